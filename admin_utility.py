@@ -1,8 +1,10 @@
 import streamlit as st
-import mysql.connector
 import pandas as pd
 from datetime import datetime, timedelta
 import traceback
+from db_pool import get_pool
+from rollups import retract_bookings, retract_donations
+from visitor_stats import recompute_visitor_stats
 
 # Set page configuration
 st.set_page_config(
@@ -12,15 +14,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Database connection
+# Database connection (borrowed from the shared pool; close() returns it)
 def get_database_connection():
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="keyur123",
-            database="temple_db"
-        )
+        conn = get_pool().get_connection()
         return conn
     except Exception as e:
         st.error(f"Database connection error: {e}")
@@ -244,23 +241,46 @@ def manage_visitors(cursor, conn):
                     if cursor.fetchone()['count'] > 0:
                         related_tables.append("PrasadamOrders")
                     
+                    cursor.execute("SELECT COUNT(*) as count FROM SlotHolds WHERE VisitorID = %s", (visitor_id,))
+                    if cursor.fetchone()['count'] > 0:
+                        related_tables.append("SlotHolds")
+                    
                     if related_tables:
                         st.error(f"Cannot delete visitor because they have records in: {', '.join(related_tables)}")
                         st.info("Delete the related records first, or use cascade delete option below.")
                         
                         if st.checkbox("I understand the risks. Delete visitor and all related records (CASCADE DELETE)"):
-                            # Delete from related tables first
+                            # Delete from related tables first (taking them out of the dashboard rollups)
+                            if "DarshanBookings" in related_tables:
+                                retract_bookings(cursor, 'VisitorID', visitor_id)
+                            if "Donations" in related_tables:
+                                retract_donations(cursor, 'VisitorID', visitor_id)
+                            if "SlotHolds" in related_tables:
+                                # Give the slots of unexpired holds back before dropping them
+                                # (locked, so the hold reaper can't release them as well)
+                                cursor.execute("""
+                                SELECT ScheduleID, NumberOfPeople FROM SlotHolds
+                                WHERE VisitorID = %s AND HoldStatus = 'Active'
+                                FOR UPDATE
+                                """, (visitor_id,))
+                                for hold in cursor.fetchall():
+                                    cursor.execute("""
+                                    UPDATE DarshanSchedules SET RemainingSlots = RemainingSlots + %s
+                                    WHERE ScheduleID = %s
+                                    """, (hold['NumberOfPeople'], hold['ScheduleID']))
                             for table in related_tables:
                                 cursor.execute(f"DELETE FROM {table} WHERE VisitorID = %s", (visitor_id,))
                             
                             # Then delete visitor
                             cursor.execute("DELETE FROM Visitors WHERE VisitorID = %s", (visitor_id,))
+                            recompute_visitor_stats(cursor, visitor_id)
                             conn.commit()
                             st.success(f"Visitor and all related records deleted successfully!")
                             st.rerun()
                     else:
                         # No related records, safe to delete
                         cursor.execute("DELETE FROM Visitors WHERE VisitorID = %s", (visitor_id,))
+                        recompute_visitor_stats(cursor, visitor_id)
                         conn.commit()
                         st.success("Visitor deleted successfully!")
                         st.rerun()
@@ -336,7 +356,7 @@ def manage_bookings(cursor, conn):
                 try:
                     # Get schedule ID and number of people before deleting
                     cursor.execute("""
-                    SELECT ScheduleID, NumberOfPeople FROM DarshanBookings
+                    SELECT ScheduleID, VisitorID, NumberOfPeople FROM DarshanBookings
                     WHERE BookingID = %s
                     """, (booking_id,))
                     booking = cursor.fetchone()
@@ -346,6 +366,7 @@ def manage_bookings(cursor, conn):
                         num_people = booking['NumberOfPeople']
                         
                         # Delete booking
+                        retract_bookings(cursor, 'BookingID', booking_id)
                         cursor.execute("DELETE FROM DarshanBookings WHERE BookingID = %s", (booking_id,))
                         
                         # Update remaining slots
@@ -354,6 +375,7 @@ def manage_bookings(cursor, conn):
                         WHERE ScheduleID = %s
                         """, (num_people, schedule_id))
                         
+                        recompute_visitor_stats(cursor, booking['VisitorID'])
                         conn.commit()
                         st.success("Booking deleted successfully and slots restored!")
                         st.rerun()
@@ -434,7 +456,12 @@ def manage_donations(cursor, conn):
             
             if st.button("Delete Selected Donation"):
                 try:
+                    cursor.execute("SELECT VisitorID FROM Donations WHERE DonationID = %s", (donation_id,))
+                    owner = cursor.fetchone()
+                    retract_donations(cursor, 'DonationID', donation_id)
                     cursor.execute("DELETE FROM Donations WHERE DonationID = %s", (donation_id,))
+                    if owner:
+                        recompute_visitor_stats(cursor, owner['VisitorID'])
                     conn.commit()
                     st.success("Donation deleted successfully!")
                     st.rerun()
@@ -511,7 +538,11 @@ def manage_pujas(cursor, conn):
             
             if st.button("Delete Selected Puja"):
                 try:
+                    cursor.execute("SELECT VisitorID FROM VirtualPujas WHERE PujaID = %s", (puja_id,))
+                    owner = cursor.fetchone()
                     cursor.execute("DELETE FROM VirtualPujas WHERE PujaID = %s", (puja_id,))
+                    if owner:
+                        recompute_visitor_stats(cursor, owner['VisitorID'])
                     conn.commit()
                     st.success("Virtual Puja deleted successfully!")
                     st.rerun()
@@ -588,7 +619,11 @@ def manage_orders(cursor, conn):
             
             if st.button("Delete Selected Order"):
                 try:
+                    cursor.execute("SELECT VisitorID FROM PrasadamOrders WHERE OrderID = %s", (order_id,))
+                    owner = cursor.fetchone()
                     cursor.execute("DELETE FROM PrasadamOrders WHERE OrderID = %s", (order_id,))
+                    if owner:
+                        recompute_visitor_stats(cursor, owner['VisitorID'])
                     conn.commit()
                     st.success("Prasadam Order deleted successfully!")
                     st.rerun()
@@ -0,0 +1,494 @@
+#api.py
+#
+# JSON booking API for the mobile app and kiosks, as a plain ASGI application.
+# Each endpoint is one TempleDatabase call (a booking, including looking up or
+# registering the devotee, is a single POST), so clients skip the Streamlit
+# page's full-script rerun per interaction.
+#
+#   pip install uvicorn
+#   python api.py --port 8000          (or: uvicorn api:app --workers 4)
+#
+# Every request except /health needs an X-API-Key header holding one of the keys
+# in TEMPLE_API_KEYS (comma-separated, e.g. one per client app). Visitor records,
+# histories and bookings are only served to a caller who also sends the devotee's
+# mobile number (phone), and a visitor_id is only accepted together with it.
+#
+# Endpoints
+#   GET    /health
+#   GET    /temples
+#   GET    /temples/{id}/darshan-types | donation-types | puja-types | prasadam-types
+#                        | festivals | schedule-templates
+#   GET    /temples/{id}/schedules[?date=YYYY-MM-DD]
+#   GET    /temples/{id}/availability?date=YYYY-MM-DD
+#   GET    /schedules/{id}
+#   GET    /visitors?phone=...
+#   POST   /visitors                  {first_name, last_name, mobile, email?, address?, city?, state?, pin?}
+#   GET    /visitors/{id}/bookings | donations | pujas | prasadam-orders?phone=...
+#   POST   /holds                     {schedule_id, num_people, visitor_id + phone | visitor}
+#   DELETE /holds/{id}?phone=...
+#   POST   /bookings                  {schedule_id, num_people, visitor_id + phone | visitor: {...}, special_req?, hold_id?}
+#   POST   /bookings/batch            {requests: [{schedule_id, visitor_id, phone, num_people, special_req?}, ...]}
+#   GET    /bookings/{id}?phone=...
+#   POST   /donations                 {temple_id, donation_type_id, amount, payment_mode, transaction_ref,
+#                                      visitor_id + phone | visitor?, ...}
+#   POST   /pujas                     {temple_id, puja_type_id, puja_date, puja_time, visitor_id + phone | visitor,
+#                                      devotee_message?}
+#   POST   /prasadam-orders           {temple_id, prasadam_type_id, quantity, shipping_address, visitor_id + phone | visitor}
+#
+# Prices come from the catalogue, never from the request. A request that finds no
+# free database connection within the pool timeout gets 503.
+
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from booking import TempleDatabase
+from db_pool import DB_BACKEND, PoolTimeoutError
+from hold_reaper import start_hold_reaper
+
+# Keys accepted in the X-API-Key header. With none configured every request but /health is refused.
+API_KEYS = [key.strip() for key in os.environ.get('TEMPLE_API_KEYS', '').split(',') if key.strip()]
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 1024 * 1024
+
+# Payment modes a donation may name (as offered by the app); each needs the gateway's transaction_ref
+PAYMENT_MODES = ("UPI", "Credit Card", "Debit Card", "Net Banking")
+
+# HTTP status for the error messages TempleDatabase returns
+ERROR_STATUS = {
+    "Number of people must be at least 1": 400,
+    "Schedule not found": 404,
+    "Visitor not found": 404,
+    "This darshan schedule has been cancelled": 409,
+    "Not enough slots available": 409,
+    "Your slot hold has expired. Please select the slot again.": 409,
+}
+
+CATALOGUES = {
+    'darshan-types': 'get_darshan_types',
+    'donation-types': 'get_donation_types',
+    'puja-types': 'get_puja_types',
+    'prasadam-types': 'get_prasadam_types',
+    'festivals': 'get_upcoming_festivals',
+    'schedule-templates': 'get_schedule_templates',
+}
+
+HISTORIES = {
+    'bookings': 'get_visitor_bookings',
+    'donations': 'get_visitor_donations',
+    'pujas': 'get_visitor_pujas',
+    'prasadam-orders': 'get_visitor_prasadam_orders',
+}
+
+# (method, path pattern, handler name)
+ROUTES = [
+    ('GET', r'/health', 'health'),
+    ('GET', r'/temples', 'temples'),
+    ('GET', r'/temples/(?P<temple_id>\d+)/(?P<catalogue>' + '|'.join(CATALOGUES) + ')', 'catalogue'),
+    ('GET', r'/temples/(?P<temple_id>\d+)/schedules', 'schedules'),
+    ('GET', r'/temples/(?P<temple_id>\d+)/availability', 'availability'),
+    ('GET', r'/schedules/(?P<schedule_id>\d+)', 'schedule'),
+    ('GET', r'/visitors', 'find_visitor'),
+    ('POST', r'/visitors', 'register_visitor'),
+    ('GET', r'/visitors/(?P<visitor_id>\d+)/(?P<history>' + '|'.join(HISTORIES) + ')', 'visitor_history'),
+    ('POST', r'/holds', 'hold'),
+    ('DELETE', r'/holds/(?P<hold_id>\d+)', 'release_hold'),
+    ('POST', r'/bookings', 'book'),
+    ('POST', r'/bookings/batch', 'book_batch'),
+    ('GET', r'/bookings/(?P<booking_id>\d+)', 'booking'),
+    ('POST', r'/donations', 'donate'),
+    ('POST', r'/pujas', 'book_puja'),
+    ('POST', r'/prasadam-orders', 'order_prasadam'),
+]
+_ROUTES = [(method, re.compile(pattern + '/?'), handler) for method, pattern, handler in ROUTES]
+
+
+class HTTPError(Exception):
+    """An error response with a status code and message"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _json_default(value: Any) -> Any:
+    """Encode the column types MySQL rows come back with"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        # TIME columns
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+def encode(payload: Any) -> bytes:
+    """Serialize a response payload"""
+    return json.dumps(payload, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+def _field(body: Dict, name: str, kind: type = int, required: bool = True, default: Any = None) -> Any:
+    """Get and type-check one field of a JSON body"""
+    value = body.get(name)
+    if value is None:
+        if required:
+            raise HTTPError(400, f"Missing field: {name}")
+        return default
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        value = float(value)
+    if not isinstance(value, kind) or isinstance(value, bool) and kind is not bool:
+        raise HTTPError(400, f"Field {name} must be {kind.__name__}")
+    return value
+
+def _date_field(body: Dict, name: str) -> str:
+    """Get a YYYY-MM-DD field"""
+    value = _field(body, name, str)
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise HTTPError(400, f"Field {name} must be a YYYY-MM-DD date")
+    return value
+
+def _result(result: Tuple[Optional[int], Optional[str]], key: str, value_key: str = None) -> Tuple[int, Dict]:
+    """Turn a TempleDatabase (id, value) / (None, error) pair into a response"""
+    record_id, value = result
+    if record_id is None:
+        if value not in ERROR_STATUS:
+            # Database error text stays in the server log
+            print(f"Request failed: {value}")
+            raise HTTPError(500, "Request failed")
+        raise HTTPError(ERROR_STATUS[value], value)
+    return 201, {key: record_id, value_key: value} if value_key else {key: record_id}
+
+
+class BookingAPI:
+    """
+    ASGI application serving the booking API from one shared database object.
+
+    db may be a TempleDatabase (its calls run on worker threads, each with its
+    own pooled connection) or an AsyncTempleDatabase (awaited directly). By
+    default the async one is used on MySQL and TempleDatabase otherwise.
+    api_keys defaults to TEMPLE_API_KEYS.
+    """
+
+    def __init__(self, db: Any = None, reap_holds: bool = True, api_keys: List[str] = None):
+        self.db = db
+        self.reap_holds = reap_holds
+        self.api_keys = [key.encode('utf-8') for key in (API_KEYS if api_keys is None else api_keys)]
+        self._started = False
+
+    def _start(self) -> None:
+        """Create the database object and the hold reaper on first use"""
+        if self._started:
+            return
+        self._started = True
+        if not self.api_keys:
+            print("WARNING: no API keys configured (TEMPLE_API_KEYS); every request except /health will be refused")
+        sync_db = None
+        if self.db is None:
+            if DB_BACKEND == 'mysql':
+                # aiomysql is only needed when serving from MySQL
+                from async_booking import AsyncTempleDatabase
+                self.db = AsyncTempleDatabase()
+            else:
+                self.db = sync_db = TempleDatabase(per_request=True)
+        elif isinstance(self.db, TempleDatabase):
+            sync_db = self.db
+        if self.reap_holds:
+            # Holds that are never booked must still give their slots back
+            start_hold_reaper(sync_db or TempleDatabase(per_request=True))
+
+    async def call(self, name: str, *args, **kwargs) -> Any:
+        """Call a database method, awaiting it or running it on a worker thread"""
+        method = getattr(self.db, name)
+        if asyncio.iscoroutinefunction(method):
+            return await method(*args, **kwargs)
+        return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def __call__(self, scope: Dict, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        self._start()
+        try:
+            self._authenticate(scope)
+            status, payload = await self._dispatch(scope, receive)
+        except HTTPError as err:
+            status, payload = err.status, {'error': err.message}
+        except PoolTimeoutError as err:
+            # Every pooled connection is busy; the client can retry
+            print(f"Error handling {scope['method']} {scope['path']}: {err}")
+            status, payload = 503, {'error': "Service busy, please retry"}
+        except Exception as err:
+            print(f"Error handling {scope['method']} {scope['path']}: {err}")
+            status, payload = 500, {'error': "Internal server error"}
+
+        body = encode(payload)
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if asyncio.iscoroutinefunction(getattr(self.db, 'disconnect', None)):
+                    await self.db.disconnect()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _authenticate(self, scope: Dict) -> None:
+        """Require a configured API key on everything but the health check"""
+        if scope['path'].rstrip('/') == '/health':
+            return
+        provided = dict(scope.get('headers', [])).get(b'x-api-key', b'')
+        # Compare against every key so the time taken doesn't reveal which one nearly matched
+        if not sum(hmac.compare_digest(provided, key) for key in self.api_keys):
+            raise HTTPError(401, "Missing or invalid API key")
+
+    async def _dispatch(self, scope: Dict, receive) -> Tuple[int, Any]:
+        """Route a request to its handler"""
+        path = scope['path']
+        allowed = False
+        for method, pattern, handler in _ROUTES:
+            match = pattern.fullmatch(path)
+            if not match:
+                continue
+            allowed = True
+            if method != scope['method']:
+                continue
+
+            params = {key: int(value) if value.isdigit() else value
+                      for key, value in match.groupdict().items()}
+            query = {key: values[-1] for key, values in
+                     parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+            body = await self._read_body(receive) if method == 'POST' else {}
+            return await getattr(self, handler)(params, query, body)
+
+        if allowed:
+            raise HTTPError(405, "Method not allowed")
+        raise HTTPError(404, "Not found")
+
+    async def _read_body(self, receive) -> Dict:
+        """Read and parse a JSON object body"""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, "Request body too large")
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        try:
+            body = json.loads(b''.join(chunks) or b'{}')
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return body
+
+    async def _own_visitor(self, phone: str, visitor_id: int = None) -> Dict:
+        """
+        The visitor registered with phone, which must be visitor_id if given.
+        Mismatches look like unknown visitors, so IDs can't be probed.
+        """
+        visitor = await self.call('get_visitor_by_phone', phone)
+        if visitor is None or visitor_id is not None and visitor['VisitorID'] != visitor_id:
+            raise HTTPError(404, "Visitor not found")
+        return visitor
+
+    async def _visitor_id(self, body: Dict, required: bool = True) -> Optional[int]:
+        """The request's visitor_id (with its phone), or the visitor given by mobile number (registered if new)"""
+        if body.get('visitor_id') is not None:
+            visitor_id = _field(body, 'visitor_id')
+            await self._own_visitor(_field(body, 'phone', str), visitor_id)
+            return visitor_id
+        visitor = body.get('visitor')
+        if visitor is None:
+            if required:
+                raise HTTPError(400, "Missing field: visitor_id or visitor")
+            return None
+        if not isinstance(visitor, dict):
+            raise HTTPError(400, "Field visitor must be an object")
+
+        mobile = _field(visitor, 'mobile', str)
+        existing = await self.call('get_visitor_by_phone', mobile)
+        if existing is not None:
+            return existing['VisitorID']
+        visitor_id = await self.call(
+            'register_visitor', _field(visitor, 'first_name', str), _field(visitor, 'last_name', str), mobile,
+            *(_field(visitor, name, str, required=False) for name in ('email', 'address', 'city', 'state', 'pin'))
+        )
+        if visitor_id is None:
+            raise HTTPError(500, "Could not register visitor")
+        return visitor_id
+
+    async def _catalogue_item(self, method: str, temple_id: int, id_key: str, item_id: int) -> Dict:
+        """Find an active donation/puja/prasadam type of a temple"""
+        item = next((row for row in await self.call(method, temple_id) if row[id_key] == item_id), None)
+        if item is None:
+            raise HTTPError(404, f"{id_key} {item_id} not found for temple {temple_id}")
+        return item
+
+    # Handlers: (path params, query params, JSON body) -> (status, payload)
+    async def health(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        return 200, {'status': 'ok', 'backend': DB_BACKEND}
+
+    async def temples(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        return 200, await self.call('get_temples')
+
+    async def catalogue(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        return 200, await self.call(CATALOGUES[params['catalogue']], params['temple_id'])
+
+    async def schedules(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        schedule_date = _date_field(query, 'date') if 'date' in query else None
+        return 200, await self.call('get_darshan_schedules', params['temple_id'], schedule_date)
+
+    async def availability(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        return 200, await self.call('get_slot_availability', params['temple_id'], _date_field(query, 'date'))
+
+    async def schedule(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        schedule = await self.call('get_schedule_details', params['schedule_id'])
+        if schedule is None:
+            raise HTTPError(404, "Schedule not found")
+        return 200, schedule
+
+    async def find_visitor(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        return 200, await self._own_visitor(_field(query, 'phone', str))
+
+    async def register_visitor(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        return 201, {'visitor_id': await self._visitor_id({'visitor': body})}
+
+    async def visitor_history(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        await self._own_visitor(_field(query, 'phone', str), params['visitor_id'])
+        return 200, await self.call(HISTORIES[params['history']], params['visitor_id'])
+
+    async def hold(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        result = await self.call('hold_slots', _field(body, 'schedule_id'), _field(body, 'num_people'),
+                                 await self._visitor_id(body))
+        return _result(result, 'hold_id')
+
+    async def release_hold(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        visitor = await self._own_visitor(_field(query, 'phone', str))
+        if not await self.call('release_hold', params['hold_id'], visitor['VisitorID']):
+            raise HTTPError(404, "No active hold with that ID")
+        return 200, {'released': True}
+
+    async def book(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        schedule_id, num_people = _field(body, 'schedule_id'), _field(body, 'num_people')
+        special_req = _field(body, 'special_req', str, required=False)
+        hold_id = _field(body, 'hold_id', required=False)
+        visitor_id = await self._visitor_id(body)
+        result = await self.call('book_darshan', schedule_id, visitor_id, num_people, special_req, hold_id=hold_id)
+        status, payload = _result(result, 'booking_id', 'qr_payload')
+        payload['visitor_id'] = visitor_id
+        return status, payload
+
+    async def book_batch(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        requests = body.get('requests')
+        if not isinstance(requests, list) or not all(isinstance(request, dict) for request in requests):
+            raise HTTPError(400, "Field requests must be a list of objects")
+        requests = [{
+            'schedule_id': _field(request, 'schedule_id'),
+            'visitor_id': _field(request, 'visitor_id'),
+            'phone': _field(request, 'phone', str),
+            'num_people': _field(request, 'num_people'),
+            'special_req': _field(request, 'special_req', str, required=False),
+        } for request in requests]
+        for request in requests:
+            await self._own_visitor(request.pop('phone'), request['visitor_id'])
+        results = await self.call('book_darshan_batch', requests)
+        return 200, [{'booking_id': booking_id, 'qr_payload': value} if booking_id is not None
+                     else {'booking_id': None, 'error': value} for booking_id, value in results]
+
+    async def booking(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        visitor = await self._own_visitor(_field(query, 'phone', str))
+        bookings = await self.call('get_visitor_bookings', visitor['VisitorID']) or []
+        if not any(row['BookingID'] == params['booking_id'] for row in bookings):
+            raise HTTPError(404, "Booking not found")
+        booking = await self.call('get_booking_details', params['booking_id'])
+        if booking is None:
+            raise HTTPError(404, "Booking not found")
+        return 200, booking
+
+    async def donate(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        temple_id, donation_type_id = _field(body, 'temple_id'), _field(body, 'donation_type_id')
+        amount = _field(body, 'amount', float)
+        payment_mode = _field(body, 'payment_mode', str)
+        if payment_mode not in PAYMENT_MODES:
+            raise HTTPError(400, f"Field payment_mode must be one of: {', '.join(PAYMENT_MODES)}")
+        transaction_ref = _field(body, 'transaction_ref', str)
+        is_anonymous = _field(body, 'is_anonymous', bool, required=False, default=False)
+
+        donation_type = await self._catalogue_item('get_donation_types', temple_id, 'DonationTypeID', donation_type_id)
+        if amount < float(donation_type['MinimumAmount'] or 0) or amount <= 0:
+            raise HTTPError(400, f"Minimum donation amount is {donation_type['MinimumAmount']}")
+
+        visitor_id = None if is_anonymous else await self._visitor_id(body, required=False)
+        result = await self.call(
+            'make_donation', temple_id, donation_type_id, visitor_id, amount, payment_mode,
+            transaction_ref, is_anonymous,
+            *(_field(body, name, str, required=False) for name in ('donor_name', 'donor_phone', 'donor_email'))
+        )
+        return _result(result, 'donation_id', 'receipt_number')
+
+    async def book_puja(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        temple_id, puja_type_id = _field(body, 'temple_id'), _field(body, 'puja_type_id')
+        puja_date, puja_time = _date_field(body, 'puja_date'), _field(body, 'puja_time', str)
+        puja_type = await self._catalogue_item('get_puja_types', temple_id, 'PujaTypeID', puja_type_id)
+        visitor_id = await self._visitor_id(body)
+        result = await self.call('book_virtual_puja', temple_id, visitor_id, puja_type_id, puja_date, puja_time,
+                                 puja_type['Price'], _field(body, 'devotee_message', str, required=False))
+        return _result(result, 'puja_id', 'receipt_number')
+
+    async def order_prasadam(self, params: Dict, query: Dict, body: Dict) -> Tuple[int, Any]:
+        temple_id, prasadam_type_id = _field(body, 'temple_id'), _field(body, 'prasadam_type_id')
+        quantity = _field(body, 'quantity')
+        if quantity < 1:
+            raise HTTPError(400, "Quantity must be at least 1")
+        shipping_address = _field(body, 'shipping_address', str)
+        prasadam_type = await self._catalogue_item('get_prasadam_types', temple_id, 'PrasadamTypeID', prasadam_type_id)
+        visitor_id = await self._visitor_id(body)
+        result = await self.call('order_prasadam', visitor_id, temple_id, prasadam_type_id, quantity,
+                                 prasadam_type['Price'] * quantity, shipping_address)
+        return _result(result, 'order_id', 'tracking_number')
+
+
+app = BookingAPI()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the JSON booking API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    args = parser.parse_args()
+
+    # The server is only needed when serving; benchmarks call the app in-process
+    import uvicorn
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#api_benchmark.py
+#
+# Booking throughput of the JSON API (api.py) against the Streamlit booking page.
+# N devotees book concurrently on a throwaway far-future day, once through each path:
+#
+#   streamlit  every click reruns the whole script: the sidebar (temples, festivals),
+#              the page's connection checkout, temples, darshan types and slot
+#              availability, then the click's own calls. A booking is five reruns
+#              (open page, Book Now, Check phone, Register if new, Proceed to Payment
+#              with hold + book). Only the database work is replayed, not widget
+#              rendering or the simulated 2s payment, so these figures flatter Streamlit.
+#   api        GET /temples/{id}/availability, then one POST /bookings that looks up or
+#              registers the devotee and books.
+#
+# The API is called in-process through its ASGI interface, or over HTTP with --url
+# (sending --api-key, by default the first of the server's TEMPLE_API_KEYS).
+#
+#   python api_benchmark.py --devotees 100 --bookings-per-devotee 3
+#   python api_benchmark.py --url http://127.0.0.1:8000 --api-key <key> --devotees 200
+
+import argparse
+import asyncio
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from api import API_KEYS, BookingAPI, encode
+from benchmark import percentile
+from booking import TempleDatabase
+from db_pool import DB_BACKEND, DB_CONFIG, get_pool
+from load_test import cleanup, create_surge_day
+
+PATHS = ['streamlit', 'api']
+
+
+async def asgi_request(app: BookingAPI, api_key: str, method: str, path: str, body: Any = None) -> Tuple[int, Any]:
+    """Send one request through an ASGI app in-process and decode the JSON response"""
+    path, _, query = path.partition('?')
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+             'headers': [(b'content-type', b'application/json'), (b'x-api-key', api_key.encode())]}
+    request_body = encode(body) if body is not None else b''
+    response = {}
+    chunks = []
+
+    async def receive() -> Dict:
+        return {'type': 'http.request', 'body': request_body, 'more_body': False}
+
+    async def send(message: Dict) -> None:
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        else:
+            chunks.append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return response['status'], json.loads(b''.join(chunks))
+
+def http_request(url: str, api_key: str, method: str, path: str, body: Any = None) -> Tuple[int, Any]:
+    """Send one request to a running API server"""
+    data = encode(body) if body is not None else None
+    request = urllib.request.Request(url.rstrip('/') + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json', 'X-API-Key': api_key})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as err:
+        return err.code, json.loads(err.read() or b'{}')
+
+def streamlit_rerun(db: TempleDatabase, temple_id: int, day: str) -> Dict[int, List[Dict]]:
+    """The database work of one rerun of app.py on the Book Darshan page"""
+    # Sidebar
+    temples = db.get_temples()
+    if temples:
+        db.get_upcoming_festivals(temples[0]['TempleID'])
+    # show_book_darshan_page
+    conn = db.pool.get_connection()
+    conn.cursor(dictionary=True)
+    conn.close()
+    db.get_temples()
+    db.get_darshan_types(temple_id)
+    return db.get_slot_availability(temple_id, day)
+
+def pick_schedule(availability: Dict, surge_ids: set, people: int, rng: random.Random) -> Optional[int]:
+    """A random surge-day schedule with room for people"""
+    candidates = [schedule['ScheduleID'] for schedules in availability.values() for schedule in schedules
+                  if schedule['ScheduleID'] in surge_ids and schedule['RemainingSlots'] >= people]
+    return rng.choice(candidates) if candidates else None
+
+def summarize(path: str, elapsed: float, requests: List[float], bookings: List[float],
+              outcomes: Counter) -> Dict[str, Any]:
+    """Throughput and latency for one path"""
+    requests, bookings = sorted(requests), sorted(bookings)
+    return {
+        'path': path,
+        'bookings': len(bookings),
+        'requests': len(requests),
+        'requests_per_booking': len(requests) / len(bookings) if bookings else None,
+        'seconds': elapsed,
+        'requests_per_s': len(requests) / elapsed if elapsed else 0.0,
+        'bookings_per_s': len(bookings) / elapsed if elapsed else 0.0,
+        'request_p50_ms': percentile(requests, 50) * 1000 if requests else None,
+        'request_p95_ms': percentile(requests, 95) * 1000 if requests else None,
+        'booking_p50_ms': percentile(bookings, 50) * 1000 if bookings else None,
+        'booking_p95_ms': percentile(bookings, 95) * 1000 if bookings else None,
+        'sold_out': outcomes['sold_out'],
+        'errors': outcomes['errors'],
+    }
+
+def run_streamlit(db: TempleDatabase, surge: Dict, phones: List[str], plans: List[List[int]],
+                  seed: int, visitor_ids: List[int]) -> Dict[str, Any]:
+    """Every devotee books through replayed Streamlit reruns, one thread per session"""
+    temple_id, day = surge['temple_id'], surge['date']
+    surge_ids = set(surge['schedule_ids'])
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    outcomes = Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(len(phones) + 1)
+
+    def rerun(action=None, *args, **kwargs) -> Any:
+        began = time.perf_counter()
+        availability = streamlit_rerun(db, temple_id, day)
+        result = action(*args, **kwargs) if action else availability
+        with lock:
+            latencies['request'].append(time.perf_counter() - began)
+        return result
+
+    def devotee(index: int) -> None:
+        rng = random.Random(seed * 100003 + index)
+        start.wait()
+        for people in plans[index]:
+            began = time.perf_counter()
+            availability = rerun()                                        # open the page
+            schedule_id = pick_schedule(availability, surge_ids, people, rng)
+            if schedule_id is None:
+                with lock:
+                    outcomes['sold_out'] += 1
+                continue
+            rerun()                                                       # Book Now
+            visitor = rerun(db.get_visitor_by_phone, phones[index])      # Check
+            if visitor is None:
+                visitor_id = rerun(db.register_visitor, "Bench", f"Devotee{index}", phones[index])
+                if visitor_id is None:
+                    with lock:
+                        outcomes['errors'] += 1
+                    return
+                with lock:
+                    visitor_ids.append(visitor_id)
+            else:
+                visitor_id = visitor['VisitorID']
+
+            def pay() -> Tuple[Optional[int], Optional[str]]:
+                hold_id, error = db.hold_slots(schedule_id, people, visitor_id)
+                if not hold_id:
+                    return None, error
+                result = db.book_darshan(schedule_id, visitor_id, people, None, hold_id=hold_id)
+                if not result[0]:
+                    db.release_hold(hold_id)
+                return result
+
+            booking_id, message = rerun(pay)                              # Proceed to Payment
+            with lock:
+                if booking_id:
+                    latencies['booking'].append(time.perf_counter() - began)
+                else:
+                    outcomes['sold_out' if message == "Not enough slots available" else 'errors'] += 1
+
+    threads = [threading.Thread(target=devotee, args=(i,)) for i in range(len(phones))]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return summarize('streamlit', time.perf_counter() - began, latencies['request'], latencies['booking'], outcomes)
+
+async def run_api(app: Optional[BookingAPI], url: Optional[str], api_key: str, surge: Dict, phones: List[str],
+                  plans: List[List[int]], seed: int, visitor_ids: List[int]) -> Dict[str, Any]:
+    """Every devotee books through the JSON API, one task per devotee"""
+    surge_ids = set(surge['schedule_ids'])
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    outcomes = Counter()
+    start = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=len(phones)) if url else None
+
+    async def request(method: str, path: str, body: Any = None) -> Tuple[int, Any]:
+        began = time.perf_counter()
+        if url:
+            result = await loop.run_in_executor(executor, http_request, url, api_key, method, path, body)
+        else:
+            result = await asgi_request(app, api_key, method, path, body)
+        latencies['request'].append(time.perf_counter() - began)
+        return result
+
+    async def devotee(index: int) -> None:
+        rng = random.Random(seed * 100003 + index)
+        await start.wait()
+        for people in plans[index]:
+            began = time.perf_counter()
+            status, availability = await request(
+                'GET', f"/temples/{surge['temple_id']}/availability?date={surge['date']}")
+            schedule_id = pick_schedule(availability, surge_ids, people, rng) if status == 200 else None
+            if schedule_id is None:
+                outcomes['sold_out' if status == 200 else 'errors'] += 1
+                continue
+            status, result = await request('POST', '/bookings', {
+                'schedule_id': schedule_id, 'num_people': people,
+                'visitor': {'first_name': "Bench", 'last_name': f"Devotee{index}", 'mobile': phones[index]}
+            })
+            if status == 201:
+                latencies['booking'].append(time.perf_counter() - began)
+                if result['visitor_id'] not in visitor_ids:
+                    visitor_ids.append(result['visitor_id'])
+            else:
+                outcomes['sold_out' if status == 409 else 'errors'] += 1
+
+    tasks = [asyncio.create_task(devotee(i)) for i in range(len(phones))]
+    began = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - began
+    if executor:
+        executor.shutdown()
+    return summarize('api', elapsed, latencies['request'], latencies['booking'], outcomes)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare booking throughput of the JSON API and the Streamlit page")
+    parser.add_argument("--devotees", type=int, default=50, help="Concurrent devotees per path")
+    parser.add_argument("--bookings-per-devotee", type=int, default=2)
+    parser.add_argument("--schedules", type=int, default=4, help="Slots on the benchmark day")
+    parser.add_argument("--capacity", type=int, default=100000, help="Capacity of each slot (large: nothing sells out)")
+    parser.add_argument("--max-people", type=int, default=4)
+    parser.add_argument("--paths", default=",".join(PATHS), help="Comma-separated subset of: " + ", ".join(PATHS))
+    parser.add_argument("--url", help="Benchmark a running API server instead of calling it in-process")
+    parser.add_argument("--api-key", help="X-API-Key to send with --url (default: the first of TEMPLE_API_KEYS)")
+    parser.add_argument("--sync-api", action="store_true",
+                        help="Serve the in-process API from TempleDatabase on worker threads even on MySQL")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the results as JSON")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark day and visitors")
+    args = parser.parse_args()
+
+    paths = [path.strip() for path in args.paths.split(',') if path.strip()]
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        parser.error(f"unknown paths: {', '.join(sorted(unknown))}")
+    # The in-process API only accepts a throwaway key of its own
+    api_key = (args.api_key or (API_KEYS[0] if API_KEYS else None)) if args.url else secrets.token_urlsafe()
+    if api_key is None:
+        parser.error("--url needs --api-key or TEMPLE_API_KEYS")
+
+    # Every Streamlit session and API worker thread gets its own connection
+    get_pool(DB_CONFIG, pool_size=args.devotees + 2, timeout=60)
+    db = TempleDatabase(per_request=True)
+    db.init_db()
+
+    rng = random.Random(args.seed)
+    plans = [[rng.randint(1, args.max_people) for _ in range(args.bookings_per_devotee)]
+             for _ in range(args.devotees)]
+    numbers = rng.sample(range(10**9), 2 * args.devotees)
+
+    if args.url or args.sync_api or DB_BACKEND != 'mysql':
+        app = BookingAPI(db, reap_holds=False, api_keys=[api_key])
+    else:
+        from async_booking import AsyncTempleDatabase
+        app = BookingAPI(AsyncTempleDatabase(pool_size=args.devotees + 2, timeout=60), reap_holds=False,
+                         api_keys=[api_key])
+
+    results = []
+    for path_no, path in enumerate(paths):
+        # A fresh day and fresh devotees per path, so both start from the same state
+        surge = create_surge_day(db, args.schedules, args.capacity, 0)
+        phones = [f"6{number:09d}" for number in numbers[path_no * args.devotees:(path_no + 1) * args.devotees]]
+        visitor_ids: List[int] = []
+        try:
+            if path == 'streamlit':
+                results.append(run_streamlit(db, surge, phones, plans, args.seed, visitor_ids))
+            else:
+                results.append(asyncio.run(run_api(None if args.url else app, args.url, api_key, surge, phones,
+                                                   plans, args.seed, visitor_ids)))
+        finally:
+            if not args.keep:
+                cleanup(db, surge, visitor_ids)
+
+    print(f"Backend: {DB_BACKEND}  Devotees: {args.devotees}  Bookings each: {args.bookings_per_devotee}"
+          f"  API: {args.url or type(app.db).__name__ + ' in-process'}")
+    print(f"{'path':<10} {'bookings':>8} {'reqs':>6} {'req/bk':>6} {'req/s':>9} {'bk/s':>8} "
+          f"{'req p50':>8} {'req p95':>8} {'bk p50':>8} {'bk p95':>8} {'sold':>5} {'err':>4}")
+    for row in results:
+        print(f"{row['path']:<10} {row['bookings']:>8} {row['requests']:>6} "
+              f"{row['requests_per_booking'] or 0:>6.1f} {row['requests_per_s']:>9.1f} {row['bookings_per_s']:>8.1f} "
+              f"{row['request_p50_ms'] or 0:>8.1f} {row['request_p95_ms'] or 0:>8.1f} "
+              f"{row['booking_p50_ms'] or 0:>8.1f} {row['booking_p95_ms'] or 0:>8.1f} "
+              f"{row['sold_out']:>5} {row['errors']:>4}")
+
+    by_path = {row['path']: row for row in results}
+    if 'streamlit' in by_path and 'api' in by_path and by_path['streamlit']['bookings_per_s']:
+        print(f"API books {by_path['api']['bookings_per_s'] / by_path['streamlit']['bookings_per_s']:.1f}x "
+              f"faster than the Streamlit page")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'meta': vars(args) | {'backend': DB_BACKEND}, 'results': results}, f, indent=2)
+        print(f"Saved {args.out}")
+
+    return 1 if any(row['errors'] for row in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
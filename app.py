@@ -1,6 +1,5 @@
 #app.py
 import streamlit as st
-import mysql.connector
 import traceback
 from datetime import datetime, timedelta
 import time
@@ -13,6 +12,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 from PIL import Image
 import base64
+from db_pool import get_pool
+from booking import TempleDatabase, render_qr_code
+from dashboard import overview_queries, run_parallel
+from hold_reaper import start_hold_reaper
+from entry_pass import USING_DEV_SECRET
 
 # Set page configuration
 st.set_page_config(
@@ -75,20 +79,22 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Database connection
+# Database connection (borrowed from the shared pool; close() returns it)
 def get_database_connection():
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="keyur123",
-            database="temple_db"
-        )
+        conn = get_pool().get_connection()
         return conn
     except Exception as e:
         st.error(f"Database connection error: {e}")
         return None
 
+# Shared TempleDatabase for all sessions; each call borrows its own pooled connection
+@st.cache_resource
+def get_temple_db():
+    db = TempleDatabase(per_request=True)
+    start_hold_reaper(db)
+    return db
+
 # Format currency
 def format_currency(amount):
     if amount == 0:
@@ -119,36 +125,21 @@ def create_sidebar():
             st.markdown("**Morning**: 5:30 AM - 12:00 PM")
             st.markdown("**Evening**: 4:00 PM - 9:30 PM")
             
-            # Get festivals if possible
-            conn = get_database_connection()
-            if conn:
-                cursor = conn.cursor(dictionary=True)
-                try:
-                    cursor.execute("SELECT * FROM Temples LIMIT 1")
-                    temple = cursor.fetchone()
-                    
-                    if temple:
-                        # Get festivals
-                        cursor.execute("""
-                        SELECT FestivalName, StartDate, EndDate FROM Festivals 
-                        WHERE TempleID = %s AND EndDate >= CURDATE() 
-                        ORDER BY StartDate LIMIT 3
-                        """, (temple['TempleID'],))
-                        
-                        festivals = cursor.fetchall()
-                        
-                        if festivals:
-                            st.markdown("### Upcoming Festivals")
-                            for festival in festivals:
-                                st.markdown(f"**{festival['FestivalName']}**: {festival['StartDate']} to {festival['EndDate']}")
-                
-                except Exception as e:
-                    # Just skip festivals if there's an error
-                    pass
+            # Get festivals if possible (served from the shared festival cache)
+            try:
+                temples = get_temple_db().get_temples()
                 
-                finally:
-                    cursor.close()
-                    conn.close()
+                if temples:
+                    festivals = get_temple_db().get_upcoming_festivals(temples[0]['TempleID'])[:3]
+                    
+                    if festivals:
+                        st.markdown("### Upcoming Festivals")
+                        for festival in festivals:
+                            st.markdown(f"**{festival['FestivalName']}**: {festival['StartDate']} to {festival['EndDate']}")
+            
+            except Exception as e:
+                # Just skip festivals if there's an error
+                pass
             
             st.markdown("---")
             st.info("📞 Helpline: +91-22-24373626\n\n📧 Email: info@siddhivinayak.org")
@@ -280,449 +271,183 @@ def show_book_darshan_page():
     try:
         st.markdown('<h1 class="main-header">Book Darshan</h1>', unsafe_allow_html=True)
         
-        conn = get_database_connection()
-        if not conn:
-            st.error("Could not connect to database. Please try again later.")
+        # Get temples
+        temples = get_temple_db().get_temples()
+        
+        if not temples:
+            st.error("No temples available in the system")
             return
         
-        cursor = conn.cursor(dictionary=True)
+        # Temple selection
+        temple_names = [temple['TempleName'] for temple in temples]
+        selected_temple = st.selectbox("Select Temple", temple_names)
+        selected_temple_id = next((temple['TempleID'] for temple in temples if temple['TempleName'] == selected_temple), None)
         
-        try:
-            # Get temples
-            cursor.execute("SELECT * FROM Temples WHERE IsActive = TRUE")
-            temples = cursor.fetchall()
-            
-            if not temples:
-                st.error("No temples available in the system")
-                return
-            
-            # Temple selection
-            temple_names = [temple['TempleName'] for temple in temples]
-            selected_temple = st.selectbox("Select Temple", temple_names)
-            selected_temple_id = next((temple['TempleID'] for temple in temples if temple['TempleName'] == selected_temple), None)
-            
-            if not selected_temple_id:
-                st.error("Temple information not available")
-                return
-            
-            # Select date
-            selected_date = st.date_input("Select Date", datetime.now())
-            
-            # Get darshan types
-            cursor.execute("""
-            SELECT * FROM DarshanTypes 
-            WHERE TempleID = %s
-            """, (selected_temple_id,))
-            
-            darshan_types = cursor.fetchall()
-            
-            if not darshan_types:
-                st.warning("No darshan types available")
-                return
+        if not selected_temple_id:
+            st.error("Temple information not available")
+            return
+        
+        # Select date
+        selected_date = st.date_input("Select Date", datetime.now())
+        
+        # Get darshan types
+        darshan_types = get_temple_db().get_darshan_types(selected_temple_id)
+        
+        if not darshan_types:
+            st.warning("No darshan types available")
+            return
+        
+        # Available schedules for every darshan type, fetched in a single query
+        availability = get_temple_db().get_slot_availability(
+            selected_temple_id, selected_date.strftime('%Y-%m-%d')
+        )
+        
+        st.markdown('<h2 class="sub-header">Available Darshan Types</h2>', unsafe_allow_html=True)
+        
+        for darshan in darshan_types:
+            class_type = "card-gold" if "VIP" in darshan['DarshanName'] or "Aarti" in darshan['DarshanName'] else "card-purple"
+            st.markdown(f'<div class="card {class_type}">', unsafe_allow_html=True)
             
-            st.markdown('<h2 class="sub-header">Available Darshan Types</h2>', unsafe_allow_html=True)
+            col1, col2 = st.columns([3, 1])
             
-            for darshan in darshan_types:
-                class_type = "card-gold" if "VIP" in darshan['DarshanName'] or "Aarti" in darshan['DarshanName'] else "card-purple"
-                st.markdown(f'<div class="card {class_type}">', unsafe_allow_html=True)
-                
-                col1, col2 = st.columns([3, 1])
-                
-                with col1:
-                    st.markdown(f"### {darshan['DarshanName']}")
-                    if darshan['Description']:
-                        st.markdown(f"**Description**: {darshan['Description']}")
-                    st.markdown(f"**Duration**: {darshan['Duration']} minutes")
-                    
-                    price_text = "Free" if darshan['StandardPrice'] == 0 else f"₹{darshan['StandardPrice']:.2f} per person"
-                    st.markdown(f"**Price**: {price_text}")
-                
-                with col2:
-                    # Get available schedules for this darshan type
-                    cursor.execute("""
-                    SELECT ScheduleID, ScheduleDate, StartTime, EndTime, RemainingSlots
-                    FROM DarshanSchedules
-                    WHERE TempleID = %s AND DarshanTypeID = %s 
-                      AND ScheduleDate = %s AND IsCancelled = FALSE
-                      AND RemainingSlots > 0
-                    ORDER BY StartTime
-                    """, (selected_temple_id, darshan['DarshanTypeID'], selected_date.strftime('%Y-%m-%d')))
-                    
-                    schedules = cursor.fetchall()
-                    
-                    if schedules:
-                        schedule_options = [f"{schedule['StartTime']} - {schedule['EndTime']} ({schedule['RemainingSlots']} slots)" 
-                                         for schedule in schedules]
-                        
-                        selected_slot = st.selectbox(
-                            f"Select Time Slot",
-                            schedule_options,
-                            key=f"slot_{darshan['DarshanTypeID']}"
-                        )
-                        
-                        selected_idx = schedule_options.index(selected_slot)
-                        selected_schedule = schedules[selected_idx]
-                        
-                        if st.button("Book Now", key=f"book_{darshan['DarshanTypeID']}"):
-                            st.session_state.selected_darshan = darshan
-                            st.session_state.selected_schedule = selected_schedule
-                            st.session_state.booking_step = "visitor_details"
-                    else:
-                        st.info("No slots available for this date")
+            with col1:
+                st.markdown(f"### {darshan['DarshanName']}")
+                if darshan['Description']:
+                    st.markdown(f"**Description**: {darshan['Description']}")
+                st.markdown(f"**Duration**: {darshan['Duration']} minutes")
                 
-                st.markdown("</div>", unsafe_allow_html=True)
+                price_text = "Free" if darshan['StandardPrice'] == 0 else f"₹{darshan['StandardPrice']:.2f} per person"
+                st.markdown(f"**Price**: {price_text}")
             
-            # Visitor details
-            if 'booking_step' in st.session_state and st.session_state.booking_step == "visitor_details":
-                st.markdown('<h2 class="sub-header">Visitor Details</h2>', unsafe_allow_html=True)
-                
-                darshan = st.session_state.selected_darshan
-                schedule = st.session_state.selected_schedule
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Selected Darshan")
-                    st.markdown(f"**Type**: {darshan['DarshanName']}")
-                    st.markdown(f"**Date**: {schedule['ScheduleDate']}")
-                    st.markdown(f"**Time**: {schedule['StartTime']} - {schedule['EndTime']}")
-                    st.markdown(f"**Price**: {format_currency(darshan['StandardPrice'])}")
-                    st.markdown("</div>", unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Enter Mobile Number")
-                    st.markdown("We'll check if you're already registered with us.")
-                    phone = st.text_input("Mobile Number", placeholder="10-digit number")
-                    
-                    if st.button("Check") and phone:
-                        cursor.execute("SELECT * FROM Visitors WHERE MobileNumber = %s", (phone,))
-                        visitor = cursor.fetchone()
-                        if visitor is not None:
-                            st.session_state.existing_visitor = visitor
-                            st.success(f"Welcome back, {visitor['FirstName']} {visitor['LastName']}!")
-                        else:
-                            st.warning("Mobile number not found. Please register.")
-                            st.session_state.new_visitor = True
-                    st.markdown("</div>", unsafe_allow_html=True)
-                
-                # Existing visitor
-                if 'existing_visitor' in st.session_state:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Booking Details")
-                    
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        num_people = st.number_input("Number of People", min_value=1, max_value=10, value=1)
-                        special_req = st.text_area("Special Requirements (if any)")
-                    
-                    with col2:
-                        # Calculate total
-                        total = num_people * darshan['StandardPrice']
-                        
-                        st.markdown("### Payment Summary")
-                        st.markdown(f"**Price per person**: ₹{darshan['StandardPrice']:.2f}")
-                        st.markdown(f"**Number of people**: {num_people}")
-                        st.markdown(f"**Total Amount**: ₹{total:.2f}")
-                        
-                        payment_method = st.selectbox("Payment Method", ["UPI", "Credit Card", "Debit Card", "Net Banking"])
-                    
-                    if st.button("Proceed to Payment"):
-                        with st.spinner("Processing payment..."):
-                            time.sleep(2)
-                        
-                        st.success("Booking successful!")
-                        st.session_state.booking_completed = True
-                        st.session_state.booking_details = {
-                            'darshan_name': darshan['DarshanName'],
-                            'date': schedule['ScheduleDate'],
-                            'time': f"{schedule['StartTime']} - {schedule['EndTime']}",
-                            'num_people': num_people,
-                            'total': total,
-                            'visitor_name': f"{st.session_state.existing_visitor['FirstName']} {st.session_state.existing_visitor['LastName']}"
-                        }
-                    
-                    st.markdown("</div>", unsafe_allow_html=True)
+            with col2:
+                schedules = availability.get(darshan['DarshanTypeID'], [])
                 
-                # New visitor
-                elif 'new_visitor' in st.session_state:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Register as New Visitor")
-                    
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        first_name = st.text_input("First Name")
-                        last_name = st.text_input("Last Name")
-                        mobile = phone  # Already entered
-                        email = st.text_input("Email")
+                if schedules:
+                    schedule_options = [f"{schedule['StartTime']} - {schedule['EndTime']} ({schedule['RemainingSlots']} slots)" 
+                                     for schedule in schedules]
                     
-                    with col2:
-                        address = st.text_area("Address")
-                        city = st.text_input("City")
-                        state = st.text_input("State")
-                        pincode = st.text_input("PIN Code")
+                    selected_slot = st.selectbox(
+                        f"Select Time Slot",
+                        schedule_options,
+                        key=f"slot_{darshan['DarshanTypeID']}"
+                    )
                     
-                    if st.button("Register & Continue"):
-                        try:
-                            # Insert new visitor
-                            cursor.execute("""
-                            INSERT INTO Visitors (FirstName, LastName, MobileNumber, EmailAddress,
-                            Address, City, State, PINCode, LastVisit)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURDATE())
-                            """, (
-                                first_name, last_name, mobile, email, address,
-                                city, state, pincode
-                            ))
-                            
-                            conn.commit()
-                            st.success(f"Registration successful! Welcome, {first_name} {last_name}")
-                            
-                            # Get the new visitor ID
-                            cursor.execute("SELECT LAST_INSERT_ID() as id")
-                            result = cursor.fetchone()
-                            visitor_id = result['id']
-                            
-                            # Update session state
-                            st.session_state.existing_visitor = {
-                                'VisitorID': visitor_id,
-                                'FirstName': first_name,
-                                'LastName': last_name
-                            }
-                            
-                            # Clean up
-                            del st.session_state.new_visitor
-                            st.rerun()
-                            
-                        except Exception as e:
-                            conn.rollback()
-                            st.error(f"Registration failed: {e}")
+                    selected_idx = schedule_options.index(selected_slot)
+                    selected_schedule = schedules[selected_idx]
                     
-                    st.markdown("</div>", unsafe_allow_html=True)
+                    if st.button("Book Now", key=f"book_{darshan['DarshanTypeID']}"):
+                        st.session_state.selected_darshan = darshan
+                        st.session_state.selected_schedule = selected_schedule
+                        st.session_state.booking_step = "visitor_details"
+                else:
+                    st.info("No slots available for this date")
             
-            # Booking confirmation
-            if 'booking_completed' in st.session_state:
-                st.markdown('<div class="success-msg">', unsafe_allow_html=True)
-                st.markdown("## 🙏 Booking Confirmed!")
-                st.markdown("Your darshan has been successfully booked.")
-                st.markdown("</div>", unsafe_allow_html=True)
-                
-                col1, col2 = st.columns([3, 2])
-                
-                with col1:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Booking Details")
-                    details = st.session_state.booking_details
-                    st.markdown(f"**Booking ID**: BK-{random.randint(10000, 99999)}")
-                    st.markdown(f"**Name**: {details['visitor_name']}")
-                    st.markdown(f"**Temple**: {selected_temple}")
-                    st.markdown(f"**Darshan Type**: {details['darshan_name']}")
-                    st.markdown(f"**Date**: {details['date']}")
-                    st.markdown(f"**Time**: {details['time']}")
-                    st.markdown(f"**Number of People**: {details['num_people']}")
-                    st.markdown(f"**Amount Paid**: ₹{details['total']:.2f}")
-                    
-                    st.markdown("""
-                    ### Important Instructions
-                    1. Please arrive at least 30 minutes before your scheduled time
-                    2. Bring a valid ID proof for verification
-                    3. Mobile phones and cameras are not allowed inside the temple
-                    4. Follow dress code: Traditional Indian attire preferred
-                    """)
-                    st.markdown("</div>", unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown('<div class="card card-gold">', unsafe_allow_html=True)
-                    st.markdown("### Entry Pass")
-                    st.markdown("Your booking is confirmed. Show this booking confirmation at the temple entrance.")
-                    st.markdown("*This serves as your entry pass. Please save it or take a screenshot.*")
-                    st.markdown("</div>", unsafe_allow_html=True)
-                
-                if st.button("Done"):
-                    # Clean up session state
-                    for key in ['booking_step', 'selected_darshan', 'selected_schedule', 
-                               'existing_visitor', 'new_visitor', 'booking_completed', 
-                               'booking_details']:
-                        if key in st.session_state:
-                            del st.session_state[key]
-                    st.rerun()
-        
-        finally:
-            cursor.close()
-            conn.close()
-    
-    except Exception as e:
-        st.error(f"Error in Book Darshan page: {e}")
-        st.write(traceback.format_exc())
-
-# Make Donation page
-def show_donation_page():
-    try:
-        st.markdown('<h1 class="main-header">Make Donation</h1>', unsafe_allow_html=True)
-        
-        conn = get_database_connection()
-        if not conn:
-            st.error("Could not connect to database. Please try again later.")
-            return
-        
-        cursor = conn.cursor(dictionary=True)
+            st.markdown("</div>", unsafe_allow_html=True)
         
-        try:
-            # Get temples
-            cursor.execute("SELECT * FROM Temples WHERE IsActive = TRUE")
-            temples = cursor.fetchall()
-            
-            if not temples:
-                st.error("No temples available in the system")
-                return
-            
-            # Temple selection
-            temple_names = [temple['TempleName'] for temple in temples]
-            selected_temple = st.selectbox("Select Temple", temple_names)
-            selected_temple_id = next((temple['TempleID'] for temple in temples if temple['TempleName'] == selected_temple), None)
-            
-            if not selected_temple_id:
-                st.error("Temple information not available")
-                return
+        # Visitor details
+        if 'booking_step' in st.session_state and st.session_state.booking_step == "visitor_details":
+            st.markdown('<h2 class="sub-header">Visitor Details</h2>', unsafe_allow_html=True)
             
-            # Get donation types
-            cursor.execute("""
-            SELECT * FROM DonationTypes
-            WHERE TempleID = %s AND IsActive = TRUE
-            ORDER BY DisplayOrder
-            """, (selected_temple_id,))
-            
-            donation_types = cursor.fetchall()
-            
-            if not donation_types:
-                st.error("No donation types available")
-                return
-            
-            st.markdown('<h2 class="sub-header">Select Donation Type</h2>', unsafe_allow_html=True)
-            
-            # Pre-select donation type if coming from home page
-            default_idx = 0
-            if 'donation_type' in st.session_state:
-                for idx, d_type in enumerate(donation_types):
-                    if d_type['TypeName'] == st.session_state.donation_type:
-                        default_idx = idx
-                        # Clear the session state
-                        del st.session_state.donation_type
-                        break
-            
-            selected_type = st.selectbox("Donation Purpose", 
-                                       [d_type['TypeName'] for d_type in donation_types],
-                                       index=default_idx)
-            
-            selected_type_id = next((d_type['DonationTypeID'] for d_type in donation_types 
-                                   if d_type['TypeName'] == selected_type), None)
-            min_amount = next((d_type['MinimumAmount'] for d_type in donation_types 
-                             if d_type['TypeName'] == selected_type), 0)
+            darshan = st.session_state.selected_darshan
+            schedule = st.session_state.selected_schedule
             
             col1, col2 = st.columns(2)
             
             with col1:
                 st.markdown('<div class="card">', unsafe_allow_html=True)
-                st.markdown(f"### {selected_type}")
-                st.markdown(f"Minimum donation amount: ₹{min_amount:.2f}")
-                
-                custom_amount = st.number_input("Enter Amount (₹)", 
-                                             min_value=float(min_amount), 
-                                             value=float(min_amount),
-                                             step=100.0)
-                
-                is_anonymous = st.checkbox("Make Anonymous Donation")
+                st.markdown("### Selected Darshan")
+                st.markdown(f"**Type**: {darshan['DarshanName']}")
+                st.markdown(f"**Date**: {schedule['ScheduleDate']}")
+                st.markdown(f"**Time**: {schedule['StartTime']} - {schedule['EndTime']}")
+                st.markdown(f"**Price**: {format_currency(darshan['StandardPrice'])}")
                 st.markdown("</div>", unsafe_allow_html=True)
-                
-                if is_anonymous:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Anonymous Donor Details")
-                    donor_name = st.text_input("Donor Name (Optional)")
-                    donor_phone = st.text_input("Donor Phone (Optional)")
-                    donor_email = st.text_input("Donor Email (Optional)")
-                    st.markdown("</div>", unsafe_allow_html=True)
-                else:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Donor Details")
-                    st.markdown("We'll check if you're already registered with us.")
-                    phone = st.text_input("Mobile Number", placeholder="10-digit number")
-                    
-                    if st.button("Check") and phone:
-                        cursor.execute("SELECT * FROM Visitors WHERE MobileNumber = %s", (phone,))
-                        visitor = cursor.fetchone()
-                        if visitor is not None:
-                            st.session_state.existing_donor = visitor
-                            st.success(f"Welcome back, {visitor['FirstName']} {visitor['LastName']}!")
-                        else:
-                            st.warning("Mobile number not found. Please register.")
-                            st.session_state.new_donor = True
-                            st.session_state.donor_phone = phone
-                    st.markdown("</div>", unsafe_allow_html=True)
             
             with col2:
                 st.markdown('<div class="card">', unsafe_allow_html=True)
-                st.markdown("### About this Donation")
-                description = next((d_type['Description'] for d_type in donation_types 
-                                  if d_type['TypeName'] == selected_type), "")
-                if description:
-                    st.markdown(description)
-                else:
-                    st.markdown(f"Your contribution to {selected_type} will help support the temple's activities.")
+                st.markdown("### Enter Mobile Number")
+                st.markdown("We'll check if you're already registered with us.")
+                phone = st.text_input("Mobile Number", placeholder="10-digit number")
+                
+                if st.button("Check") and phone:
+                    visitor = get_temple_db().get_visitor_by_phone(phone)
+                    if visitor is not None:
+                        st.session_state.existing_visitor = visitor
+                        st.success(f"Welcome back, {visitor['FirstName']} {visitor['LastName']}!")
+                    else:
+                        st.warning("Mobile number not found. Please register.")
+                        st.session_state.new_visitor = True
                 st.markdown("</div>", unsafe_allow_html=True)
-                
+            
+            # Existing visitor
+            if 'existing_visitor' in st.session_state:
                 st.markdown('<div class="card">', unsafe_allow_html=True)
-                st.markdown("### Payment Method")
-                payment_method = st.selectbox("Select Payment Method", 
-                                           ["UPI", "Credit Card", "Debit Card", "Net Banking"])
+                st.markdown("### Booking Details")
                 
-                st.markdown("### Total Amount")
-                st.markdown(f"**Total**: ₹{custom_amount:.2f}")
-                st.markdown("</div>", unsafe_allow_html=True)
+                col1, col2 = st.columns(2)
                 
-                # Process donation based on visitor type
-                if 'existing_donor' in st.session_state:
-                    if st.button("Proceed to Payment", key="donation_payment"):
-                        with st.spinner("Processing payment..."):
-                            time.sleep(2)
-                        
-                        # Store donation details for confirmation
-                        st.session_state.donation_completed = True
-                        st.session_state.donation_details = {
-                            'receipt_number': f"DON-{selected_temple_id}-{random.randint(1000, 9999)}-{datetime.now().strftime('%y%m%d')}",
-                            'donor_name': f"{st.session_state.existing_donor['FirstName']} {st.session_state.existing_donor['LastName']}",
-                            'donation_type': selected_type,
-                            'amount': custom_amount,
-                            'date': datetime.now().strftime('%d-%m-%Y %H:%M')
-                        }
+                with col1:
+                    num_people = st.number_input("Number of People", min_value=1, max_value=10, value=1)
+                    special_req = st.text_area("Special Requirements (if any)")
                 
-                elif is_anonymous and st.button("Proceed to Payment", key="anonymous_donation"):
+                with col2:
+                    # Calculate total
+                    total = num_people * darshan['StandardPrice']
+                    
+                    st.markdown("### Payment Summary")
+                    st.markdown(f"**Price per person**: ₹{darshan['StandardPrice']:.2f}")
+                    st.markdown(f"**Number of people**: {num_people}")
+                    st.markdown(f"**Total Amount**: ₹{total:.2f}")
+                    
+                    payment_method = st.selectbox("Payment Method", ["UPI", "Credit Card", "Debit Card", "Net Banking"])
+                
+                if st.button("Proceed to Payment"):
+                    temple_db = get_temple_db()
+                    visitor_id = st.session_state.existing_visitor['VisitorID']
+                    
+                    # Hold the slots first so they can't be sold while payment is in progress
+                    hold_id, error = temple_db.hold_slots(schedule['ScheduleID'], num_people, visitor_id)
+                    if not hold_id:
+                        st.error(f"Could not reserve slots: {error}")
+                        st.stop()
+                    
                     with st.spinner("Processing payment..."):
                         time.sleep(2)
                     
-                    # Store donation details for confirmation
-                    st.session_state.donation_completed = True
-                    st.session_state.donation_details = {
-                        'receipt_number': f"DON-{selected_temple_id}-{random.randint(1000, 9999)}-{datetime.now().strftime('%y%m%d')}",
-                        'donor_name': donor_name if donor_name else "Anonymous Donor",
-                        'donation_type': selected_type,
-                        'amount': custom_amount,
-                        'date': datetime.now().strftime('%d-%m-%Y %H:%M')
+                    booking_id, result = temple_db.book_darshan(
+                        schedule['ScheduleID'], visitor_id, num_people, special_req, hold_id=hold_id
+                    )
+                    if not booking_id:
+                        temple_db.release_hold(hold_id)
+                        st.error(f"Booking failed: {result}")
+                        st.stop()
+                    
+                    st.success("Booking successful!")
+                    st.session_state.booking_completed = True
+                    st.session_state.booking_details = {
+                        'booking_id': booking_id,
+                        'qr_payload': result,
+                        'darshan_name': darshan['DarshanName'],
+                        'date': schedule['ScheduleDate'],
+                        'time': f"{schedule['StartTime']} - {schedule['EndTime']}",
+                        'num_people': num_people,
+                        'total': total,
+                        'visitor_name': f"{st.session_state.existing_visitor['FirstName']} {st.session_state.existing_visitor['LastName']}"
                     }
+                
+                st.markdown("</div>", unsafe_allow_html=True)
             
-            # New donor registration
-            if 'new_donor' in st.session_state and 'new_donor_registered' not in st.session_state:
+            # New visitor
+            elif 'new_visitor' in st.session_state:
                 st.markdown('<div class="card">', unsafe_allow_html=True)
-                st.markdown("### Register as New Donor")
+                st.markdown("### Register as New Visitor")
                 
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     first_name = st.text_input("First Name")
                     last_name = st.text_input("Last Name")
+                    mobile = phone  # Already entered
                     email = st.text_input("Email")
-                    mobile = st.session_state.donor_phone  # Already entered
                 
                 with col2:
                     address = st.text_area("Address")
@@ -732,93 +457,317 @@ def show_donation_page():
                 
                 if st.button("Register & Continue"):
                     try:
-                        # Insert new visitor
-                        cursor.execute("""
-                        INSERT INTO Visitors (FirstName, LastName, MobileNumber, EmailAddress,
-                        Address, City, State, PINCode, LastVisit)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURDATE())
-                        """, (
-                            first_name, last_name, mobile, email, address,
-                            city, state, pincode
-                        ))
+                        # Register the new visitor (this also clears any cached miss for the number)
+                        visitor_id = get_temple_db().register_visitor(
+                            first_name, last_name, mobile, email, address, city, state, pincode
+                        )
+                        if not visitor_id:
+                            raise Exception("Could not save visitor details")
                         
-                        conn.commit()
                         st.success(f"Registration successful! Welcome, {first_name} {last_name}")
                         
-                        # Get the new visitor ID
-                        cursor.execute("SELECT LAST_INSERT_ID() as id")
-                        result = cursor.fetchone()
-                        visitor_id = result['id']
-                        
                         # Update session state
-                        st.session_state.existing_donor = {
+                        st.session_state.existing_visitor = {
                             'VisitorID': visitor_id,
                             'FirstName': first_name,
                             'LastName': last_name
                         }
                         
                         # Clean up
-                        del st.session_state.new_donor
-                        st.session_state.new_donor_registered = True
+                        del st.session_state.new_visitor
                         st.rerun()
                         
                     except Exception as e:
-                        conn.rollback()
                         st.error(f"Registration failed: {e}")
                 
                 st.markdown("</div>", unsafe_allow_html=True)
+        
+        # Booking confirmation
+        if 'booking_completed' in st.session_state:
+            st.markdown('<div class="success-msg">', unsafe_allow_html=True)
+            st.markdown("## 🙏 Booking Confirmed!")
+            st.markdown("Your darshan has been successfully booked.")
+            st.markdown("</div>", unsafe_allow_html=True)
             
-            # Donation Confirmation
-            if 'donation_completed' in st.session_state:
-                st.markdown('<div class="success-msg">', unsafe_allow_html=True)
-                st.markdown("## 🙏 Donation Successful!")
-                st.markdown("Thank you for your generous contribution.")
+            col1, col2 = st.columns([3, 2])
+            
+            with col1:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Booking Details")
+                details = st.session_state.booking_details
+                st.markdown(f"**Booking ID**: BK-{details['booking_id']}")
+                st.markdown(f"**Name**: {details['visitor_name']}")
+                st.markdown(f"**Temple**: {selected_temple}")
+                st.markdown(f"**Darshan Type**: {details['darshan_name']}")
+                st.markdown(f"**Date**: {details['date']}")
+                st.markdown(f"**Time**: {details['time']}")
+                st.markdown(f"**Number of People**: {details['num_people']}")
+                st.markdown(f"**Amount Paid**: ₹{details['total']:.2f}")
+                
+                st.markdown("""
+                ### Important Instructions
+                1. Please arrive at least 30 minutes before your scheduled time
+                2. Bring a valid ID proof for verification
+                3. Mobile phones and cameras are not allowed inside the temple
+                4. Follow dress code: Traditional Indian attire preferred
+                """)
                 st.markdown("</div>", unsafe_allow_html=True)
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Donation Receipt")
-                    details = st.session_state.donation_details
-                    st.markdown(f"**Receipt Number**: {details['receipt_number']}")
-                    st.markdown(f"**Donor Name**: {details['donor_name']}")
-                    st.markdown(f"**Donation Type**: {details['donation_type']}")
-                    st.markdown(f"**Amount**: ₹{details['amount']:.2f}")
-                    st.markdown(f"**Date**: {details['date']}")
-                    
-                    st.markdown("""
-                    ### Tax Benefits
-                    Donations to temples are eligible for tax exemption under Section 80G of the Income Tax Act.
-                    Please keep this receipt safe for your tax records.
-                    """)
-                    st.markdown("</div>", unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown('<div class="card card-gold">', unsafe_allow_html=True)
-                    st.markdown("### Divine Blessings")
-                    st.markdown("""
-                    Thank you for your generous donation to Siddhivinayak Temple.
+            
+            with col2:
+                st.markdown('<div class="card card-gold">', unsafe_allow_html=True)
+                st.markdown("### Entry Pass")
+                st.image(base64.b64decode(render_qr_code(details['qr_payload'])), width=200)
+                st.markdown("Your booking is confirmed. Show this booking confirmation at the temple entrance.")
+                st.markdown("*This serves as your entry pass. Please save it or take a screenshot.*")
+                st.markdown("</div>", unsafe_allow_html=True)
+            
+            if st.button("Done"):
+                # Clean up session state
+                for key in ['booking_step', 'selected_darshan', 'selected_schedule', 
+                           'existing_visitor', 'new_visitor', 'booking_completed', 
+                           'booking_details']:
+                    if key in st.session_state:
+                        del st.session_state[key]
+                st.rerun()
+    
+    
+    except Exception as e:
+        st.error(f"Error in Book Darshan page: {e}")
+        st.write(traceback.format_exc())
+
+# Make Donation page
+def show_donation_page():
+    try:
+        st.markdown('<h1 class="main-header">Make Donation</h1>', unsafe_allow_html=True)
+        
+        # Get temples
+        temples = get_temple_db().get_temples()
+        
+        if not temples:
+            st.error("No temples available in the system")
+            return
+        
+        # Temple selection
+        temple_names = [temple['TempleName'] for temple in temples]
+        selected_temple = st.selectbox("Select Temple", temple_names)
+        selected_temple_id = next((temple['TempleID'] for temple in temples if temple['TempleName'] == selected_temple), None)
+        
+        if not selected_temple_id:
+            st.error("Temple information not available")
+            return
+        
+        # Get donation types
+        donation_types = get_temple_db().get_donation_types(selected_temple_id)
+        
+        if not donation_types:
+            st.error("No donation types available")
+            return
+        
+        st.markdown('<h2 class="sub-header">Select Donation Type</h2>', unsafe_allow_html=True)
+        
+        # Pre-select donation type if coming from home page
+        default_idx = 0
+        if 'donation_type' in st.session_state:
+            for idx, d_type in enumerate(donation_types):
+                if d_type['TypeName'] == st.session_state.donation_type:
+                    default_idx = idx
+                    # Clear the session state
+                    del st.session_state.donation_type
+                    break
+        
+        selected_type = st.selectbox("Donation Purpose", 
+                                   [d_type['TypeName'] for d_type in donation_types],
+                                   index=default_idx)
+        
+        selected_type_id = next((d_type['DonationTypeID'] for d_type in donation_types 
+                               if d_type['TypeName'] == selected_type), None)
+        min_amount = next((d_type['MinimumAmount'] for d_type in donation_types 
+                         if d_type['TypeName'] == selected_type), 0)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown('<div class="card">', unsafe_allow_html=True)
+            st.markdown(f"### {selected_type}")
+            st.markdown(f"Minimum donation amount: ₹{min_amount:.2f}")
+            
+            custom_amount = st.number_input("Enter Amount (₹)", 
+                                         min_value=float(min_amount), 
+                                         value=float(min_amount),
+                                         step=100.0)
+            
+            is_anonymous = st.checkbox("Make Anonymous Donation")
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            if is_anonymous:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Anonymous Donor Details")
+                donor_name = st.text_input("Donor Name (Optional)")
+                donor_phone = st.text_input("Donor Phone (Optional)")
+                donor_email = st.text_input("Donor Email (Optional)")
+                st.markdown("</div>", unsafe_allow_html=True)
+            else:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Donor Details")
+                st.markdown("We'll check if you're already registered with us.")
+                phone = st.text_input("Mobile Number", placeholder="10-digit number")
+                
+                if st.button("Check") and phone:
+                    visitor = get_temple_db().get_visitor_by_phone(phone)
+                    if visitor is not None:
+                        st.session_state.existing_donor = visitor
+                        st.success(f"Welcome back, {visitor['FirstName']} {visitor['LastName']}!")
+                    else:
+                        st.warning("Mobile number not found. Please register.")
+                        st.session_state.new_donor = True
+                        st.session_state.donor_phone = phone
+                st.markdown("</div>", unsafe_allow_html=True)
+        
+        with col2:
+            st.markdown('<div class="card">', unsafe_allow_html=True)
+            st.markdown("### About this Donation")
+            description = next((d_type['Description'] for d_type in donation_types 
+                              if d_type['TypeName'] == selected_type), "")
+            if description:
+                st.markdown(description)
+            else:
+                st.markdown(f"Your contribution to {selected_type} will help support the temple's activities.")
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            st.markdown('<div class="card">', unsafe_allow_html=True)
+            st.markdown("### Payment Method")
+            payment_method = st.selectbox("Select Payment Method", 
+                                       ["UPI", "Credit Card", "Debit Card", "Net Banking"])
+            
+            st.markdown("### Total Amount")
+            st.markdown(f"**Total**: ₹{custom_amount:.2f}")
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            # Process donation based on visitor type
+            if 'existing_donor' in st.session_state:
+                if st.button("Proceed to Payment", key="donation_payment"):
+                    with st.spinner("Processing payment..."):
+                        time.sleep(2)
+                    
+                    # Store donation details for confirmation
+                    st.session_state.donation_completed = True
+                    st.session_state.donation_details = {
+                        'receipt_number': f"DON-{selected_temple_id}-{random.randint(1000, 9999)}-{datetime.now().strftime('%y%m%d')}",
+                        'donor_name': f"{st.session_state.existing_donor['FirstName']} {st.session_state.existing_donor['LastName']}",
+                        'donation_type': selected_type,
+                        'amount': custom_amount,
+                        'date': datetime.now().strftime('%d-%m-%Y %H:%M')
+                    }
+            
+            elif is_anonymous and st.button("Proceed to Payment", key="anonymous_donation"):
+                with st.spinner("Processing payment..."):
+                    time.sleep(2)
+                
+                # Store donation details for confirmation
+                st.session_state.donation_completed = True
+                st.session_state.donation_details = {
+                    'receipt_number': f"DON-{selected_temple_id}-{random.randint(1000, 9999)}-{datetime.now().strftime('%y%m%d')}",
+                    'donor_name': donor_name if donor_name else "Anonymous Donor",
+                    'donation_type': selected_type,
+                    'amount': custom_amount,
+                    'date': datetime.now().strftime('%d-%m-%Y %H:%M')
+                }
+        
+        # New donor registration
+        if 'new_donor' in st.session_state and 'new_donor_registered' not in st.session_state:
+            st.markdown('<div class="card">', unsafe_allow_html=True)
+            st.markdown("### Register as New Donor")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                first_name = st.text_input("First Name")
+                last_name = st.text_input("Last Name")
+                email = st.text_input("Email")
+                mobile = st.session_state.donor_phone  # Already entered
+            
+            with col2:
+                address = st.text_area("Address")
+                city = st.text_input("City")
+                state = st.text_input("State")
+                pincode = st.text_input("PIN Code")
+            
+            if st.button("Register & Continue"):
+                try:
+                    # Register the new visitor (this also clears any cached miss for the number)
+                    visitor_id = get_temple_db().register_visitor(
+                        first_name, last_name, mobile, email, address, city, state, pincode
+                    )
+                    if not visitor_id:
+                        raise Exception("Could not save visitor details")
                     
-                    May Lord Ganesha bless you with health, wealth, and prosperity.
-                    Your contribution will help us continue the sacred traditions and
-                    maintain the divine sanctity of the temple.
+                    st.success(f"Registration successful! Welcome, {first_name} {last_name}")
                     
-                    🙏 Om Gam Ganapataye Namaha 🙏
-                    """)
-                    st.markdown("</div>", unsafe_allow_html=True)
+                    # Update session state
+                    st.session_state.existing_donor = {
+                        'VisitorID': visitor_id,
+                        'FirstName': first_name,
+                        'LastName': last_name
+                    }
+                    
+                    # Clean up
+                    del st.session_state.new_donor
+                    st.session_state.new_donor_registered = True
+                    st.rerun()
+                    
+                except Exception as e:
+                    st.error(f"Registration failed: {e}")
+            
+            st.markdown("</div>", unsafe_allow_html=True)
+        
+        # Donation Confirmation
+        if 'donation_completed' in st.session_state:
+            st.markdown('<div class="success-msg">', unsafe_allow_html=True)
+            st.markdown("## 🙏 Donation Successful!")
+            st.markdown("Thank you for your generous contribution.")
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Donation Receipt")
+                details = st.session_state.donation_details
+                st.markdown(f"**Receipt Number**: {details['receipt_number']}")
+                st.markdown(f"**Donor Name**: {details['donor_name']}")
+                st.markdown(f"**Donation Type**: {details['donation_type']}")
+                st.markdown(f"**Amount**: ₹{details['amount']:.2f}")
+                st.markdown(f"**Date**: {details['date']}")
+                
+                st.markdown("""
+                ### Tax Benefits
+                Donations to temples are eligible for tax exemption under Section 80G of the Income Tax Act.
+                Please keep this receipt safe for your tax records.
+                """)
+                st.markdown("</div>", unsafe_allow_html=True)
+            
+            with col2:
+                st.markdown('<div class="card card-gold">', unsafe_allow_html=True)
+                st.markdown("### Divine Blessings")
+                st.markdown("""
+                Thank you for your generous donation to Siddhivinayak Temple.
                 
-                if st.button("Done"):
-                    # Clean up session state
-                    for key in ['donation_completed', 'donation_details', 'existing_donor',
-                              'new_donor', 'new_donor_registered']:
-                        if key in st.session_state:
-                            del st.session_state[key]
-                    st.rerun()
-        
-        finally:
-            cursor.close()
-            conn.close()
+                May Lord Ganesha bless you with health, wealth, and prosperity.
+                Your contribution will help us continue the sacred traditions and
+                maintain the divine sanctity of the temple.
+                
+                🙏 Om Gam Ganapataye Namaha 🙏
+                """)
+                st.markdown("</div>", unsafe_allow_html=True)
+            
+            if st.button("Done"):
+                # Clean up session state
+                for key in ['donation_completed', 'donation_details', 'existing_donor',
+                          'new_donor', 'new_donor_registered']:
+                    if key in st.session_state:
+                        del st.session_state[key]
+                st.rerun()
+    
     
     except Exception as e:
         st.error(f"Error in Make Donation page: {e}")
@@ -829,240 +778,212 @@ def show_virtual_puja_page():
     try:
         st.markdown('<h1 class="main-header">Book Virtual Puja</h1>', unsafe_allow_html=True)
         
-        conn = get_database_connection()
-        if not conn:
-            st.error("Could not connect to database. Please try again later.")
+        # Get temples
+        temples = get_temple_db().get_temples()
+        
+        if not temples:
+            st.error("No temples available in the system")
             return
         
-        cursor = conn.cursor(dictionary=True)
+        # Temple selection
+        temple_names = [temple['TempleName'] for temple in temples]
+        selected_temple = st.selectbox("Select Temple", temple_names)
+        selected_temple_id = next((temple['TempleID'] for temple in temples if temple['TempleName'] == selected_temple), None)
         
-        try:
-            # Get temples
-            cursor.execute("SELECT * FROM Temples WHERE IsActive = TRUE")
-            temples = cursor.fetchall()
-            
-            if not temples:
-                st.error("No temples available in the system")
-                return
-            
-            # Temple selection
-            temple_names = [temple['TempleName'] for temple in temples]
-            selected_temple = st.selectbox("Select Temple", temple_names)
-            selected_temple_id = next((temple['TempleID'] for temple in temples if temple['TempleName'] == selected_temple), None)
-            
-            if not selected_temple_id:
-                st.error("Temple information not available")
-                return
-            
-            # Get puja types
-            cursor.execute("""
-            SELECT * FROM PujaTypes
-            WHERE TempleID = %s AND IsActive = TRUE
-            """, (selected_temple_id,))
-            
-            puja_types = cursor.fetchall()
+        if not selected_temple_id:
+            st.error("Temple information not available")
+            return
+        
+        # Get puja types
+        puja_types = get_temple_db().get_puja_types(selected_temple_id)
+        
+        if not puja_types:
+            st.error("No puja types available")
+            return
+        
+        st.markdown('<h2 class="sub-header">Available Puja Types</h2>', unsafe_allow_html=True)
+        
+        col1, col2 = st.columns(2)
+        current_col = col1
+        
+        for i, puja in enumerate(puja_types):
+            # Switch columns
+            current_col = col1 if i % 2 == 0 else col2
             
-            if not puja_types:
-                st.error("No puja types available")
-                return
+            with current_col:
+                st.markdown('<div class="card card-purple">', unsafe_allow_html=True)
+                st.markdown(f"### {puja['PujaName']}")
+                if puja['Description']:
+                    st.markdown(f"**Description**: {puja['Description']}")
+                st.markdown(f"**Duration**: {puja['Duration']} minutes")
+                st.markdown(f"**Price**: ₹{puja['Price']:.2f}")
+                
+                if st.button(f"Book {puja['PujaName']}", key=f"puja_{puja['PujaTypeID']}"):
+                    st.session_state.selected_puja = puja
+                    st.session_state.puja_step = "details"
+                
+                st.markdown("</div>", unsafe_allow_html=True)
+        
+        # Puja booking details
+        if 'puja_step' in st.session_state and st.session_state.puja_step == "details":
+            st.markdown('<h2 class="sub-header">Puja Booking Details</h2>', unsafe_allow_html=True)
             
-            st.markdown('<h2 class="sub-header">Available Puja Types</h2>', unsafe_allow_html=True)
+            puja = st.session_state.selected_puja
             
             col1, col2 = st.columns(2)
-            current_col = col1
             
-            for i, puja in enumerate(puja_types):
-                # Switch columns
-                current_col = col1 if i % 2 == 0 else col2
+            with col1:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Selected Puja")
+                st.markdown(f"**Type**: {puja['PujaName']}")
+                if puja['Description']:
+                    st.markdown(f"**Description**: {puja['Description']}")
+                st.markdown(f"**Duration**: {puja['Duration']} minutes")
+                st.markdown(f"**Price**: ₹{puja['Price']:.2f}")
+                st.markdown("</div>", unsafe_allow_html=True)
                 
-                with current_col:
-                    st.markdown('<div class="card card-purple">', unsafe_allow_html=True)
-                    st.markdown(f"### {puja['PujaName']}")
-                    if puja['Description']:
-                        st.markdown(f"**Description**: {puja['Description']}")
-                    st.markdown(f"**Duration**: {puja['Duration']} minutes")
-                    st.markdown(f"**Price**: ₹{puja['Price']:.2f}")
-                    
-                    if st.button(f"Book {puja['PujaName']}", key=f"puja_{puja['PujaTypeID']}"):
-                        st.session_state.selected_puja = puja
-                        st.session_state.puja_step = "details"
-                    
-                    st.markdown("</div>", unsafe_allow_html=True)
-            
-            # Puja booking details
-            if 'puja_step' in st.session_state and st.session_state.puja_step == "details":
-                st.markdown('<h2 class="sub-header">Puja Booking Details</h2>', unsafe_allow_html=True)
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Schedule Puja")
                 
-                puja = st.session_state.selected_puja
+                # Date selection
+                min_date = datetime.now() + timedelta(days=1)
+                max_date = datetime.now() + timedelta(days=30)
+                selected_date = st.date_input("Select Date", min_date, min_value=min_date, max_value=max_date)
                 
-                col1, col2 = st.columns(2)
+                # Time selection
+                time_options = ["06:00", "07:00", "08:00", "09:00", "10:00", "11:00", 
+                              "16:00", "17:00", "18:00", "19:00"]
+                selected_time = st.selectbox("Select Time", time_options)
                 
-                with col1:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Selected Puja")
-                    st.markdown(f"**Type**: {puja['PujaName']}")
-                    if puja['Description']:
-                        st.markdown(f"**Description**: {puja['Description']}")
-                    st.markdown(f"**Duration**: {puja['Duration']} minutes")
-                    st.markdown(f"**Price**: ₹{puja['Price']:.2f}")
-                    st.markdown("</div>", unsafe_allow_html=True)
-                    
+                devotee_message = st.text_area("Your Message for the Priests")
+                st.markdown("</div>", unsafe_allow_html=True)
+            
+            with col2:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Enter Mobile Number")
+                st.markdown("We'll check if you're already registered with us.")
+                phone = st.text_input("Mobile Number", placeholder="10-digit number")
+                
+                if st.button("Check") and phone:
+                    visitor = get_temple_db().get_visitor_by_phone(phone)
+                    if visitor is not None:
+                        st.session_state.existing_puja_visitor = visitor
+                        st.success(f"Welcome back, {visitor['FirstName']} {visitor['LastName']}!")
+                    else:
+                        st.warning("Mobile number not found. Please register.")
+                        st.session_state.new_puja_visitor = True
+                        st.session_state.puja_visitor_phone = phone
+                st.markdown("</div>", unsafe_allow_html=True)
+                
+                if 'existing_puja_visitor' in st.session_state:
                     st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Schedule Puja")
+                    st.markdown("### Payment Details")
                     
-                    # Date selection
-                    min_date = datetime.now() + timedelta(days=1)
-                    max_date = datetime.now() + timedelta(days=30)
-                    selected_date = st.date_input("Select Date", min_date, min_value=min_date, max_value=max_date)
+                    st.markdown(f"**Total Amount**: ₹{puja['Price']:.2f}")
+                    payment_method = st.selectbox("Payment Method", ["UPI", "Credit Card", "Debit Card", "Net Banking"])
                     
-                    # Time selection
-                    time_options = ["06:00", "07:00", "08:00", "09:00", "10:00", "11:00", 
-                                  "16:00", "17:00", "18:00", "19:00"]
-                    selected_time = st.selectbox("Select Time", time_options)
+                    if st.button("Book Puja"):
+                        with st.spinner("Processing payment..."):
+                            time.sleep(2)
+                        
+                        st.success("Virtual Puja booked successfully!")
+                        st.session_state.puja_completed = True
+                        st.session_state.puja_details = {
+                            'receipt_number': f"PUJA-{random.randint(10000, 99999)}",
+                            'puja_name': puja['PujaName'],
+                            'date': selected_date.strftime('%Y-%m-%d'),
+                            'time': selected_time,
+                            'visitor_name': f"{st.session_state.existing_puja_visitor['FirstName']} {st.session_state.existing_puja_visitor['LastName']}",
+                            'price': puja['Price'],
+                            'devotee_message': devotee_message if devotee_message else "For the wellbeing of my family"
+                        }
                     
-                    devotee_message = st.text_area("Your Message for the Priests")
                     st.markdown("</div>", unsafe_allow_html=True)
                 
-                with col2:
+                elif 'new_puja_visitor' in st.session_state:
                     st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Enter Mobile Number")
-                    st.markdown("We'll check if you're already registered with us.")
-                    phone = st.text_input("Mobile Number", placeholder="10-digit number")
-                    
-                    if st.button("Check") and phone:
-                        cursor.execute("SELECT * FROM Visitors WHERE MobileNumber = %s", (phone,))
-                        visitor = cursor.fetchone()
-                        if visitor is not None:
-                            st.session_state.existing_puja_visitor = visitor
-                            st.success(f"Welcome back, {visitor['FirstName']} {visitor['LastName']}!")
-                        else:
-                            st.warning("Mobile number not found. Please register.")
-                            st.session_state.new_puja_visitor = True
-                            st.session_state.puja_visitor_phone = phone
-                    st.markdown("</div>", unsafe_allow_html=True)
+                    st.markdown("### Register as New Visitor")
                     
-                    if 'existing_puja_visitor' in st.session_state:
-                        st.markdown('<div class="card">', unsafe_allow_html=True)
-                        st.markdown("### Payment Details")
-                        
-                        st.markdown(f"**Total Amount**: ₹{puja['Price']:.2f}")
-                        payment_method = st.selectbox("Payment Method", ["UPI", "Credit Card", "Debit Card", "Net Banking"])
-                        
-                        if st.button("Book Puja"):
-                            with st.spinner("Processing payment..."):
-                                time.sleep(2)
+                    first_name = st.text_input("First Name")
+                    last_name = st.text_input("Last Name")
+                    email = st.text_input("Email")
+                    address = st.text_input("Address")
+                    
+                    if st.button("Register & Continue"):
+                        try:
+                            # Register the new visitor (this also clears any cached miss for the number)
+                            visitor_id = get_temple_db().register_visitor(
+                                first_name, last_name, st.session_state.puja_visitor_phone, email, address
+                            )
+                            if not visitor_id:
+                                raise Exception("Could not save visitor details")
+                            
+                            st.success(f"Registration successful! Welcome, {first_name} {last_name}")
                             
-                            st.success("Virtual Puja booked successfully!")
-                            st.session_state.puja_completed = True
-                            st.session_state.puja_details = {
-                                'receipt_number': f"PUJA-{random.randint(10000, 99999)}",
-                                'puja_name': puja['PujaName'],
-                                'date': selected_date.strftime('%Y-%m-%d'),
-                                'time': selected_time,
-                                'visitor_name': f"{st.session_state.existing_puja_visitor['FirstName']} {st.session_state.existing_puja_visitor['LastName']}",
-                                'price': puja['Price'],
-                                'devotee_message': devotee_message if devotee_message else "For the wellbeing of my family"
+                            # Update session state
+                            st.session_state.existing_puja_visitor = {
+                                'VisitorID': visitor_id,
+                                'FirstName': first_name,
+                                'LastName': last_name
                             }
-                        
-                        st.markdown("</div>", unsafe_allow_html=True)
+                            
+                            # Clean up
+                            del st.session_state.new_puja_visitor
+                            st.rerun()
+                            
+                        except Exception as e:
+                            st.error(f"Registration failed: {e}")
                     
-                    elif 'new_puja_visitor' in st.session_state:
-                        st.markdown('<div class="card">', unsafe_allow_html=True)
-                        st.markdown("### Register as New Visitor")
-                        
-                        first_name = st.text_input("First Name")
-                        last_name = st.text_input("Last Name")
-                        email = st.text_input("Email")
-                        address = st.text_input("Address")
-                        
-                        if st.button("Register & Continue"):
-                            try:
-                                # Insert new visitor (simplified)
-                                cursor.execute("""
-                                INSERT INTO Visitors (FirstName, LastName, MobileNumber, EmailAddress,
-                                Address, LastVisit)
-                                VALUES (%s, %s, %s, %s, %s, CURDATE())
-                                """, (
-                                    first_name, last_name, st.session_state.puja_visitor_phone, 
-                                    email, address
-                                ))
-                                
-                                conn.commit()
-                                st.success(f"Registration successful! Welcome, {first_name} {last_name}")
-                                
-                                # Get the new visitor ID
-                                cursor.execute("SELECT LAST_INSERT_ID() as id")
-                                result = cursor.fetchone()
-                                visitor_id = result['id']
-                                
-                                # Update session state
-                                st.session_state.existing_puja_visitor = {
-                                    'VisitorID': visitor_id,
-                                    'FirstName': first_name,
-                                    'LastName': last_name
-                                }
-                                
-                                # Clean up
-                                del st.session_state.new_puja_visitor
-                                st.rerun()
-                                
-                            except Exception as e:
-                                conn.rollback()
-                                st.error(f"Registration failed: {e}")
-                        
-                        st.markdown("</div>", unsafe_allow_html=True)
-            
-            # Puja confirmation
-            if 'puja_completed' in st.session_state:
-                st.markdown('<div class="success-msg">', unsafe_allow_html=True)
-                st.markdown("## 🙏 Virtual Puja Booked!")
-                st.markdown("Your virtual puja has been successfully scheduled.")
-                st.markdown("</div>", unsafe_allow_html=True)
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Puja Details")
-                    details = st.session_state.puja_details
-                    st.markdown(f"**Puja Type**: {details['puja_name']}")
-                    st.markdown(f"**Name**: {details['visitor_name']}")
-                    st.markdown(f"**Temple**: {selected_temple}")
-                    st.markdown(f"**Date**: {details['date']}")
-                    st.markdown(f"**Time**: {details['time']}")
-                    st.markdown(f"**Receipt Number**: {details['receipt_number']}")
-                    st.markdown(f"**Your Message**: \"{details['devotee_message']}\"")
-                    
-                    st.markdown("""
-                    ### What Happens Next
-                    1. Our priests will perform the puja at the scheduled time
-                    2. You will receive a video recording of the puja via email
-                    3. Prasadam from the puja will be sent to your registered address
-                    """)
-                    st.markdown("</div>", unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown('<div class="card card-gold">', unsafe_allow_html=True)
-                    st.markdown("### Important Information")
-                    st.markdown("""
-                    - The recording will be available within 24 hours after the puja
-                    - You can share this recording with your family members
-                    - For any assistance, please contact our helpline
-                    - Thank you for your devotion and trust in Siddhivinayak Temple
-                    """)
                     st.markdown("</div>", unsafe_allow_html=True)
-                
-                if st.button("Done"):
-                    # Clean up session state
-                    for key in ['puja_step', 'selected_puja', 'existing_puja_visitor', 
-                               'puja_completed', 'puja_details']:
-                        if key in st.session_state:
-                            del st.session_state[key]
-                    st.rerun()
         
-        finally:
-            cursor.close()
-            conn.close()
+        # Puja confirmation
+        if 'puja_completed' in st.session_state:
+            st.markdown('<div class="success-msg">', unsafe_allow_html=True)
+            st.markdown("## 🙏 Virtual Puja Booked!")
+            st.markdown("Your virtual puja has been successfully scheduled.")
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Puja Details")
+                details = st.session_state.puja_details
+                st.markdown(f"**Puja Type**: {details['puja_name']}")
+                st.markdown(f"**Name**: {details['visitor_name']}")
+                st.markdown(f"**Temple**: {selected_temple}")
+                st.markdown(f"**Date**: {details['date']}")
+                st.markdown(f"**Time**: {details['time']}")
+                st.markdown(f"**Receipt Number**: {details['receipt_number']}")
+                st.markdown(f"**Your Message**: \"{details['devotee_message']}\"")
+                
+                st.markdown("""
+                ### What Happens Next
+                1. Our priests will perform the puja at the scheduled time
+                2. You will receive a video recording of the puja via email
+                3. Prasadam from the puja will be sent to your registered address
+                """)
+                st.markdown("</div>", unsafe_allow_html=True)
+            
+            with col2:
+                st.markdown('<div class="card card-gold">', unsafe_allow_html=True)
+                st.markdown("### Important Information")
+                st.markdown("""
+                - The recording will be available within 24 hours after the puja
+                - You can share this recording with your family members
+                - For any assistance, please contact our helpline
+                - Thank you for your devotion and trust in Siddhivinayak Temple
+                """)
+                st.markdown("</div>", unsafe_allow_html=True)
+            
+            if st.button("Done"):
+                # Clean up session state
+                for key in ['puja_step', 'selected_puja', 'existing_puja_visitor', 
+                           'puja_completed', 'puja_details']:
+                    if key in st.session_state:
+                        del st.session_state[key]
+                st.rerun()
+    
     
     except Exception as e:
         st.error(f"Error in Virtual Puja page: {e}")
@@ -1073,236 +994,208 @@ def show_order_prasadam_page():
     try:
         st.markdown('<h1 class="main-header">Order Temple Prasadam</h1>', unsafe_allow_html=True)
         
-        conn = get_database_connection()
-        if not conn:
-            st.error("Could not connect to database. Please try again later.")
+        # Get temples
+        temples = get_temple_db().get_temples()
+        
+        if not temples:
+            st.error("No temples available in the system")
             return
         
-        cursor = conn.cursor(dictionary=True)
+        # Temple selection
+        temple_names = [temple['TempleName'] for temple in temples]
+        selected_temple = st.selectbox("Select Temple", temple_names)
+        selected_temple_id = next((temple['TempleID'] for temple in temples if temple['TempleName'] == selected_temple), None)
         
-        try:
-            # Get temples
-            cursor.execute("SELECT * FROM Temples WHERE IsActive = TRUE")
-            temples = cursor.fetchall()
-            
-            if not temples:
-                st.error("No temples available in the system")
-                return
-            
-            # Temple selection
-            temple_names = [temple['TempleName'] for temple in temples]
-            selected_temple = st.selectbox("Select Temple", temple_names)
-            selected_temple_id = next((temple['TempleID'] for temple in temples if temple['TempleName'] == selected_temple), None)
-            
-            if not selected_temple_id:
-                st.error("Temple information not available")
-                return
-            
-            # Get prasadam types
-            cursor.execute("""
-            SELECT * FROM PrasadamTypes
-            WHERE TempleID = %s AND IsActive = TRUE
-            """, (selected_temple_id,))
-            
-            prasadam_types = cursor.fetchall()
+        if not selected_temple_id:
+            st.error("Temple information not available")
+            return
+        
+        # Get prasadam types
+        prasadam_types = get_temple_db().get_prasadam_types(selected_temple_id)
+        
+        if not prasadam_types:
+            st.error("No prasadam types available")
+            return
+        
+        st.markdown('<h2 class="sub-header">Available Prasadam</h2>', unsafe_allow_html=True)
+        
+        col1, col2 = st.columns(2)
+        current_col = col1
+        
+        for i, prasadam in enumerate(prasadam_types):
+            # Switch columns
+            current_col = col1 if i % 2 == 0 else col2
             
-            if not prasadam_types:
-                st.error("No prasadam types available")
-                return
+            with current_col:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown(f"### {prasadam['Name']}")
+                if prasadam['Description']:
+                    st.markdown(f"{prasadam['Description']}")
+                st.markdown(f"**Price**: ₹{prasadam['Price']:.2f} per pack")
+                
+                if st.button(f"Order {prasadam['Name']}", key=f"prasadam_{prasadam['PrasadamTypeID']}"):
+                    st.session_state.selected_prasadam = prasadam
+                    st.session_state.prasadam_step = "details"
+                
+                st.markdown("</div>", unsafe_allow_html=True)
+        
+        # Prasadam order details
+        if 'prasadam_step' in st.session_state and st.session_state.prasadam_step == "details":
+            st.markdown('<h2 class="sub-header">Order Details</h2>', unsafe_allow_html=True)
             
-            st.markdown('<h2 class="sub-header">Available Prasadam</h2>', unsafe_allow_html=True)
+            prasadam = st.session_state.selected_prasadam
             
             col1, col2 = st.columns(2)
-            current_col = col1
             
-            for i, prasadam in enumerate(prasadam_types):
-                # Switch columns
-                current_col = col1 if i % 2 == 0 else col2
+            with col1:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Selected Prasadam")
+                st.markdown(f"**Type**: {prasadam['Name']}")
+                if prasadam['Description']:
+                    st.markdown(f"**Description**: {prasadam['Description']}")
+                st.markdown(f"**Price**: ₹{prasadam['Price']:.2f} per pack")
+                
+                quantity = st.number_input("Quantity", min_value=1, max_value=20, value=1)
+                
+                subtotal = quantity * prasadam['Price']
+                shipping = 100.00
+                total = subtotal + shipping
+                
+                st.markdown("### Order Summary")
+                st.markdown(f"**Subtotal**: ₹{subtotal:.2f}")
+                st.markdown(f"**Shipping & Handling**: ₹{shipping:.2f}")
+                st.markdown(f"**Total**: ₹{total:.2f}")
+                st.markdown("</div>", unsafe_allow_html=True)
+            
+            with col2:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Enter Mobile Number")
+                st.markdown("We'll check if you're already registered with us.")
+                phone = st.text_input("Mobile Number", placeholder="10-digit number")
+                
+                if st.button("Check") and phone:
+                    visitor = get_temple_db().get_visitor_by_phone(phone)
+                    if visitor is not None:
+                        st.session_state.existing_prasadam_visitor = visitor
+                        st.success(f"Welcome back, {visitor['FirstName']} {visitor['LastName']}!")
+                    else:
+                        st.warning("Mobile number not found. Please register.")
+                        st.session_state.new_prasadam_visitor = True
+                        st.session_state.prasadam_visitor_phone = phone
+                st.markdown("</div>", unsafe_allow_html=True)
                 
-                with current_col:
+                if 'existing_prasadam_visitor' in st.session_state:
                     st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown(f"### {prasadam['Name']}")
-                    if prasadam['Description']:
-                        st.markdown(f"{prasadam['Description']}")
-                    st.markdown(f"**Price**: ₹{prasadam['Price']:.2f} per pack")
+                    st.markdown("### Shipping Address")
                     
-                    if st.button(f"Order {prasadam['Name']}", key=f"prasadam_{prasadam['PrasadamTypeID']}"):
-                        st.session_state.selected_prasadam = prasadam
-                        st.session_state.prasadam_step = "details"
+                    address_line1 = st.text_input("Address Line 1")
+                    address_line2 = st.text_input("Address Line 2")
+                    city = st.text_input("City")
+                    state = st.selectbox("State", ["Maharashtra", "Gujarat", "Karnataka", 
+                                                "Tamil Nadu", "Andhra Pradesh", "Delhi", "Other"])
+                    pincode = st.text_input("PIN Code")
                     
-                    st.markdown("</div>", unsafe_allow_html=True)
-            
-            # Prasadam order details
-            if 'prasadam_step' in st.session_state and st.session_state.prasadam_step == "details":
-                st.markdown('<h2 class="sub-header">Order Details</h2>', unsafe_allow_html=True)
-                
-                prasadam = st.session_state.selected_prasadam
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Selected Prasadam")
-                    st.markdown(f"**Type**: {prasadam['Name']}")
-                    if prasadam['Description']:
-                        st.markdown(f"**Description**: {prasadam['Description']}")
-                    st.markdown(f"**Price**: ₹{prasadam['Price']:.2f} per pack")
-                    
-                    quantity = st.number_input("Quantity", min_value=1, max_value=20, value=1)
-                    
-                    subtotal = quantity * prasadam['Price']
-                    shipping = 100.00
-                    total = subtotal + shipping
-                    
-                    st.markdown("### Order Summary")
-                    st.markdown(f"**Subtotal**: ₹{subtotal:.2f}")
-                    st.markdown(f"**Shipping & Handling**: ₹{shipping:.2f}")
-                    st.markdown(f"**Total**: ₹{total:.2f}")
-                    st.markdown("</div>", unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Enter Mobile Number")
-                    st.markdown("We'll check if you're already registered with us.")
-                    phone = st.text_input("Mobile Number", placeholder="10-digit number")
-                    
-                    if st.button("Check") and phone:
-                        cursor.execute("SELECT * FROM Visitors WHERE MobileNumber = %s", (phone,))
-                        visitor = cursor.fetchone()
-                        if visitor is not None:
-                            st.session_state.existing_prasadam_visitor = visitor
-                            st.success(f"Welcome back, {visitor['FirstName']} {visitor['LastName']}!")
-                        else:
-                            st.warning("Mobile number not found. Please register.")
-                            st.session_state.new_prasadam_visitor = True
-                            st.session_state.prasadam_visitor_phone = phone
-                    st.markdown("</div>", unsafe_allow_html=True)
+                    full_address = f"{address_line1}, {address_line2}, {city}, {state} - {pincode}"
                     
-                    if 'existing_prasadam_visitor' in st.session_state:
-                        st.markdown('<div class="card">', unsafe_allow_html=True)
-                        st.markdown("### Shipping Address")
-                        
-                        address_line1 = st.text_input("Address Line 1")
-                        address_line2 = st.text_input("Address Line 2")
-                        city = st.text_input("City")
-                        state = st.selectbox("State", ["Maharashtra", "Gujarat", "Karnataka", 
-                                                    "Tamil Nadu", "Andhra Pradesh", "Delhi", "Other"])
-                        pincode = st.text_input("PIN Code")
+                    payment_method = st.selectbox("Payment Method", ["UPI", "Credit Card", "Debit Card", "Net Banking"])
+                    
+                    if st.button("Place Order"):
+                        with st.spinner("Processing payment..."):
+                            time.sleep(2)
                         
-                        full_address = f"{address_line1}, {address_line2}, {city}, {state} - {pincode}"
+                        st.success("Order placed successfully!")
                         
-                        payment_method = st.selectbox("Payment Method", ["UPI", "Credit Card", "Debit Card", "Net Banking"])
+                        # Get estimated delivery
+                        estimated_delivery = (datetime.now() + timedelta(days=7)).strftime('%d %b %Y')
                         
-                        if st.button("Place Order"):
-                            with st.spinner("Processing payment..."):
-                                time.sleep(2)
-                            
-                            st.success("Order placed successfully!")
+                        st.session_state.order_completed = True
+                        st.session_state.order_details = {
+                            'order_id': f"ORD-{random.randint(10000, 99999)}",
+                            'tracking_number': f"TRACK-{random.randint(10000000, 99999999)}",
+                            'prasadam_name': prasadam['Name'],
+                            'quantity': quantity,
+                            'total': total,
+                            'shipping_address': full_address,
+                            'visitor_name': f"{st.session_state.existing_prasadam_visitor['FirstName']} {st.session_state.existing_prasadam_visitor['LastName']}",
+                            'estimated_delivery': estimated_delivery
+                        }
+                    
+                    st.markdown("</div>", unsafe_allow_html=True)
+                
+                elif 'new_prasadam_visitor' in st.session_state:
+                    st.markdown('<div class="card">', unsafe_allow_html=True)
+                    st.markdown("### Register as New Visitor")
+                    
+                    first_name = st.text_input("First Name")
+                    last_name = st.text_input("Last Name")
+                    email = st.text_input("Email")
+                    address = st.text_input("Address")
+                    
+                    if st.button("Register & Continue"):
+                        try:
+                            # Register the new visitor (this also clears any cached miss for the number)
+                            visitor_id = get_temple_db().register_visitor(
+                                first_name, last_name, st.session_state.prasadam_visitor_phone, email, address
+                            )
+                            if not visitor_id:
+                                raise Exception("Could not save visitor details")
                             
-                            # Get estimated delivery
-                            estimated_delivery = (datetime.now() + timedelta(days=7)).strftime('%d %b %Y')
+                            st.success(f"Registration successful! Welcome, {first_name} {last_name}")
                             
-                            st.session_state.order_completed = True
-                            st.session_state.order_details = {
-                                'order_id': f"ORD-{random.randint(10000, 99999)}",
-                                'tracking_number': f"TRACK-{random.randint(10000000, 99999999)}",
-                                'prasadam_name': prasadam['Name'],
-                                'quantity': quantity,
-                                'total': total,
-                                'shipping_address': full_address,
-                                'visitor_name': f"{st.session_state.existing_prasadam_visitor['FirstName']} {st.session_state.existing_prasadam_visitor['LastName']}",
-                                'estimated_delivery': estimated_delivery
+                            # Update session state
+                            st.session_state.existing_prasadam_visitor = {
+                                'VisitorID': visitor_id,
+                                'FirstName': first_name,
+                                'LastName': last_name
                             }
-                        
-                        st.markdown("</div>", unsafe_allow_html=True)
+                            
+                            # Clean up
+                            del st.session_state.new_prasadam_visitor
+                            st.rerun()
+                            
+                        except Exception as e:
+                            st.error(f"Registration failed: {e}")
                     
-                    elif 'new_prasadam_visitor' in st.session_state:
-                        st.markdown('<div class="card">', unsafe_allow_html=True)
-                        st.markdown("### Register as New Visitor")
-                        
-                        first_name = st.text_input("First Name")
-                        last_name = st.text_input("Last Name")
-                        email = st.text_input("Email")
-                        address = st.text_input("Address")
-                        
-                        if st.button("Register & Continue"):
-                            try:
-                                # Insert new visitor (simplified)
-                                cursor.execute("""
-                                INSERT INTO Visitors (FirstName, LastName, MobileNumber, EmailAddress,
-                                Address, LastVisit)
-                                VALUES (%s, %s, %s, %s, %s, CURDATE())
-                                """, (
-                                    first_name, last_name, st.session_state.prasadam_visitor_phone, 
-                                    email, address
-                                ))
-                                
-                                conn.commit()
-                                st.success(f"Registration successful! Welcome, {first_name} {last_name}")
-                                
-                                # Get the new visitor ID
-                                cursor.execute("SELECT LAST_INSERT_ID() as id")
-                                result = cursor.fetchone()
-                                visitor_id = result['id']
-                                
-                                # Update session state
-                                st.session_state.existing_prasadam_visitor = {
-                                    'VisitorID': visitor_id,
-                                    'FirstName': first_name,
-                                    'LastName': last_name
-                                }
-                                
-                                # Clean up
-                                del st.session_state.new_prasadam_visitor
-                                st.rerun()
-                                
-                            except Exception as e:
-                                conn.rollback()
-                                st.error(f"Registration failed: {e}")
-                        
-                        st.markdown("</div>", unsafe_allow_html=True)
-            
-            # Order confirmation
-            if 'order_completed' in st.session_state:
-                st.markdown('<div class="success-msg">', unsafe_allow_html=True)
-                st.markdown("## 🙏 Prasadam Order Placed!")
-                st.markdown("Your order has been successfully placed and will be shipped soon.")
-                st.markdown("</div>", unsafe_allow_html=True)
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown("### Order Details")
-                    details = st.session_state.order_details
-                    st.markdown(f"**Order ID**: {details['order_id']}")
-                    st.markdown(f"**Tracking Number**: {details['tracking_number']}")
-                    st.markdown(f"**Customer**: {details['visitor_name']}")
-                    st.markdown(f"**Prasadam**: {details['prasadam_name']}")
-                    st.markdown(f"**Quantity**: {details['quantity']}")
-                    st.markdown(f"**Total Amount**: ₹{details['total']:.2f}")
-                    st.markdown(f"**Shipping Address**: {details['shipping_address']}")
-                    st.markdown(f"**Estimated Delivery**: {details['estimated_delivery']}")
-                    st.markdown("</div>", unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown('<div class="card card-gold">', unsafe_allow_html=True)
-                    st.markdown("### Tracking Information")
-                    st.markdown(f"Your order with tracking number **{details['tracking_number']}** has been confirmed.")
-                    st.markdown("You will receive email notifications as your order progresses.")
                     st.markdown("</div>", unsafe_allow_html=True)
-                
-                if st.button("Done"):
-                    # Clean up session state
-                    for key in ['prasadam_step', 'selected_prasadam', 'existing_prasadam_visitor',
-                               'order_completed', 'order_details']:
-                        if key in st.session_state:
-                            del st.session_state[key]
-                    st.rerun()
         
-        finally:
-            cursor.close()
-            conn.close()
+        # Order confirmation
+        if 'order_completed' in st.session_state:
+            st.markdown('<div class="success-msg">', unsafe_allow_html=True)
+            st.markdown("## 🙏 Prasadam Order Placed!")
+            st.markdown("Your order has been successfully placed and will be shipped soon.")
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("### Order Details")
+                details = st.session_state.order_details
+                st.markdown(f"**Order ID**: {details['order_id']}")
+                st.markdown(f"**Tracking Number**: {details['tracking_number']}")
+                st.markdown(f"**Customer**: {details['visitor_name']}")
+                st.markdown(f"**Prasadam**: {details['prasadam_name']}")
+                st.markdown(f"**Quantity**: {details['quantity']}")
+                st.markdown(f"**Total Amount**: ₹{details['total']:.2f}")
+                st.markdown(f"**Shipping Address**: {details['shipping_address']}")
+                st.markdown(f"**Estimated Delivery**: {details['estimated_delivery']}")
+                st.markdown("</div>", unsafe_allow_html=True)
+            
+            with col2:
+                st.markdown('<div class="card card-gold">', unsafe_allow_html=True)
+                st.markdown("### Tracking Information")
+                st.markdown(f"Your order with tracking number **{details['tracking_number']}** has been confirmed.")
+                st.markdown("You will receive email notifications as your order progresses.")
+                st.markdown("</div>", unsafe_allow_html=True)
+            
+            if st.button("Done"):
+                # Clean up session state
+                for key in ['prasadam_step', 'selected_prasadam', 'existing_prasadam_visitor',
+                           'order_completed', 'order_details']:
+                    if key in st.session_state:
+                        del st.session_state[key]
+                st.rerun()
+    
     
     except Exception as e:
         st.error(f"Error in Order Prasadam page: {e}")
@@ -1326,8 +1219,7 @@ def show_view_bookings_page():
             cursor = conn.cursor(dictionary=True)
             
             try:
-                cursor.execute("SELECT * FROM Visitors WHERE MobileNumber = %s", (phone,))
-                visitor = cursor.fetchone()
+                visitor = get_temple_db().get_visitor_by_phone(phone)
                 
                 if visitor is not None:
                     st.success(f"Welcome, {visitor['FirstName']} {visitor['LastName']}!")
@@ -1442,8 +1334,7 @@ def show_admin_dashboard():
             
             try:
                 # Get all temples
-                cursor.execute("SELECT * FROM Temples WHERE IsActive = TRUE")
-                temples = cursor.fetchall()
+                temples = get_temple_db().get_temples()
                 
                 if not temples:
                     st.error("No temples available in the system")
@@ -1471,12 +1362,14 @@ def show_admin_dashboard():
                 with admin_tabs[0]:
                     st.markdown(f"### {selected_temple} Overview")
                     
+                    # Every panel's query at once, each on its own pooled connection
+                    overview = run_parallel(get_pool(), overview_queries(selected_temple_id))
+                    
                     # Key metrics
                     col1, col2, col3, col4 = st.columns(4)
                     
                     with col1:
-                        cursor.execute("SELECT COUNT(*) as count FROM Visitors")
-                        visitor_count = cursor.fetchone()['count']
+                        visitor_count = overview['visitor_count']['count']
                         
                         st.markdown('<div class="card">', unsafe_allow_html=True)
                         st.markdown(f"### {visitor_count:,}")
@@ -1484,12 +1377,7 @@ def show_admin_dashboard():
                         st.markdown("</div>", unsafe_allow_html=True)
                     
                     with col2:
-                        cursor.execute("""
-                        SELECT COUNT(*) as count FROM DarshanBookings b
-                        JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
-                        WHERE ds.TempleID = %s
-                        """, (selected_temple_id,))
-                        booking_count = cursor.fetchone()['count']
+                        booking_count = overview['booking_count']['count']
                         
                         st.markdown('<div class="card">', unsafe_allow_html=True)
                         st.markdown(f"### {booking_count:,}")
@@ -1497,11 +1385,7 @@ def show_admin_dashboard():
                         st.markdown("</div>", unsafe_allow_html=True)
                     
                     with col3:
-                        cursor.execute("""
-                        SELECT SUM(Amount) as total FROM Donations
-                        WHERE TempleID = %s
-                        """, (selected_temple_id,))
-                        result = cursor.fetchone()
+                        result = overview['donation_total']
                         donation_total = result['total'] if result['total'] else 0
                         
                         st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -1511,13 +1395,7 @@ def show_admin_dashboard():
                     
                     with col4:
                         # Get today's visitor count
-                        cursor.execute("""
-                        SELECT SUM(NumberOfPeople) as today_visitors
-                        FROM DarshanBookings b
-                        JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
-                        WHERE ds.TempleID = %s AND ds.ScheduleDate = CURDATE()
-                        """, (selected_temple_id,))
-                        result = cursor.fetchone()
+                        result = overview['today_visitors']
                         today_visitors = result['today_visitors'] if result['today_visitors'] else 0
                         
                         st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -1527,17 +1405,7 @@ def show_admin_dashboard():
                     
                     # Recent visitors with more details
                     st.markdown("### Recent Visitors")
-                    cursor.execute("""
-                    SELECT v.VisitorID, v.FirstName, v.LastName, v.MobileNumber, v.EmailAddress, 
-                           v.City, v.State, v.LastVisit, 
-                           (SELECT COUNT(*) FROM DarshanBookings WHERE VisitorID = v.VisitorID) as BookingCount,
-                           (SELECT SUM(Amount) FROM Donations WHERE VisitorID = v.VisitorID) as TotalDonations
-                    FROM Visitors v
-                    ORDER BY v.LastVisit DESC
-                    LIMIT 10
-                    """)
-                    
-                    recent_visitors = cursor.fetchall()
+                    recent_visitors = overview['recent_visitors']
                     
                     if recent_visitors:
                         visitor_df = pd.DataFrame(recent_visitors)
@@ -1549,16 +1417,7 @@ def show_admin_dashboard():
                     
                     # Booking trends
                     st.markdown("### Booking Trends")
-                    cursor.execute("""
-                    SELECT ds.ScheduleDate, COUNT(*) as BookingCount, SUM(b.NumberOfPeople) as VisitorCount
-                    FROM DarshanBookings b
-                    JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
-                    WHERE ds.TempleID = %s AND ds.ScheduleDate >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-                    GROUP BY ds.ScheduleDate
-                    ORDER BY ds.ScheduleDate
-                    """, (selected_temple_id,))
-                    
-                    booking_trends = cursor.fetchall()
+                    booking_trends = overview['booking_trends']
                     
                     if booking_trends:
                         trend_df = pd.DataFrame(booking_trends)
@@ -1989,13 +1848,14 @@ def show_admin_dashboard():
                                 CONCAT(v.FirstName, ' ', v.LastName) as VisitorName,
                                 v.City,
                                 v.State,
-                                (SELECT COUNT(*) FROM DarshanBookings WHERE VisitorID = v.VisitorID) as DarshanCount,
-                                (SELECT COUNT(*) FROM VirtualPujas WHERE VisitorID = v.VisitorID) as PujaCount,
-                                (SELECT COUNT(*) FROM PrasadamOrders WHERE VisitorID = v.VisitorID) as PrasadamCount,
-                                (SELECT COUNT(*) FROM Donations WHERE VisitorID = v.VisitorID) as DonationCount
-                            FROM Visitors v
-                            HAVING (DarshanCount + PujaCount + PrasadamCount + DonationCount) > 2
-                            ORDER BY (DarshanCount + PujaCount + PrasadamCount + DonationCount) DESC
+                                vs.BookingCount as DarshanCount,
+                                vs.PujaCount,
+                                vs.PrasadamCount,
+                                vs.DonationCount
+                            FROM VisitorStats vs
+                            JOIN Visitors v ON v.VisitorID = vs.VisitorID
+                            WHERE vs.ActivityCount > 2
+                            ORDER BY vs.ActivityCount DESC
                             LIMIT 20
                         """,
                         "Current Month Revenue": """
@@ -2071,6 +1931,8 @@ def show_admin_dashboard():
                         try:
                             # Execute the query
                             cursor.execute(query)
+                            # The query may have edited temples or service types
+                            get_temple_db().invalidate_catalogue()
                             results = cursor.fetchall()
                             
                             if results:
@@ -2221,7 +2083,39 @@ def show_admin_dashboard():
                         for idx, row in enumerate(size_data[:5]):
                             st.markdown(f"- {row['table_name']}: {row['size_mb']:.2f} MB")
                         st.markdown("</div>", unsafe_allow_html=True)
-                                            
+
+                    # Connection pool metrics
+                    st.markdown("#### Connection Pool")
+                    pool_stats = get_pool().stats()
+                    pool_df = pd.DataFrame([
+                        {"Metric": key, "Value": round(value, 2) if isinstance(value, float) else value}
+                        for key, value in pool_stats.items()
+                    ])
+                    st.dataframe(pool_df, use_container_width=True)
+
+                    # Reference data cache (temples and darshan/donation/puja/prasadam types)
+                    st.markdown("#### Catalogue Cache")
+                    catalogue_stats = get_temple_db().catalogue.stats()
+                    catalogue_df = pd.DataFrame([
+                        {"Metric": key, "Value": round(value, 2) if isinstance(value, float) else value}
+                        for key, value in catalogue_stats.items()
+                    ])
+                    st.dataframe(catalogue_df, use_container_width=True)
+
+                    # Visitor-by-phone lookup cache (registered numbers and known misses)
+                    st.markdown("#### Visitor Lookup Cache")
+                    visitor_stats = get_temple_db().visitors.stats()
+                    visitor_df = pd.DataFrame([
+                        {"Cache": cache_name, **{key: round(value, 2) if isinstance(value, float) else value
+                                                 for key, value in cache_stats.items()}}
+                        for cache_name, cache_stats in visitor_stats.items()
+                    ])
+                    st.dataframe(visitor_df, use_container_width=True)
+
+                    if st.button("Refresh Catalogue Cache"):
+                        get_temple_db().invalidate_catalogue()
+                        st.success("Cached temples and service types will be reloaded on next use")
+
                     # Add table maintenance tools
                     st.markdown("#### Table Maintenance")
                     
@@ -2358,6 +2252,10 @@ def show_admin_dashboard():
 # Main app function
 def main():
     try:
+        if USING_DEV_SECRET:
+            st.warning("⚠️ Entry passes are signed with the public development secret (TEMPLE_DEV_MODE=1) "
+                       "and can be forged. Set TEMPLE_PASS_SECRET before taking real bookings.")
+        
         # Create sidebar and get selected menu
         menu = create_sidebar()
         
@@ -0,0 +1,1303 @@
+#async_booking.py
+
+import os
+import asyncio
+import contextvars
+import functools
+import random
+from contextlib import asynccontextmanager
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Tuple, Optional, Any
+
+import aiomysql
+import pymysql
+
+from booking import (CATALOGUE_TTL, DEFAULT_SHARD_COUNT, HOLD_TTL_SECONDS, REMAINING_SLOTS_SQL,
+                     SHARD_ATTEMPTS, SHARD_THRESHOLD, TEMPLATE_HORIZON_DAYS, TempleDatabase,
+                     batch_request_error)
+from cache import TTLCache
+from dashboard import Query, dashboard_queries, dashboard_workers
+from db_pool import DB_BACKEND, POOL_SIZE, POOL_TIMEOUT, PoolTimeoutError
+from entry_pass import sign_pass
+from rollups import BOOKING_ROLLUP_SQL, DONATION_ROLLUP_SQL, booking_increments, donation_increment
+from visitor_lookup import VisitorLookup
+from visitor_stats import VISITOR_ACTIVITY_SQL, visitor_activity
+
+# Seconds after which an idle pooled connection is reopened instead of reused
+ASYNC_POOL_RECYCLE = int(os.environ.get('TEMPLE_ASYNC_POOL_RECYCLE', 3600))
+
+
+def _with_connection(method):
+    """Run an AsyncTempleDatabase coroutine inside a unit of work unless one is already open"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self._state.get() is not None:
+            return await method(self, *args, **kwargs)
+        async with self.unit_of_work():
+            return await method(self, *args, **kwargs)
+    return wrapper
+
+
+class AsyncVisitorLookup(VisitorLookup):
+    """VisitorLookup whose database lookups run on an AsyncTempleDatabase"""
+
+    async def get(self, phone: str) -> Optional[Dict]:
+        """Get a visitor by mobile number, or None if not registered"""
+        visitor = self.found.get(phone)
+        if visitor is not None:
+            return dict(visitor)
+        if self.not_found.get(phone):
+            return None
+
+        try:
+            async with self.db.unit_of_work():
+                await self.db.cursor.execute(
+                    "SELECT * FROM Visitors WHERE MobileNumber = %s", (phone,)
+                )
+                visitor = await self.db.cursor.fetchone()
+        except (pymysql.MySQLError, PoolTimeoutError) as err:
+            print(f"Error getting visitor: {err}")
+            return None
+
+        if visitor is None:
+            self.not_found.set(phone, True)
+            return None
+
+        self.found.set(phone, visitor)
+        return dict(visitor)
+
+
+class AsyncTempleDatabase:
+    """
+    asyncio counterpart of booking.TempleDatabase on aiomysql.
+
+    Every public method of TempleDatabase is mirrored as a coroutine with the
+    same arguments, return values and commit/rollback points. Calls always
+    borrow a connection from an aiomysql pool for their duration (like
+    TempleDatabase's per-request mode); the connection is tracked in a context
+    variable, so nested calls and unit_of_work() blocks in one task share it
+    while concurrent tasks never do. The pool is opened on first use, inside
+    the running event loop.
+    """
+
+    def __init__(self, host="localhost", user="root", password="keyur123", database="temple_db",
+                 pool_size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT, backend: str = DB_BACKEND):
+        """Set up caches; the connection pool is created by connect()"""
+        if backend != 'mysql':
+            raise ValueError(f"AsyncTempleDatabase needs the mysql backend, not {backend!r}")
+        self.config = {
+            'host': host,
+            'user': user,
+            'password': password,
+            'database': database
+        }
+        self.pool_size = pool_size
+        self.timeout = timeout
+        # Dashboard queries in flight at once on this pool (see dashboard.py), made with the pool
+        self._dashboard_slots = None
+        self.pool = None
+        self._pool_lock = None
+        self.catalogue = TTLCache(CATALOGUE_TTL)
+        # Upcoming festivals per (temple, day); entries expire at the following midnight
+        self.festival_calendar = TTLCache(24 * 3600)
+        self.visitors = AsyncVisitorLookup(self)
+        # (temple, date) pairs whose template slots this process has already materialized
+        self._materialized = TTLCache(3600, maxsize=4096)
+        self._state = contextvars.ContextVar(f'temple_async_connection_{id(self)}', default=None)
+
+    @property
+    def conn(self):
+        """Connection for the current task"""
+        state = self._state.get()
+        return state[0] if state else None
+
+    @property
+    def cursor(self):
+        """Dictionary cursor for the current task"""
+        state = self._state.get()
+        return state[1] if state else None
+
+    async def __aenter__(self) -> 'AsyncTempleDatabase':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.disconnect()
+
+    async def connect(self) -> None:
+        """Open the connection pool (once) in the running event loop"""
+        if self.pool is not None:
+            return
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            if self.pool is not None:
+                return
+            try:
+                self.pool = await aiomysql.create_pool(
+                    host=self.config['host'], user=self.config['user'],
+                    password=self.config['password'], db=self.config['database'],
+                    minsize=1, maxsize=self.pool_size, autocommit=False,
+                    pool_recycle=ASYNC_POOL_RECYCLE
+                )
+                self._dashboard_slots = asyncio.Semaphore(dashboard_workers(self.pool_size))
+            except pymysql.MySQLError as err:
+                print(f"Error connecting to MySQL: {err}")
+                raise
+
+    async def disconnect(self) -> None:
+        """Close the pool and every connection in it"""
+        if self.pool is not None:
+            pool, self.pool = self.pool, None
+            pool.close()
+            await pool.wait_closed()
+
+    def invalidate_catalogue(self) -> None:
+        """Drop cached reference data, e.g. after an admin edits temples, service types or festivals"""
+        self.catalogue.clear()
+        self.festival_calendar.clear()
+        self._materialized.clear()
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        """
+        Borrow one connection and cursor for a group of calls in this task.
+        Nested calls reuse the outer connection; the connection goes back to the
+        pool (rolling back anything left uncommitted) when the block exits.
+        """
+        if self._state.get() is not None:
+            yield self
+            return
+
+        await self.connect()
+        pool = self.pool
+        try:
+            conn = await asyncio.wait_for(pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(
+                msg=f"No database connection available within {self.timeout:.1f}s "
+                    f"(pool size {self.pool_size})"
+            )
+
+        cursor = await conn.cursor(aiomysql.DictCursor)
+        token = self._state.set((conn, cursor))
+        try:
+            yield self
+        finally:
+            self._state.reset(token)
+            try:
+                await cursor.close()
+                await conn.rollback()
+            except pymysql.MySQLError:
+                # aiomysql drops closed connections instead of pooling them
+                conn.close()
+            pool.release(conn)
+
+    async def _cached(self, cache: TTLCache, key: Any, loader, expires_at: float = None) -> Any:
+        """Get a cache entry, awaiting loader() to fill it on a miss. None results are not cached."""
+        value = cache.get(key)
+        if value is not None:
+            return value
+        value = await loader()
+        if value is not None:
+            cache.set(key, value, expires_at=expires_at)
+        return value
+
+    async def _fetch_parallel(self, queries: Dict[str, Query]) -> Dict[str, Any]:
+        """
+        Run independent read queries concurrently, each on its own pooled connection
+        (a few at a time, see dashboard_workers), and return results by name
+        """
+        async def fetch(sql: str, params: Tuple, one: bool) -> Any:
+            # Each task runs in a copy of the caller's context; start it without the caller's connection
+            self._state.set(None)
+            async with self._dashboard_slots, self.unit_of_work():
+                await self.cursor.execute(sql, params)
+                return await self.cursor.fetchone() if one else list(await self.cursor.fetchall())
+
+        await self.connect()
+        results = await asyncio.gather(*(fetch(*query) for query in queries.values()))
+        return dict(zip(queries, results))
+
+    async def init_db(self) -> None:
+        """
+        Initialize the database with required tables. Schema creation, migrations and
+        sample data are run once at startup by TempleDatabase.init_db on a worker thread.
+        """
+        def init() -> None:
+            db = TempleDatabase(**self.config)
+            try:
+                db.init_db()
+            finally:
+                db.disconnect()
+
+        await asyncio.to_thread(init)
+        self.invalidate_catalogue()
+
+    # Visitor-related methods
+    async def get_visitor_by_phone(self, phone: str) -> Optional[Dict]:
+        """Get visitor details by phone number (served from the visitor lookup cache)"""
+        return await self.visitors.get(phone)
+
+    @_with_connection
+    async def register_visitor(self, first_name: str, last_name: str, mobile: str,
+                               email: str = None, address: str = None, city: str = None,
+                               state: str = None, pin: str = None) -> Optional[int]:
+        """Register a new visitor"""
+        try:
+            query = """
+            INSERT INTO Visitors (FirstName, LastName, MobileNumber, EmailAddress,
+            Address, City, State, PINCode, LastVisit)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURDATE())
+            """
+
+            await self.cursor.execute(query, (
+                first_name, last_name, mobile, email, address,
+                city, state, pin
+            ))
+
+            visitor_id = self.cursor.lastrowid
+            await self.conn.commit()
+
+            # The number may be cached as unregistered
+            self.visitors.invalidate(mobile)
+            return visitor_id
+        except pymysql.MySQLError as err:
+            print(f"Error registering visitor: {err}")
+            await self.conn.rollback()
+            return None
+
+    @_with_connection
+    async def update_visitor_last_visit(self, visitor_id: int, commit: bool = True) -> bool:
+        """
+        Update the last visit date for a visitor. With commit=False the update
+        joins the caller's transaction and errors propagate to the caller.
+        """
+        try:
+            await self.cursor.execute(
+                "UPDATE Visitors SET LastVisit = CURDATE() WHERE VisitorID = %s",
+                (visitor_id,)
+            )
+            if commit:
+                await self.conn.commit()
+            return True
+        except pymysql.MySQLError as err:
+            if not commit:
+                raise
+            print(f"Error updating visitor: {err}")
+            await self.conn.rollback()
+            return False
+
+    # Temple-related methods
+    async def get_temples(self) -> List[Dict]:
+        """Get list of all active temples (served from the catalogue cache)"""
+        return await self._cached(self.catalogue, 'temples', self._load_temples) or []
+
+    @_with_connection
+    async def _load_temples(self) -> Optional[List[Dict]]:
+        try:
+            await self.cursor.execute(
+                "SELECT * FROM Temples WHERE IsActive = TRUE"
+            )
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting temples: {err}")
+            return None
+
+    # Darshan-related methods
+    async def get_darshan_types(self, temple_id: int) -> List[Dict]:
+        """Get darshan types for a temple (served from the catalogue cache)"""
+        return await self._cached(
+            self.catalogue, ('darshan_types', temple_id), lambda: self._load_darshan_types(temple_id)
+        ) or []
+
+    @_with_connection
+    async def _load_darshan_types(self, temple_id: int) -> Optional[List[Dict]]:
+        try:
+            await self.cursor.execute(
+                "SELECT * FROM DarshanTypes WHERE TempleID = %s",
+                (temple_id,)
+            )
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting darshan types: {err}")
+            return None
+
+    async def get_schedule_templates(self, temple_id: int) -> List[Dict]:
+        """Get a temple's active recurring schedule templates (served from the catalogue cache)"""
+        return await self._cached(
+            self.catalogue, ('schedule_templates', temple_id), lambda: self._load_schedule_templates(temple_id)
+        ) or []
+
+    @_with_connection
+    async def _load_schedule_templates(self, temple_id: int) -> Optional[List[Dict]]:
+        try:
+            await self.cursor.execute("""
+            SELECT st.TemplateID, st.DarshanTypeID, dt.DarshanName, st.StartTime, st.EndTime,
+                   st.Capacity, st.WeekdayMask, st.ValidFrom, st.ValidTo, dt.StandardPrice, dt.Duration
+            FROM ScheduleTemplates st
+            JOIN DarshanTypes dt ON st.DarshanTypeID = dt.DarshanTypeID
+            WHERE st.TempleID = %s AND st.IsActive = TRUE
+            ORDER BY st.StartTime
+            """, (temple_id,))
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting schedule templates: {err}")
+            return None
+
+    async def _materialize_schedules(self, temple_id: int, schedule_date: date) -> None:
+        """
+        Create the date's schedule rows from the temple's templates, once per process.
+        The unique slot key makes concurrent materialization harmless.
+        """
+        key = (temple_id, schedule_date)
+        if schedule_date < date.today() or self._materialized.get(key):
+            return
+
+        if await self._insert_template_schedules(temple_id, schedule_date):
+            self._materialized.set(key, True)
+
+    @_with_connection
+    async def _insert_template_schedules(self, temple_id: int, schedule_date: date) -> bool:
+        """
+        Insert the date's missing template slots and commit. Inside a caller's unit of
+        work this commits the caller's transaction too, so call it before writing anything.
+        """
+        try:
+            await self.cursor.execute("""
+            INSERT INTO DarshanSchedules (TempleID, DarshanTypeID, FestivalID, ScheduleDate,
+            StartTime, EndTime, CurrentCapacity, RemainingSlots)
+            SELECT st.TempleID, st.DarshanTypeID,
+                   (SELECT f.FestivalID FROM Festivals f
+                    WHERE f.TempleID = st.TempleID AND %s BETWEEN f.StartDate AND f.EndDate
+                    ORDER BY f.StartDate LIMIT 1),
+                   %s, st.StartTime, st.EndTime, st.Capacity, st.Capacity
+            FROM ScheduleTemplates st
+            WHERE st.TempleID = %s AND st.IsActive = TRUE
+                  AND (st.WeekdayMask & (1 << WEEKDAY(%s))) <> 0
+                  AND (st.ValidFrom IS NULL OR st.ValidFrom <= %s)
+                  AND (st.ValidTo IS NULL OR st.ValidTo >= %s)
+            ON DUPLICATE KEY UPDATE ScheduleID = ScheduleID
+            """, (schedule_date, schedule_date, temple_id, schedule_date, schedule_date, schedule_date))
+            await self.conn.commit()
+            return True
+        except pymysql.MySQLError as err:
+            print(f"Error materializing schedules: {err}")
+            await self.conn.rollback()
+            return False
+
+    async def _template_slots(self, temple_id: int, materialized: set, days: int) -> List[Dict]:
+        """Unmaterialized template slots for the next days days, shaped like schedule rows"""
+        templates = await self.get_schedule_templates(temple_id)
+        slots = []
+        today = date.today()
+        for offset in range(days):
+            day = today + timedelta(days=offset)
+            for template in templates:
+                if not template['WeekdayMask'] & (1 << day.weekday()):
+                    continue
+                if (template['ValidFrom'] and template['ValidFrom'] > day) or \
+                   (template['ValidTo'] and template['ValidTo'] < day):
+                    continue
+                if (template['DarshanTypeID'], day, template['StartTime']) in materialized:
+                    continue
+                slots.append({
+                    'ScheduleID': None,
+                    'DarshanTypeID': template['DarshanTypeID'],
+                    'DarshanName': template['DarshanName'],
+                    'ScheduleDate': day,
+                    'StartTime': template['StartTime'],
+                    'EndTime': template['EndTime'],
+                    'RemainingSlots': template['Capacity'],
+                    'StandardPrice': template['StandardPrice'],
+                    'Duration': template['Duration']
+                })
+        return slots
+
+    async def get_darshan_schedules(self, temple_id: int, date: str = None) -> List[Dict]:
+        """
+        Get darshan schedules for a temple, optionally filtered by date. Asking for a
+        date materializes its template slots first. Without a date, template slots
+        not materialized yet are included for the next TEMPLATE_HORIZON_DAYS days
+        with ScheduleID None.
+        """
+        if date:
+            # Before the query borrows its connection, so a call never holds two at once
+            await self._materialize_schedules(temple_id, datetime.strptime(str(date)[:10], '%Y-%m-%d').date())
+        return await self._get_darshan_schedules(temple_id, date)
+
+    @_with_connection
+    async def _get_darshan_schedules(self, temple_id: int, date: str = None) -> List[Dict]:
+        try:
+            if date:
+                query = f"""
+                SELECT ds.ScheduleID, ds.DarshanTypeID, dt.DarshanName, ds.ScheduleDate, ds.StartTime,
+                       ds.EndTime, {REMAINING_SLOTS_SQL} AS RemainingSlots, dt.StandardPrice, dt.Duration
+                FROM DarshanSchedules ds
+                JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
+                WHERE ds.TempleID = %s AND ds.ScheduleDate = %s AND ds.IsCancelled = FALSE
+                      AND {REMAINING_SLOTS_SQL} > 0
+                ORDER BY ds.StartTime
+                """
+                await self.cursor.execute(query, (temple_id, date))
+                return list(await self.cursor.fetchall())
+
+            query = f"""
+            SELECT ds.ScheduleID, ds.DarshanTypeID, dt.DarshanName, ds.ScheduleDate, ds.StartTime,
+                   ds.EndTime, {REMAINING_SLOTS_SQL} AS RemainingSlots, dt.StandardPrice, dt.Duration
+            FROM DarshanSchedules ds
+            JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
+            WHERE ds.TempleID = %s AND ds.ScheduleDate >= CURDATE() AND ds.IsCancelled = FALSE
+                  AND {REMAINING_SLOTS_SQL} > 0
+            ORDER BY ds.ScheduleDate, ds.StartTime
+            """
+            await self.cursor.execute(query, (temple_id,))
+            schedules = list(await self.cursor.fetchall())
+
+            if not await self.get_schedule_templates(temple_id):
+                return schedules
+
+            # Every materialized slot in the horizon (full or cancelled ones included)
+            # hides its template slot
+            today = datetime.now().date()
+            await self.cursor.execute("""
+            SELECT DarshanTypeID, ScheduleDate, StartTime FROM DarshanSchedules
+            WHERE TempleID = %s AND ScheduleDate BETWEEN %s AND %s
+            """, (temple_id, today, today + timedelta(days=TEMPLATE_HORIZON_DAYS - 1)))
+            materialized = {(row['DarshanTypeID'], row['ScheduleDate'], row['StartTime'])
+                            for row in await self.cursor.fetchall()}
+
+            schedules.extend(await self._template_slots(temple_id, materialized, TEMPLATE_HORIZON_DAYS))
+            schedules.sort(key=lambda schedule: (schedule['ScheduleDate'], schedule['StartTime']))
+            return schedules
+        except pymysql.MySQLError as err:
+            print(f"Error getting darshan schedules: {err}")
+            return []
+
+    async def get_slot_availability(self, temple_id: int, date: str) -> Dict[int, List[Dict]]:
+        """Get bookable schedules for a temple and date, grouped by DarshanTypeID, in one query"""
+        availability = {}
+        for schedule in await self.get_darshan_schedules(temple_id, date):
+            availability.setdefault(schedule['DarshanTypeID'], []).append(schedule)
+        return availability
+
+    @_with_connection
+    async def get_schedule_details(self, schedule_id: int) -> Optional[Dict]:
+        """Get details for a specific schedule"""
+        try:
+            query = f"""
+            SELECT ds.ScheduleID, ds.TempleID, ds.DarshanTypeID, ds.FestivalID, ds.ScheduleDate,
+                   ds.StartTime, ds.EndTime, ds.CurrentCapacity, {REMAINING_SLOTS_SQL} AS RemainingSlots,
+                   ds.IsCancelled, ds.ShardCount, dt.DarshanName, dt.StandardPrice, dt.Duration
+            FROM DarshanSchedules ds
+            JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
+            WHERE ds.ScheduleID = %s
+            """
+            await self.cursor.execute(query, (schedule_id,))
+            return await self.cursor.fetchone()
+        except pymysql.MySQLError as err:
+            print(f"Error getting schedule details: {err}")
+            return None
+
+    async def _reserve_slots(self, schedule_id: int, num_people: int, shard_count: int = 0) -> bool:
+        """
+        Take num_people slots from a schedule in the current transaction.
+        Every decrement is guarded in SQL, so it either succeeds atomically or
+        leaves the counters untouched when capacity has run out.
+        """
+        if shard_count:
+            # Sharded schedule: try a couple of random shards so concurrent
+            # bookings land on different rows
+            for shard_no in random.sample(range(shard_count), min(SHARD_ATTEMPTS, shard_count)):
+                await self.cursor.execute("""
+                UPDATE DarshanScheduleShards SET RemainingSlots = RemainingSlots - %s
+                WHERE ScheduleID = %s AND ShardNo = %s AND RemainingSlots >= %s
+                """, (num_people, schedule_id, shard_no, num_people))
+                if self.cursor.rowcount == 1:
+                    return True
+            return await self._reserve_across_shards(schedule_id, num_people)
+
+        await self.cursor.execute("""
+        UPDATE DarshanSchedules SET RemainingSlots = RemainingSlots - %s
+        WHERE ScheduleID = %s AND RemainingSlots >= %s AND IsCancelled = FALSE
+        """, (num_people, schedule_id, num_people))
+        return self.cursor.rowcount == 1
+
+    async def _reserve_across_shards(self, schedule_id: int, num_people: int) -> bool:
+        """
+        Slow path for a nearly full sharded schedule: lock its shards and take
+        the slots from as many of them (and then the schedule row) as needed
+        """
+        await self.cursor.execute("""
+        SELECT ShardNo, RemainingSlots FROM DarshanScheduleShards
+        WHERE ScheduleID = %s AND RemainingSlots > 0
+        ORDER BY ShardNo
+        FOR UPDATE
+        """, (schedule_id,))
+        shards = await self.cursor.fetchall()
+
+        needed = num_people
+        for shard in shards:
+            take = min(needed, shard['RemainingSlots'])
+            await self.cursor.execute("""
+            UPDATE DarshanScheduleShards SET RemainingSlots = RemainingSlots - %s
+            WHERE ScheduleID = %s AND ShardNo = %s
+            """, (take, schedule_id, shard['ShardNo']))
+            needed -= take
+            if needed == 0:
+                return True
+
+        # Whatever is left must come from the schedule row's own counter
+        await self.cursor.execute("""
+        UPDATE DarshanSchedules SET RemainingSlots = RemainingSlots - %s
+        WHERE ScheduleID = %s AND RemainingSlots >= %s AND IsCancelled = FALSE
+        """, (needed, schedule_id, needed))
+        return self.cursor.rowcount == 1
+
+    @_with_connection
+    async def shard_schedule(self, schedule_id: int, shard_count: int = DEFAULT_SHARD_COUNT) -> bool:
+        """Move a schedule's remaining slots into shard_count sub-counters"""
+        try:
+            await self.cursor.execute(
+                "SELECT RemainingSlots, ShardCount FROM DarshanSchedules WHERE ScheduleID = %s FOR UPDATE",
+                (schedule_id,)
+            )
+            schedule = await self.cursor.fetchone()
+
+            if not schedule:
+                await self.conn.rollback()
+                return False
+
+            if schedule['ShardCount']:
+                await self.conn.rollback()
+                return True
+
+            base, extra = divmod(schedule['RemainingSlots'], shard_count)
+            shards = [
+                (schedule_id, shard_no, base + (1 if shard_no < extra else 0))
+                for shard_no in range(shard_count)
+            ]
+            await self.cursor.executemany("""
+            INSERT INTO DarshanScheduleShards (ScheduleID, ShardNo, RemainingSlots)
+            VALUES (%s, %s, %s)
+            """, shards)
+
+            await self.cursor.execute(
+                "UPDATE DarshanSchedules SET RemainingSlots = 0, ShardCount = %s WHERE ScheduleID = %s",
+                (shard_count, schedule_id)
+            )
+
+            await self.conn.commit()
+            return True
+        except pymysql.MySQLError as err:
+            print(f"Error sharding schedule: {err}")
+            await self.conn.rollback()
+            return False
+
+    @_with_connection
+    async def shard_large_schedules(self, min_capacity: int = SHARD_THRESHOLD,
+                                    shard_count: int = DEFAULT_SHARD_COUNT) -> int:
+        """Shard every upcoming schedule whose capacity is at least min_capacity. Returns how many were sharded."""
+        try:
+            await self.cursor.execute("""
+            SELECT ScheduleID FROM DarshanSchedules
+            WHERE ScheduleDate >= CURDATE() AND ShardCount = 0 AND CurrentCapacity >= %s
+            """, (min_capacity,))
+            schedule_ids = [row['ScheduleID'] for row in await self.cursor.fetchall()]
+        except pymysql.MySQLError as err:
+            print(f"Error finding schedules to shard: {err}")
+            return 0
+
+        sharded = 0
+        for schedule_id in schedule_ids:
+            if await self.shard_schedule(schedule_id, shard_count):
+                sharded += 1
+        return sharded
+
+    @_with_connection
+    async def book_darshan(self, schedule_id: int, visitor_id: int, num_people: int,
+                           special_req: str = None, hold_id: int = None) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Book a darshan slot, either directly or by converting an active hold from
+        hold_slots(). Returns (booking_id, QR payload) or (None, error message).
+        """
+        if num_people < 1:
+            return None, "Number of people must be at least 1"
+
+        try:
+            # Get schedule details (for the price; capacity is enforced by _reserve_slots)
+            schedule = await self.get_schedule_details(schedule_id)
+
+            if not schedule:
+                return None, "Schedule not found"
+
+            if schedule['IsCancelled']:
+                return None, "This darshan schedule has been cancelled"
+
+            if hold_id is None and schedule['RemainingSlots'] < num_people:
+                return None, "Not enough slots available"
+
+            total_amount = schedule['StandardPrice'] * num_people
+
+            payment_ref = f"PAY-{random.randint(10000000, 99999999)}"
+
+            # Reserve the slots (or claim the held ones); the booking insert below
+            # joins the same transaction
+            if hold_id is not None:
+                if not await self._convert_hold(hold_id, schedule_id, visitor_id, num_people):
+                    await self.conn.rollback()
+                    return None, "Your slot hold has expired. Please select the slot again."
+            elif not await self._reserve_slots(schedule_id, num_people, schedule['ShardCount']):
+                await self.conn.rollback()
+                return None, "Not enough slots available"
+
+            # Insert booking
+            query = """
+            INSERT INTO DarshanBookings (ScheduleID, VisitorID, NumberOfPeople, TotalAmount,
+            PaymentStatus, PaymentReference, SpecialRequirements)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """
+
+            await self.cursor.execute(query, (
+                schedule_id, visitor_id, num_people, total_amount, "Completed",
+                payment_ref, special_req
+            ))
+
+            booking_id = self.cursor.lastrowid
+
+            # Only the signed QR payload is stored; render_qr_code() draws the image on demand
+            qr_data = sign_pass(booking_id, schedule_id, num_people, schedule['ScheduleDate'])
+            await self.cursor.execute(
+                "UPDATE DarshanBookings SET QRCode = %s WHERE BookingID = %s",
+                (qr_data, booking_id)
+            )
+
+            if hold_id is not None:
+                await self.cursor.execute(
+                    "UPDATE SlotHolds SET BookingID = %s WHERE HoldID = %s",
+                    (booking_id, hold_id)
+                )
+
+            # Update visitor's last visit
+            await self.update_visitor_last_visit(visitor_id, commit=False)
+
+            await self.cursor.execute(VISITOR_ACTIVITY_SQL, visitor_activity(visitor_id, 'booking', 1, total_amount))
+            
+            # Dashboard totals, last so the rollup row is locked as briefly as possible
+            for row in booking_increments([(schedule['TempleID'], schedule['ScheduleDate'],
+                                            schedule['DarshanTypeID'], num_people, total_amount)]):
+                await self.cursor.execute(BOOKING_ROLLUP_SQL, row)
+
+            await self.conn.commit()
+            return booking_id, qr_data
+        except pymysql.MySQLError as err:
+            print(f"Error booking darshan: {err}")
+            await self.conn.rollback()
+            return None, str(err)
+
+    @_with_connection
+    async def book_darshan_batch(self, requests: List[Dict]) -> List[Tuple[Optional[int], Optional[str]]]:
+        """
+        Book many darshan slots in one transaction (trust, school and group uploads).
+        Each request is a dict with schedule_id, visitor_id, num_people and optionally
+        special_req. Returns one (booking_id, QR payload) or (None, error message)
+        per request, in order; rows that can't be booked don't stop the others.
+        """
+        results: List[Tuple[Optional[int], Optional[str]]] = [(None, None)] * len(requests)
+
+        pending = []
+        for i, request in enumerate(requests):
+            error = batch_request_error(request)
+            if error:
+                results[i] = (None, error)
+            else:
+                pending.append(i)
+
+        if not pending:
+            return results
+
+        try:
+            # Capacity and price for every affected schedule in one query
+            schedule_ids = sorted({requests[i]['schedule_id'] for i in pending})
+            placeholders = ", ".join(["%s"] * len(schedule_ids))
+            await self.cursor.execute(f"""
+            SELECT ds.ScheduleID, ds.TempleID, ds.DarshanTypeID, ds.ScheduleDate, ds.IsCancelled,
+                   ds.ShardCount, {REMAINING_SLOTS_SQL} AS RemainingSlots, dt.StandardPrice
+            FROM DarshanSchedules ds
+            JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
+            WHERE ds.ScheduleID IN ({placeholders})
+            """, schedule_ids)
+            schedules = {row['ScheduleID']: row for row in await self.cursor.fetchall()}
+
+            visitor_ids = sorted({requests[i]['visitor_id'] for i in pending})
+            placeholders = ", ".join(["%s"] * len(visitor_ids))
+            await self.cursor.execute(f"SELECT VisitorID FROM Visitors WHERE VisitorID IN ({placeholders})", visitor_ids)
+            known_visitors = {row['VisitorID'] for row in await self.cursor.fetchall()}
+
+            by_schedule: Dict[int, List[int]] = {}
+            for i in pending:
+                request = requests[i]
+                schedule = schedules.get(request['schedule_id'])
+                if not schedule:
+                    results[i] = (None, "Schedule not found")
+                elif schedule['IsCancelled']:
+                    results[i] = (None, "This darshan schedule has been cancelled")
+                elif request['visitor_id'] not in known_visitors:
+                    results[i] = (None, "Visitor not found")
+                else:
+                    by_schedule.setdefault(request['schedule_id'], []).append(i)
+
+            # One aggregated decrement per schedule, in a fixed order. A savepoint
+            # undoes a failed attempt so the schedule can be re-planned against
+            # its current capacity without losing the rest of the batch.
+            admitted = []
+            for schedule_id in sorted(by_schedule):
+                schedule = schedules[schedule_id]
+                remaining = schedule['RemainingSlots']
+
+                for attempt in range(2):
+                    accepted, total = [], 0
+                    for i in by_schedule[schedule_id]:
+                        if total + requests[i]['num_people'] <= remaining:
+                            accepted.append(i)
+                            total += requests[i]['num_people']
+
+                    if not accepted:
+                        break
+
+                    await self.cursor.execute("SAVEPOINT batch_schedule")
+                    if await self._reserve_slots(schedule_id, total, schedule['ShardCount']):
+                        break
+                    await self.cursor.execute("ROLLBACK TO SAVEPOINT batch_schedule")
+                    accepted = []
+
+                    # Someone else booked in the meantime; re-read and try once more
+                    await self.cursor.execute(f"""
+                    SELECT {REMAINING_SLOTS_SQL} AS RemainingSlots
+                    FROM DarshanSchedules ds WHERE ds.ScheduleID = %s
+                    """, (schedule_id,))
+                    remaining = (await self.cursor.fetchone())['RemainingSlots']
+
+                accepted = set(accepted)
+                for i in by_schedule[schedule_id]:
+                    if i in accepted:
+                        admitted.append(i)
+                    else:
+                        results[i] = (None, "Not enough slots available")
+
+            if not admitted:
+                await self.conn.rollback()
+                return results
+
+            # Unique payment references also identify the inserted rows afterwards
+            payment_refs = set()
+            while len(payment_refs) < len(admitted):
+                payment_refs.add(f"PAY-{random.randint(10000000, 99999999)}")
+            payment_refs = dict(zip(admitted, payment_refs))
+
+            await self.cursor.executemany("""
+            INSERT INTO DarshanBookings (ScheduleID, VisitorID, NumberOfPeople, TotalAmount,
+            PaymentStatus, PaymentReference, SpecialRequirements)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, [
+                (requests[i]['schedule_id'], requests[i]['visitor_id'], requests[i]['num_people'],
+                 schedules[requests[i]['schedule_id']]['StandardPrice'] * requests[i]['num_people'],
+                 "Completed", payment_refs[i], requests[i].get('special_req'))
+                for i in admitted
+            ])
+            first_id = self.cursor.lastrowid
+
+            placeholders = ", ".join(["%s"] * len(admitted))
+            await self.cursor.execute(f"""
+            SELECT BookingID, PaymentReference FROM DarshanBookings
+            WHERE BookingID >= %s AND PaymentReference IN ({placeholders})
+            """, [first_id] + [payment_refs[i] for i in admitted])
+            booking_ids = {row['PaymentReference']: row['BookingID'] for row in await self.cursor.fetchall()}
+
+            qr_updates = []
+            for i in admitted:
+                request = requests[i]
+                booking_id = booking_ids[payment_refs[i]]
+                qr_data = sign_pass(booking_id, request['schedule_id'], request['num_people'],
+                                    schedules[request['schedule_id']]['ScheduleDate'])
+                qr_updates.append((qr_data, booking_id))
+                results[i] = (booking_id, qr_data)
+
+            await self.cursor.executemany(
+                "UPDATE DarshanBookings SET QRCode = %s WHERE BookingID = %s", qr_updates
+            )
+
+            visitor_ids = sorted({requests[i]['visitor_id'] for i in admitted})
+            placeholders = ", ".join(["%s"] * len(visitor_ids))
+            await self.cursor.execute(
+                f"UPDATE Visitors SET LastVisit = CURDATE() WHERE VisitorID IN ({placeholders})", visitor_ids
+            )
+
+            # Activity totals per visitor, in VisitorID order
+            per_visitor: Dict[int, List] = {}
+            for i in admitted:
+                totals = per_visitor.setdefault(requests[i]['visitor_id'], [0, 0])
+                totals[0] += 1
+                totals[1] += schedules[requests[i]['schedule_id']]['StandardPrice'] * requests[i]['num_people']
+            for visitor_id in sorted(per_visitor):
+                await self.cursor.execute(VISITOR_ACTIVITY_SQL, visitor_activity(visitor_id, 'booking', *per_visitor[visitor_id]))
+            
+            # Dashboard totals, one rollup row per day and darshan type
+            bookings = []
+            for i in admitted:
+                schedule = schedules[requests[i]['schedule_id']]
+                bookings.append((schedule['TempleID'], schedule['ScheduleDate'], schedule['DarshanTypeID'],
+                                 requests[i]['num_people'], schedule['StandardPrice'] * requests[i]['num_people']))
+            for row in booking_increments(bookings):
+                await self.cursor.execute(BOOKING_ROLLUP_SQL, row)
+
+            await self.conn.commit()
+            return results
+        except pymysql.MySQLError as err:
+            print(f"Error booking darshan batch: {err}")
+            await self.conn.rollback()
+            # The whole transaction was undone; keep only the per-row validation errors
+            return [result if result[0] is None and result[1] else (None, str(err))
+                    for result in results]
+
+    # Slot hold methods
+    async def _release_slots(self, schedule_id: int, num_people: int) -> None:
+        """Give slots back to a schedule in the current transaction (into a random shard if sharded)"""
+        await self.cursor.execute("SELECT ShardCount FROM DarshanSchedules WHERE ScheduleID = %s", (schedule_id,))
+        schedule = await self.cursor.fetchone()
+
+        if schedule and schedule['ShardCount']:
+            await self.cursor.execute("""
+            UPDATE DarshanScheduleShards SET RemainingSlots = RemainingSlots + %s
+            WHERE ScheduleID = %s AND ShardNo = %s
+            """, (num_people, schedule_id, random.randrange(schedule['ShardCount'])))
+        else:
+            await self.cursor.execute(
+                "UPDATE DarshanSchedules SET RemainingSlots = RemainingSlots + %s WHERE ScheduleID = %s",
+                (num_people, schedule_id)
+            )
+
+    async def _convert_hold(self, hold_id: int, schedule_id: int, visitor_id: int, num_people: int) -> bool:
+        """Mark the visitor's unexpired hold as converted in the current transaction"""
+        await self.cursor.execute("""
+        UPDATE SlotHolds SET HoldStatus = 'Converted'
+        WHERE HoldID = %s AND ScheduleID = %s AND VisitorID = %s AND NumberOfPeople = %s
+              AND HoldStatus = 'Active' AND ExpiresAt > %s
+        """, (hold_id, schedule_id, visitor_id, num_people, datetime.now()))
+        return self.cursor.rowcount == 1
+
+    @_with_connection
+    async def hold_slots(self, schedule_id: int, num_people: int, visitor_id: int = None,
+                         ttl_seconds: int = HOLD_TTL_SECONDS) -> Tuple[Optional[int], Optional[str]]:
+        """Take slots out of availability for ttl_seconds while payment is in progress"""
+        if num_people < 1:
+            return None, "Number of people must be at least 1"
+
+        try:
+            schedule = await self.get_schedule_details(schedule_id)
+
+            if not schedule:
+                return None, "Schedule not found"
+
+            if schedule['IsCancelled']:
+                return None, "This darshan schedule has been cancelled"
+
+            if schedule['RemainingSlots'] < num_people:
+                return None, "Not enough slots available"
+
+            if not await self._reserve_slots(schedule_id, num_people, schedule['ShardCount']):
+                await self.conn.rollback()
+                return None, "Not enough slots available"
+
+            expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
+            await self.cursor.execute("""
+            INSERT INTO SlotHolds (ScheduleID, VisitorID, NumberOfPeople, ExpiresAt)
+            VALUES (%s, %s, %s, %s)
+            """, (schedule_id, visitor_id, num_people, expires_at))
+
+            hold_id = self.cursor.lastrowid
+
+            await self.conn.commit()
+            return hold_id, None
+        except pymysql.MySQLError as err:
+            print(f"Error holding slots: {err}")
+            await self.conn.rollback()
+            return None, str(err)
+
+    @_with_connection
+    async def release_hold(self, hold_id: int, visitor_id: int = None) -> bool:
+        """Give up an active hold (only if it is visitor_id's, when given) and return its slots"""
+        try:
+            await self.cursor.execute(
+                "SELECT ScheduleID, VisitorID, NumberOfPeople FROM SlotHolds WHERE HoldID = %s AND HoldStatus = 'Active' FOR UPDATE",
+                (hold_id,)
+            )
+            hold = await self.cursor.fetchone()
+
+            if not hold or visitor_id is not None and hold['VisitorID'] != visitor_id:
+                await self.conn.rollback()
+                return False
+
+            await self.cursor.execute("UPDATE SlotHolds SET HoldStatus = 'Released' WHERE HoldID = %s", (hold_id,))
+            await self._release_slots(hold['ScheduleID'], hold['NumberOfPeople'])
+
+            await self.conn.commit()
+            return True
+        except pymysql.MySQLError as err:
+            print(f"Error releasing hold: {err}")
+            await self.conn.rollback()
+            return False
+
+    @_with_connection
+    async def release_expired_holds(self, batch_size: int = 500) -> int:
+        """Expire lapsed holds in batches and return their slots. Returns the number of holds released."""
+        released = 0
+
+        try:
+            while True:
+                # Find candidates without locking the index range, then lock just those rows
+                await self.cursor.execute("""
+                SELECT HoldID FROM SlotHolds
+                WHERE HoldStatus = 'Active' AND ExpiresAt <= %s
+                ORDER BY ExpiresAt
+                LIMIT %s
+                """, (datetime.now(), batch_size))
+                candidates = [row['HoldID'] for row in await self.cursor.fetchall()]
+
+                if not candidates:
+                    break
+
+                placeholders = ", ".join(["%s"] * len(candidates))
+                await self.cursor.execute(f"""
+                SELECT HoldID, ScheduleID, NumberOfPeople FROM SlotHolds
+                WHERE HoldID IN ({placeholders}) AND HoldStatus = 'Active'
+                FOR UPDATE SKIP LOCKED
+                """, candidates)
+                holds = await self.cursor.fetchall()
+
+                if holds:
+                    hold_ids = [hold['HoldID'] for hold in holds]
+                    placeholders = ", ".join(["%s"] * len(hold_ids))
+                    await self.cursor.execute(
+                        f"UPDATE SlotHolds SET HoldStatus = 'Expired' WHERE HoldID IN ({placeholders})",
+                        hold_ids
+                    )
+
+                    # One counter update per schedule, in a fixed order
+                    per_schedule = {}
+                    for hold in holds:
+                        per_schedule[hold['ScheduleID']] = per_schedule.get(hold['ScheduleID'], 0) + hold['NumberOfPeople']
+                    for schedule_id in sorted(per_schedule):
+                        await self._release_slots(schedule_id, per_schedule[schedule_id])
+
+                await self.conn.commit()
+                released += len(holds)
+
+                if len(candidates) < batch_size:
+                    break
+        except pymysql.MySQLError as err:
+            print(f"Error releasing expired holds: {err}")
+            await self.conn.rollback()
+
+        return released
+
+    @_with_connection
+    async def get_booking_details(self, booking_id: int) -> Optional[Dict]:
+        """Get details for a specific booking"""
+        try:
+            query = """
+            SELECT b.BookingID, v.FirstName, v.LastName, dt.DarshanName,
+                   ds.ScheduleDate, ds.StartTime, ds.EndTime, b.NumberOfPeople,
+                   b.TotalAmount, b.PaymentStatus, b.BookingStatus, b.QRCode,
+                   t.TempleName, t.Location
+            FROM DarshanBookings b
+            JOIN Visitors v ON b.VisitorID = v.VisitorID
+            JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
+            JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
+            JOIN Temples t ON ds.TempleID = t.TempleID
+            WHERE b.BookingID = %s
+            """
+            await self.cursor.execute(query, (booking_id,))
+            return await self.cursor.fetchone()
+        except pymysql.MySQLError as err:
+            print(f"Error getting booking details: {err}")
+            return None
+
+    @_with_connection
+    async def get_visitor_bookings(self, visitor_id: int) -> List[Dict]:
+        """Get all bookings for a visitor"""
+        try:
+            query = """
+            SELECT b.BookingID, dt.DarshanName, ds.ScheduleDate, ds.StartTime, ds.EndTime,
+                   b.NumberOfPeople, b.TotalAmount, b.BookingStatus, t.TempleName
+            FROM DarshanBookings b
+            JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
+            JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
+            JOIN Temples t ON ds.TempleID = t.TempleID
+            WHERE b.VisitorID = %s
+            ORDER BY ds.ScheduleDate DESC, ds.StartTime
+            """
+            await self.cursor.execute(query, (visitor_id,))
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting visitor bookings: {err}")
+            return []
+
+    # Donation-related methods
+    async def get_donation_types(self, temple_id: int) -> List[Dict]:
+        """Get donation types for a temple (served from the catalogue cache)"""
+        return await self._cached(
+            self.catalogue, ('donation_types', temple_id), lambda: self._load_donation_types(temple_id)
+        ) or []
+
+    @_with_connection
+    async def _load_donation_types(self, temple_id: int) -> Optional[List[Dict]]:
+        try:
+            query = """
+            SELECT DonationTypeID, TypeName, Description, MinimumAmount
+            FROM DonationTypes
+            WHERE TempleID = %s AND IsActive = TRUE
+            ORDER BY DisplayOrder
+            """
+            await self.cursor.execute(query, (temple_id,))
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting donation types: {err}")
+            return None
+
+    @_with_connection
+    async def make_donation(self, temple_id: int, donation_type_id: int, visitor_id: int = None,
+                            amount: float = 0, payment_mode: str = "", transaction_ref: str = None,
+                            is_anonymous: bool = False, donor_name: str = None, donor_phone: str = None,
+                            donor_email: str = None) -> Tuple[Optional[int], Optional[str]]:
+        """Record a donation"""
+        try:
+            query = """
+            INSERT INTO Donations (TempleID, DonationTypeID, VisitorID, Amount,
+            PaymentMode, TransactionReference, IsAnonymous, DonorName, DonorPhone, DonorEmail)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """
+
+            await self.cursor.execute(query, (
+                temple_id, donation_type_id, visitor_id, amount, payment_mode, transaction_ref,
+                is_anonymous, donor_name, donor_phone, donor_email
+            ))
+
+            donation_id = self.cursor.lastrowid
+
+            # Generate receipt number
+            receipt_number = f"DON-{temple_id}-{donation_id}-{datetime.now().strftime('%y%m%d')}"
+
+            await self.cursor.execute(
+                "UPDATE Donations SET ReceiptNumber = %s WHERE DonationID = %s",
+                (receipt_number, donation_id)
+            )
+
+            # Update visitor's last visit if applicable
+            if visitor_id:
+                await self.update_visitor_last_visit(visitor_id, commit=False)
+                await self.cursor.execute(VISITOR_ACTIVITY_SQL, visitor_activity(visitor_id, 'donation', 1, amount))
+
+            await self.cursor.execute(DONATION_ROLLUP_SQL, donation_increment(donation_id))
+
+            await self.conn.commit()
+            return donation_id, receipt_number
+        except pymysql.MySQLError as err:
+            print(f"Error making donation: {err}")
+            await self.conn.rollback()
+            return None, str(err)
+
+    @_with_connection
+    async def get_visitor_donations(self, visitor_id: int) -> List[Dict]:
+        """Get all donations for a visitor"""
+        try:
+            query = """
+            SELECT d.DonationID, dt.TypeName, d.DonationDate, d.Amount, d.PaymentMode,
+                   d.ReceiptNumber, t.TempleName
+            FROM Donations d
+            JOIN DonationTypes dt ON d.DonationTypeID = dt.DonationTypeID
+            JOIN Temples t ON d.TempleID = t.TempleID
+            WHERE d.VisitorID = %s
+            ORDER BY d.DonationDate DESC
+            """
+            await self.cursor.execute(query, (visitor_id,))
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting visitor donations: {err}")
+            return []
+
+    # Virtual Puja methods
+    async def get_puja_types(self, temple_id: int) -> List[Dict]:
+        """Get available puja types for a temple (served from the catalogue cache)"""
+        return await self._cached(
+            self.catalogue, ('puja_types', temple_id), lambda: self._load_puja_types(temple_id)
+        ) or []
+
+    @_with_connection
+    async def _load_puja_types(self, temple_id: int) -> Optional[List[Dict]]:
+        try:
+            query = """
+            SELECT * FROM PujaTypes
+            WHERE TempleID = %s AND IsActive = TRUE
+            """
+            await self.cursor.execute(query, (temple_id,))
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting puja types: {err}")
+            return None
+
+    @_with_connection
+    async def book_virtual_puja(self, temple_id: int, visitor_id: int, puja_type_id: int,
+                                puja_date: str, puja_time: str, total_amount: float,
+                                devotee_message: str = None) -> Tuple[Optional[int], Optional[str]]:
+        """Book a virtual puja"""
+        try:
+            # Process payment
+            receipt_number = f"PUJA-{random.randint(10000000, 99999999)}"
+
+            query = """
+            INSERT INTO VirtualPujas (TempleID, VisitorID, PujaTypeID, PujaDate, PujaTime,
+            TotalAmount, DevoteeMessage, ReceiptNumber)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """
+
+            await self.cursor.execute(query, (
+                temple_id, visitor_id, puja_type_id, puja_date, puja_time,
+                total_amount, devotee_message, receipt_number
+            ))
+
+            puja_id = self.cursor.lastrowid
+
+            # Update visitor's last visit
+            await self.update_visitor_last_visit(visitor_id, commit=False)
+            await self.cursor.execute(VISITOR_ACTIVITY_SQL, visitor_activity(visitor_id, 'puja', 1, total_amount))
+
+            await self.conn.commit()
+            return puja_id, receipt_number
+        except pymysql.MySQLError as err:
+            print(f"Error booking virtual puja: {err}")
+            await self.conn.rollback()
+            return None, str(err)
+
+    @_with_connection
+    async def get_visitor_pujas(self, visitor_id: int) -> List[Dict]:
+        """Get all virtual pujas for a visitor"""
+        try:
+            query = """
+            SELECT vp.*, pt.PujaName, pt.Description
+            FROM VirtualPujas vp
+            JOIN PujaTypes pt ON vp.PujaTypeID = pt.PujaTypeID
+            WHERE vp.VisitorID = %s
+            ORDER BY vp.PujaDate DESC, vp.PujaTime DESC
+            """
+            await self.cursor.execute(query, (visitor_id,))
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting visitor pujas: {err}")
+            return []
+
+    # Prasadam Order methods
+    async def get_prasadam_types(self, temple_id: int) -> List[Dict]:
+        """Get available prasadam types for a temple (served from the catalogue cache)"""
+        return await self._cached(
+            self.catalogue, ('prasadam_types', temple_id), lambda: self._load_prasadam_types(temple_id)
+        ) or []
+
+    @_with_connection
+    async def _load_prasadam_types(self, temple_id: int) -> Optional[List[Dict]]:
+        try:
+            query = """
+            SELECT * FROM PrasadamTypes
+            WHERE TempleID = %s AND IsActive = TRUE
+            """
+            await self.cursor.execute(query, (temple_id,))
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting prasadam types: {err}")
+            return None
+
+    @_with_connection
+    async def order_prasadam(self, visitor_id: int, temple_id: int, prasadam_type_id: int,
+                             quantity: int, total_amount: float, shipping_address: str) -> Tuple[Optional[int], Optional[str]]:
+        """Place an order for prasadam"""
+        try:
+            estimated_delivery = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
+
+            query = """
+            INSERT INTO PrasadamOrders (VisitorID, TempleID, PrasadamTypeID, Quantity,
+            TotalAmount, ShippingAddress, EstimatedDelivery)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """
+
+            await self.cursor.execute(query, (
+                visitor_id, temple_id, prasadam_type_id, quantity,
+                total_amount, shipping_address, estimated_delivery
+            ))
+
+            order_id = self.cursor.lastrowid
+            tracking_number = f"TRACK-{random.randint(10000000, 99999999)}"
+
+            await self.cursor.execute(
+                "UPDATE PrasadamOrders SET TrackingNumber = %s WHERE OrderID = %s",
+                (tracking_number, order_id)
+            )
+
+            await self.cursor.execute(VISITOR_ACTIVITY_SQL, visitor_activity(visitor_id, 'prasadam', 1, total_amount))
+
+            await self.conn.commit()
+            return order_id, tracking_number
+        except pymysql.MySQLError as err:
+            print(f"Error ordering prasadam: {err}")
+            await self.conn.rollback()
+            return None, str(err)
+
+    @_with_connection
+    async def get_visitor_prasadam_orders(self, visitor_id: int) -> List[Dict]:
+        """Get all prasadam orders for a visitor"""
+        try:
+            query = """
+            SELECT po.*, pt.Name as PrasadamName, pt.Description, pt.Price
+            FROM PrasadamOrders po
+            JOIN PrasadamTypes pt ON po.PrasadamTypeID = pt.PrasadamTypeID
+            WHERE po.VisitorID = %s
+            ORDER BY po.OrderDate DESC
+            """
+            await self.cursor.execute(query, (visitor_id,))
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting visitor prasadam orders: {err}")
+            return []
+
+    # Festival methods
+    async def get_upcoming_festivals(self, temple_id: int) -> List[Dict]:
+        """Get upcoming festivals for a temple (cached until the day rolls over)"""
+        today = date.today()
+        next_midnight = datetime.combine(today + timedelta(days=1), time.min).timestamp()
+        return await self._cached(
+            self.festival_calendar, (temple_id, today),
+            lambda: self._load_upcoming_festivals(temple_id, today),
+            expires_at=next_midnight
+        ) or []
+
+    @_with_connection
+    async def _load_upcoming_festivals(self, temple_id: int, today: date) -> Optional[List[Dict]]:
+        try:
+            query = """
+            SELECT * FROM Festivals
+            WHERE TempleID = %s AND EndDate >= %s
+            ORDER BY StartDate
+            """
+            await self.cursor.execute(query, (temple_id, today))
+            return list(await self.cursor.fetchall())
+        except pymysql.MySQLError as err:
+            print(f"Error getting upcoming festivals: {err}")
+            return None
+
+    # Admin dashboard methods
+    async def get_dashboard_data(self, temple_id: int) -> Dict[str, Any]:
+        """Get data for admin dashboard (its queries run concurrently, see dashboard.py)"""
+        try:
+            return await self._fetch_parallel(dashboard_queries(temple_id))
+        except (pymysql.MySQLError, PoolTimeoutError) as err:
+            print(f"Error getting dashboard data: {err}")
+            return {}
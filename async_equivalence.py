@@ -0,0 +1,290 @@
+#async_equivalence.py
+#
+# Equivalence check for AsyncTempleDatabase against TempleDatabase.
+# Every read method is called on both with the same arguments and must return
+# the same rows; then the same booking scenario (holds, conversions, refusals,
+# batches, sharded counters, donations, pujas, prasadam) runs on a twin
+# schedule for each and must produce the same outcomes and the same rows.
+# Finally concurrent async bookings race for one schedule, which must not oversell.
+#
+#   python async_equivalence.py --tasks 200 --capacity 300
+
+import argparse
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from async_booking import AsyncTempleDatabase
+from booking import TempleDatabase
+from rollups import retract_bookings, retract_donations
+from visitor_stats import recompute_visitor_stats
+from stress_booking import check_schedule, create_stress_schedule
+
+# Columns that differ between the sync and async twins by construction
+VOLATILE_COLUMNS = {'BookingID', 'ScheduleID', 'VisitorID', 'DonationID', 'PujaID', 'OrderID', 'HoldID',
+                    'QRCode', 'PaymentReference', 'ReceiptNumber', 'TrackingNumber', 'MobileNumber',
+                    'BookingDateTime', 'DonationDate', 'OrderDate', 'RegistrationDate'}
+
+MISSING_ID = 2 ** 31 - 1
+
+def strip(value: Any) -> Any:
+    """Drop volatile columns from rows (recursively) so twins can be compared"""
+    if isinstance(value, dict):
+        return {key: strip(item) for key, item in value.items() if key not in VOLATILE_COLUMNS}
+    if isinstance(value, (list, tuple)):
+        return [strip(item) for item in value]
+    return value
+
+def outcome(result: Any) -> Any:
+    """Reduce a method result to what must match: success or the error message"""
+    if isinstance(result, list):
+        return [outcome(item) for item in result]
+    if isinstance(result, tuple) and len(result) == 2:
+        if result[0] is not None:
+            return ('ok', str(result[1]).split('-')[0] if isinstance(result[1], str) else result[1])
+        return ('error', result[1])
+    return result
+
+def scenario(schedule_id: int, visitor_id: int, temple: Dict, types: Dict) -> List[Tuple[str, str, tuple, dict]]:
+    """Steps run on both implementations: (label, method, args, kwargs). 'HOLD' is replaced by the last hold ID."""
+    puja_date = (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d')
+    temple_id = temple['TempleID']
+    return [
+        ('zero people', 'book_darshan', (schedule_id, visitor_id, 0), {}),
+        ('unknown schedule', 'book_darshan', (MISSING_ID, visitor_id, 1), {}),
+        ('hold', 'hold_slots', (schedule_id, 3, visitor_id), {}),
+        ('book held slots', 'book_darshan', (schedule_id, visitor_id, 3), {'hold_id': 'HOLD'}),
+        ('rebook converted hold', 'book_darshan', (schedule_id, visitor_id, 3), {'hold_id': 'HOLD'}),
+        ('hold to release', 'hold_slots', (schedule_id, 2, visitor_id), {}),
+        ('release hold', 'release_hold', ('HOLD',), {}),
+        ('release hold again', 'release_hold', ('HOLD',), {}),
+        ('book direct', 'book_darshan', (schedule_id, visitor_id, 5), {'special_req': 'Wheelchair'}),
+        ('overbook', 'book_darshan', (schedule_id, visitor_id, 50), {}),
+        ('batch', 'book_darshan_batch', ([
+            {'schedule_id': schedule_id, 'visitor_id': visitor_id, 'num_people': 1},
+            {'schedule_id': schedule_id, 'visitor_id': visitor_id, 'num_people': 0},
+            {'schedule_id': schedule_id, 'visitor_id': visitor_id, 'num_people': 5},
+            {'schedule_id': MISSING_ID, 'visitor_id': visitor_id, 'num_people': 1},
+            {'schedule_id': schedule_id, 'visitor_id': MISSING_ID, 'num_people': 1},
+        ],), {}),
+        ('lapsed hold', 'hold_slots', (schedule_id, 1, visitor_id), {'ttl_seconds': -1}),
+        ('book lapsed hold', 'book_darshan', (schedule_id, visitor_id, 1), {'hold_id': 'HOLD'}),
+        ('shard', 'shard_schedule', (schedule_id, 4), {}),
+        ('shard again', 'shard_schedule', (schedule_id, 4), {}),
+        ('book sharded', 'book_darshan', (schedule_id, visitor_id, 2), {}),
+        ('overbook sharded', 'book_darshan', (schedule_id, visitor_id, 50), {}),
+        ('last visit', 'update_visitor_last_visit', (visitor_id,), {}),
+        ('donation', 'make_donation', (temple_id, types['donation'], visitor_id, 501, 'UPI'), {}),
+        ('puja', 'book_virtual_puja', (temple_id, visitor_id, types['puja'], puja_date, '09:00', 501), {}),
+        ('prasadam', 'order_prasadam', (visitor_id, temple_id, types['prasadam'], 2, 202, 'Prabhadevi, Mumbai'), {}),
+    ]
+
+def resolve(args: tuple, kwargs: dict, hold_id: Any) -> Tuple[tuple, dict]:
+    """Substitute the last hold ID into a step's arguments"""
+    return (tuple(hold_id if arg == 'HOLD' else arg for arg in args),
+            {key: hold_id if value == 'HOLD' else value for key, value in kwargs.items()})
+
+def visitor_rows(db: TempleDatabase, visitor_id: int) -> Dict[str, Any]:
+    """Everything a visitor's scenario leaves behind, read through the sync implementation"""
+    bookings = db.get_visitor_bookings(visitor_id)
+    return {
+        'bookings': bookings,
+        'booking_details': [db.get_booking_details(booking['BookingID']) for booking in bookings],
+        'donations': db.get_visitor_donations(visitor_id),
+        'pujas': db.get_visitor_pujas(visitor_id),
+        'prasadam': db.get_visitor_prasadam_orders(visitor_id),
+    }
+
+def hold_statuses(db: TempleDatabase, schedule_id: int) -> List[Tuple]:
+    """Statuses of a schedule's holds in creation order"""
+    with db.unit_of_work():
+        db.cursor.execute(
+            "SELECT NumberOfPeople, HoldStatus, BookingID IS NOT NULL AS Booked FROM SlotHolds "
+            "WHERE ScheduleID = %s ORDER BY HoldID", (schedule_id,)
+        )
+        return [tuple(row.values()) for row in db.cursor.fetchall()]
+
+def cleanup(db: TempleDatabase, schedule_ids: List[int], visitor_ids: List[int]) -> None:
+    """Remove the rows created by the check"""
+    with db.unit_of_work():
+        for schedule_id in schedule_ids:
+            db.cursor.execute("DELETE FROM SlotHolds WHERE ScheduleID = %s", (schedule_id,))
+            retract_bookings(db.cursor, 'ScheduleID', schedule_id)
+            db.cursor.execute("DELETE FROM DarshanBookings WHERE ScheduleID = %s", (schedule_id,))
+            db.cursor.execute("DELETE FROM DarshanScheduleShards WHERE ScheduleID = %s", (schedule_id,))
+            db.cursor.execute("DELETE FROM DarshanSchedules WHERE ScheduleID = %s", (schedule_id,))
+        for visitor_id in visitor_ids:
+            retract_bookings(db.cursor, 'VisitorID', visitor_id)
+            retract_donations(db.cursor, 'VisitorID', visitor_id)
+            for table in ('Donations', 'VirtualPujas', 'PrasadamOrders', 'DarshanBookings'):
+                db.cursor.execute(f"DELETE FROM {table} WHERE VisitorID = %s", (visitor_id,))
+            db.cursor.execute("DELETE FROM Visitors WHERE VisitorID = %s", (visitor_id,))
+        recompute_visitor_stats(db.cursor, *visitor_ids)
+        db.conn.commit()
+
+async def compare_reads(db: TempleDatabase, adb: AsyncTempleDatabase, temple_id: int,
+                        visitor: Dict, schedule_id: int) -> List[str]:
+    """Call every read method on both implementations; return the names that disagree"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    reads = [
+        ('get_temples', ()),
+        ('get_darshan_types', (temple_id,)),
+        ('get_schedule_templates', (temple_id,)),
+        ('get_donation_types', (temple_id,)),
+        ('get_puja_types', (temple_id,)),
+        ('get_prasadam_types', (temple_id,)),
+        ('get_upcoming_festivals', (temple_id,)),
+        ('get_darshan_schedules', (temple_id,)),
+        ('get_darshan_schedules', (temple_id, today)),
+        ('get_slot_availability', (temple_id, today)),
+        ('get_schedule_details', (schedule_id,)),
+        ('get_schedule_details', (MISSING_ID,)),
+        ('get_visitor_by_phone', (visitor['MobileNumber'],)),
+        ('get_visitor_by_phone', ('0000000000',)),
+        ('get_visitor_bookings', (visitor['VisitorID'],)),
+        ('get_visitor_donations', (visitor['VisitorID'],)),
+        ('get_visitor_pujas', (visitor['VisitorID'],)),
+        ('get_visitor_prasadam_orders', (visitor['VisitorID'],)),
+        ('get_booking_details', (MISSING_ID,)),
+        ('get_dashboard_data', (temple_id,)),
+    ]
+    bookings = db.get_visitor_bookings(visitor['VisitorID'])
+    if bookings:
+        reads.append(('get_booking_details', (bookings[0]['BookingID'],)))
+
+    mismatches = []
+    for name, args in reads:
+        expected = getattr(db, name)(*args)
+        actual = await getattr(adb, name)(*args)
+        if expected != actual:
+            mismatches.append(f"{name}{args}")
+            print(f"  MISMATCH {name}{args}\n    sync:  {expected!r}\n    async: {actual!r}")
+    return mismatches
+
+async def race(adb: AsyncTempleDatabase, schedule_id: int, visitor_ids: List[int],
+               max_people: int) -> Dict[str, int]:
+    """Concurrent tasks book one schedule until small requests are refused too"""
+    results = {'booked': 0, 'people': 0, 'rejected': 0, 'errors': 0}
+    start = asyncio.Event()
+
+    async def devotee(visitor_id: int) -> None:
+        await start.wait()
+        while True:
+            people = random.randint(1, max_people)
+            booking_id, message = await adb.book_darshan(schedule_id, visitor_id, people)
+            if booking_id:
+                results['booked'] += 1
+                results['people'] += people
+            elif message == "Not enough slots available":
+                results['rejected'] += 1
+                if people == 1:
+                    return
+            else:
+                results['errors'] += 1
+                return
+
+    tasks = [asyncio.create_task(devotee(visitor_id)) for visitor_id in visitor_ids]
+    start.set()
+    await asyncio.gather(*tasks)
+    return results
+
+async def run(args: argparse.Namespace) -> int:
+    db = TempleDatabase(per_request=True)
+    db.init_db()
+    adb = AsyncTempleDatabase(pool_size=args.pool_size)
+    failures = []
+
+    temple = db.get_temples()[0]
+    temple_id = temple['TempleID']
+    types = {
+        'donation': db.get_donation_types(temple_id)[0]['DonationTypeID'],
+        'puja': db.get_puja_types(temple_id)[0]['PujaTypeID'],
+        'prasadam': db.get_prasadam_types(temple_id)[0]['PrasadamTypeID'],
+    }
+
+    schedules = {'sync': create_stress_schedule(db, args.scenario_capacity),
+                 'async': create_stress_schedule(db, args.scenario_capacity)}
+    visitors = {'sync': db.register_visitor("Equivalence", "Devotee", f"9{random.randint(100000000, 999999999)}"),
+                'async': None}
+    race_schedule = None
+    race_visitors: List[int] = []
+
+    try:
+        async with adb:
+            visitors['async'] = await adb.register_visitor("Equivalence", "Devotee",
+                                                           f"9{random.randint(100000000, 999999999)}")
+            # The same scenario on twin schedules
+            steps = {name: scenario(schedules[name], visitors[name], temple, types) for name in schedules}
+            holds = {'sync': None, 'async': None}
+            for i, (label, method, step_args, step_kwargs) in enumerate(steps['sync']):
+                call_args, call_kwargs = resolve(step_args, step_kwargs, holds['sync'])
+                expected = getattr(db, method)(*call_args, **call_kwargs)
+                _, _, step_args, step_kwargs = steps['async'][i]
+                call_args, call_kwargs = resolve(step_args, step_kwargs, holds['async'])
+                actual = await getattr(adb, method)(*call_args, **call_kwargs)
+
+                if method == 'hold_slots':
+                    holds['sync'], holds['async'] = expected[0], actual[0]
+                if outcome(expected) != outcome(actual):
+                    failures.append(f"scenario: {label}")
+                    print(f"  MISMATCH {label}\n    sync:  {expected!r}\n    async: {actual!r}")
+
+            for name, check in (('counters', lambda key: strip(check_schedule(db, schedules[key]))),
+                                ('holds', lambda key: hold_statuses(db, schedules[key])),
+                                ('rows', lambda key: strip(visitor_rows(db, visitors[key])))):
+                if check('sync') != check('async'):
+                    failures.append(f"scenario state: {name}")
+                    print(f"  MISMATCH {name}\n    sync:  {check('sync')!r}\n    async: {check('async')!r}")
+
+            # Read methods against the same rows
+            with db.unit_of_work():
+                db.cursor.execute("SELECT * FROM Visitors WHERE VisitorID = %s", (visitors['async'],))
+                visitor = db.cursor.fetchone()
+            failures += [f"read: {name}" for name in
+                         await compare_reads(db, adb, temple_id, visitor, schedules['async'])]
+
+            # Concurrent async bookings on one schedule
+            race_schedule = create_stress_schedule(db, args.capacity)
+            if args.shards:
+                await adb.shard_schedule(race_schedule, args.shards)
+            race_visitors = [await adb.register_visitor("Equivalence", f"Racer{i}", f"9{random.randint(100000000, 999999999)}")
+                             for i in range(args.tasks)]
+            results = await race(adb, race_schedule, race_visitors, args.max_people)
+            state = check_schedule(db, race_schedule)
+            print(f"Race: {args.tasks} tasks, capacity {args.capacity}, shards {args.shards}: "
+                  f"{results['booked']} bookings ({results['people']} people), "
+                  f"{results['rejected']} rejected, {results['errors']} errors, "
+                  f"{state['RemainingSlots']} slots left")
+            if (state['RemainingSlots'] < 0 or results['errors']
+                    or state['CurrentCapacity'] - state['RemainingSlots'] != state['booked']
+                    or state['booked'] != results['people']):
+                failures.append("race: slot counter and bookings disagree")
+    finally:
+        if not args.keep:
+            cleanup(db, [s for s in [*schedules.values(), race_schedule] if s],
+                    [v for v in [*visitors.values(), *race_visitors] if v])
+
+    if failures:
+        print(f"FAIL: {len(failures)} difference(s)")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("OK: AsyncTempleDatabase matches TempleDatabase")
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check AsyncTempleDatabase against TempleDatabase")
+    parser.add_argument("--tasks", type=int, default=100, help="Concurrent async bookers in the race")
+    parser.add_argument("--capacity", type=int, default=300, help="Capacity of the raced schedule")
+    parser.add_argument("--max-people", type=int, default=4, help="Each raced booking asks for 1..N people")
+    parser.add_argument("--shards", type=int, default=0, help="Split the raced schedule into N sharded counters")
+    parser.add_argument("--scenario-capacity", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=20, help="Async pool size")
+    parser.add_argument("--keep", action="store_true", help="Keep the test schedules and bookings")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,448 @@
+#benchmark.py
+#
+# Latency and throughput benchmarks for the TempleDatabase methods. Each data
+# scale gets its own database (temple_bench_<scale>), filled once by datagen.py
+# and reused by later runs. Results (p50/p95/p99 latency, throughput) are saved
+# as JSON so runs can be compared over time.
+#
+#   python benchmark.py --scales tiny,small
+#   python benchmark.py --scales small --methods visitor --concurrency 8
+#   python benchmark.py --scales small --compare benchmark-20261001-120000.json
+#
+# Any MySQL 8 server works; a disposable local one is enough:
+#   docker run -d -p 3306:3306 -e MYSQL_ROOT_PASSWORD=keyur123 mysql:8
+# or run in-process on the embedded backend (one file per scale):
+#   TEMPLE_DB_BACKEND=sqlite python benchmark.py --scales tiny
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import mysql.connector
+
+from booking import TempleDatabase
+from datagen import SCALES, TABLES, generate
+from db_pool import DB_CONFIG, get_pool
+from rollups import retract_bookings, retract_donations
+from visitor_stats import recompute_visitor_stats
+
+# Timed calls per method, and calls per method before timing starts
+ITERATIONS = 200
+WARMUP = 10
+# Stop a method early once it has run this long
+TIME_BUDGET = 10.0
+# Sampled IDs the read benchmarks draw from
+SAMPLE_SIZE = 1000
+# A p50 or p95 this much slower than the baseline counts as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+class Fixture:
+    """IDs and reference data the benchmarks draw their arguments from"""
+
+    def __init__(self, db: TempleDatabase, seed: int):
+        self.db = db
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.temple_id = db.get_temples()[0]['TempleID']
+        self.darshan_types = db.get_darshan_types(self.temple_id)
+        self.donation_types = db.get_donation_types(self.temple_id)
+        self.puja_types = db.get_puja_types(self.temple_id)
+        self.prasadam_types = db.get_prasadam_types(self.temple_id)
+        self.today = date.today()
+
+        self.visitors = self._sample('Visitors', 'VisitorID', ['VisitorID', 'MobileNumber'])
+        self.bookings = [row['BookingID'] for row in self._sample('DarshanBookings', 'BookingID', ['BookingID'])]
+        with db.unit_of_work():
+            db.cursor.execute("""
+            SELECT ScheduleID FROM DarshanSchedules
+            WHERE TempleID = %s AND ScheduleDate BETWEEN %s AND %s
+            """, (self.temple_id, self.today, self.today + timedelta(days=30)))
+            self.schedules = [row['ScheduleID'] for row in db.cursor.fetchall()]
+
+        self.write_schedule = self._create_write_schedule()
+        self.created: Dict[str, List[int]] = {'Visitors': [], 'Donations': [], 'VirtualPujas': [], 'PrasadamOrders': []}
+
+    def _sample(self, table: str, id_column: str, columns: List[str]) -> List[Dict]:
+        """Up to SAMPLE_SIZE random rows, found by probing random IDs rather than ORDER BY RAND()"""
+        with self.db.unit_of_work():
+            self.db.cursor.execute(f"SELECT MIN({id_column}) AS lo, MAX({id_column}) AS hi FROM {table}")
+            bounds = self.db.cursor.fetchone()
+            if bounds['lo'] is None:
+                return []
+            probes = sorted({self.rng.randint(bounds['lo'], bounds['hi']) for _ in range(SAMPLE_SIZE)})
+            placeholders = ", ".join(["%s"] * len(probes))
+            self.db.cursor.execute(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE {id_column} IN ({placeholders})", probes
+            )
+            return self.db.cursor.fetchall()
+
+    def _create_write_schedule(self) -> int:
+        """A huge far-future schedule for the write benchmarks, so they never run out of slots"""
+        darshan_type = self.darshan_types[0]
+        schedule_date = self.today + timedelta(days=3650 + self.rng.randint(0, 3650))
+        with self.db.unit_of_work():
+            self.db.cursor.execute("""
+            INSERT INTO DarshanSchedules (TempleID, DarshanTypeID, ScheduleDate,
+            StartTime, EndTime, CurrentCapacity, RemainingSlots)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (self.temple_id, darshan_type['DarshanTypeID'], schedule_date,
+                  '05:00', '23:00', 10**9, 10**9))
+            schedule_id = self.db.cursor.lastrowid
+            self.db.conn.commit()
+        return schedule_id
+
+    # Random arguments
+    def pick(self, values: List[Any]) -> Any:
+        with self._lock:
+            return self.rng.choice(values)
+
+    def visitor_id(self) -> int:
+        return self.pick(self.visitors)['VisitorID']
+
+    def phone(self) -> str:
+        return self.pick(self.visitors)['MobileNumber']
+
+    def day(self) -> str:
+        with self._lock:
+            return (self.today + timedelta(days=self.rng.randint(0, 6))).strftime('%Y-%m-%d')
+
+    def record(self, table: str, row_id: Optional[int]) -> None:
+        if row_id:
+            with self._lock:
+                self.created[table].append(row_id)
+
+    def cleanup(self) -> None:
+        """Remove the rows the write benchmarks created"""
+        with self.db.unit_of_work():
+            cursor = self.db.cursor
+            # Visitors whose activity the deletes change, for the VisitorStats recompute
+            cursor.execute("SELECT DISTINCT VisitorID FROM DarshanBookings WHERE ScheduleID = %s", (self.write_schedule,))
+            touched = [row['VisitorID'] for row in cursor.fetchall()] + self.created['Visitors']
+            retract_bookings(cursor, 'ScheduleID', self.write_schedule)
+            cursor.execute("DELETE FROM DarshanBookings WHERE ScheduleID = %s", (self.write_schedule,))
+            cursor.execute("DELETE FROM SlotHolds WHERE ScheduleID = %s", (self.write_schedule,))
+            cursor.execute("DELETE FROM DarshanSchedules WHERE ScheduleID = %s", (self.write_schedule,))
+            for table, id_column in [('Donations', 'DonationID'), ('VirtualPujas', 'PujaID'),
+                                     ('PrasadamOrders', 'OrderID'), ('Visitors', 'VisitorID')]:
+                ids = self.created[table]
+                for start in range(0, len(ids), 1000):
+                    batch = ids[start:start + 1000]
+                    placeholders = ', '.join(['%s'] * len(batch))
+                    if table == 'Donations':
+                        retract_donations(cursor, 'DonationID', *batch)
+                    if table != 'Visitors':
+                        cursor.execute(f"SELECT DISTINCT VisitorID FROM {table} WHERE {id_column} IN ({placeholders})",
+                                       batch)
+                        touched += [row['VisitorID'] for row in cursor.fetchall()]
+                    cursor.execute(f"DELETE FROM {table} WHERE {id_column} IN ({placeholders})", batch)
+            recompute_visitor_stats(cursor, *touched)
+            self.db.conn.commit()
+
+
+def _registered(fx: Fixture) -> Optional[int]:
+    with fx._lock:
+        mobile = f"8{fx.rng.randint(100000000, 999999999)}"
+    visitor_id = fx.db.register_visitor("Bench", "Devotee", mobile)
+    fx.record('Visitors', visitor_id)
+    return visitor_id
+
+def _held_and_released(fx: Fixture) -> bool:
+    hold_id, _ = fx.db.hold_slots(fx.write_schedule, 2, fx.visitor_id())
+    return hold_id is not None and fx.db.release_hold(hold_id)
+
+def _donation(fx: Fixture) -> Tuple:
+    donation_type = fx.pick(fx.donation_types)
+    result = fx.db.make_donation(fx.temple_id, donation_type['DonationTypeID'], fx.visitor_id(),
+                                 max(float(donation_type['MinimumAmount']), 501.0), 'UPI', 'BENCH')
+    fx.record('Donations', result[0])
+    return result
+
+def _puja(fx: Fixture) -> Tuple:
+    puja_type = fx.pick(fx.puja_types)
+    result = fx.db.book_virtual_puja(fx.temple_id, fx.visitor_id(), puja_type['PujaTypeID'],
+                                     fx.day(), '08:00', float(puja_type['Price']))
+    fx.record('VirtualPujas', result[0])
+    return result
+
+def _prasadam(fx: Fixture) -> Tuple:
+    prasadam_type = fx.pick(fx.prasadam_types)
+    result = fx.db.order_prasadam(fx.visitor_id(), fx.temple_id, prasadam_type['PrasadamTypeID'],
+                                  2, float(prasadam_type['Price']) * 2, "1, Bench Road, Mumbai")
+    fx.record('PrasadamOrders', result[0])
+    return result
+
+# name -> call; the call's return value is checked for failure with _failed()
+BENCHMARKS: Dict[str, Callable[[Fixture], Any]] = {
+    # Catalogue (served from the in-process cache once warm)
+    'get_temples': lambda fx: fx.db.get_temples(),
+    'get_darshan_types': lambda fx: fx.db.get_darshan_types(fx.temple_id),
+    'get_donation_types': lambda fx: fx.db.get_donation_types(fx.temple_id),
+    'get_puja_types': lambda fx: fx.db.get_puja_types(fx.temple_id),
+    'get_prasadam_types': lambda fx: fx.db.get_prasadam_types(fx.temple_id),
+    'get_schedule_templates': lambda fx: fx.db.get_schedule_templates(fx.temple_id),
+    'get_upcoming_festivals': lambda fx: fx.db.get_upcoming_festivals(fx.temple_id),
+    # Schedules
+    'get_darshan_schedules': lambda fx: fx.db.get_darshan_schedules(fx.temple_id, fx.day()),
+    'get_darshan_schedules_all': lambda fx: fx.db.get_darshan_schedules(fx.temple_id),
+    'get_slot_availability': lambda fx: fx.db.get_slot_availability(fx.temple_id, fx.day()),
+    'get_schedule_details': lambda fx: fx.db.get_schedule_details(fx.pick(fx.schedules)),
+    # Visitor reads
+    'get_visitor_by_phone': lambda fx: fx.db.get_visitor_by_phone(fx.phone()),
+    'get_visitor_bookings': lambda fx: fx.db.get_visitor_bookings(fx.visitor_id()),
+    'get_visitor_donations': lambda fx: fx.db.get_visitor_donations(fx.visitor_id()),
+    'get_visitor_pujas': lambda fx: fx.db.get_visitor_pujas(fx.visitor_id()),
+    'get_visitor_prasadam_orders': lambda fx: fx.db.get_visitor_prasadam_orders(fx.visitor_id()),
+    'get_booking_details': lambda fx: fx.db.get_booking_details(fx.pick(fx.bookings)),
+    'get_dashboard_data': lambda fx: fx.db.get_dashboard_data(fx.temple_id),
+    # Writes
+    'register_visitor': _registered,
+    'update_visitor_last_visit': lambda fx: fx.db.update_visitor_last_visit(fx.visitor_id()),
+    'book_darshan': lambda fx: fx.db.book_darshan(fx.write_schedule, fx.visitor_id(), 2),
+    'book_darshan_batch': lambda fx: fx.db.book_darshan_batch(
+        [{'schedule_id': fx.write_schedule, 'visitor_id': fx.visitor_id(), 'num_people': 2} for _ in range(10)]
+    ),
+    'hold_slots+release_hold': _held_and_released,
+    'make_donation': _donation,
+    'book_virtual_puja': _puja,
+    'order_prasadam': _prasadam,
+    'release_expired_holds': lambda fx: fx.db.release_expired_holds(),
+}
+
+# Methods whose fixture data may be missing at a given scale
+NEEDS = {
+    'get_schedule_details': 'schedules', 'get_visitor_by_phone': 'visitors', 'get_visitor_bookings': 'visitors',
+    'get_visitor_donations': 'visitors', 'get_visitor_pujas': 'visitors', 'get_visitor_prasadam_orders': 'visitors',
+    'get_booking_details': 'bookings', 'update_visitor_last_visit': 'visitors', 'book_darshan': 'visitors',
+    'book_darshan_batch': 'visitors', 'hold_slots+release_hold': 'visitors', 'make_donation': 'donation_types',
+    'book_virtual_puja': 'puja_types', 'order_prasadam': 'prasadam_types',
+}
+
+
+def _failed(result: Any) -> bool:
+    """Whether a TempleDatabase return value signals an error"""
+    if result is None or result is False:
+        return True
+    if isinstance(result, tuple) and result and result[0] is None:
+        return True
+    if isinstance(result, list) and result and isinstance(result[0], tuple):
+        return any(row[0] is None for row in result)
+    return False
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+def run_benchmark(fx: Fixture, call: Callable[[Fixture], Any], iterations: int = ITERATIONS,
+                  warmup: int = WARMUP, concurrency: int = 1, time_budget: float = TIME_BUDGET,
+                  cold: bool = False) -> Dict[str, Any]:
+    """Time iterations calls spread over concurrency threads. Returns latency percentiles and throughput."""
+    for _ in range(warmup):
+        call(fx)
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = [iterations]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + time_budget
+
+    def worker() -> None:
+        nonlocal errors
+        while True:
+            with lock:
+                if remaining[0] <= 0 or time.perf_counter() > deadline:
+                    return
+                remaining[0] -= 1
+            if cold:
+                fx.db.invalidate_catalogue()
+                fx.db.visitors.clear()
+            started = time.perf_counter()
+            try:
+                failed = _failed(call(fx))
+            except mysql.connector.Error:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += failed
+
+    began = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - began
+
+    latencies.sort()
+    return {
+        'calls': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        'throughput_per_s': round(len(latencies) / wall, 1) if wall else 0.0,
+    }
+
+def prepare_scale(scale: str, prefix: str, seed: int, workers: int = None, pool_size: int = None) -> TempleDatabase:
+    """Create (or reuse) the scale's database and top it up to the scale's row counts"""
+    database = f"{prefix}_{scale}"
+    if DB_CONFIG.get('backend', 'mysql') == 'mysql':
+        server = {key: value for key, value in DB_CONFIG.items() if key != 'database'}
+        conn = get_pool(server, pool_size=1).get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+            cursor.close()
+        finally:
+            conn.close()
+
+    config = {**DB_CONFIG, 'database': database}
+    if pool_size:
+        get_pool(config, pool_size=pool_size)
+    db = TempleDatabase(**config, per_request=True)
+    db.init_db()
+
+    missing = {}
+    with db.unit_of_work():
+        for table, (table_name, _, _) in TABLES.items():
+            db.cursor.execute(f"SELECT COUNT(*) AS n FROM {table_name}")
+            missing[table] = max(0, SCALES[scale][table] - db.cursor.fetchone()['n'])
+    if missing['visitors']:
+        generate(db, missing, seed=seed, workers=workers)
+    return db
+
+def table_sizes(db: TempleDatabase) -> Dict[str, int]:
+    with db.unit_of_work():
+        sizes = {}
+        for table_name, _, _ in TABLES.values():
+            db.cursor.execute(f"SELECT COUNT(*) AS n FROM {table_name}")
+            sizes[table_name] = db.cursor.fetchone()['n']
+        return sizes
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline: Dict, current: Dict, threshold: float = REGRESSION_THRESHOLD) -> int:
+    """Print per-method changes against a baseline run. Returns the number of regressions."""
+    regressions = 0
+    for scale, methods in current['results'].items():
+        old_methods = baseline.get('results', {}).get(scale)
+        if not old_methods:
+            print(f"\n[{scale}] not in baseline")
+            continue
+        print(f"\n[{scale}] vs baseline {baseline['meta'].get('revision')} ({baseline['meta'].get('started')})")
+        print(f"{'method':<30} {'p50 ms':>17} {'p95 ms':>17} {'ops/s':>17}")
+        for name, new in methods.items():
+            old = old_methods.get(name)
+            if not old:
+                continue
+
+            def change(key: str) -> str:
+                if not old[key]:
+                    return f"{new[key]:>8}"
+                return f"{new[key]:>8} {(new[key] - old[key]) / old[key]:+7.0%}"
+
+            slower = any(old[key] and (new[key] - old[key]) / old[key] > threshold for key in ('p50_ms', 'p95_ms'))
+            regressions += slower
+            print(f"{name:<30} {change('p50_ms'):>17} {change('p95_ms'):>17} {change('throughput_per_s'):>17}"
+                  f"{'  SLOWER' if slower else ''}")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark TempleDatabase methods at several data scales")
+    parser.add_argument("--scales", default="tiny", help=f"Comma-separated, from: {', '.join(SCALES)}")
+    parser.add_argument("--methods", default=None, help="Comma-separated substrings of method names to run")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--concurrency", type=int, default=1, help="Threads calling each method at once")
+    parser.add_argument("--time-budget", type=float, default=TIME_BUDGET, help="Max seconds per method")
+    parser.add_argument("--cold", action="store_true", help="Clear the in-process caches before every call")
+    parser.add_argument("--database-prefix", default="temple_bench")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None, help="Data generation processes")
+    parser.add_argument("--out", default=None, help="Results file (default: benchmark-<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline results file to compare against")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 if any method got slower")
+    args = parser.parse_args()
+
+    scales = [scale.strip() for scale in args.scales.split(",")]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    names = list(BENCHMARKS)
+    if args.methods:
+        patterns = [pattern.strip() for pattern in args.methods.split(",")]
+        names = [name for name in names if any(pattern in name for pattern in patterns)]
+
+    started = datetime.now()
+    report = {
+        'meta': {
+            'started': started.isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'host': platform.node(),
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency,
+            'cold': args.cold,
+            'seed': args.seed,
+            'scales': {},
+        },
+        'results': {}
+    }
+
+    for scale in scales:
+        # One connection per benchmark thread, plus spares for fixture bookkeeping
+        db = prepare_scale(scale, args.database_prefix, args.seed, args.workers, args.concurrency + 2)
+        with db.unit_of_work():
+            db.cursor.execute("SELECT VERSION() AS version")
+            report['meta']['server'] = db.cursor.fetchone()['version']
+        report['meta']['scales'][scale] = table_sizes(db)
+        print(f"\n[{scale}] " + ", ".join(f"{table} {rows:,}" for table, rows in report['meta']['scales'][scale].items()))
+
+        fx = Fixture(db, args.seed)
+        results = report['results'][scale] = {}
+        try:
+            print(f"{'method':<30} {'calls':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>9}")
+            for name in names:
+                if name in NEEDS and not getattr(fx, NEEDS[name]):
+                    print(f"{name:<30} skipped (no {NEEDS[name]} at this scale)")
+                    continue
+                stats = results[name] = run_benchmark(fx, BENCHMARKS[name], args.iterations, args.warmup,
+                                                      args.concurrency, args.time_budget, args.cold)
+                print(f"{name:<30} {stats['calls']:>6} {stats['errors']:>4} {stats['p50_ms']:>9} "
+                      f"{stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['throughput_per_s']:>9}")
+        finally:
+            fx.cleanup()
+
+    out = args.out or f"benchmark-{started:%Y%m%d-%H%M%S}.json"
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,102 @@
 #booking.py
 
+import os
 import mysql.connector
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 import random
 import qrcode
 from io import BytesIO
 import base64
+import functools
+import threading
+from contextlib import contextmanager
 from typing import Dict, List, Tuple, Optional, Any, Union
+from cache import TTLCache
+from dashboard import dashboard_queries, run_parallel
+from db_pool import DB_BACKEND, get_pool
+from entry_pass import sign_pass
+from migrations import migrate
+from rollups import BOOKING_ROLLUP_SQL, DONATION_ROLLUP_SQL, booking_increments, donation_increment
+from schedule_generator import (DEFAULT_TEMPLATES, build_schedule_frame, insert_schedule_rows,
+                                resolve_templates, save_templates)
+from visitor_lookup import VisitorLookup
+from visitor_stats import VISITOR_ACTIVITY_SQL, visitor_activity
+
+# Schedules at or above this capacity are worth splitting into sharded slot counters
+SHARD_THRESHOLD = 5000
+DEFAULT_SHARD_COUNT = 16
+# Random shards tried with a guarded decrement before falling back to a locked scan
+SHARD_ATTEMPTS = 2
+
+# Seconds reference data (temples and the darshan/donation/puja/prasadam types) is cached for
+CATALOGUE_TTL = float(os.environ.get('TEMPLE_CATALOGUE_TTL', 300))
+
+# Days ahead for which the undated schedule listing includes not-yet-materialized template slots
+TEMPLATE_HORIZON_DAYS = 30
+
+# Rendered entry-pass QR images kept in memory (keyed by payload)
+QR_RENDER_CACHE_SIZE = int(os.environ.get('TEMPLE_QR_RENDER_CACHE_SIZE', 1024))
+
+# Every base64-encoded PNG starts with this (the encoded PNG signature)
+PNG_BASE64_PREFIX = 'iVBORw0KGgo'
+
+# How long a slot hold lasts while the devotee completes payment
+HOLD_TTL_SECONDS = 600
+
+# Remaining slots of the schedule aliased ds: its own counter plus any shard counters
+REMAINING_SLOTS_SQL = """(ds.RemainingSlots + CASE WHEN ds.ShardCount > 0 THEN
+    (SELECT COALESCE(SUM(sh.RemainingSlots), 0) FROM DarshanScheduleShards sh
+     WHERE sh.ScheduleID = ds.ScheduleID) ELSE 0 END)"""
+
+def _is_id(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+def batch_request_error(request: Any) -> Optional[str]:
+    """Why one book_darshan_batch request can't be booked as given, or None if it's well formed"""
+    if not isinstance(request, dict):
+        return "Booking request must be an object"
+    if not _is_id(request.get('schedule_id')):
+        return "Missing or invalid schedule_id"
+    if not _is_id(request.get('visitor_id')):
+        return "Missing or invalid visitor_id"
+    if not _is_id(request.get('num_people')):
+        return "Number of people must be at least 1"
+    if request.get('special_req') is not None and not isinstance(request['special_req'], str):
+        return "Special requirements must be text"
+    return None
+
+class _ConnectionState:
+    """Connection and cursor used by the calls of one TempleDatabase (or one thread)"""
+    conn = None
+    cursor = None
+
+class _ThreadConnectionState(threading.local, _ConnectionState):
+    """Per-thread connection state for per-request mode"""
+
+def _with_connection(method):
+    """Run a TempleDatabase method inside a unit of work when in per-request mode"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.per_request or self._state.conn is not None:
+            return method(self, *args, **kwargs)
+        with self.unit_of_work():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class TempleDatabase:
     """
     Handles all database operations for the Siddhivinayak Temple Booking System
+
+    By default an instance holds one pooled connection and cursor for its whole
+    life. With per_request=True every call (or every unit_of_work() block)
+    borrows its own connection from the pool instead, so a single instance can
+    be shared by all Streamlit sessions and worker threads, and a dropped
+    connection is replaced on the next borrow.
     """
     
-    def __init__(self, host="localhost", user="root", password="keyur123", database="temple_db"):
+    def __init__(self, host="localhost", user="root", password="keyur123", database="temple_db",
+                 per_request: bool = False, backend: str = DB_BACKEND):
         """Initialize database connection"""
         self.config = {
             'host': host,
@@ -22,23 +104,91 @@ class TempleDatabase:
             'password': password,
             'database': database
         }
+        if backend != 'mysql':
+            # Embedded backends only need the database name (sqlite: a file name or path)
+            self.config = {'backend': backend, 'database': database}
+        self.per_request = per_request
+        self.catalogue = TTLCache(CATALOGUE_TTL)
+        # Upcoming festivals per (temple, day); entries expire at the following midnight
+        self.festival_calendar = TTLCache(24 * 3600)
+        self.visitors = VisitorLookup(self)
+        # (temple, date) pairs whose template slots this process has already materialized
+        self._materialized = TTLCache(3600, maxsize=4096)
+        self._state = _ThreadConnectionState() if per_request else _ConnectionState()
         self.connect()
     
+    @property
+    def conn(self):
+        """Connection for the current call"""
+        return self._state.conn
+    
+    @conn.setter
+    def conn(self, value) -> None:
+        self._state.conn = value
+    
+    @property
+    def cursor(self):
+        """Dictionary cursor for the current call"""
+        return self._state.cursor
+    
+    @cursor.setter
+    def cursor(self, value) -> None:
+        self._state.cursor = value
+    
     def connect(self) -> None:
-        """Create a connection to the MySQL database"""
+        """Attach to the shared pool, borrowing a long-lived connection unless in per-request mode"""
         try:
-            self.conn = mysql.connector.connect(**self.config)
-            self.cursor = self.conn.cursor(dictionary=True)
+            self.pool = get_pool(self.config)
+            if not self.per_request:
+                self.conn = self.pool.get_connection()
+                self.cursor = self.conn.cursor(dictionary=True)
         except mysql.connector.Error as err:
             print(f"Error connecting to MySQL: {err}")
             raise
     
     def disconnect(self) -> None:
-        """Close the database connection"""
-        if hasattr(self, 'conn') and self.conn.is_connected():
-            self.cursor.close()
+        """Return the database connection to the pool"""
+        if self.conn is not None:
+            try:
+                self.cursor.close()
+            except mysql.connector.Error:
+                pass
             self.conn.close()
+            self.conn = None
+            self.cursor = None
     
+    def invalidate_catalogue(self) -> None:
+        """Drop cached reference data, e.g. after an admin edits temples, service types or festivals"""
+        self.catalogue.clear()
+        self.festival_calendar.clear()
+        self._materialized.clear()
+    
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Borrow one connection and cursor for a group of calls on this thread.
+        Nested calls reuse the outer connection; the connection goes back to the
+        pool (rolling back anything left uncommitted) when the block exits.
+        """
+        if not self.per_request or self._state.conn is not None:
+            yield self
+            return
+        
+        conn = self.pool.get_connection()
+        try:
+            self.conn = conn
+            self.cursor = conn.cursor(dictionary=True)
+            yield self
+        finally:
+            try:
+                self.cursor.close()
+            except mysql.connector.Error:
+                pass
+            self.conn = None
+            self.cursor = None
+            conn.close()
+    
+    @_with_connection
     def init_db(self) -> None:
         """Initialize the database with required tables"""
         try:
@@ -231,12 +381,16 @@ class TempleDatabase:
             
             self.conn.commit()
             
+            # Bring indexes and later schema changes up to date
+            migrate(self.conn, self.cursor)
+            
             # Check if we need to insert sample data
             self.cursor.execute("SELECT COUNT(*) as count FROM Temples")
             result = self.cursor.fetchone()
             
             if result['count'] == 0:
                 self._insert_sample_data()
+                self.invalidate_catalogue()
             
         except mysql.connector.Error as err:
             print(f"Error creating tables: {err}")
@@ -273,12 +427,14 @@ class TempleDatabase:
                 ('Evening Aarti', 'Special evening aarti darshan', 45, 1000, 300.00, True)
             ]
             
+            darshan_type_ids = {}
             for darshan in darshan_types:
                 self.cursor.execute("""
                 INSERT INTO DarshanTypes (TempleID, DarshanName, Description, 
                 Duration, MaxCapacity, StandardPrice, IsSpecial)
                 VALUES (%s, %s, %s, %s, %s, %s, %s)
                 """, (temple_id, *darshan))
+                darshan_type_ids[darshan[0]] = self.cursor.lastrowid
             
             # Insert Donation Types
             donation_types = [
@@ -340,70 +496,11 @@ class TempleDatabase:
                 VALUES (%s, %s, %s, %s, %s)
                 """, (temple_id, *prasadam))
             
-            # Create sample Darshan schedules for the next 7 days
-            for i in range(7):
-                schedule_date = (datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d')
-                
-                # Regular Darshan
-                self.cursor.execute("""
-                INSERT INTO DarshanSchedules (TempleID, DarshanTypeID, ScheduleDate, 
-                StartTime, EndTime, CurrentCapacity, RemainingSlots)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    temple_id, 
-                    1,  # Regular Darshan
-                    schedule_date, 
-                    '05:30', 
-                    '21:30', 
-                    10000, 
-                    10000
-                ))
-                
-                # VIP Darshan - Morning and Evening
-                for start_time, end_time in [('07:00', '10:00'), ('16:00', '19:00')]:
-                    self.cursor.execute("""
-                    INSERT INTO DarshanSchedules (TempleID, DarshanTypeID, ScheduleDate, 
-                    StartTime, EndTime, CurrentCapacity, RemainingSlots)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        temple_id, 
-                        2,  # VIP Darshan
-                        schedule_date, 
-                        start_time, 
-                        end_time, 
-                        2000, 
-                        2000
-                    ))
-                
-                # Morning Aarti
-                self.cursor.execute("""
-                INSERT INTO DarshanSchedules (TempleID, DarshanTypeID, ScheduleDate, 
-                StartTime, EndTime, CurrentCapacity, RemainingSlots)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    temple_id, 
-                    3,  # Morning Aarti
-                    schedule_date, 
-                    '05:30', 
-                    '06:15', 
-                    1000, 
-                    1000
-                ))
-                
-                # Evening Aarti
-                self.cursor.execute("""
-                INSERT INTO DarshanSchedules (TempleID, DarshanTypeID, ScheduleDate, 
-                StartTime, EndTime, CurrentCapacity, RemainingSlots)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    temple_id, 
-                    4,  # Evening Aarti
-                    schedule_date, 
-                    '19:00', 
-                    '19:45', 
-                    1000, 
-                    1000
-                ))
+            # Create sample Darshan schedules for the next 7 days; later dates are
+            # materialized from the same recurring templates when first viewed
+            templates = resolve_templates(DEFAULT_TEMPLATES, darshan_type_ids)
+            insert_schedule_rows(self.cursor, build_schedule_frame(temple_id, date.today(), 7, templates))
+            save_templates(self.cursor, temple_id, templates)
             
             self.conn.commit()
             print("Sample data inserted successfully")
@@ -415,17 +512,10 @@ class TempleDatabase:
     
     # Visitor-related methods
     def get_visitor_by_phone(self, phone: str) -> Optional[Dict]:
-        """Get visitor details by phone number"""
-        try:
-            self.cursor.execute(
-                "SELECT * FROM Visitors WHERE MobileNumber = %s", (phone,)
-            )
-            result = self.cursor.fetchone()
-            return result
-        except mysql.connector.Error as err:
-            print(f"Error getting visitor: {err}")
-            return None
+        """Get visitor details by phone number (served from the visitor lookup cache)"""
+        return self.visitors.get(phone)
     
+    @_with_connection
     def register_visitor(self, first_name: str, last_name: str, mobile: str, 
                         email: str = None, address: str = None, city: str = None, 
                         state: str = None, pin: str = None) -> Optional[int]:
@@ -442,30 +532,45 @@ class TempleDatabase:
                 city, state, pin
             ))
             
+            visitor_id = self.cursor.lastrowid
             self.conn.commit()
-            return self.cursor.lastrowid
+            
+            # The number may be cached as unregistered
+            self.visitors.invalidate(mobile)
+            return visitor_id
         except mysql.connector.Error as err:
             print(f"Error registering visitor: {err}")
             self.conn.rollback()
             return None
     
-    def update_visitor_last_visit(self, visitor_id: int) -> bool:
-        """Update the last visit date for a visitor"""
+    @_with_connection
+    def update_visitor_last_visit(self, visitor_id: int, commit: bool = True) -> bool:
+        """
+        Update the last visit date for a visitor. With commit=False the update
+        joins the caller's transaction and errors propagate to the caller.
+        """
         try:
             self.cursor.execute(
                 "UPDATE Visitors SET LastVisit = CURDATE() WHERE VisitorID = %s", 
                 (visitor_id,)
             )
-            self.conn.commit()
+            if commit:
+                self.conn.commit()
             return True
         except mysql.connector.Error as err:
+            if not commit:
+                raise
             print(f"Error updating visitor: {err}")
             self.conn.rollback()
             return False
     
     # Temple-related methods
     def get_temples(self) -> List[Dict]:
-        """Get list of all active temples"""
+        """Get list of all active temples (served from the catalogue cache)"""
+        return self.catalogue.get_or_load('temples', self._load_temples) or []
+    
+    @_with_connection
+    def _load_temples(self) -> Optional[List[Dict]]:
         try:
             self.cursor.execute(
                 "SELECT * FROM Temples WHERE IsActive = TRUE"
@@ -473,11 +578,17 @@ class TempleDatabase:
             return self.cursor.fetchall()
         except mysql.connector.Error as err:
             print(f"Error getting temples: {err}")
-            return []
+            return None
     
     # Darshan-related methods
     def get_darshan_types(self, temple_id: int) -> List[Dict]:
-        """Get darshan types for a temple"""
+        """Get darshan types for a temple (served from the catalogue cache)"""
+        return self.catalogue.get_or_load(
+            ('darshan_types', temple_id), lambda: self._load_darshan_types(temple_id)
+        ) or []
+    
+    @_with_connection
+    def _load_darshan_types(self, temple_id: int) -> Optional[List[Dict]]:
         try:
             self.cursor.execute(
                 "SELECT * FROM DarshanTypes WHERE TempleID = %s", 
@@ -486,45 +597,173 @@ class TempleDatabase:
             return self.cursor.fetchall()
         except mysql.connector.Error as err:
             print(f"Error getting darshan types: {err}")
-            return []
+            return None
+    
+    def get_schedule_templates(self, temple_id: int) -> List[Dict]:
+        """Get a temple's active recurring schedule templates (served from the catalogue cache)"""
+        return self.catalogue.get_or_load(
+            ('schedule_templates', temple_id), lambda: self._load_schedule_templates(temple_id)
+        ) or []
+    
+    @_with_connection
+    def _load_schedule_templates(self, temple_id: int) -> Optional[List[Dict]]:
+        try:
+            self.cursor.execute("""
+            SELECT st.TemplateID, st.DarshanTypeID, dt.DarshanName, st.StartTime, st.EndTime,
+                   st.Capacity, st.WeekdayMask, st.ValidFrom, st.ValidTo, dt.StandardPrice, dt.Duration
+            FROM ScheduleTemplates st
+            JOIN DarshanTypes dt ON st.DarshanTypeID = dt.DarshanTypeID
+            WHERE st.TempleID = %s AND st.IsActive = TRUE
+            ORDER BY st.StartTime
+            """, (temple_id,))
+            return self.cursor.fetchall()
+        except mysql.connector.Error as err:
+            print(f"Error getting schedule templates: {err}")
+            return None
+    
+    def _materialize_schedules(self, temple_id: int, schedule_date: date) -> None:
+        """
+        Create the date's schedule rows from the temple's templates, once per process.
+        The unique slot key makes concurrent materialization harmless.
+        """
+        key = (temple_id, schedule_date)
+        if schedule_date < date.today() or self._materialized.get(key):
+            return
+        
+        if self._insert_template_schedules(temple_id, schedule_date):
+            self._materialized.set(key, True)
+    
+    @_with_connection
+    def _insert_template_schedules(self, temple_id: int, schedule_date: date) -> bool:
+        """
+        Insert the date's missing template slots and commit. Inside a caller's unit of
+        work this commits the caller's transaction too, so call it before writing anything.
+        """
+        try:
+            self.cursor.execute("""
+            INSERT INTO DarshanSchedules (TempleID, DarshanTypeID, FestivalID, ScheduleDate,
+            StartTime, EndTime, CurrentCapacity, RemainingSlots)
+            SELECT st.TempleID, st.DarshanTypeID,
+                   (SELECT f.FestivalID FROM Festivals f
+                    WHERE f.TempleID = st.TempleID AND %s BETWEEN f.StartDate AND f.EndDate
+                    ORDER BY f.StartDate LIMIT 1),
+                   %s, st.StartTime, st.EndTime, st.Capacity, st.Capacity
+            FROM ScheduleTemplates st
+            WHERE st.TempleID = %s AND st.IsActive = TRUE
+                  AND (st.WeekdayMask & (1 << WEEKDAY(%s))) <> 0
+                  AND (st.ValidFrom IS NULL OR st.ValidFrom <= %s)
+                  AND (st.ValidTo IS NULL OR st.ValidTo >= %s)
+            ON DUPLICATE KEY UPDATE ScheduleID = ScheduleID
+            """, (schedule_date, schedule_date, temple_id, schedule_date, schedule_date, schedule_date))
+            self.conn.commit()
+            return True
+        except mysql.connector.Error as err:
+            print(f"Error materializing schedules: {err}")
+            self.conn.rollback()
+            return False
+    
+    def _template_slots(self, temple_id: int, materialized: set, days: int) -> List[Dict]:
+        """Unmaterialized template slots for the next days days, shaped like schedule rows"""
+        slots = []
+        today = date.today()
+        for offset in range(days):
+            day = today + timedelta(days=offset)
+            for template in self.get_schedule_templates(temple_id):
+                if not template['WeekdayMask'] & (1 << day.weekday()):
+                    continue
+                if (template['ValidFrom'] and template['ValidFrom'] > day) or \
+                   (template['ValidTo'] and template['ValidTo'] < day):
+                    continue
+                if (template['DarshanTypeID'], day, template['StartTime']) in materialized:
+                    continue
+                slots.append({
+                    'ScheduleID': None,
+                    'DarshanTypeID': template['DarshanTypeID'],
+                    'DarshanName': template['DarshanName'],
+                    'ScheduleDate': day,
+                    'StartTime': template['StartTime'],
+                    'EndTime': template['EndTime'],
+                    'RemainingSlots': template['Capacity'],
+                    'StandardPrice': template['StandardPrice'],
+                    'Duration': template['Duration']
+                })
+        return slots
     
     def get_darshan_schedules(self, temple_id: int, date: str = None) -> List[Dict]:
-        """Get darshan schedules for a temple, optionally filtered by date"""
+        """
+        Get darshan schedules for a temple, optionally filtered by date. Asking for a
+        date materializes its template slots first. Without a date, template slots
+        not materialized yet are included for the next TEMPLATE_HORIZON_DAYS days
+        with ScheduleID None.
+        """
+        if date:
+            # Before the query borrows its connection, so a call never holds two at once
+            self._materialize_schedules(temple_id, datetime.strptime(str(date)[:10], '%Y-%m-%d').date())
+        return self._get_darshan_schedules(temple_id, date)
+    
+    @_with_connection
+    def _get_darshan_schedules(self, temple_id: int, date: str = None) -> List[Dict]:
         try:
             if date:
-                query = """
-                SELECT ds.ScheduleID, dt.DarshanName, ds.ScheduleDate, ds.StartTime, ds.EndTime, 
-                       ds.RemainingSlots, dt.StandardPrice, dt.Duration
+                query = f"""
+                SELECT ds.ScheduleID, ds.DarshanTypeID, dt.DarshanName, ds.ScheduleDate, ds.StartTime, 
+                       ds.EndTime, {REMAINING_SLOTS_SQL} AS RemainingSlots, dt.StandardPrice, dt.Duration
                 FROM DarshanSchedules ds
                 JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
                 WHERE ds.TempleID = %s AND ds.ScheduleDate = %s AND ds.IsCancelled = FALSE 
-                      AND ds.RemainingSlots > 0
+                      AND {REMAINING_SLOTS_SQL} > 0
                 ORDER BY ds.StartTime
                 """
-                params = (temple_id, date)
-            else:
-                query = """
-                SELECT ds.ScheduleID, dt.DarshanName, ds.ScheduleDate, ds.StartTime, ds.EndTime, 
-                       ds.RemainingSlots, dt.StandardPrice, dt.Duration
-                FROM DarshanSchedules ds
-                JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
-                WHERE ds.TempleID = %s AND ds.ScheduleDate >= CURDATE() AND ds.IsCancelled = FALSE 
-                      AND ds.RemainingSlots > 0
-                ORDER BY ds.ScheduleDate, ds.StartTime
-                """
-                params = (temple_id,)
+                self.cursor.execute(query, (temple_id, date))
+                return self.cursor.fetchall()
             
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
+            query = f"""
+            SELECT ds.ScheduleID, ds.DarshanTypeID, dt.DarshanName, ds.ScheduleDate, ds.StartTime, 
+                   ds.EndTime, {REMAINING_SLOTS_SQL} AS RemainingSlots, dt.StandardPrice, dt.Duration
+            FROM DarshanSchedules ds
+            JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
+            WHERE ds.TempleID = %s AND ds.ScheduleDate >= CURDATE() AND ds.IsCancelled = FALSE 
+                  AND {REMAINING_SLOTS_SQL} > 0
+            ORDER BY ds.ScheduleDate, ds.StartTime
+            """
+            self.cursor.execute(query, (temple_id,))
+            schedules = self.cursor.fetchall()
+            
+            if not self.get_schedule_templates(temple_id):
+                return schedules
+            
+            # Every materialized slot in the horizon (full or cancelled ones included)
+            # hides its template slot
+            today = datetime.now().date()
+            self.cursor.execute("""
+            SELECT DarshanTypeID, ScheduleDate, StartTime FROM DarshanSchedules
+            WHERE TempleID = %s AND ScheduleDate BETWEEN %s AND %s
+            """, (temple_id, today, today + timedelta(days=TEMPLATE_HORIZON_DAYS - 1)))
+            materialized = {(row['DarshanTypeID'], row['ScheduleDate'], row['StartTime'])
+                            for row in self.cursor.fetchall()}
+            
+            schedules.extend(self._template_slots(temple_id, materialized, TEMPLATE_HORIZON_DAYS))
+            schedules.sort(key=lambda schedule: (schedule['ScheduleDate'], schedule['StartTime']))
+            return schedules
         except mysql.connector.Error as err:
             print(f"Error getting darshan schedules: {err}")
             return []
     
+    def get_slot_availability(self, temple_id: int, date: str) -> Dict[int, List[Dict]]:
+        """Get bookable schedules for a temple and date, grouped by DarshanTypeID, in one query"""
+        availability = {}
+        for schedule in self.get_darshan_schedules(temple_id, date):
+            availability.setdefault(schedule['DarshanTypeID'], []).append(schedule)
+        return availability
+    
+    @_with_connection
     def get_schedule_details(self, schedule_id: int) -> Optional[Dict]:
         """Get details for a specific schedule"""
         try:
-            query = """
-            SELECT ds.*, dt.DarshanName, dt.StandardPrice, dt.Duration
+            query = f"""
+            SELECT ds.ScheduleID, ds.TempleID, ds.DarshanTypeID, ds.FestivalID, ds.ScheduleDate,
+                   ds.StartTime, ds.EndTime, ds.CurrentCapacity, {REMAINING_SLOTS_SQL} AS RemainingSlots,
+                   ds.IsCancelled, ds.ShardCount, dt.DarshanName, dt.StandardPrice, dt.Duration
             FROM DarshanSchedules ds
             JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
             WHERE ds.ScheduleID = %s
@@ -535,69 +774,505 @@ class TempleDatabase:
             print(f"Error getting schedule details: {err}")
             return None
     
+    def _reserve_slots(self, schedule_id: int, num_people: int, shard_count: int = 0) -> bool:
+        """
+        Take num_people slots from a schedule in the current transaction.
+        Every decrement is guarded in SQL, so it either succeeds atomically or
+        leaves the counters untouched when capacity has run out.
+        """
+        if shard_count:
+            # Sharded schedule: try a couple of random shards so concurrent
+            # bookings land on different rows
+            for shard_no in random.sample(range(shard_count), min(SHARD_ATTEMPTS, shard_count)):
+                self.cursor.execute("""
+                UPDATE DarshanScheduleShards SET RemainingSlots = RemainingSlots - %s
+                WHERE ScheduleID = %s AND ShardNo = %s AND RemainingSlots >= %s
+                """, (num_people, schedule_id, shard_no, num_people))
+                if self.cursor.rowcount == 1:
+                    return True
+            return self._reserve_across_shards(schedule_id, num_people)
+        
+        self.cursor.execute("""
+        UPDATE DarshanSchedules SET RemainingSlots = RemainingSlots - %s
+        WHERE ScheduleID = %s AND RemainingSlots >= %s AND IsCancelled = FALSE
+        """, (num_people, schedule_id, num_people))
+        return self.cursor.rowcount == 1
+    
+    def _reserve_across_shards(self, schedule_id: int, num_people: int) -> bool:
+        """
+        Slow path for a nearly full sharded schedule: lock its shards and take
+        the slots from as many of them (and then the schedule row) as needed
+        """
+        self.cursor.execute("""
+        SELECT ShardNo, RemainingSlots FROM DarshanScheduleShards
+        WHERE ScheduleID = %s AND RemainingSlots > 0
+        ORDER BY ShardNo
+        FOR UPDATE
+        """, (schedule_id,))
+        shards = self.cursor.fetchall()
+        
+        needed = num_people
+        for shard in shards:
+            take = min(needed, shard['RemainingSlots'])
+            self.cursor.execute("""
+            UPDATE DarshanScheduleShards SET RemainingSlots = RemainingSlots - %s
+            WHERE ScheduleID = %s AND ShardNo = %s
+            """, (take, schedule_id, shard['ShardNo']))
+            needed -= take
+            if needed == 0:
+                return True
+        
+        # Whatever is left must come from the schedule row's own counter
+        self.cursor.execute("""
+        UPDATE DarshanSchedules SET RemainingSlots = RemainingSlots - %s
+        WHERE ScheduleID = %s AND RemainingSlots >= %s AND IsCancelled = FALSE
+        """, (needed, schedule_id, needed))
+        return self.cursor.rowcount == 1
+    
+    @_with_connection
+    def shard_schedule(self, schedule_id: int, shard_count: int = DEFAULT_SHARD_COUNT) -> bool:
+        """Move a schedule's remaining slots into shard_count sub-counters"""
+        try:
+            self.cursor.execute(
+                "SELECT RemainingSlots, ShardCount FROM DarshanSchedules WHERE ScheduleID = %s FOR UPDATE",
+                (schedule_id,)
+            )
+            schedule = self.cursor.fetchone()
+            
+            if not schedule:
+                self.conn.rollback()
+                return False
+            
+            if schedule['ShardCount']:
+                self.conn.rollback()
+                return True
+            
+            base, extra = divmod(schedule['RemainingSlots'], shard_count)
+            shards = [
+                (schedule_id, shard_no, base + (1 if shard_no < extra else 0))
+                for shard_no in range(shard_count)
+            ]
+            self.cursor.executemany("""
+            INSERT INTO DarshanScheduleShards (ScheduleID, ShardNo, RemainingSlots)
+            VALUES (%s, %s, %s)
+            """, shards)
+            
+            self.cursor.execute(
+                "UPDATE DarshanSchedules SET RemainingSlots = 0, ShardCount = %s WHERE ScheduleID = %s",
+                (shard_count, schedule_id)
+            )
+            
+            self.conn.commit()
+            return True
+        except mysql.connector.Error as err:
+            print(f"Error sharding schedule: {err}")
+            self.conn.rollback()
+            return False
+    
+    @_with_connection
+    def shard_large_schedules(self, min_capacity: int = SHARD_THRESHOLD,
+                              shard_count: int = DEFAULT_SHARD_COUNT) -> int:
+        """Shard every upcoming schedule whose capacity is at least min_capacity. Returns how many were sharded."""
+        try:
+            self.cursor.execute("""
+            SELECT ScheduleID FROM DarshanSchedules
+            WHERE ScheduleDate >= CURDATE() AND ShardCount = 0 AND CurrentCapacity >= %s
+            """, (min_capacity,))
+            schedule_ids = [row['ScheduleID'] for row in self.cursor.fetchall()]
+        except mysql.connector.Error as err:
+            print(f"Error finding schedules to shard: {err}")
+            return 0
+        
+        return sum(1 for schedule_id in schedule_ids if self.shard_schedule(schedule_id, shard_count))
+    
+    @_with_connection
     def book_darshan(self, schedule_id: int, visitor_id: int, num_people: int, 
-                    special_req: str = None) -> Tuple[Optional[int], Optional[str]]:
-        """Book a darshan slot"""
+                    special_req: str = None, hold_id: int = None) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Book a darshan slot, either directly or by converting an active hold from
+        hold_slots(). Returns (booking_id, QR payload) or (None, error message).
+        """
+        if num_people < 1:
+            return None, "Number of people must be at least 1"
+        
         try:
-            # Get schedule details
+            # Get schedule details (for the price; capacity is enforced by _reserve_slots)
             schedule = self.get_schedule_details(schedule_id)
             
             if not schedule:
                 return None, "Schedule not found"
             
-            if schedule['RemainingSlots'] < num_people:
+            if schedule['IsCancelled']:
+                return None, "This darshan schedule has been cancelled"
+            
+            if hold_id is None and schedule['RemainingSlots'] < num_people:
                 return None, "Not enough slots available"
             
             total_amount = schedule['StandardPrice'] * num_people
             
             payment_ref = f"PAY-{random.randint(10000000, 99999999)}"
             
-            # Create QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr_data = f"BOOK-{schedule_id}-{visitor_id}-{num_people}-{payment_ref}"
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            buffered = BytesIO()
-            img.save(buffered)
-            qr_img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+            # Reserve the slots (or claim the held ones); the booking insert below
+            # joins the same transaction
+            if hold_id is not None:
+                if not self._convert_hold(hold_id, schedule_id, visitor_id, num_people):
+                    self.conn.rollback()
+                    return None, "Your slot hold has expired. Please select the slot again."
+            elif not self._reserve_slots(schedule_id, num_people, schedule['ShardCount']):
+                self.conn.rollback()
+                return None, "Not enough slots available"
             
             # Insert booking
             query = """
             INSERT INTO DarshanBookings (ScheduleID, VisitorID, NumberOfPeople, TotalAmount,
-            PaymentStatus, PaymentReference, QRCode, SpecialRequirements)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            PaymentStatus, PaymentReference, SpecialRequirements)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
             """
             
             self.cursor.execute(query, (
                 schedule_id, visitor_id, num_people, total_amount, "Completed", 
-                payment_ref, qr_img_str, special_req
+                payment_ref, special_req
             ))
             
             booking_id = self.cursor.lastrowid
             
-            # Update remaining slots
+            # Only the signed QR payload is stored; render_qr_code() draws the image on demand
+            qr_data = sign_pass(booking_id, schedule_id, num_people, schedule['ScheduleDate'])
             self.cursor.execute(
-                "UPDATE DarshanSchedules SET RemainingSlots = RemainingSlots - %s WHERE ScheduleID = %s",
-                (num_people, schedule_id)
+                "UPDATE DarshanBookings SET QRCode = %s WHERE BookingID = %s",
+                (qr_data, booking_id)
             )
             
+            if hold_id is not None:
+                self.cursor.execute(
+                    "UPDATE SlotHolds SET BookingID = %s WHERE HoldID = %s",
+                    (booking_id, hold_id)
+                )
+            
             # Update visitor's last visit
-            self.update_visitor_last_visit(visitor_id)
+            self.update_visitor_last_visit(visitor_id, commit=False)
+            
+            self.cursor.execute(VISITOR_ACTIVITY_SQL, visitor_activity(visitor_id, 'booking', 1, total_amount))
+            
+            # Dashboard totals, last so the rollup row is locked as briefly as possible
+            for row in booking_increments([(schedule['TempleID'], schedule['ScheduleDate'],
+                                            schedule['DarshanTypeID'], num_people, total_amount)]):
+                self.cursor.execute(BOOKING_ROLLUP_SQL, row)
             
             self.conn.commit()
-            return booking_id, qr_img_str
+            return booking_id, qr_data
         except mysql.connector.Error as err:
             print(f"Error booking darshan: {err}")
             self.conn.rollback()
             return None, str(err)
     
+    @_with_connection
+    def book_darshan_batch(self, requests: List[Dict]) -> List[Tuple[Optional[int], Optional[str]]]:
+        """
+        Book many darshan slots in one transaction (trust, school and group uploads).
+        Each request is a dict with schedule_id, visitor_id, num_people and optionally
+        special_req. Returns one (booking_id, QR payload) or (None, error message)
+        per request, in order; rows that can't be booked don't stop the others.
+        """
+        results: List[Tuple[Optional[int], Optional[str]]] = [(None, None)] * len(requests)
+        
+        pending = []
+        for i, request in enumerate(requests):
+            error = batch_request_error(request)
+            if error:
+                results[i] = (None, error)
+            else:
+                pending.append(i)
+        
+        if not pending:
+            return results
+        
+        try:
+            # Capacity and price for every affected schedule in one query
+            schedule_ids = sorted({requests[i]['schedule_id'] for i in pending})
+            placeholders = ", ".join(["%s"] * len(schedule_ids))
+            self.cursor.execute(f"""
+            SELECT ds.ScheduleID, ds.TempleID, ds.DarshanTypeID, ds.ScheduleDate, ds.IsCancelled,
+                   ds.ShardCount, {REMAINING_SLOTS_SQL} AS RemainingSlots, dt.StandardPrice
+            FROM DarshanSchedules ds
+            JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
+            WHERE ds.ScheduleID IN ({placeholders})
+            """, schedule_ids)
+            schedules = {row['ScheduleID']: row for row in self.cursor.fetchall()}
+            
+            visitor_ids = sorted({requests[i]['visitor_id'] for i in pending})
+            placeholders = ", ".join(["%s"] * len(visitor_ids))
+            self.cursor.execute(f"SELECT VisitorID FROM Visitors WHERE VisitorID IN ({placeholders})", visitor_ids)
+            known_visitors = {row['VisitorID'] for row in self.cursor.fetchall()}
+            
+            by_schedule: Dict[int, List[int]] = {}
+            for i in pending:
+                request = requests[i]
+                schedule = schedules.get(request['schedule_id'])
+                if not schedule:
+                    results[i] = (None, "Schedule not found")
+                elif schedule['IsCancelled']:
+                    results[i] = (None, "This darshan schedule has been cancelled")
+                elif request['visitor_id'] not in known_visitors:
+                    results[i] = (None, "Visitor not found")
+                else:
+                    by_schedule.setdefault(request['schedule_id'], []).append(i)
+            
+            # One aggregated decrement per schedule, in a fixed order. A savepoint
+            # undoes a failed attempt so the schedule can be re-planned against
+            # its current capacity without losing the rest of the batch.
+            admitted = []
+            for schedule_id in sorted(by_schedule):
+                schedule = schedules[schedule_id]
+                remaining = schedule['RemainingSlots']
+                
+                for attempt in range(2):
+                    accepted, total = [], 0
+                    for i in by_schedule[schedule_id]:
+                        if total + requests[i]['num_people'] <= remaining:
+                            accepted.append(i)
+                            total += requests[i]['num_people']
+                    
+                    if not accepted:
+                        break
+                    
+                    self.cursor.execute("SAVEPOINT batch_schedule")
+                    if self._reserve_slots(schedule_id, total, schedule['ShardCount']):
+                        break
+                    self.cursor.execute("ROLLBACK TO SAVEPOINT batch_schedule")
+                    accepted = []
+                    
+                    # Someone else booked in the meantime; re-read and try once more
+                    self.cursor.execute(f"""
+                    SELECT {REMAINING_SLOTS_SQL} AS RemainingSlots
+                    FROM DarshanSchedules ds WHERE ds.ScheduleID = %s
+                    """, (schedule_id,))
+                    remaining = self.cursor.fetchone()['RemainingSlots']
+                
+                accepted = set(accepted)
+                for i in by_schedule[schedule_id]:
+                    if i in accepted:
+                        admitted.append(i)
+                    else:
+                        results[i] = (None, "Not enough slots available")
+            
+            if not admitted:
+                self.conn.rollback()
+                return results
+            
+            # Unique payment references also identify the inserted rows afterwards
+            payment_refs = set()
+            while len(payment_refs) < len(admitted):
+                payment_refs.add(f"PAY-{random.randint(10000000, 99999999)}")
+            payment_refs = dict(zip(admitted, payment_refs))
+            
+            self.cursor.executemany("""
+            INSERT INTO DarshanBookings (ScheduleID, VisitorID, NumberOfPeople, TotalAmount,
+            PaymentStatus, PaymentReference, SpecialRequirements)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, [
+                (requests[i]['schedule_id'], requests[i]['visitor_id'], requests[i]['num_people'],
+                 schedules[requests[i]['schedule_id']]['StandardPrice'] * requests[i]['num_people'],
+                 "Completed", payment_refs[i], requests[i].get('special_req'))
+                for i in admitted
+            ])
+            first_id = self.cursor.lastrowid
+            
+            placeholders = ", ".join(["%s"] * len(admitted))
+            self.cursor.execute(f"""
+            SELECT BookingID, PaymentReference FROM DarshanBookings
+            WHERE BookingID >= %s AND PaymentReference IN ({placeholders})
+            """, [first_id] + [payment_refs[i] for i in admitted])
+            booking_ids = {row['PaymentReference']: row['BookingID'] for row in self.cursor.fetchall()}
+            
+            qr_updates = []
+            for i in admitted:
+                request = requests[i]
+                booking_id = booking_ids[payment_refs[i]]
+                qr_data = sign_pass(booking_id, request['schedule_id'], request['num_people'],
+                                    schedules[request['schedule_id']]['ScheduleDate'])
+                qr_updates.append((qr_data, booking_id))
+                results[i] = (booking_id, qr_data)
+            
+            self.cursor.executemany(
+                "UPDATE DarshanBookings SET QRCode = %s WHERE BookingID = %s", qr_updates
+            )
+            
+            visitor_ids = sorted({requests[i]['visitor_id'] for i in admitted})
+            placeholders = ", ".join(["%s"] * len(visitor_ids))
+            self.cursor.execute(
+                f"UPDATE Visitors SET LastVisit = CURDATE() WHERE VisitorID IN ({placeholders})", visitor_ids
+            )
+            
+            # Activity totals per visitor, in VisitorID order
+            per_visitor: Dict[int, List] = {}
+            for i in admitted:
+                totals = per_visitor.setdefault(requests[i]['visitor_id'], [0, 0])
+                totals[0] += 1
+                totals[1] += schedules[requests[i]['schedule_id']]['StandardPrice'] * requests[i]['num_people']
+            for visitor_id in sorted(per_visitor):
+                self.cursor.execute(VISITOR_ACTIVITY_SQL, visitor_activity(visitor_id, 'booking', *per_visitor[visitor_id]))
+            
+            # Dashboard totals, one rollup row per day and darshan type
+            bookings = []
+            for i in admitted:
+                schedule = schedules[requests[i]['schedule_id']]
+                bookings.append((schedule['TempleID'], schedule['ScheduleDate'], schedule['DarshanTypeID'],
+                                 requests[i]['num_people'], schedule['StandardPrice'] * requests[i]['num_people']))
+            for row in booking_increments(bookings):
+                self.cursor.execute(BOOKING_ROLLUP_SQL, row)
+            
+            self.conn.commit()
+            return results
+        except mysql.connector.Error as err:
+            print(f"Error booking darshan batch: {err}")
+            self.conn.rollback()
+            # The whole transaction was undone; keep only the per-row validation errors
+            return [result if result[0] is None and result[1] else (None, str(err))
+                    for result in results]
+    
+    # Slot hold methods
+    def _release_slots(self, schedule_id: int, num_people: int) -> None:
+        """Give slots back to a schedule in the current transaction (into a random shard if sharded)"""
+        self.cursor.execute("SELECT ShardCount FROM DarshanSchedules WHERE ScheduleID = %s", (schedule_id,))
+        schedule = self.cursor.fetchone()
+        
+        if schedule and schedule['ShardCount']:
+            self.cursor.execute("""
+            UPDATE DarshanScheduleShards SET RemainingSlots = RemainingSlots + %s
+            WHERE ScheduleID = %s AND ShardNo = %s
+            """, (num_people, schedule_id, random.randrange(schedule['ShardCount'])))
+        else:
+            self.cursor.execute(
+                "UPDATE DarshanSchedules SET RemainingSlots = RemainingSlots + %s WHERE ScheduleID = %s",
+                (num_people, schedule_id)
+            )
+    
+    def _convert_hold(self, hold_id: int, schedule_id: int, visitor_id: int, num_people: int) -> bool:
+        """Mark the visitor's unexpired hold as converted in the current transaction"""
+        self.cursor.execute("""
+        UPDATE SlotHolds SET HoldStatus = 'Converted'
+        WHERE HoldID = %s AND ScheduleID = %s AND VisitorID = %s AND NumberOfPeople = %s
+              AND HoldStatus = 'Active' AND ExpiresAt > %s
+        """, (hold_id, schedule_id, visitor_id, num_people, datetime.now()))
+        return self.cursor.rowcount == 1
+    
+    @_with_connection
+    def hold_slots(self, schedule_id: int, num_people: int, visitor_id: int = None,
+                   ttl_seconds: int = HOLD_TTL_SECONDS) -> Tuple[Optional[int], Optional[str]]:
+        """Take slots out of availability for ttl_seconds while payment is in progress"""
+        if num_people < 1:
+            return None, "Number of people must be at least 1"
+        
+        try:
+            schedule = self.get_schedule_details(schedule_id)
+            
+            if not schedule:
+                return None, "Schedule not found"
+            
+            if schedule['IsCancelled']:
+                return None, "This darshan schedule has been cancelled"
+            
+            if schedule['RemainingSlots'] < num_people:
+                return None, "Not enough slots available"
+            
+            if not self._reserve_slots(schedule_id, num_people, schedule['ShardCount']):
+                self.conn.rollback()
+                return None, "Not enough slots available"
+            
+            expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
+            self.cursor.execute("""
+            INSERT INTO SlotHolds (ScheduleID, VisitorID, NumberOfPeople, ExpiresAt)
+            VALUES (%s, %s, %s, %s)
+            """, (schedule_id, visitor_id, num_people, expires_at))
+            
+            hold_id = self.cursor.lastrowid
+            
+            self.conn.commit()
+            return hold_id, None
+        except mysql.connector.Error as err:
+            print(f"Error holding slots: {err}")
+            self.conn.rollback()
+            return None, str(err)
+    
+    @_with_connection
+    def release_hold(self, hold_id: int, visitor_id: int = None) -> bool:
+        """Give up an active hold (only if it is visitor_id's, when given) and return its slots"""
+        try:
+            self.cursor.execute(
+                "SELECT ScheduleID, VisitorID, NumberOfPeople FROM SlotHolds WHERE HoldID = %s AND HoldStatus = 'Active' FOR UPDATE",
+                (hold_id,)
+            )
+            hold = self.cursor.fetchone()
+            
+            if not hold or visitor_id is not None and hold['VisitorID'] != visitor_id:
+                self.conn.rollback()
+                return False
+            
+            self.cursor.execute("UPDATE SlotHolds SET HoldStatus = 'Released' WHERE HoldID = %s", (hold_id,))
+            self._release_slots(hold['ScheduleID'], hold['NumberOfPeople'])
+            
+            self.conn.commit()
+            return True
+        except mysql.connector.Error as err:
+            print(f"Error releasing hold: {err}")
+            self.conn.rollback()
+            return False
+    
+    @_with_connection
+    def release_expired_holds(self, batch_size: int = 500) -> int:
+        """Expire lapsed holds in batches and return their slots. Returns the number of holds released."""
+        released = 0
+        
+        try:
+            while True:
+                # Find candidates without locking the index range, then lock just those rows
+                self.cursor.execute("""
+                SELECT HoldID FROM SlotHolds
+                WHERE HoldStatus = 'Active' AND ExpiresAt <= %s
+                ORDER BY ExpiresAt
+                LIMIT %s
+                """, (datetime.now(), batch_size))
+                candidates = [row['HoldID'] for row in self.cursor.fetchall()]
+                
+                if not candidates:
+                    break
+                
+                placeholders = ", ".join(["%s"] * len(candidates))
+                self.cursor.execute(f"""
+                SELECT HoldID, ScheduleID, NumberOfPeople FROM SlotHolds
+                WHERE HoldID IN ({placeholders}) AND HoldStatus = 'Active'
+                FOR UPDATE SKIP LOCKED
+                """, candidates)
+                holds = self.cursor.fetchall()
+                
+                if holds:
+                    hold_ids = [hold['HoldID'] for hold in holds]
+                    placeholders = ", ".join(["%s"] * len(hold_ids))
+                    self.cursor.execute(
+                        f"UPDATE SlotHolds SET HoldStatus = 'Expired' WHERE HoldID IN ({placeholders})",
+                        hold_ids
+                    )
+                    
+                    # One counter update per schedule, in a fixed order
+                    per_schedule = {}
+                    for hold in holds:
+                        per_schedule[hold['ScheduleID']] = per_schedule.get(hold['ScheduleID'], 0) + hold['NumberOfPeople']
+                    for schedule_id in sorted(per_schedule):
+                        self._release_slots(schedule_id, per_schedule[schedule_id])
+                
+                self.conn.commit()
+                released += len(holds)
+                
+                if len(candidates) < batch_size:
+                    break
+        except mysql.connector.Error as err:
+            print(f"Error releasing expired holds: {err}")
+            self.conn.rollback()
+        
+        return released
+    
+    @_with_connection
     def get_booking_details(self, booking_id: int) -> Optional[Dict]:
         """Get details for a specific booking"""
         try:
@@ -619,6 +1294,7 @@ class TempleDatabase:
             print(f"Error getting booking details: {err}")
             return None
     
+    @_with_connection
     def get_visitor_bookings(self, visitor_id: int) -> List[Dict]:
         """Get all bookings for a visitor"""
         try:
@@ -640,7 +1316,13 @@ class TempleDatabase:
     
     # Donation-related methods
     def get_donation_types(self, temple_id: int) -> List[Dict]:
-        """Get donation types for a temple"""
+        """Get donation types for a temple (served from the catalogue cache)"""
+        return self.catalogue.get_or_load(
+            ('donation_types', temple_id), lambda: self._load_donation_types(temple_id)
+        ) or []
+    
+    @_with_connection
+    def _load_donation_types(self, temple_id: int) -> Optional[List[Dict]]:
         try:
             query = """
             SELECT DonationTypeID, TypeName, Description, MinimumAmount
@@ -652,8 +1334,9 @@ class TempleDatabase:
             return self.cursor.fetchall()
         except mysql.connector.Error as err:
             print(f"Error getting donation types: {err}")
-            return []
+            return None
     
+    @_with_connection
     def make_donation(self, temple_id: int, donation_type_id: int, visitor_id: int = None, 
                      amount: float = 0, payment_mode: str = "", transaction_ref: str = None,
                      is_anonymous: bool = False, donor_name: str = None, donor_phone: str = None, 
@@ -683,7 +1366,10 @@ class TempleDatabase:
             
             # Update visitor's last visit if applicable
             if visitor_id:
-                self.update_visitor_last_visit(visitor_id)
+                self.update_visitor_last_visit(visitor_id, commit=False)
+                self.cursor.execute(VISITOR_ACTIVITY_SQL, visitor_activity(visitor_id, 'donation', 1, amount))
+            
+            self.cursor.execute(DONATION_ROLLUP_SQL, donation_increment(donation_id))
             
             self.conn.commit()
             return donation_id, receipt_number
@@ -692,6 +1378,7 @@ class TempleDatabase:
             self.conn.rollback()
             return None, str(err)
     
+    @_with_connection
     def get_visitor_donations(self, visitor_id: int) -> List[Dict]:
         """Get all donations for a visitor"""
         try:
@@ -712,7 +1399,13 @@ class TempleDatabase:
     
     # Virtual Puja methods
     def get_puja_types(self, temple_id: int) -> List[Dict]:
-        """Get available puja types for a temple"""
+        """Get available puja types for a temple (served from the catalogue cache)"""
+        return self.catalogue.get_or_load(
+            ('puja_types', temple_id), lambda: self._load_puja_types(temple_id)
+        ) or []
+    
+    @_with_connection
+    def _load_puja_types(self, temple_id: int) -> Optional[List[Dict]]:
         try:
             query = """
             SELECT * FROM PujaTypes 
@@ -722,8 +1415,9 @@ class TempleDatabase:
             return self.cursor.fetchall()
         except mysql.connector.Error as err:
             print(f"Error getting puja types: {err}")
-            return []
+            return None
     
+    @_with_connection
     def book_virtual_puja(self, temple_id: int, visitor_id: int, puja_type_id: int, 
                          puja_date: str, puja_time: str, total_amount: float,
                          devotee_message: str = None) -> Tuple[Optional[int], Optional[str]]:
@@ -746,7 +1440,8 @@ class TempleDatabase:
             puja_id = self.cursor.lastrowid
             
             # Update visitor's last visit
-            self.update_visitor_last_visit(visitor_id)
+            self.update_visitor_last_visit(visitor_id, commit=False)
+            self.cursor.execute(VISITOR_ACTIVITY_SQL, visitor_activity(visitor_id, 'puja', 1, total_amount))
             
             self.conn.commit()
             return puja_id, receipt_number
@@ -755,6 +1450,7 @@ class TempleDatabase:
             self.conn.rollback()
             return None, str(err)
     
+    @_with_connection
     def get_visitor_pujas(self, visitor_id: int) -> List[Dict]:
         """Get all virtual pujas for a visitor"""
         try:
@@ -773,7 +1469,13 @@ class TempleDatabase:
     
     # Prasadam Order methods
     def get_prasadam_types(self, temple_id: int) -> List[Dict]:
-        """Get available prasadam types for a temple"""
+        """Get available prasadam types for a temple (served from the catalogue cache)"""
+        return self.catalogue.get_or_load(
+            ('prasadam_types', temple_id), lambda: self._load_prasadam_types(temple_id)
+        ) or []
+    
+    @_with_connection
+    def _load_prasadam_types(self, temple_id: int) -> Optional[List[Dict]]:
         try:
             query = """
             SELECT * FROM PrasadamTypes
@@ -783,8 +1485,9 @@ class TempleDatabase:
             return self.cursor.fetchall()
         except mysql.connector.Error as err:
             print(f"Error getting prasadam types: {err}")
-            return []
+            return None
     
+    @_with_connection
     def order_prasadam(self, visitor_id: int, temple_id: int, prasadam_type_id: int,
                       quantity: int, total_amount: float, shipping_address: str) -> Tuple[Optional[int], Optional[str]]:
         """Place an order for prasadam"""
@@ -810,6 +1513,8 @@ class TempleDatabase:
                 (tracking_number, order_id)
             )
             
+            self.cursor.execute(VISITOR_ACTIVITY_SQL, visitor_activity(visitor_id, 'prasadam', 1, total_amount))
+            
             self.conn.commit()
             return order_id, tracking_number
         except mysql.connector.Error as err:
@@ -817,6 +1522,7 @@ class TempleDatabase:
             self.conn.rollback()
             return None, str(err)
     
+    @_with_connection
     def get_visitor_prasadam_orders(self, visitor_id: int) -> List[Dict]:
         """Get all prasadam orders for a visitor"""
         try:
@@ -835,84 +1541,34 @@ class TempleDatabase:
     
     # Festival methods
     def get_upcoming_festivals(self, temple_id: int) -> List[Dict]:
-        """Get upcoming festivals for a temple"""
+        """Get upcoming festivals for a temple (cached until the day rolls over)"""
+        today = date.today()
+        next_midnight = datetime.combine(today + timedelta(days=1), time.min).timestamp()
+        return self.festival_calendar.get_or_load(
+            (temple_id, today),
+            lambda: self._load_upcoming_festivals(temple_id, today),
+            expires_at=next_midnight
+        ) or []
+    
+    @_with_connection
+    def _load_upcoming_festivals(self, temple_id: int, today: date) -> Optional[List[Dict]]:
         try:
             query = """
             SELECT * FROM Festivals
-            WHERE TempleID = %s AND EndDate >= CURDATE()
+            WHERE TempleID = %s AND EndDate >= %s
             ORDER BY StartDate
             """
-            self.cursor.execute(query, (temple_id,))
+            self.cursor.execute(query, (temple_id, today))
             return self.cursor.fetchall()
         except mysql.connector.Error as err:
             print(f"Error getting upcoming festivals: {err}")
-            return []
+            return None
     
     # Admin dashboard methods
     def get_dashboard_data(self, temple_id: int) -> Dict[str, Any]:
-        """Get data for admin dashboard"""
+        """Get data for admin dashboard (its queries run concurrently, see dashboard.py)"""
         try:
-            result = {}
-            
-            # Today's bookings
-            today = datetime.now().strftime('%Y-%m-%d')
-            bookings_query = """
-            SELECT COUNT(*) as today_bookings, SUM(b.NumberOfPeople) as today_visitors,
-                   SUM(b.TotalAmount) as today_booking_amount
-            FROM DarshanBookings b
-            JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
-            WHERE ds.TempleID = %s AND ds.ScheduleDate = %s
-            """
-            self.cursor.execute(bookings_query, (temple_id, today))
-            result['bookings'] = self.cursor.fetchone()
-            
-            # Today's donations
-            donations_query = """
-            SELECT COUNT(*) as today_donations, SUM(Amount) as today_amount
-            FROM Donations
-            WHERE TempleID = %s AND DATE(DonationDate) = %s
-            """
-            self.cursor.execute(donations_query, (temple_id, today))
-            result['donations'] = self.cursor.fetchone()
-            
-            # Recent visitors
-            visitors_query = """
-            SELECT v.VisitorID, v.FirstName, v.LastName, v.MobileNumber, v.LastVisit
-            FROM Visitors v
-            JOIN DarshanBookings b ON v.VisitorID = b.VisitorID
-            JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
-            WHERE ds.TempleID = %s
-            GROUP BY v.VisitorID
-            ORDER BY v.LastVisit DESC
-            LIMIT 10
-            """
-            self.cursor.execute(visitors_query, (temple_id,))
-            result['recent_visitors'] = self.cursor.fetchall()
-            
-            # Darshan bookings by type
-            darshan_query = """
-            SELECT dt.DarshanName, COUNT(b.BookingID) as booking_count
-            FROM DarshanBookings b
-            JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
-            JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
-            WHERE ds.TempleID = %s
-            GROUP BY dt.DarshanName
-            """
-            self.cursor.execute(darshan_query, (temple_id,))
-            result['darshan_stats'] = self.cursor.fetchall()
-            
-            # Donation statistics
-            donation_query = """
-            SELECT dt.TypeName, COUNT(d.DonationID) as donation_count, SUM(d.Amount) as total_amount
-            FROM Donations d
-            JOIN DonationTypes dt ON d.DonationTypeID = dt.DonationTypeID
-            WHERE d.TempleID = %s
-            GROUP BY dt.TypeName
-            """
-            self.cursor.execute(donation_query, (temple_id,))
-            result['donation_stats'] = self.cursor.fetchall()
-            
-            return result
+            return run_parallel(self.pool, dashboard_queries(temple_id))
         except mysql.connector.Error as err:
             print(f"Error getting dashboard data: {err}")
             return {}
@@ -924,8 +1580,8 @@ def format_currency(amount: float) -> str:
         return "Free"
     return f"₹{amount:,.2f}"
 
-def generate_qr_code_image(data: str) -> str:
-    """Generate a QR code image and return base64 encoded string"""
+def make_qr_image(data: str) -> Any:
+    """Draw a QR code as a 1-bit PIL image"""
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -935,7 +1591,22 @@ def generate_qr_code_image(data: str) -> str:
     qr.add_data(data)
     qr.make(fit=True)
     
-    img = qr.make_image(fill_color="black", back_color="white")
+    return qr.make_image(fill_color="black", back_color="white").get_image()
+
+def render_qr_png(data: str) -> bytes:
+    """Generate a QR code image and return the PNG bytes"""
     buffered = BytesIO()
-    img.save(buffered)
-    return base64.b64encode(buffered.getvalue()).decode("utf-8")
\ No newline at end of file
+    make_qr_image(data).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+def generate_qr_code_image(data: str) -> str:
+    """Generate a QR code image and return base64 encoded string"""
+    return base64.b64encode(render_qr_png(data)).decode("utf-8")
+
+@functools.lru_cache(maxsize=QR_RENDER_CACHE_SIZE)
+def render_qr_code(payload: str) -> str:
+    """Render a booking's stored QR payload as a base64 PNG, caching recent renders"""
+    # Rows written before payloads were stored compactly already hold the image
+    if payload.startswith(PNG_BASE64_PREFIX):
+        return payload
+    return generate_qr_code_image(payload)
\ No newline at end of file
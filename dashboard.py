@@ -0,0 +1,142 @@
+#dashboard.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+# Dashboard queries in flight at once across all sessions; each holds a pooled connection
+DASHBOARD_WORKERS = int(os.environ.get('TEMPLE_DASHBOARD_WORKERS', 6))
+
+# ...but never more than 1/DASHBOARD_POOL_SHARE of the pool, so admin pages can't
+# take the connections the booking pages need
+DASHBOARD_POOL_SHARE = 5
+
+# (sql, params, fetch one row instead of all)
+Query = Tuple[str, Tuple, bool]
+
+def dashboard_queries(temple_id: int, today: str = None) -> Dict[str, Query]:
+    """The independent queries behind get_dashboard_data, keyed by result name"""
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    return {
+        # Today's bookings and donations, from the daily rollups
+        'bookings': ("""
+            SELECT CAST(COALESCE(SUM(BookingCount), 0) AS SIGNED) as today_bookings,
+                   SUM(VisitorCount) as today_visitors, SUM(TotalAmount) as today_booking_amount
+            FROM DailyBookingRollups
+            WHERE TempleID = %s AND RollupDate = %s
+            """, (temple_id, today), True),
+        'donations': ("""
+            SELECT CAST(COALESCE(SUM(DonationCount), 0) AS SIGNED) as today_donations, SUM(TotalAmount) as today_amount
+            FROM DailyDonationRollups
+            WHERE TempleID = %s AND RollupDate = %s
+            """, (temple_id, today), True),
+        'recent_visitors': ("""
+            SELECT v.VisitorID, v.FirstName, v.LastName, v.MobileNumber, v.LastVisit
+            FROM Visitors v
+            JOIN DarshanBookings b ON v.VisitorID = b.VisitorID
+            JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
+            WHERE ds.TempleID = %s
+            GROUP BY v.VisitorID
+            ORDER BY v.LastVisit DESC
+            LIMIT 10
+            """, (temple_id,), False),
+        # Darshan bookings by type
+        'darshan_stats': ("""
+            SELECT dt.DarshanName, CAST(SUM(r.BookingCount) AS SIGNED) as booking_count
+            FROM DailyBookingRollups r
+            JOIN DarshanTypes dt ON r.DarshanTypeID = dt.DarshanTypeID
+            WHERE r.TempleID = %s
+            GROUP BY dt.DarshanName
+            HAVING SUM(r.BookingCount) > 0
+            """, (temple_id,), False),
+        # Donation statistics
+        'donation_stats': ("""
+            SELECT dt.TypeName, CAST(SUM(r.DonationCount) AS SIGNED) as donation_count,
+                   SUM(r.TotalAmount) as total_amount
+            FROM DailyDonationRollups r
+            JOIN DonationTypes dt ON r.DonationTypeID = dt.DonationTypeID
+            WHERE r.TempleID = %s
+            GROUP BY dt.TypeName
+            HAVING SUM(r.DonationCount) > 0
+            """, (temple_id,), False),
+    }
+
+def overview_queries(temple_id: int) -> Dict[str, Query]:
+    """The queries of the admin Overview tab, keyed by result name"""
+    return {
+        'visitor_count': ("SELECT COUNT(*) as count FROM Visitors", (), True),
+        # Totals come from the daily rollups (see rollups.py)
+        'booking_count': ("""
+            SELECT CAST(COALESCE(SUM(BookingCount), 0) AS SIGNED) as count FROM DailyBookingRollups
+            WHERE TempleID = %s
+            """, (temple_id,), True),
+        'donation_total': ("""
+            SELECT SUM(TotalAmount) as total FROM DailyDonationRollups
+            WHERE TempleID = %s
+            """, (temple_id,), True),
+        'today_visitors': ("""
+            SELECT SUM(VisitorCount) as today_visitors
+            FROM DailyBookingRollups
+            WHERE TempleID = %s AND RollupDate = CURDATE()
+            """, (temple_id,), True),
+        'recent_visitors': ("""
+            SELECT v.VisitorID, v.FirstName, v.LastName, v.MobileNumber, v.EmailAddress,
+                   v.City, v.State, v.LastVisit,
+                   COALESCE(vs.BookingCount, 0) as BookingCount, vs.DonationAmount as TotalDonations
+            FROM Visitors v
+            LEFT JOIN VisitorStats vs ON vs.VisitorID = v.VisitorID
+            ORDER BY v.LastVisit DESC
+            LIMIT 10
+            """, (), False),
+        'booking_trends': ("""
+            SELECT RollupDate as ScheduleDate, CAST(SUM(BookingCount) AS SIGNED) as BookingCount,
+                   SUM(VisitorCount) as VisitorCount
+            FROM DailyBookingRollups
+            WHERE TempleID = %s AND RollupDate >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+            GROUP BY RollupDate
+            HAVING SUM(BookingCount) > 0
+            ORDER BY RollupDate
+            """, (temple_id,), False),
+    }
+
+def dashboard_workers(pool_size: int) -> int:
+    """How many dashboard queries may run at once on a pool of pool_size connections"""
+    return max(1, min(DASHBOARD_WORKERS, pool_size // DASHBOARD_POOL_SHARE))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor(pool) -> ThreadPoolExecutor:
+    """Worker threads shared by every dashboard in the process, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=dashboard_workers(pool.pool_size),
+                                           thread_name_prefix='dashboard')
+        return _executor
+
+def _fetch(pool, sql: str, params: Tuple, one: bool) -> Any:
+    """Run one query on a connection borrowed for just that query"""
+    conn = pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchone() if one else cursor.fetchall()
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+def run_parallel(pool, queries: Dict[str, Query]) -> Dict[str, Any]:
+    """
+    Run independent read queries at once, each on its own connection from pool,
+    and return their results by name. The queries don't share a snapshot, so
+    rows written meanwhile may show up in some results and not others.
+    Raises the error of the first failed query.
+    """
+    executor = _get_executor(pool)
+    futures = {name: executor.submit(_fetch, pool, *query) for name, query in queries.items()}
+    return {name: future.result() for name, future in futures.items()}
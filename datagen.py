@@ -0,0 +1,434 @@
+#datagen.py
+#
+# Synthetic production-scale data for the temple schema. Fills Visitors,
+# DarshanBookings, Donations, VirtualPujas and PrasadamOrders with realistic
+# distributions (repeat devotees, weekend and festival spikes, long-tailed
+# donation amounts) so dashboard and booking queries can be measured at size.
+#
+# Output is reproducible for a given --seed: every chunk of rows draws from its
+# own generator seeded by (seed, table, chunk), independent of worker count.
+#
+#   python datagen.py --scale small
+#   python datagen.py --scale production --workers 8 --method load-data
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from db_pool import get_pool
+from entry_pass import sign_pass
+from rollups import rebuild_rollups
+from visitor_stats import rebuild_visitor_stats
+
+SCALES = {
+    'tiny': {'visitors': 1_000, 'bookings': 10_000, 'donations': 2_000, 'pujas': 500, 'prasadam': 500},
+    'small': {'visitors': 10_000, 'bookings': 100_000, 'donations': 20_000, 'pujas': 5_000, 'prasadam': 5_000},
+    'medium': {'visitors': 500_000, 'bookings': 5_000_000, 'donations': 1_000_000, 'pujas': 200_000, 'prasadam': 200_000},
+    'production': {'visitors': 5_000_000, 'bookings': 50_000_000, 'donations': 10_000_000,
+                   'pujas': 1_000_000, 'prasadam': 1_000_000},
+}
+
+# Rows generated per worker task, and rows per INSERT statement
+CHUNK_ROWS = 100_000
+INSERT_BATCH = 5_000
+# Bound parameters per INSERT, kept under SQLite's limit of 32766
+MAX_PARAMS = 30_000
+
+# Extra demand on festival days and weekends, relative to an ordinary weekday
+FESTIVAL_WEIGHT = 5.0
+WEEKEND_WEIGHT = 1.6
+
+TABLES = {
+    'visitors': ('Visitors', 'VisitorID', ['VisitorID', 'FirstName', 'LastName', 'MobileNumber', 'EmailAddress',
+                                           'RegistrationDate', 'City', 'State', 'PINCode', 'LastVisit']),
+    'bookings': ('DarshanBookings', 'BookingID', ['BookingID', 'ScheduleID', 'VisitorID', 'BookingDateTime',
+                                                  'NumberOfPeople', 'TotalAmount', 'PaymentStatus',
+                                                  'PaymentReference', 'QRCode', 'BookingStatus', 'CheckedInAt']),
+    'donations': ('Donations', 'DonationID', ['DonationID', 'TempleID', 'DonationTypeID', 'VisitorID', 'DonationDate',
+                                              'Amount', 'PaymentMode', 'TransactionReference', 'ReceiptNumber',
+                                              'IsAnonymous']),
+    'pujas': ('VirtualPujas', 'PujaID', ['PujaID', 'TempleID', 'VisitorID', 'PujaTypeID', 'PujaDate', 'PujaTime',
+                                         'TotalAmount', 'PujaStatus', 'ReceiptNumber', 'DevoteeMessage']),
+    'prasadam': ('PrasadamOrders', 'OrderID', ['OrderID', 'VisitorID', 'TempleID', 'PrasadamTypeID', 'OrderDate',
+                                               'Quantity', 'TotalAmount', 'ShippingAddress', 'TrackingNumber',
+                                               'OrderStatus', 'EstimatedDelivery']),
+}
+TABLE_SEEDS = {name: i for i, name in enumerate(TABLES)}
+
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan', 'Rohan',
+               'Ananya', 'Diya', 'Aadhya', 'Saanvi', 'Pari', 'Anika', 'Navya', 'Riya', 'Meera', 'Kavya',
+               'Rahul', 'Amit', 'Suresh', 'Ganesh', 'Mahesh', 'Priya', 'Sunita', 'Lakshmi', 'Pooja', 'Neha']
+LAST_NAMES = ['Sharma', 'Patil', 'Deshmukh', 'Joshi', 'Kulkarni', 'Shah', 'Mehta', 'Iyer', 'Nair', 'Reddy',
+              'Gupta', 'Singh', 'Kumar', 'Pawar', 'Jadhav', 'Shinde', 'More', 'Gaikwad', 'Chavan', 'Rao']
+# (city, state, PIN prefix, share of devotees)
+CITIES = [('Mumbai', 'Maharashtra', '400', 0.45), ('Thane', 'Maharashtra', '400', 0.12),
+          ('Pune', 'Maharashtra', '411', 0.12), ('Nashik', 'Maharashtra', '422', 0.05),
+          ('Ahmedabad', 'Gujarat', '380', 0.06), ('Bengaluru', 'Karnataka', '560', 0.06),
+          ('Delhi', 'Delhi', '110', 0.05), ('Hyderabad', 'Telangana', '500', 0.04),
+          ('Chennai', 'Tamil Nadu', '600', 0.03), ('Kolkata', 'West Bengal', '700', 0.02)]
+PAYMENT_MODES = ['UPI', 'Credit Card', 'Debit Card', 'Net Banking', 'Cash']
+PAYMENT_MODE_SHARE = [0.55, 0.15, 0.15, 0.1, 0.05]
+PUJA_TIMES = ['06:00', '08:00', '10:00', '12:00', '17:00', '19:00']
+MESSAGES = [None, 'For the wellbeing of my family', 'For success in exams', 'For good health',
+            'Gratitude for blessings received', 'For a new beginning']
+
+
+def _pick(rng: np.random.Generator, values: List[Any], size: int, p: List[float] = None) -> np.ndarray:
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=p)]
+
+def _visitor_ids(rng: np.random.Generator, ctx: Dict, size: int) -> np.ndarray:
+    """Visitor IDs skewed towards a core of regular devotees"""
+    count = ctx['visitor_count']
+    offsets = (rng.pareto(1.2, size) * count / 50).astype(np.int64) % count
+    return ctx['visitor_base'] + 1 + offsets
+
+def _days(rng: np.random.Generator, ctx: Dict, size: int) -> np.ndarray:
+    """Dates drawn with weekend and festival spikes"""
+    return ctx['start_ordinal'] + rng.choice(len(ctx['day_weights']), size=size, p=ctx['day_weights'])
+
+def _datetimes(rng: np.random.Generator, day_ordinals: np.ndarray, first_hour: int = 6, last_hour: int = 22) -> List[datetime]:
+    seconds = rng.integers(first_hour * 3600, last_hour * 3600, size=len(day_ordinals))
+    return [datetime.fromordinal(int(day)) + timedelta(seconds=int(s)) for day, s in zip(day_ordinals, seconds)]
+
+def _generate(table: str, first_id: int, count: int, ctx: Dict, rng: np.random.Generator) -> List[Tuple]:
+    """Build count rows for a table, with IDs first_id, first_id + 1, ..."""
+    ids = np.arange(first_id, first_id + count)
+    today = date.today().toordinal()
+
+    if table == 'visitors':
+        city = rng.choice(len(CITIES), size=count, p=[c[3] for c in CITIES])
+        first = _pick(rng, FIRST_NAMES, count)
+        last = _pick(rng, LAST_NAMES, count)
+        registered = _datetimes(rng, today - rng.integers(0, 3 * 365, size=count))
+        last_visit = today - rng.integers(0, 365, size=count)
+        pins = rng.integers(1, 100, size=count)
+        return [(
+            int(vid), first[i], last[i],
+            # 7919 is coprime with 10**9, so numbers are distinct across IDs
+            f"9{int(vid) * 7919 % 10**9:09d}",
+            f"{first[i].lower()}.{last[i].lower()}{int(vid)}@example.com",
+            registered[i], CITIES[city[i]][0], CITIES[city[i]][1],
+            f"{CITIES[city[i]][2]}{pins[i]:03d}", date.fromordinal(int(max(last_visit[i], registered[i].toordinal())))
+        ) for i, vid in enumerate(ids)]
+
+    if table == 'bookings':
+        schedules = ctx['schedules']
+        pick = rng.choice(len(schedules['ids']), size=count, p=schedules['weights'])
+        people = rng.choice(np.arange(1, 7), size=count, p=[0.35, 0.3, 0.15, 0.1, 0.06, 0.04])
+        visitors = _visitor_ids(rng, ctx, count)
+        lead_days = rng.integers(0, 30, size=count)
+        booked_at = _datetimes(rng, np.minimum(schedules['dates'][pick] - lead_days, today))
+        checked_in = rng.random(count) < 0.9
+        refs = rng.integers(10**7, 10**8, size=count)
+        rows = []
+        for i, booking_id in enumerate(ids):
+            s = pick[i]
+            schedule_day = int(schedules['dates'][s])
+            rows.append((
+                int(booking_id), int(schedules['ids'][s]), int(visitors[i]), booked_at[i], int(people[i]),
+                float(schedules['prices'][s]) * int(people[i]), 'Completed', f"PAY-{refs[i]}",
+                sign_pass(int(booking_id), int(schedules['ids'][s]), int(people[i]), date.fromordinal(schedule_day)),
+                'Confirmed',
+                datetime.fromordinal(schedule_day) + timedelta(hours=6, minutes=int(refs[i] % 900))
+                if schedule_day < today and checked_in[i] else None
+            ))
+        return rows
+
+    if table == 'donations':
+        types = ctx['donation_types']
+        pick = rng.choice(len(types), size=count)
+        amounts = np.round(np.array([t[1] for t in types])[pick] * rng.lognormal(0.7, 1.0, size=count), -1)
+        anonymous = rng.random(count) < 0.15
+        visitors = _visitor_ids(rng, ctx, count)
+        when = _datetimes(rng, _days(rng, ctx, count))
+        modes = _pick(rng, PAYMENT_MODES, count, PAYMENT_MODE_SHARE)
+        return [(
+            int(donation_id), ctx['temple_id'], types[pick[i]][0], None if anonymous[i] else int(visitors[i]),
+            when[i], float(max(amounts[i], types[pick[i]][1])), modes[i], f"TXN-{int(donation_id):010d}",
+            f"DON-{ctx['temple_id']}-{int(donation_id)}-{when[i]:%y%m%d}", bool(anonymous[i])
+        ) for i, donation_id in enumerate(ids)]
+
+    if table == 'pujas':
+        types = ctx['puja_types']
+        pick = rng.choice(len(types), size=count)
+        visitors = _visitor_ids(rng, ctx, count)
+        days = _days(rng, ctx, count)
+        times = _pick(rng, PUJA_TIMES, count)
+        messages = _pick(rng, MESSAGES, count)
+        return [(
+            int(puja_id), ctx['temple_id'], int(visitors[i]), types[pick[i]][0], date.fromordinal(int(days[i])),
+            times[i], types[pick[i]][1], 'Completed' if days[i] < today else 'Scheduled',
+            f"PUJA-{int(puja_id):08d}", messages[i]
+        ) for i, puja_id in enumerate(ids)]
+
+    if table == 'prasadam':
+        types = ctx['prasadam_types']
+        pick = rng.choice(len(types), size=count)
+        visitors = _visitor_ids(rng, ctx, count)
+        days = _days(rng, ctx, count)
+        ordered = _datetimes(rng, days)
+        quantity = rng.choice(np.arange(1, 6), size=count, p=[0.5, 0.25, 0.12, 0.08, 0.05])
+        transit = rng.integers(5, 11, size=count)
+        city = rng.choice(len(CITIES), size=count, p=[c[3] for c in CITIES])
+        return [(
+            int(order_id), int(visitors[i]), ctx['temple_id'], types[pick[i]][0], ordered[i], int(quantity[i]),
+            types[pick[i]][1] * int(quantity[i]),
+            f"{int(order_id) % 500 + 1}, Sample Road, {CITIES[city[i]][0]}, {CITIES[city[i]][1]}",
+            f"TRACK-{int(order_id):08d}",
+            'Delivered' if days[i] + transit[i] < today else 'Processing',
+            date.fromordinal(int(days[i] + transit[i]))
+        ) for i, order_id in enumerate(ids)]
+
+    raise ValueError(f"Unknown table: {table}")
+
+def _write_insert(cursor, table_name: str, columns: List[str], rows: List[Tuple]) -> None:
+    placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    batch_size = min(INSERT_BATCH, MAX_PARAMS // len(columns))
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        cursor.execute(
+            f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES " + ", ".join([placeholder] * len(batch)),
+            [value for row in batch for value in row]
+        )
+
+def _write_load_data(cursor, table_name: str, columns: List[str], rows: List[Tuple]) -> None:
+    def field(value: Any) -> str:
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        return str(value)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, encoding='utf-8') as out:
+        for row in rows:
+            out.write('\t'.join(field(value) for value in row) + '\n')
+        path = out.name
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {table_name} "
+            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(columns)})",
+            (path,)
+        )
+    finally:
+        os.unlink(path)
+
+def _run_chunk(table: str, chunk_no: int, first_id: int, count: int, ctx: Dict) -> Tuple[str, int, float]:
+    """Worker: generate and load one chunk of a table in its own transaction"""
+    started = time.perf_counter()
+    rng = np.random.default_rng([ctx['seed'], TABLE_SEEDS[table], chunk_no])
+    rows = _generate(table, first_id, count, ctx, rng)
+    table_name, _, columns = TABLES[table]
+
+    config = dict(ctx['config'])
+    if ctx['method'] == 'load-data':
+        config['allow_local_infile'] = True
+    if config.get('backend') == 'sqlite':
+        # Chunks queue for SQLite's single write lock
+        config['timeout'] = 3600
+    conn = get_pool(config, pool_size=1).get_connection(timeout=60)
+    cursor = conn.cursor()
+    try:
+        # Every reference is generated from rows that exist, and IDs are fresh
+        cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+        if ctx['method'] == 'load-data':
+            _write_load_data(cursor, table_name, columns, rows)
+        else:
+            _write_insert(cursor, table_name, columns, rows)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return table, count, time.perf_counter() - started
+
+def _chunks(table: str, total: int, base_id: int) -> List[Tuple[str, int, int, int]]:
+    return [(table, chunk_no, base_id + start + 1, min(CHUNK_ROWS, total - start))
+            for chunk_no, start in enumerate(range(0, total, CHUNK_ROWS))]
+
+def _run_chunks(executor: ProcessPoolExecutor, chunks: List[Tuple], ctx: Dict) -> Dict[str, int]:
+    """Run chunks (of several tables at once) on the pool, printing progress"""
+    done: Dict[str, int] = {}
+    started = time.perf_counter()
+    futures = [executor.submit(_run_chunk, *chunk, ctx) for chunk in chunks]
+    for future in as_completed(futures):
+        table, count, _ = future.result()
+        done[table] = done.get(table, 0) + count
+        elapsed = time.perf_counter() - started
+        print(f"  {table:<10} {done[table]:>12,} rows   ({sum(done.values()) / elapsed:,.0f} rows/s overall)")
+    return done
+
+def _build_context(db, temple_id: int, start: date, days: int, counts: Dict[str, int],
+                   seed: int, method: str) -> Dict:
+    """Look up reference data and ID bases, and precompute the demand curve"""
+    from schedule_generator import generate_schedules
+
+    created = generate_schedules(db, temple_id, start, days)
+    if created:
+        print(f"Created {created} schedules for the date range")
+
+    end = start + timedelta(days=days - 1)
+    ctx = {'config': dict(db.config), 'temple_id': temple_id, 'seed': seed, 'method': method,
+           'start_ordinal': start.toordinal()}
+
+    with db.unit_of_work():
+        cursor = db.cursor
+        for table, (table_name, id_column, _) in TABLES.items():
+            cursor.execute(f"SELECT COALESCE(MAX({id_column}), 0) AS max_id FROM {table_name}")
+            ctx[f"{table}_base"] = cursor.fetchone()['max_id']
+
+        cursor.execute("""
+        SELECT StartDate, EndDate FROM Festivals
+        WHERE TempleID = %s AND StartDate <= %s AND EndDate >= %s
+        """, (temple_id, end, start))
+        festivals = cursor.fetchall()
+
+        # Sharded schedules keep their counts in sub-counters; leave them alone
+        cursor.execute("""
+        SELECT ds.ScheduleID, ds.ScheduleDate, ds.CurrentCapacity, dt.StandardPrice
+        FROM DarshanSchedules ds
+        JOIN DarshanTypes dt ON ds.DarshanTypeID = dt.DarshanTypeID
+        WHERE ds.TempleID = %s AND ds.ScheduleDate BETWEEN %s AND %s
+              AND ds.IsCancelled = FALSE AND ds.ShardCount = 0
+        """, (temple_id, start, end))
+        schedules = cursor.fetchall()
+
+        cursor.execute("SELECT DonationTypeID, MinimumAmount FROM DonationTypes WHERE TempleID = %s AND IsActive = TRUE",
+                       (temple_id,))
+        ctx['donation_types'] = [(row['DonationTypeID'], float(row['MinimumAmount'])) for row in cursor.fetchall()]
+        cursor.execute("SELECT PujaTypeID, Price FROM PujaTypes WHERE TempleID = %s AND IsActive = TRUE", (temple_id,))
+        ctx['puja_types'] = [(row['PujaTypeID'], float(row['Price'])) for row in cursor.fetchall()]
+        cursor.execute("SELECT PrasadamTypeID, Price FROM PrasadamTypes WHERE TempleID = %s AND IsActive = TRUE",
+                       (temple_id,))
+        ctx['prasadam_types'] = [(row['PrasadamTypeID'], float(row['Price'])) for row in cursor.fetchall()]
+
+    # Relative demand per day: weekends and festival days draw bigger crowds
+    ordinals = np.arange(start.toordinal(), start.toordinal() + days)
+    weights = np.ones(days)
+    weights[[date.fromordinal(int(day)).weekday() >= 5 for day in ordinals]] *= WEEKEND_WEIGHT
+    for festival in festivals:
+        weights[(ordinals >= festival['StartDate'].toordinal()) & (ordinals <= festival['EndDate'].toordinal())] *= FESTIVAL_WEIGHT
+    ctx['day_weights'] = weights / weights.sum()
+
+    if schedules:
+        dates = np.array([row['ScheduleDate'].toordinal() for row in schedules])
+        capacity = np.array([row['CurrentCapacity'] for row in schedules], dtype=float)
+        schedule_weights = capacity * weights[dates - start.toordinal()]
+        ctx['schedules'] = {
+            'ids': np.array([row['ScheduleID'] for row in schedules]),
+            'dates': dates,
+            'prices': np.array([float(row['StandardPrice']) for row in schedules]),
+            'weights': schedule_weights / schedule_weights.sum()
+        }
+
+    ctx['visitor_base'] = ctx['visitors_base']
+    ctx['visitor_count'] = counts['visitors']
+    return ctx
+
+def _sync_slot_counters(db, temple_id: int, start: date, days: int) -> None:
+    """Make RemainingSlots agree with the generated bookings, raising capacity where demand exceeded it"""
+    with db.unit_of_work():
+        db.cursor.execute("""
+        SELECT b.ScheduleID, SUM(b.NumberOfPeople) AS booked
+        FROM DarshanBookings b
+        JOIN DarshanSchedules s ON b.ScheduleID = s.ScheduleID
+        WHERE s.TempleID = %s AND s.ScheduleDate BETWEEN %s AND %s AND s.ShardCount = 0
+        GROUP BY b.ScheduleID
+        """, (temple_id, start, start + timedelta(days=days - 1)))
+        booked = [(int(row['booked']), row['ScheduleID']) for row in db.cursor.fetchall()]
+        # Single-table form, so it runs on the SQLite backend too
+        db.cursor.executemany("""
+        UPDATE DarshanSchedules
+        SET RemainingSlots = GREATEST(CurrentCapacity, %s) - %s,
+            CurrentCapacity = GREATEST(CurrentCapacity, %s)
+        WHERE ScheduleID = %s
+        """, [(people, people, people, schedule_id) for people, schedule_id in booked])
+        db.conn.commit()
+
+def generate(db, counts: Dict[str, int], seed: int = 42, workers: int = None, method: str = "insert",
+             temple_id: int = None, days_back: int = 365, days_ahead: int = 30) -> Dict[str, int]:
+    """
+    Add counts[table] synthetic rows to each table of db's database, spread over
+    days_back days of history and days_ahead days of future bookings.
+    Returns the number of rows inserted per table.
+    """
+    counts = {table: counts.get(table, 0) for table in TABLES}
+    workers = workers or os.cpu_count() or 1
+    temple_id = temple_id or db.get_temples()[0]['TempleID']
+    start = date.today() - timedelta(days=days_back)
+    days = days_back + days_ahead + 1
+
+    ctx = _build_context(db, temple_id, start, days, counts, seed, method)
+    if counts['visitors'] == 0:
+        if any(counts.values()):
+            print("No new visitors; other tables need visitors > 0")
+        return counts
+    if counts['bookings'] and 'schedules' not in ctx:
+        print("No unsharded schedules in the date range; skipping bookings")
+        counts['bookings'] = 0
+    for table, key in [('donations', 'donation_types'), ('pujas', 'puja_types'), ('prasadam', 'prasadam_types')]:
+        if counts[table] and not ctx[key]:
+            print(f"No active {key.replace('_', ' ')}; skipping {table}")
+            counts[table] = 0
+
+    print(f"Generating {', '.join(f'{count:,} {table}' for table, count in counts.items())} "
+          f"(seed {seed}, {workers} workers, {method})")
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Visitors first, since every other table refers to them
+        _run_chunks(executor, _chunks('visitors', counts['visitors'], ctx['visitors_base']), ctx)
+
+        # The rest in parallel, chunks of different tables interleaved
+        chunks = [chunk for table in ['bookings', 'donations', 'pujas', 'prasadam']
+                  for chunk in _chunks(table, counts[table], ctx[f"{table}_base"])]
+        chunks.sort(key=lambda chunk: chunk[1])
+        _run_chunks(executor, chunks, ctx)
+
+    if counts['bookings']:
+        _sync_slot_counters(db, temple_id, start, days)
+    if counts['bookings'] or counts['donations']:
+        # Bulk rows bypass book_darshan/make_donation, so recompute the dashboard rollups
+        with db.unit_of_work():
+            rebuild_rollups(db.conn, db.cursor, temple_id, start, start + timedelta(days=days - 1))
+    # The generated rows only refer to the generated visitors
+    with db.unit_of_work():
+        rebuild_visitor_stats(db.conn, db.cursor, ctx['visitors_base'] + 1, ctx['visitors_base'] + counts['visitors'])
+
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"Inserted {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    return counts
+
+def main() -> int:
+    from booking import TempleDatabase
+
+    parser = argparse.ArgumentParser(description="Fill the temple database with synthetic production-scale data")
+    parser.add_argument("--scale", choices=list(SCALES), default="small", help="Preset row counts")
+    for table in TABLES:
+        parser.add_argument(f"--{table}", type=int, default=None, help=f"Override the {table} row count")
+    parser.add_argument("--temple", type=int, default=None, help="TempleID (default: the first active temple)")
+    parser.add_argument("--days-back", type=int, default=365, help="History length in days")
+    parser.add_argument("--days-ahead", type=int, default=30, help="Future bookings horizon in days")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--method", choices=["insert", "load-data"], default="insert",
+                        help="Multi-row INSERTs, or LOAD DATA LOCAL INFILE (needs local_infile=ON on the server)")
+    args = parser.parse_args()
+
+    counts = {table: getattr(args, table) if getattr(args, table) is not None else SCALES[args.scale][table]
+              for table in TABLES}
+
+    db = TempleDatabase(per_request=True)
+    db.init_db()
+    inserted = generate(db, counts, args.seed, args.workers, args.method, args.temple,
+                        args.days_back, args.days_ahead)
+    return 0 if inserted['visitors'] or not any(counts.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+#db_pool.py
+
+import os
+import threading
+import time
+import mysql.connector
+from typing import Dict, List, Tuple, Any
+
+# Default connection settings shared by app.py, admin_utility.py and booking.py
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'keyur123',
+    'database': 'temple_db'
+}
+
+# Storage backend: 'mysql', or 'sqlite' for an embedded single-node database (sqlite_backend.py)
+DB_BACKEND = os.environ.get('TEMPLE_DB_BACKEND', 'mysql')
+if DB_BACKEND != 'mysql':
+    DB_CONFIG = {'backend': DB_BACKEND, 'database': DB_CONFIG['database']}
+
+# Pool tuning, overridable from the environment for festival deployments
+POOL_SIZE = int(os.environ.get('TEMPLE_DB_POOL_SIZE', 10))
+POOL_TIMEOUT = float(os.environ.get('TEMPLE_DB_POOL_TIMEOUT', 5.0))
+HEALTH_CHECK_INTERVAL = float(os.environ.get('TEMPLE_DB_HEALTH_CHECK_INTERVAL', 5.0))
+
+
+class PoolTimeoutError(mysql.connector.errors.PoolError):
+    """Raised when no pooled connection became free within the checkout timeout"""
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled MySQL connection. Behaves like the underlying
+    connection, except that close() hands it back to the pool.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', conn: Any):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name: str) -> Any:
+        if self._conn is None:
+            raise mysql.connector.errors.InterfaceError(msg="Connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def close(self) -> None:
+        """Return the connection to the pool"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn)
+
+    def __enter__(self) -> 'PooledConnection':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of MySQL connections.
+
+    Connections are created lazily up to pool_size. A borrower waits up to
+    timeout seconds for a free connection, and connections that have been idle
+    longer than health_check_interval are pinged (and replaced if dead) before
+    being handed out.
+    """
+
+    def __init__(self, config: Dict[str, Any], pool_size: int = POOL_SIZE,
+                 timeout: float = POOL_TIMEOUT, health_check_interval: float = HEALTH_CHECK_INTERVAL):
+        self.config = dict(config)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle: List[Tuple[Any, float]] = []
+        self._created = 0
+        self._in_use = 0
+
+        # Metrics
+        self._connects = 0
+        self._borrows = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._health_check_failures = 0
+        self._discarded = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _connect(self) -> Any:
+        """Open a new physical connection"""
+        conn = connect(self.config)
+        with self._cond:
+            self._connects += 1
+        return conn
+
+    def _discard(self, conn: Any) -> None:
+        """Drop a physical connection and free its slot"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._created -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def get_connection(self, timeout: float = None) -> PooledConnection:
+        """Borrow a connection, waiting up to timeout seconds for one to free up"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            self._borrows += 1
+            waited = False
+
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+
+                if self._created < self.pool_size:
+                    self._created += 1
+                    conn, last_used = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        msg=f"No database connection available within {timeout:.1f}s "
+                            f"(pool size {self.pool_size})"
+                    )
+
+                if not waited:
+                    self._waits += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+            wait_time = time.monotonic() - started
+            self._total_wait += wait_time
+            self._max_wait = max(self._max_wait, wait_time)
+            self._in_use += 1
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif time.monotonic() - last_used >= self.health_check_interval:
+                try:
+                    conn.ping(reconnect=False)
+                except mysql.connector.Error:
+                    with self._cond:
+                        self._health_check_failures += 1
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                    conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+            self._discard(_ClosedConnection())
+            raise
+
+        return PooledConnection(self, conn)
+
+    def _release(self, conn: Any) -> None:
+        """Take a connection back, ending any transaction left open by the borrower"""
+        with self._cond:
+            self._in_use -= 1
+
+        try:
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool metrics"""
+        with self._cond:
+            return {
+                'pool_size': self.pool_size,
+                'open_connections': self._created,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'connects': self._connects,
+                'borrows': self._borrows,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'health_check_failures': self._health_check_failures,
+                'discarded': self._discarded,
+                'avg_wait_ms': (self._total_wait / self._borrows * 1000) if self._borrows else 0.0,
+                'max_wait_ms': self._max_wait * 1000
+            }
+
+    def close_all(self) -> None:
+        """Close every idle connection; borrowed ones are closed when returned"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+class _ClosedConnection:
+    """Placeholder used to free a pool slot whose connection never opened"""
+
+    def close(self) -> None:
+        pass
+
+
+def connect(config: Dict[str, Any]) -> Any:
+    """Open an unpooled connection with the config's backend (MySQL unless config['backend'] says otherwise)"""
+    config = dict(config)
+    backend = config.pop('backend', 'mysql')
+    if backend == 'sqlite':
+        import sqlite_backend
+        return sqlite_backend.connect(**config)
+    if backend != 'mysql':
+        raise mysql.connector.errors.NotSupportedError(msg=f"Unknown database backend: {backend}")
+    return mysql.connector.connect(**config)
+
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(config: Dict[str, Any] = None, **options) -> ConnectionPool:
+    """
+    Get the process-wide pool for a connection config, creating it on first use.
+    Options (pool_size, timeout, health_check_interval) only apply on creation.
+    """
+    config = dict(DB_CONFIG if config is None else config)
+    key = tuple(sorted(config.items()))
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(config, **options)
+            _pools[key] = pool
+        return pool
+
+def get_connection(timeout: float = None) -> PooledConnection:
+    """Borrow a connection from the default pool"""
+    return get_pool().get_connection(timeout)
@@ -0,0 +1,79 @@
+#entry_pass.py
+#
+# Signed darshan entry passes. The QR payload carries the booking and an HMAC
+# over it, so a gate can tell a genuine pass from a forged one without asking
+# the database:
+#
+#   TP1.<booking_id>.<schedule_id>.<people>.<yyyymmdd>.<signature>
+
+import base64
+import hashlib
+import hmac
+import os
+import sys
+from datetime import date, datetime
+from typing import Dict, Optional, Union
+
+PASS_VERSION = 'TP1'
+
+# Publicly known, so passes signed with it can be forged. Only used with TEMPLE_DEV_MODE=1.
+DEV_PASS_SECRET = 'dev-only-temple-pass-secret'
+
+def _load_secret() -> str:
+    """The pass secret from TEMPLE_PASS_SECRET; refuses to run without one outside dev mode"""
+    secret = os.environ.get('TEMPLE_PASS_SECRET')
+    if secret:
+        return secret
+    if os.environ.get('TEMPLE_DEV_MODE') != '1':
+        raise RuntimeError("TEMPLE_PASS_SECRET is not set; entry passes can't be signed or verified "
+                           "(set TEMPLE_DEV_MODE=1 to use the insecure development secret)")
+    print("WARNING: TEMPLE_PASS_SECRET is not set, signing entry passes with the public "
+          "development secret. Anyone can forge these passes.", file=sys.stderr)
+    return DEV_PASS_SECRET
+
+# Shared by the booking app and every gate scanner
+PASS_SECRET = _load_secret()
+USING_DEV_SECRET = PASS_SECRET == DEV_PASS_SECRET
+
+# Truncated HMAC-SHA256 (96 bits) keeps the QR code small
+SIGNATURE_BYTES = 12
+
+def _signature(body: str, secret: str) -> str:
+    """URL-safe truncated HMAC of a pass body"""
+    digest = hmac.new(secret.encode('utf-8'), body.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode('ascii')
+
+def sign_pass(booking_id: int, schedule_id: int, num_people: int,
+              schedule_date: Union[date, str], secret: str = None) -> str:
+    """Build the signed QR payload for a booking"""
+    if isinstance(schedule_date, str):
+        schedule_date = datetime.strptime(schedule_date, '%Y-%m-%d').date()
+    body = f"{PASS_VERSION}.{booking_id}.{schedule_id}.{num_people}.{schedule_date:%Y%m%d}"
+    return f"{body}.{_signature(body, secret or PASS_SECRET)}"
+
+def is_signed_pass(payload: str) -> bool:
+    """Check whether a payload uses the signed format (as opposed to a legacy BOOK-... payload)"""
+    return payload.startswith(PASS_VERSION + '.')
+
+def verify_pass(payload: str, secret: str = None) -> Optional[Dict]:
+    """Check a signed payload's signature. Returns the pass fields, or None if malformed or forged."""
+    try:
+        body, signature = payload.rsplit('.', 1)
+        version, booking_id, schedule_id, num_people, day = body.split('.')
+    except ValueError:
+        return None
+
+    if version != PASS_VERSION:
+        return None
+    if not hmac.compare_digest(signature, _signature(body, secret or PASS_SECRET)):
+        return None
+
+    try:
+        return {
+            'BookingID': int(booking_id),
+            'ScheduleID': int(schedule_id),
+            'NumberOfPeople': int(num_people),
+            'ScheduleDate': datetime.strptime(day, '%Y%m%d').date()
+        }
+    except ValueError:
+        return None
@@ -0,0 +1,263 @@
+#gate.py
+#
+# Entry-pass verification at the temple gate. The day's valid bookings are
+# loaded into memory once; after that a scan is checked locally (signature,
+# date, booking, double entry) and check-ins are written back in batches.
+#
+#   python gate.py --temple 1 < scans.txt
+
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import mysql.connector
+from entry_pass import USING_DEV_SECRET, is_signed_pass, verify_pass
+
+# Check-ins are written back once this many are pending or this many seconds have passed
+FLUSH_SIZE = 200
+FLUSH_INTERVAL = 5.0
+
+
+class GateResult(NamedTuple):
+    """Outcome of one scan"""
+    ok: bool
+    reason: str
+    booking_id: Optional[int] = None
+    num_people: int = 0
+
+
+class GateVerifier:
+    """
+    Verifies entry passes for one temple and day against an in-memory index.
+
+    Signed passes are checked with the shared HMAC secret, so forged or
+    altered passes never reach the database. Legacy BOOK-... payloads are
+    matched against the payloads stored with the day's bookings. Double entry
+    is caught with a bitmap over booking IDs.
+    """
+
+    def __init__(self, db, temple_id: int, day: date = None,
+                 flush_size: int = FLUSH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.db = db
+        self.temple_id = temple_id
+        self.day = day or date.today()
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._bookings: Dict[int, Tuple[int, int]] = {}
+        self._legacy: Dict[str, int] = {}
+        self._not_valid: Set[int] = set()
+        self._seen_base = 0
+        self._seen = bytearray()
+        self._pending: List[Tuple[datetime, int]] = []
+        self._last_flush = time.monotonic()
+        self.counts = Counter()
+
+    # Index
+    def load(self) -> int:
+        """Load the day's confirmed bookings. Returns the number indexed."""
+        with self.db.unit_of_work():
+            self.db.cursor.execute("""
+            SELECT b.BookingID, b.ScheduleID, b.NumberOfPeople, b.QRCode, b.CheckedInAt
+            FROM DarshanBookings b
+            JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
+            WHERE ds.TempleID = %s AND ds.ScheduleDate = %s
+                  AND ds.IsCancelled = FALSE AND b.BookingStatus = 'Confirmed'
+            ORDER BY b.BookingID
+            """, (self.temple_id, self.day))
+            rows = self.db.cursor.fetchall()
+
+        with self._lock:
+            self._bookings.clear()
+            self._legacy.clear()
+            self._not_valid.clear()
+            self._seen_base = rows[0]['BookingID'] if rows else 0
+            self._seen = bytearray((rows[-1]['BookingID'] - self._seen_base) // 8 + 1 if rows else 0)
+
+            for row in rows:
+                self._add(row)
+
+        return len(rows)
+
+    def _add(self, row: Dict) -> None:
+        """Index one booking row (lock held)"""
+        booking_id = row['BookingID']
+        self._bookings[booking_id] = (row['ScheduleID'], row['NumberOfPeople'])
+        if row['QRCode'] and not is_signed_pass(row['QRCode']):
+            self._legacy[row['QRCode']] = booking_id
+        if row['CheckedInAt'] is not None:
+            self._mark(booking_id)
+
+    def _lookup(self, booking_id: int) -> Optional[Tuple[int, int]]:
+        """Fetch a booking made after load() and add it to the index"""
+        with self._lock:
+            if booking_id in self._not_valid:
+                return None
+
+        try:
+            with self.db.unit_of_work():
+                self.db.cursor.execute("""
+                SELECT b.BookingID, b.ScheduleID, b.NumberOfPeople, b.QRCode, b.CheckedInAt
+                FROM DarshanBookings b
+                JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
+                WHERE b.BookingID = %s AND ds.TempleID = %s AND ds.ScheduleDate = %s
+                      AND ds.IsCancelled = FALSE AND b.BookingStatus = 'Confirmed'
+                """, (booking_id, self.temple_id, self.day))
+                row = self.db.cursor.fetchone()
+        except mysql.connector.Error as err:
+            print(f"Error looking up booking: {err}")
+            return None
+
+        with self._lock:
+            if row is None:
+                self._not_valid.add(booking_id)
+                return None
+            self._add(row)
+            return self._bookings[booking_id]
+
+    # Seen-set
+    def _mark(self, booking_id: int) -> bool:
+        """Set a booking's seen bit (lock held). Returns False if it was already set."""
+        offset = booking_id - self._seen_base
+        if offset < 0:
+            # Older than anything loaded; shift the bitmap down to cover it
+            shift = (-offset + 7) // 8
+            self._seen[0:0] = bytes(shift)
+            self._seen_base -= shift * 8
+            offset = booking_id - self._seen_base
+
+        index, bit = divmod(offset, 8)
+        if index >= len(self._seen):
+            self._seen.extend(bytes(index - len(self._seen) + 1))
+
+        if self._seen[index] & (1 << bit):
+            return False
+        self._seen[index] |= 1 << bit
+        return True
+
+    # Scanning
+    def verify(self, payload: str) -> GateResult:
+        """Check one scanned payload and record the check-in if it is admitted"""
+        result = self._verify(payload.strip())
+        with self._lock:
+            self.counts[result.reason] += 1
+        self._maybe_flush()
+        return result
+
+    def _verify(self, payload: str) -> GateResult:
+        if is_signed_pass(payload):
+            fields = verify_pass(payload)
+            if fields is None:
+                return GateResult(False, 'invalid_signature')
+            if fields['ScheduleDate'] != self.day:
+                return GateResult(False, 'wrong_date', fields['BookingID'])
+            booking_id = fields['BookingID']
+        else:
+            with self._lock:
+                booking_id = self._legacy.get(payload)
+            if booking_id is None:
+                return GateResult(False, 'unknown_pass')
+            fields = None
+
+        with self._lock:
+            booking = self._bookings.get(booking_id)
+        if booking is None:
+            booking = self._lookup(booking_id)
+        if booking is None:
+            return GateResult(False, 'not_valid', booking_id)
+
+        schedule_id, num_people = booking
+        if fields and (fields['ScheduleID'], fields['NumberOfPeople']) != booking:
+            return GateResult(False, 'mismatch', booking_id)
+
+        with self._lock:
+            if not self._mark(booking_id):
+                return GateResult(False, 'already_checked_in', booking_id, num_people)
+            self._pending.append((datetime.now(), booking_id))
+
+        return GateResult(True, 'admitted', booking_id, num_people)
+
+    # Check-in sync
+    def _maybe_flush(self) -> None:
+        with self._lock:
+            due = (len(self._pending) >= self.flush_size
+                   or (self._pending and time.monotonic() - self._last_flush >= self.flush_interval))
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write pending check-ins to the database. Returns the number written."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return 0
+
+        try:
+            with self.db.unit_of_work():
+                self.db.cursor.executemany(
+                    "UPDATE DarshanBookings SET CheckedInAt = %s WHERE BookingID = %s AND CheckedInAt IS NULL",
+                    pending
+                )
+                self.db.conn.commit()
+            return len(pending)
+        except mysql.connector.Error as err:
+            print(f"Error saving check-ins: {err}")
+            # Keep them for the next flush
+            with self._lock:
+                self._pending[0:0] = pending
+            return 0
+
+    def stats(self) -> Dict:
+        """Get index size, seen-set size and scan outcome counts"""
+        with self._lock:
+            return {
+                'bookings_indexed': len(self._bookings),
+                'legacy_payloads': len(self._legacy),
+                'seen_set_bytes': len(self._seen),
+                'pending_check_ins': len(self._pending),
+                **dict(self.counts)
+            }
+
+def main() -> int:
+    from booking import TempleDatabase
+
+    parser = argparse.ArgumentParser(description="Verify scanned entry passes read one per line from stdin")
+    parser.add_argument("--temple", type=int, required=True, help="TempleID of this gate")
+    parser.add_argument("--date", default=None, help="Day to admit (YYYY-MM-DD, default today)")
+    args = parser.parse_args()
+
+    if USING_DEV_SECRET:
+        print("WARNING: this gate accepts passes signed with the public development secret "
+              "(TEMPLE_DEV_MODE=1). Do not use it at a real gate.", file=sys.stderr)
+
+    day = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else None
+    gate = GateVerifier(TempleDatabase(per_request=True), args.temple, day)
+
+    started = time.perf_counter()
+    print(f"Indexed {gate.load()} bookings in {time.perf_counter() - started:.2f}s")
+
+    scans = 0
+    started = time.perf_counter()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        result = gate.verify(line)
+        scans += 1
+        print(f"{'OK  ' if result.ok else 'DENY'} {result.reason:<20} booking={result.booking_id} people={result.num_people}")
+    elapsed = time.perf_counter() - started
+    gate.flush()
+
+    if scans:
+        print(f"{scans} scans in {elapsed:.2f}s ({scans / elapsed * 60:,.0f} per minute)" if elapsed else f"{scans} scans")
+    print(gate.stats())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
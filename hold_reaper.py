@@ -0,0 +1,46 @@
+#hold_reaper.py
+
+import threading
+from typing import Optional
+
+# Seconds between sweeps for expired slot holds
+REAP_INTERVAL = 30
+
+
+class HoldReaper(threading.Thread):
+    """Background thread that periodically releases expired slot holds"""
+
+    def __init__(self, db, interval: float = REAP_INTERVAL, batch_size: int = 500):
+        super().__init__(name="slot-hold-reaper", daemon=True)
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        self.released = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.released += self.db.release_expired_holds(self.batch_size)
+            except Exception as e:
+                # Pool timeouts and the like; try again on the next sweep
+                print(f"Error in slot hold reaper: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        """Ask the reaper to exit after its current sweep"""
+        self._stop_event.set()
+
+
+_reaper: Optional[HoldReaper] = None
+_reaper_lock = threading.Lock()
+
+def start_hold_reaper(db, interval: float = REAP_INTERVAL) -> HoldReaper:
+    """Start the process-wide reaper for a TempleDatabase, if it isn't running already"""
+    global _reaper
+
+    with _reaper_lock:
+        if _reaper is None or not _reaper.is_alive():
+            _reaper = HoldReaper(db, interval)
+            _reaper.start()
+        return _reaper
@@ -0,0 +1,280 @@
+#load_test.py
+#
+# Festival-surge load test. N devotees arrive at once and each runs the full
+# darshan flow the app does: look up their phone number, register, list the
+# day's slots, hold slots while paying and book. Reports booking throughput,
+# per-step latency, InnoDB lock waits and deadlocks, then checks every slot
+# counter against the bookings and active holds made on it.
+#
+#   python load_test.py --devotees 500 --capacity 2000
+#   python load_test.py --devotees 1000 --shards 8 --no-holds
+
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import mysql.connector
+
+from benchmark import percentile
+from booking import TempleDatabase, REMAINING_SLOTS_SQL
+from db_pool import DB_CONFIG, get_pool
+from rollups import retract_bookings
+from visitor_stats import recompute_visitor_stats
+
+STEPS = ['lookup', 'register', 'list', 'hold', 'book', 'flow']
+
+
+def create_surge_day(db: TempleDatabase, schedules: int, capacity: int, shards: int) -> Dict:
+    """Create a far-future day with schedules slots of capacity each. Returns the temple, date and schedule IDs."""
+    temple_id = db.get_temples()[0]['TempleID']
+    darshan_types = db.get_darshan_types(temple_id)
+    day = (datetime.now() + timedelta(days=3650 + random.randint(0, 3650))).strftime('%Y-%m-%d')
+
+    schedule_ids = []
+    with db.unit_of_work():
+        for i in range(schedules):
+            darshan_type = darshan_types[i % len(darshan_types)]
+            start = datetime.strptime('05:00', '%H:%M') + timedelta(hours=i)
+            db.cursor.execute("""
+            INSERT INTO DarshanSchedules (TempleID, DarshanTypeID, ScheduleDate,
+            StartTime, EndTime, CurrentCapacity, RemainingSlots)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (temple_id, darshan_type['DarshanTypeID'], day, start.strftime('%H:%M'),
+                  (start + timedelta(hours=1)).strftime('%H:%M'), capacity, capacity))
+            schedule_ids.append(db.cursor.lastrowid)
+        db.conn.commit()
+
+    if shards:
+        for schedule_id in schedule_ids:
+            db.shard_schedule(schedule_id, shards)
+    return {'temple_id': temple_id, 'date': day, 'schedule_ids': schedule_ids}
+
+def lock_counters(db: TempleDatabase) -> Dict[str, Optional[int]]:
+    """Server-wide InnoDB row lock wait and deadlock counters (None where the server doesn't expose one)"""
+    counters = {'row_lock_waits': None, 'row_lock_time_ms': None, 'deadlocks': None}
+    if db.config.get('backend', 'mysql') != 'mysql':
+        return counters
+    with db.unit_of_work():
+        try:
+            db.cursor.execute("SHOW GLOBAL STATUS LIKE 'Innodb_%'")
+            status = {row['Variable_name']: int(row['Value']) for row in db.cursor.fetchall()
+                      if str(row['Value']).isdigit()}
+            counters['row_lock_waits'] = status.get('Innodb_row_lock_waits')
+            counters['row_lock_time_ms'] = status.get('Innodb_row_lock_time')
+            # MariaDB reports deadlocks as a status variable, MySQL as an InnoDB metric
+            counters['deadlocks'] = status.get('Innodb_deadlocks')
+            if counters['deadlocks'] is None:
+                db.cursor.execute("SELECT COUNT AS n FROM information_schema.INNODB_METRICS WHERE NAME = 'lock_deadlocks'")
+                row = db.cursor.fetchone()
+                counters['deadlocks'] = row['n'] if row else None
+        except mysql.connector.Error as err:
+            print(f"Could not read lock counters: {err}")
+    return counters
+
+def check_consistency(db: TempleDatabase, schedule_ids: List[int]) -> List[Dict]:
+    """
+    Per schedule: capacity, remaining (base counter plus shards), people booked
+    and people in active holds. Consistent when capacity - remaining equals
+    booked + held and no counter is negative.
+    """
+    placeholders = ", ".join(["%s"] * len(schedule_ids))
+    with db.unit_of_work():
+        db.cursor.execute(f"""
+        SELECT ds.ScheduleID, ds.CurrentCapacity, {REMAINING_SLOTS_SQL} AS RemainingSlots,
+               LEAST(ds.RemainingSlots,
+                     COALESCE((SELECT MIN(sh.RemainingSlots) FROM DarshanScheduleShards sh
+                               WHERE sh.ScheduleID = ds.ScheduleID), 0)) AS lowest_counter,
+               (SELECT COALESCE(SUM(b.NumberOfPeople), 0) FROM DarshanBookings b
+                WHERE b.ScheduleID = ds.ScheduleID) AS booked,
+               (SELECT COALESCE(SUM(h.NumberOfPeople), 0) FROM SlotHolds h
+                WHERE h.ScheduleID = ds.ScheduleID AND h.HoldStatus = 'Active') AS held
+        FROM DarshanSchedules ds
+        WHERE ds.ScheduleID IN ({placeholders})
+        ORDER BY ds.ScheduleID
+        """, schedule_ids)
+        rows = db.cursor.fetchall()
+
+    for row in rows:
+        row['consistent'] = (row['lowest_counter'] >= 0
+                             and row['CurrentCapacity'] - row['RemainingSlots'] == row['booked'] + row['held'])
+    return rows
+
+def cleanup(db: TempleDatabase, surge: Dict, visitor_ids: List[int]) -> None:
+    """Remove the surge day's schedules and everything booked on them, and the load-test visitors"""
+    with db.unit_of_work():
+        # Template slots materialized for the day by the listing calls go too
+        db.cursor.execute("SELECT ScheduleID FROM DarshanSchedules WHERE TempleID = %s AND ScheduleDate = %s",
+                          (surge['temple_id'], surge['date']))
+        schedule_ids = [row['ScheduleID'] for row in db.cursor.fetchall()]
+        for schedule_id in schedule_ids:
+            retract_bookings(db.cursor, 'ScheduleID', schedule_id)
+            db.cursor.execute("DELETE FROM DarshanBookings WHERE ScheduleID = %s", (schedule_id,))
+            db.cursor.execute("DELETE FROM SlotHolds WHERE ScheduleID = %s", (schedule_id,))
+            db.cursor.execute("DELETE FROM DarshanScheduleShards WHERE ScheduleID = %s", (schedule_id,))
+            db.cursor.execute("DELETE FROM DarshanSchedules WHERE ScheduleID = %s", (schedule_id,))
+        for start in range(0, len(visitor_ids), 1000):
+            batch = visitor_ids[start:start + 1000]
+            db.cursor.execute(f"DELETE FROM Visitors WHERE VisitorID IN ({', '.join(['%s'] * len(batch))})", batch)
+        recompute_visitor_stats(db.cursor, *visitor_ids)
+        db.conn.commit()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Simulate a festival surge of devotees booking darshan")
+    parser.add_argument("--devotees", type=int, default=200, help="Concurrent devotees")
+    parser.add_argument("--bookings-per-devotee", type=int, default=1)
+    parser.add_argument("--schedules", type=int, default=4, help="Slots on the surge day")
+    parser.add_argument("--capacity", type=int, default=1000, help="Capacity of each slot")
+    parser.add_argument("--shards", type=int, default=0, help="Split each slot into N sharded counters")
+    parser.add_argument("--max-people", type=int, default=6, help="Each booking is for 1..N people")
+    parser.add_argument("--hot-share", type=float, default=0.5,
+                        help="Share of devotees who go for the earliest open slot")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Spread arrivals over this many seconds")
+    parser.add_argument("--payment-delay", type=float, default=0.0, help="Seconds between hold and booking")
+    parser.add_argument("--no-holds", action="store_true", help="Book directly instead of hold-then-book")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--keep", action="store_true", help="Keep the surge day and test visitors")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Size the shared pool so every devotee gets its own connection
+    get_pool(DB_CONFIG, pool_size=args.devotees + 2, timeout=60)
+    db = TempleDatabase(per_request=True)
+    db.init_db()
+
+    surge = create_surge_day(db, args.schedules, args.capacity, args.shards)
+    surge_ids = set(surge['schedule_ids'])
+    phones = [f"7{number:09d}" for number in rng.sample(range(10**9), args.devotees)]
+    plans = [[(rng.random() < args.hot_share, rng.randint(1, args.max_people), rng.random())
+              for _ in range(args.bookings_per_devotee)] for _ in range(args.devotees)]
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    outcomes = Counter()
+    visitor_ids: List[int] = []
+    lock = threading.Lock()
+    start = threading.Barrier(args.devotees)
+
+    def timed(step: str, call, *call_args, **call_kwargs):
+        began = time.perf_counter()
+        result = call(*call_args, **call_kwargs)
+        elapsed = time.perf_counter() - began
+        with lock:
+            latencies[step].append(elapsed)
+        return result
+
+    def failed(message: str) -> None:
+        text = (message or '').lower()
+        with lock:
+            if message == "Not enough slots available":
+                outcomes['sold_out'] += 1
+            elif 'deadlock' in text:
+                outcomes['deadlock_errors'] += 1
+            elif 'lock wait timeout' in text:
+                outcomes['lock_timeout_errors'] += 1
+            else:
+                outcomes['errors'] += 1
+
+    def devotee(index: int) -> None:
+        start.wait()
+        if args.ramp:
+            time.sleep(args.ramp * index / args.devotees)
+        flow_started = time.perf_counter()
+
+        phone = phones[index]
+        visitor = timed('lookup', db.get_visitor_by_phone, phone)
+        if visitor is None:
+            visitor_id = timed('register', db.register_visitor, "Surge", f"Devotee{index}", phone)
+            if visitor_id is None:
+                failed("registration failed")
+                return
+            with lock:
+                visitor_ids.append(visitor_id)
+        else:
+            visitor_id = visitor['VisitorID']
+
+        for hot, people, pick in plans[index]:
+            schedules = [schedule for schedule in timed('list', db.get_darshan_schedules, surge['temple_id'], surge['date'])
+                         if schedule['ScheduleID'] in surge_ids and schedule['RemainingSlots'] >= people]
+            if not schedules:
+                failed("Not enough slots available")
+                continue
+            schedule = schedules[0] if hot else schedules[int(pick * len(schedules))]
+
+            hold_id = None
+            if not args.no_holds:
+                hold_id, message = timed('hold', db.hold_slots, schedule['ScheduleID'], people, visitor_id)
+                if hold_id is None:
+                    failed(message)
+                    continue
+                if args.payment_delay:
+                    time.sleep(args.payment_delay)
+
+            booking_id, message = timed('book', db.book_darshan, schedule['ScheduleID'], visitor_id, people,
+                                        hold_id=hold_id)
+            if booking_id is None:
+                if hold_id is not None:
+                    db.release_hold(hold_id)
+                failed(message)
+                continue
+            with lock:
+                outcomes['booked'] += 1
+                outcomes['people'] += people
+
+        with lock:
+            latencies['flow'].append(time.perf_counter() - flow_started)
+
+    before = lock_counters(db)
+    threads = [threading.Thread(target=devotee, args=(i,)) for i in range(args.devotees)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    after = lock_counters(db)
+
+    print(f"Devotees: {args.devotees}  Slots: {args.schedules} x {args.capacity}  Shards: {args.shards}  "
+          f"Holds: {'no' if args.no_holds else 'yes'}  Time: {elapsed:.2f}s")
+    print(f"Bookings: {outcomes['booked']} ({outcomes['people']} people) = {outcomes['booked'] / elapsed:,.1f} bookings/s, "
+          f"{outcomes['people'] / elapsed:,.1f} people/s")
+    print(f"Sold out: {outcomes['sold_out']}  Deadlock errors: {outcomes['deadlock_errors']}  "
+          f"Lock wait timeouts: {outcomes['lock_timeout_errors']}  Other errors: {outcomes['errors']}")
+
+    print(f"\n{'step':<10} {'calls':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for step in STEPS:
+        values = sorted(latencies.get(step, []))
+        if values:
+            print(f"{step:<10} {len(values):>7} {percentile(values, 50) * 1000:>9.1f} {percentile(values, 95) * 1000:>9.1f} "
+                  f"{percentile(values, 99) * 1000:>9.1f} {values[-1] * 1000:>9.1f}")
+
+    print("\nInnoDB (server-wide, during the run):")
+    for name in before:
+        if before[name] is None or after[name] is None:
+            print(f"  {name}: n/a")
+        else:
+            print(f"  {name}: {after[name] - before[name]}")
+
+    print(f"\n{'schedule':>9} {'capacity':>9} {'remaining':>10} {'booked':>8} {'held':>6}  ok")
+    rows = check_consistency(db, surge['schedule_ids'])
+    for row in rows:
+        print(f"{row['ScheduleID']:>9} {row['CurrentCapacity']:>9} {row['RemainingSlots']:>10} "
+              f"{row['booked']:>8} {row['held']:>6}  {'yes' if row['consistent'] else 'NO'}")
+    print(f"Pool: {db.pool.stats()}")
+
+    consistent = all(row['consistent'] for row in rows) and sum(row['booked'] for row in rows) == outcomes['people']
+
+    if not args.keep:
+        cleanup(db, surge, visitor_ids)
+
+    if not consistent:
+        print("FAIL: slot counters disagree with bookings and holds")
+        return 1
+    print("OK: slot counters match bookings and active holds")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+#migrations.py
+
+import mysql.connector
+from typing import Callable, List, Set, Tuple
+from db_pool import DB_CONFIG, get_pool
+from rollups import rebuild_rollups
+from visitor_stats import rebuild_visitor_stats
+
+MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS SchemaMigrations (
+    Version INT PRIMARY KEY,
+    Name VARCHAR(100) NOT NULL,
+    AppliedAt DATETIME DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Advisory lock so two processes starting at once don't upgrade concurrently
+MIGRATION_LOCK = 'temple_db_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 60
+
+# Rows rewritten per transaction by data migrations
+QR_REWRITE_BATCH = 1000
+
+# Schema helpers (each one is safe to re-run)
+def index_exists(cursor, table: str, index_name: str) -> bool:
+    """Check whether an index exists on a table"""
+    cursor.execute("""
+    SELECT COUNT(*) as count FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, index_name))
+    return cursor.fetchone()['count'] > 0
+
+def create_index(cursor, table: str, index_name: str, columns: List[str], unique: bool = False) -> None:
+    """Create an index unless it already exists"""
+    if not index_exists(cursor, table, index_name):
+        cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {index_name} ON {table} ({', '.join(columns)})")
+
+def column_exists(cursor, table: str, column: str) -> bool:
+    """Check whether a column exists on a table"""
+    cursor.execute("""
+    SELECT COUNT(*) as count FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()['count'] > 0
+
+def add_column(cursor, table: str, column: str, definition: str) -> None:
+    """Add a column unless it already exists"""
+    if not column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+# Migrations
+def _add_hot_path_indexes(conn, cursor) -> None:
+    """Indexes for the lookups that run on every page"""
+    create_index(cursor, 'Visitors', 'idx_visitors_mobile', ['MobileNumber'])
+    create_index(cursor, 'DarshanSchedules', 'idx_schedules_temple_date',
+                 ['TempleID', 'ScheduleDate', 'DarshanTypeID', 'IsCancelled'])
+    create_index(cursor, 'Donations', 'idx_donations_temple_date', ['TempleID', 'DonationDate'])
+    create_index(cursor, 'DarshanBookings', 'idx_bookings_visitor', ['VisitorID'])
+
+def _add_schedule_shards(conn, cursor) -> None:
+    """Sub-counters that spread a large schedule's RemainingSlots over several rows"""
+    add_column(cursor, 'DarshanSchedules', 'ShardCount', 'INT NOT NULL DEFAULT 0')
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS DarshanScheduleShards (
+        ScheduleID INT NOT NULL,
+        ShardNo INT NOT NULL,
+        RemainingSlots INT NOT NULL,
+        PRIMARY KEY (ScheduleID, ShardNo),
+        FOREIGN KEY (ScheduleID) REFERENCES DarshanSchedules(ScheduleID)
+    )
+    """)
+
+def _add_slot_holds(conn, cursor) -> None:
+    """Time-limited holds taken on slots while the devotee pays"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS SlotHolds (
+        HoldID INT AUTO_INCREMENT PRIMARY KEY,
+        ScheduleID INT NOT NULL,
+        VisitorID INT NULL,
+        NumberOfPeople INT NOT NULL,
+        HoldStatus VARCHAR(20) NOT NULL DEFAULT 'Active',
+        CreatedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+        ExpiresAt DATETIME NOT NULL,
+        BookingID INT NULL,
+        FOREIGN KEY (ScheduleID) REFERENCES DarshanSchedules(ScheduleID),
+        FOREIGN KEY (VisitorID) REFERENCES Visitors(VisitorID)
+    )
+    """)
+    create_index(cursor, 'SlotHolds', 'idx_holds_status_expiry', ['HoldStatus', 'ExpiresAt'])
+
+def _compact_qr_payloads(conn, cursor) -> None:
+    """Replace stored base64 QR images with the compact payload they encode, then shrink the column"""
+    cursor.execute("SELECT COALESCE(MAX(BookingID), 0) as max_id FROM DarshanBookings")
+    max_id = cursor.fetchone()['max_id']
+
+    # Short committed batches so booking inserts aren't blocked behind one huge update
+    for start in range(0, max_id, QR_REWRITE_BATCH):
+        cursor.execute("""
+        UPDATE DarshanBookings
+        SET QRCode = CONCAT('BOOK-', ScheduleID, '-', VisitorID, '-', NumberOfPeople, '-',
+                            COALESCE(PaymentReference, CONCAT('BK', BookingID)))
+        WHERE BookingID > %s AND BookingID <= %s
+          AND (QRCode IS NULL OR LENGTH(QRCode) > 255)
+        """, (start, start + QR_REWRITE_BATCH))
+        conn.commit()
+
+    cursor.execute("ALTER TABLE DarshanBookings MODIFY QRCode VARCHAR(255)")
+
+def _add_booking_check_in(conn, cursor) -> None:
+    """Gate check-in time for darshan bookings"""
+    add_column(cursor, 'DarshanBookings', 'CheckedInAt', 'DATETIME NULL')
+
+def _drop_duplicate_schedules(cursor) -> None:
+    """
+    Delete the extra schedules of slots (temple, darshan type, date, start time)
+    that were created more than once, keeping the one with bookings or holds.
+    Raises if a slot has bookings or holds on more than one of its schedules.
+    """
+    cursor.execute("""
+    SELECT TempleID, DarshanTypeID, ScheduleDate, StartTime FROM DarshanSchedules
+    GROUP BY TempleID, DarshanTypeID, ScheduleDate, StartTime
+    HAVING COUNT(*) > 1
+    """)
+    conflicts = []
+    for slot in cursor.fetchall():
+        cursor.execute("""
+        SELECT ds.ScheduleID,
+               (EXISTS (SELECT 1 FROM DarshanBookings b WHERE b.ScheduleID = ds.ScheduleID)
+                OR EXISTS (SELECT 1 FROM SlotHolds h WHERE h.ScheduleID = ds.ScheduleID)) as in_use
+        FROM DarshanSchedules ds
+        WHERE ds.TempleID = %s AND ds.DarshanTypeID = %s AND ds.ScheduleDate = %s AND ds.StartTime = %s
+        ORDER BY in_use DESC, ds.ScheduleID
+        """, (slot['TempleID'], slot['DarshanTypeID'], slot['ScheduleDate'], slot['StartTime']))
+        schedules = cursor.fetchall()
+
+        if sum(1 for schedule in schedules if schedule['in_use']) > 1:
+            conflicts.append(f"temple {slot['TempleID']}, darshan type {slot['DarshanTypeID']}, "
+                             f"{slot['ScheduleDate']} {slot['StartTime']}: schedules "
+                             + ", ".join(str(schedule['ScheduleID']) for schedule in schedules))
+            continue
+
+        spare = tuple(schedule['ScheduleID'] for schedule in schedules[1:])
+        placeholders = ", ".join(["%s"] * len(spare))
+        cursor.execute(f"DELETE FROM DarshanScheduleShards WHERE ScheduleID IN ({placeholders})", spare)
+        cursor.execute(f"DELETE FROM DarshanSchedules WHERE ScheduleID IN ({placeholders})", spare)
+
+    if conflicts:
+        raise mysql.connector.errors.IntegrityError(
+            msg="Duplicate darshan schedules with bookings or holds on more than one copy; merge them by hand "
+                "and re-run the migration:\n  " + "\n  ".join(conflicts))
+
+def _add_schedule_templates(conn, cursor) -> None:
+    """Recurring schedule templates, and one row per slot so lazy materialization can't duplicate"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ScheduleTemplates (
+        TemplateID INT AUTO_INCREMENT PRIMARY KEY,
+        TempleID INT NOT NULL,
+        DarshanTypeID INT NOT NULL,
+        StartTime TIME NOT NULL,
+        EndTime TIME NOT NULL,
+        Capacity INT NOT NULL,
+        WeekdayMask INT NOT NULL DEFAULT 127,
+        ValidFrom DATE NULL,
+        ValidTo DATE NULL,
+        IsActive BOOLEAN DEFAULT TRUE,
+        FOREIGN KEY (TempleID) REFERENCES Temples(TempleID),
+        FOREIGN KEY (DarshanTypeID) REFERENCES DarshanTypes(DarshanTypeID)
+    )
+    """)
+    create_index(cursor, 'ScheduleTemplates', 'idx_templates_temple', ['TempleID', 'IsActive'])
+    if not index_exists(cursor, 'DarshanSchedules', 'uq_schedules_slot'):
+        _drop_duplicate_schedules(cursor)
+    create_index(cursor, 'DarshanSchedules', 'uq_schedules_slot',
+                 ['TempleID', 'DarshanTypeID', 'ScheduleDate', 'StartTime'], unique=True)
+
+def _add_daily_rollups(conn, cursor) -> None:
+    """Per-day booking and donation totals for the dashboard, backfilled from existing rows"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS DailyBookingRollups (
+        TempleID INT NOT NULL,
+        RollupDate DATE NOT NULL,
+        DarshanTypeID INT NOT NULL,
+        ShardNo INT NOT NULL,
+        BookingCount INT NOT NULL DEFAULT 0,
+        VisitorCount INT NOT NULL DEFAULT 0,
+        TotalAmount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (TempleID, RollupDate, DarshanTypeID, ShardNo)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS DailyDonationRollups (
+        TempleID INT NOT NULL,
+        RollupDate DATE NOT NULL,
+        DonationTypeID INT NOT NULL,
+        ShardNo INT NOT NULL,
+        DonationCount INT NOT NULL DEFAULT 0,
+        TotalAmount DECIMAL(16, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (TempleID, RollupDate, DonationTypeID, ShardNo)
+    )
+    """)
+    conn.commit()
+    rebuild_rollups(conn, cursor)
+
+def _add_visitor_stats(conn, cursor) -> None:
+    """Per-visitor activity totals for the visitor reports, backfilled from existing rows"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS VisitorStats (
+        VisitorID INT PRIMARY KEY,
+        BookingCount INT NOT NULL DEFAULT 0,
+        BookingAmount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        DonationCount INT NOT NULL DEFAULT 0,
+        DonationAmount DECIMAL(16, 2) NOT NULL DEFAULT 0,
+        PujaCount INT NOT NULL DEFAULT 0,
+        PujaAmount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        PrasadamCount INT NOT NULL DEFAULT 0,
+        PrasadamAmount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        ActivityCount INT NOT NULL DEFAULT 0,
+        LastActivity DATETIME NULL
+    )
+    """)
+    create_index(cursor, 'VisitorStats', 'idx_visitor_stats_activity', ['ActivityCount'])
+    create_index(cursor, 'Visitors', 'idx_visitors_last_visit', ['LastVisit'])
+    conn.commit()
+    rebuild_visitor_stats(conn, cursor)
+
+# Ordered (version, name, upgrade) list. Append new migrations at the end and
+# never renumber or edit one that has shipped.
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'hot_path_indexes', _add_hot_path_indexes),
+    (2, 'schedule_slot_shards', _add_schedule_shards),
+    (3, 'slot_holds', _add_slot_holds),
+    (4, 'compact_qr_payloads', _compact_qr_payloads),
+    (5, 'booking_check_in', _add_booking_check_in),
+    (6, 'schedule_templates', _add_schedule_templates),
+    (7, 'daily_rollups', _add_daily_rollups),
+    (8, 'visitor_stats', _add_visitor_stats),
+]
+
+def applied_versions(cursor) -> Set[int]:
+    """Get the set of migration versions already applied"""
+    cursor.execute("SELECT Version FROM SchemaMigrations")
+    return {row['Version'] for row in cursor.fetchall()}
+
+def migrate(conn, cursor, target: int = None) -> List[int]:
+    """Apply pending migrations in order, up to target if given. Returns the versions applied."""
+    cursor.execute(MIGRATIONS_TABLE)
+    conn.commit()
+
+    cursor.execute("SELECT GET_LOCK(%s, %s) as locked", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+    if not cursor.fetchone()['locked']:
+        raise mysql.connector.errors.OperationalError(msg="Timed out waiting for the schema migration lock")
+
+    applied = []
+    try:
+        done = applied_versions(cursor)
+
+        for version, name, upgrade in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
+
+            print(f"Applying migration {version}: {name}")
+            upgrade(conn, cursor)
+            cursor.execute(
+                "INSERT INTO SchemaMigrations (Version, Name) VALUES (%s, %s)",
+                (version, name)
+            )
+            conn.commit()
+            applied.append(version)
+    except mysql.connector.Error as err:
+        print(f"Error applying migrations: {err}")
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s) as released", (MIGRATION_LOCK,))
+        cursor.fetchone()
+
+    return applied
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the temple database")
+    parser.add_argument("--target", type=int, default=None, help="Stop after this version")
+    parser.add_argument("--status", action="store_true", help="Only list applied and pending migrations")
+    args = parser.parse_args()
+
+    conn = get_pool(DB_CONFIG).get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        if args.status:
+            cursor.execute(MIGRATIONS_TABLE)
+            done = applied_versions(cursor)
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:>4}  {name:<40} {'applied' if version in done else 'pending'}")
+        else:
+            applied = migrate(conn, cursor, args.target)
+            print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
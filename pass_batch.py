@@ -0,0 +1,243 @@
+#pass_batch.py
+#
+# Bulk entry-pass generation for group and trust bookings. QR rendering is
+# spread over a process pool and each pass is written to the ZIP or PDF as
+# soon as it is ready, so only a bounded window of images is in memory.
+#
+#   python pass_batch.py --schedule 42 --out passes.pdf
+#   python pass_batch.py --synthetic 20000 --out passes.zip
+
+import argparse
+import os
+import sys
+import time
+import zlib
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from booking import make_qr_image, render_qr_png
+
+# Passes rendered per worker task, and tasks kept in flight per worker
+CHUNK_SIZE = 64
+TASKS_PER_WORKER = 2
+
+# Page size in points (A6) and the QR code's printed width
+PDF_PAGE_SIZE = (297, 420)
+PDF_QR_SIZE = 240
+
+
+def _render_png_chunk(payloads: List[str]) -> List[bytes]:
+    """Worker: render PNGs for a chunk of payloads"""
+    return [render_qr_png(payload) for payload in payloads]
+
+def _render_bitmap_chunk(payloads: List[str]) -> List[Tuple[int, int, bytes]]:
+    """Worker: render compressed 1-bit bitmaps (width, height, data) for a chunk of payloads"""
+    rendered = []
+    for payload in payloads:
+        image = make_qr_image(payload)
+        rendered.append((image.width, image.height, zlib.compress(image.tobytes())))
+    return rendered
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def render_passes(passes: Iterable[Tuple[str, str]], render: Callable, workers: int = None,
+                  chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[str, Any]]:
+    """
+    Render (name, payload) pairs in a process pool, yielding (name, rendered) in
+    input order. Input is consumed lazily and at most TASKS_PER_WORKER chunks per
+    worker are in flight at once.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = workers * TASKS_PER_WORKER
+    in_flight = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in _chunks(passes, chunk_size):
+            names = [name for name, _ in chunk]
+            in_flight.append((names, executor.submit(render, [payload for _, payload in chunk])))
+
+            if len(in_flight) >= window:
+                names, future = in_flight.popleft()
+                yield from zip(names, future.result())
+
+        while in_flight:
+            names, future = in_flight.popleft()
+            yield from zip(names, future.result())
+
+
+class _PdfWriter:
+    """Minimal streaming PDF writer: one 1-bit image per page, written as it arrives"""
+
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.offsets: Dict[int, int] = {}
+        self.pages: List[int] = []
+        self.next_id = 3  # 1 = catalog, 2 = page tree, both written at the end
+        self.written = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes) -> None:
+        self.out.write(data)
+        self.written += len(data)
+
+    def _object(self, obj_id: int, body: bytes, stream: bytes = None) -> None:
+        self.offsets[obj_id] = self.written
+        self._write(f"{obj_id} 0 obj\n".encode() + body)
+        if stream is not None:
+            self._write(b"\nstream\n" + stream + b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def add_page(self, name: str, width: int, height: int, bitmap: bytes) -> None:
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+
+        self._object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode /Length {len(bitmap)} >>"
+        ).encode(), bitmap)
+
+        page_width, page_height = PDF_PAGE_SIZE
+        x = (page_width - PDF_QR_SIZE) / 2
+        y = page_height - PDF_QR_SIZE - 60
+        label = name.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        content = (
+            f"q {PDF_QR_SIZE} 0 0 {PDF_QR_SIZE} {x:.1f} {y:.1f} cm /QR Do Q\n"
+            f"BT /F1 14 Tf {x:.1f} {y - 30:.1f} Td (Entry Pass {label}) Tj ET"
+        ).encode()
+        self._object(content_id, f"<< /Length {len(content)} >>".encode(), content)
+
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width} {page_height}] "
+            f"/Resources << /XObject << /QR {image_id} 0 R >> "
+            f"/Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> >> >> "
+            f"/Contents {content_id} 0 R >>"
+        ).encode())
+        self.pages.append(page_id)
+
+    def close(self) -> None:
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.pages)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode())
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self.written
+        total = self.next_id
+        lines = [f"xref\n0 {total}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, total):
+            lines.append(f"{self.offsets.get(obj_id, 0):010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {total} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._write("".join(lines).encode())
+
+def generate_passes(passes: Iterable[Tuple[str, str]], out_path: str, fmt: str = None,
+                    workers: int = None, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Render (name, payload) pairs into a ZIP of PNGs or a multi-page PDF.
+    The format defaults to the output file's extension. Returns throughput stats.
+    """
+    fmt = (fmt or os.path.splitext(out_path)[1].lstrip('.') or 'zip').lower()
+    if fmt not in ('zip', 'pdf'):
+        raise ValueError(f"Unsupported pass format: {fmt}")
+
+    started = time.perf_counter()
+    count = 0
+
+    if fmt == 'zip':
+        # PNGs are already compressed, so store them as-is
+        with zipfile.ZipFile(out_path, 'w', zipfile.ZIP_STORED) as archive:
+            for name, png in render_passes(passes, _render_png_chunk, workers, chunk_size):
+                archive.writestr(f"{name}.png", png)
+                count += 1
+    else:
+        with open(out_path, 'wb') as out:
+            pdf = _PdfWriter(out)
+            for name, (width, height, bitmap) in render_passes(passes, _render_bitmap_chunk, workers, chunk_size):
+                pdf.add_page(name, width, height, bitmap)
+                count += 1
+            pdf.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'passes': count,
+        'format': fmt,
+        'seconds': round(elapsed, 3),
+        'passes_per_second': round(count / elapsed, 1) if elapsed else 0.0,
+        'bytes': os.path.getsize(out_path)
+    }
+
+def iter_booking_passes(db, schedule_id: int = None, booking_ids: List[int] = None,
+                        batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+    """Stream (name, QR payload) pairs for a schedule's bookings or a list of booking IDs"""
+    last_id = 0
+    while True:
+        with db.unit_of_work():
+            if booking_ids is not None:
+                batch_ids = [booking_id for booking_id in booking_ids if booking_id > last_id]
+                batch_ids = sorted(batch_ids)[:batch_size]
+                if not batch_ids:
+                    return
+                placeholders = ", ".join(["%s"] * len(batch_ids))
+                db.cursor.execute(
+                    f"SELECT BookingID, QRCode FROM DarshanBookings WHERE BookingID IN ({placeholders}) ORDER BY BookingID",
+                    batch_ids
+                )
+                last_seen = batch_ids[-1]
+            else:
+                db.cursor.execute("""
+                SELECT BookingID, QRCode FROM DarshanBookings
+                WHERE ScheduleID = %s AND BookingID > %s AND BookingStatus = 'Confirmed'
+                ORDER BY BookingID
+                LIMIT %s
+                """, (schedule_id, last_id, batch_size))
+                last_seen = None
+            rows = db.cursor.fetchall()
+
+        for row in rows:
+            if row['QRCode']:
+                yield f"BK-{row['BookingID']}", row['QRCode']
+
+        if booking_ids is None:
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]['BookingID']
+        else:
+            last_id = last_seen
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate printable entry passes in bulk")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--schedule", type=int, help="All confirmed bookings of this ScheduleID")
+    source.add_argument("--bookings", type=str, help="Comma-separated BookingIDs")
+    source.add_argument("--synthetic", type=int, help="N generated signed passes (no database), for throughput checks")
+    parser.add_argument("--out", required=True, help="Output .zip or .pdf")
+    parser.add_argument("--format", choices=["zip", "pdf"], default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        from datetime import date
+        from entry_pass import sign_pass
+        passes = ((f"BK-{i}", sign_pass(i, 1, 1 + i % 5, date.today())) for i in range(1, args.synthetic + 1))
+    else:
+        from booking import TempleDatabase
+        db = TempleDatabase(per_request=True)
+        booking_ids = [int(b) for b in args.bookings.split(",")] if args.bookings else None
+        passes = iter_booking_passes(db, args.schedule, booking_ids)
+
+    stats = generate_passes(passes, args.out, args.format, args.workers, args.chunk_size)
+    print(f"Generated {stats['passes']} passes into {args.out} ({stats['format']}, "
+          f"{stats['bytes'] / 1024 / 1024:.1f} MB) in {stats['seconds']:.2f}s "
+          f"= {stats['passes_per_second']:,.0f} passes/s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#rollups.py
+
+import os
+import random
+import mysql.connector
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from db_pool import DB_CONFIG, get_pool
+
+# Rows each (temple, day, type) total is spread over. Writers add to a random one, so
+# concurrent bookings of the same darshan don't queue on a single row lock.
+ROLLUP_SHARDS = int(os.environ.get('TEMPLE_ROLLUP_SHARDS', 8))
+
+# Days recomputed per transaction by rebuild_rollups()
+REBUILD_BATCH_DAYS = 31
+
+BOOKING_ROLLUP_SQL = """
+INSERT INTO DailyBookingRollups (TempleID, RollupDate, DarshanTypeID, ShardNo,
+                                 BookingCount, VisitorCount, TotalAmount)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE BookingCount = BookingCount + VALUES(BookingCount),
+    VisitorCount = VisitorCount + VALUES(VisitorCount), TotalAmount = TotalAmount + VALUES(TotalAmount)
+"""
+
+# Aggregates of existing booking/donation rows, added into the rollups (sign -1 to take them out)
+_BOOKING_ROWS_ROLLUP = """
+INSERT INTO DailyBookingRollups (TempleID, RollupDate, DarshanTypeID, ShardNo,
+                                 BookingCount, VisitorCount, TotalAmount)
+SELECT ds.TempleID, ds.ScheduleDate, ds.DarshanTypeID, %s,
+       %s * COUNT(*), %s * SUM(b.NumberOfPeople), %s * SUM(b.TotalAmount)
+FROM DarshanBookings b
+JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
+WHERE {where}
+GROUP BY ds.TempleID, ds.ScheduleDate, ds.DarshanTypeID
+ON DUPLICATE KEY UPDATE BookingCount = BookingCount + VALUES(BookingCount),
+    VisitorCount = VisitorCount + VALUES(VisitorCount), TotalAmount = TotalAmount + VALUES(TotalAmount)
+"""
+
+_DONATION_ROWS_ROLLUP = """
+INSERT INTO DailyDonationRollups (TempleID, RollupDate, DonationTypeID, ShardNo, DonationCount, TotalAmount)
+SELECT d.TempleID, DATE(d.DonationDate), d.DonationTypeID, %s, %s * COUNT(*), %s * SUM(d.Amount)
+FROM Donations d
+WHERE {where}
+GROUP BY d.TempleID, DATE(d.DonationDate), d.DonationTypeID
+ON DUPLICATE KEY UPDATE DonationCount = DonationCount + VALUES(DonationCount),
+    TotalAmount = TotalAmount + VALUES(TotalAmount)
+"""
+
+# Dated by the stored DonationDate, so the server clock decides the day as it does for the row
+DONATION_ROLLUP_SQL = _DONATION_ROWS_ROLLUP.format(where="d.DonationID = %s")
+
+_BOOKING_FILTERS = {'BookingID': 'b.BookingID', 'VisitorID': 'b.VisitorID', 'ScheduleID': 'b.ScheduleID'}
+_DONATION_FILTERS = {'DonationID': 'd.DonationID', 'VisitorID': 'd.VisitorID'}
+
+def rollup_shard() -> int:
+    """Pick the rollup row a writer adds to"""
+    return random.randrange(ROLLUP_SHARDS)
+
+def booking_increments(bookings: List[Tuple[int, Any, int, int, float]]) -> List[Tuple]:
+    """
+    Parameters for BOOKING_ROLLUP_SQL from (temple_id, schedule_date, darshan_type_id,
+    num_people, amount) per booking: one row per day and darshan type, in key order
+    so concurrent batches lock rollup rows in the same order.
+    """
+    totals: Dict[Tuple, List] = {}
+    for temple_id, day, darshan_type_id, num_people, amount in bookings:
+        total = totals.setdefault((temple_id, day, darshan_type_id), [0, 0, 0])
+        total[0] += 1
+        total[1] += num_people
+        total[2] += amount
+    shard = rollup_shard()
+    return [key + (shard, *total) for key, total in sorted(totals.items())]
+
+def donation_increment(donation_id: int) -> Tuple:
+    """Parameters for DONATION_ROLLUP_SQL for a newly inserted donation"""
+    return (rollup_shard(), 1, 1, donation_id)
+
+def retract_bookings(cursor, column: str, *values: int) -> None:
+    """Take the bookings whose column is one of values out of the rollups; run just before deleting them"""
+    where = f"{_BOOKING_FILTERS[column]} IN ({', '.join(['%s'] * len(values))})"
+    cursor.execute(_BOOKING_ROWS_ROLLUP.format(where=where), (rollup_shard(), -1, -1, -1) + values)
+
+def retract_donations(cursor, column: str, *values: int) -> None:
+    """Take the donations whose column is one of values out of the rollups; run just before deleting them"""
+    where = f"{_DONATION_FILTERS[column]} IN ({', '.join(['%s'] * len(values))})"
+    cursor.execute(_DONATION_ROWS_ROLLUP.format(where=where), (rollup_shard(), -1, -1) + values)
+
+def _date_range(cursor, queries: List[str], params: Tuple) -> Tuple[Optional[date], Optional[date]]:
+    """Earliest and latest date over several (min_day, max_day) queries"""
+    lows, highs = [], []
+    for query in queries:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        if row['min_day'] is not None:
+            lows.append(_as_date(row['min_day']))
+            highs.append(_as_date(row['max_day']))
+    return (min(lows), max(highs)) if lows else (None, None)
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+def rebuild_rollups(conn, cursor, temple_id: int = None, start: date = None, end: date = None) -> Dict[str, int]:
+    """
+    Recompute the rollups from DarshanBookings and Donations for start..end (default
+    every day that has bookings, donations or rollups), optionally for one temple.
+    Commits every REBUILD_BATCH_DAYS days; run it off-peak. Returns the rows written per table.
+    """
+    temple_sql, temple_params = ("AND TempleID = %s", (temple_id,)) if temple_id else ("", ())
+    if start is None or end is None:
+        low, high = _date_range(cursor, [
+            f"SELECT MIN(ScheduleDate) as min_day, MAX(ScheduleDate) as max_day FROM DarshanSchedules "
+            f"WHERE ScheduleID IN (SELECT ScheduleID FROM DarshanBookings) {temple_sql}",
+            f"SELECT MIN(DonationDate) as min_day, MAX(DonationDate) as max_day FROM Donations WHERE 1 = 1 {temple_sql}",
+            f"SELECT MIN(RollupDate) as min_day, MAX(RollupDate) as max_day FROM DailyBookingRollups WHERE 1 = 1 {temple_sql}",
+            f"SELECT MIN(RollupDate) as min_day, MAX(RollupDate) as max_day FROM DailyDonationRollups WHERE 1 = 1 {temple_sql}",
+        ], temple_params)
+        start, end = start or low, end or high
+    written = {'DailyBookingRollups': 0, 'DailyDonationRollups': 0}
+    if start is None or end is None:
+        return written
+
+    booking_temple = "AND ds.TempleID = %s" if temple_id else ""
+    donation_temple = "AND d.TempleID = %s" if temple_id else ""
+    batch_start = start
+    while batch_start <= end:
+        batch_end = min(batch_start + timedelta(days=REBUILD_BATCH_DAYS - 1), end)
+        days = (batch_start, batch_end)
+
+        cursor.execute(f"DELETE FROM DailyBookingRollups WHERE RollupDate BETWEEN %s AND %s {temple_sql}",
+                       days + temple_params)
+        cursor.execute(_BOOKING_ROWS_ROLLUP.format(where=f"ds.ScheduleDate BETWEEN %s AND %s {booking_temple}"),
+                       (0, 1, 1, 1) + days + temple_params)
+        written['DailyBookingRollups'] += max(cursor.rowcount, 0)
+
+        cursor.execute(f"DELETE FROM DailyDonationRollups WHERE RollupDate BETWEEN %s AND %s {temple_sql}",
+                       days + temple_params)
+        cursor.execute(_DONATION_ROWS_ROLLUP.format(where=f"d.DonationDate >= %s AND d.DonationDate < %s {donation_temple}"),
+                       (0, 1, 1, batch_start, batch_end + timedelta(days=1)) + temple_params)
+        written['DailyDonationRollups'] += max(cursor.rowcount, 0)
+
+        conn.commit()
+        batch_start = batch_end + timedelta(days=1)
+    return written
+
+def check_rollups(cursor, temple_id: int = None) -> List[Dict]:
+    """Compare the rollups with fresh aggregates of the source tables; returns the days that differ"""
+    temple_sql, temple_params = ("WHERE TempleID = %s", (temple_id,)) if temple_id else ("", ())
+    booking_temple = "WHERE ds.TempleID = %s" if temple_id else ""
+    checks = [
+        ('booking', f"""
+         SELECT ds.TempleID, ds.ScheduleDate as day, ds.DarshanTypeID as type_id,
+                COUNT(*) as count, SUM(b.NumberOfPeople) as people, SUM(b.TotalAmount) as amount
+         FROM DarshanBookings b JOIN DarshanSchedules ds ON b.ScheduleID = ds.ScheduleID
+         {booking_temple}
+         GROUP BY ds.TempleID, ds.ScheduleDate, ds.DarshanTypeID
+         """, f"""
+         SELECT TempleID, RollupDate as day, DarshanTypeID as type_id,
+                SUM(BookingCount) as count, SUM(VisitorCount) as people, SUM(TotalAmount) as amount
+         FROM DailyBookingRollups {temple_sql}
+         GROUP BY TempleID, RollupDate, DarshanTypeID
+         """),
+        ('donation', f"""
+         SELECT TempleID, DATE(DonationDate) as day, DonationTypeID as type_id,
+                COUNT(*) as count, 0 as people, SUM(Amount) as amount
+         FROM Donations {temple_sql}
+         GROUP BY TempleID, DATE(DonationDate), DonationTypeID
+         """, f"""
+         SELECT TempleID, RollupDate as day, DonationTypeID as type_id,
+                SUM(DonationCount) as count, 0 as people, SUM(TotalAmount) as amount
+         FROM DailyDonationRollups {temple_sql}
+         GROUP BY TempleID, RollupDate, DonationTypeID
+         """),
+    ]
+    mismatches = []
+    for kind, source_query, rollup_query in checks:
+        totals = []
+        for query in (source_query, rollup_query):
+            cursor.execute(query, temple_params)
+            totals.append({(row['TempleID'], _as_date(row['day']), row['type_id']):
+                           (int(row['count'] or 0), int(row['people'] or 0), float(row['amount'] or 0))
+                           for row in cursor.fetchall()})
+        source, rollup = totals
+        for key in sorted(set(source) | set(rollup)):
+            expected, actual = source.get(key, (0, 0, 0.0)), rollup.get(key, (0, 0, 0.0))
+            if expected[:2] != actual[:2] or abs(expected[2] - actual[2]) > 0.005:
+                mismatches.append({'kind': kind, 'temple_id': key[0], 'day': key[1], 'type_id': key[2],
+                                   'expected': expected, 'actual': actual})
+    return mismatches
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild or verify the daily dashboard rollups")
+    parser.add_argument("--check", action="store_true", help="Only report days whose rollups disagree")
+    parser.add_argument("--temple", type=int, default=None, help="Limit to one temple")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, default=None,
+                        help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, default=None,
+                        help="Last day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    conn = get_pool(DB_CONFIG).get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        if args.check:
+            mismatches = check_rollups(cursor, args.temple)
+            for row in mismatches:
+                print(f"{row['kind']:<9} temple {row['temple_id']} {row['day']} type {row['type_id']}: "
+                      f"expected {row['expected']}, rollup has {row['actual']}")
+            print(f"{len(mismatches)} mismatched day(s)" if mismatches else "Rollups match the source tables")
+            return 1 if mismatches else 0
+        written = rebuild_rollups(conn, cursor, args.temple, args.start, args.end)
+        print(f"Rebuilt {written['DailyBookingRollups']:,} booking and "
+              f"{written['DailyDonationRollups']:,} donation rollup rows")
+        return 0
+    except mysql.connector.Error as err:
+        print(f"Error rebuilding rollups: {err}")
+        conn.rollback()
+        return 1
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,260 @@
+#schedule_generator.py
+#
+# Bulk creation of DarshanSchedules from per-darshan-type templates. Rows for
+# the whole date range are computed at once with pandas and written with
+# multi-row INSERTs, so a year's calendar takes seconds.
+#
+#   python schedule_generator.py --temple 1 --days 365
+
+import argparse
+import sys
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import mysql.connector
+import pandas as pd
+
+# Daily windows per darshan type. Optional 'Weekdays' limits a window to
+# some days of the week (0 = Monday).
+DEFAULT_TEMPLATES = [
+    {'DarshanName': 'Regular Darshan', 'StartTime': '05:30', 'EndTime': '21:30', 'Capacity': 10000},
+    {'DarshanName': 'VIP Darshan', 'StartTime': '07:00', 'EndTime': '10:00', 'Capacity': 2000},
+    {'DarshanName': 'VIP Darshan', 'StartTime': '16:00', 'EndTime': '19:00', 'Capacity': 2000},
+    {'DarshanName': 'Morning Aarti', 'StartTime': '05:30', 'EndTime': '06:15', 'Capacity': 1000},
+    {'DarshanName': 'Evening Aarti', 'StartTime': '19:00', 'EndTime': '19:45', 'Capacity': 1000},
+]
+
+# Rows per INSERT statement
+INSERT_BATCH = 1000
+
+SCHEDULE_COLUMNS = ['TempleID', 'DarshanTypeID', 'FestivalID', 'ScheduleDate',
+                    'StartTime', 'EndTime', 'CurrentCapacity', 'RemainingSlots']
+
+def resolve_templates(templates: List[Dict], darshan_type_ids: Dict[str, int]) -> List[Dict]:
+    """Fill in DarshanTypeID for templates given by DarshanName, dropping unknown types"""
+    resolved = []
+    for template in templates:
+        darshan_type_id = template.get('DarshanTypeID') or darshan_type_ids.get(template.get('DarshanName'))
+        if darshan_type_id is not None:
+            resolved.append({**template, 'DarshanTypeID': darshan_type_id})
+    return resolved
+
+def _weekday_mask(weekdays: Optional[List[int]]) -> int:
+    """Bitmask of allowed weekdays (all days when None)"""
+    if not weekdays:
+        return 0b1111111
+    return sum(1 << day for day in set(weekdays))
+
+def _template_frame(templates: List[Dict]) -> pd.DataFrame:
+    return pd.DataFrame([{
+        'DarshanTypeID': template['DarshanTypeID'],
+        'StartTime': template['StartTime'],
+        'EndTime': template['EndTime'],
+        'Capacity': template['Capacity'],
+        'WeekdayMask': _weekday_mask(template.get('Weekdays'))
+    } for template in templates], columns=['DarshanTypeID', 'StartTime', 'EndTime', 'Capacity', 'WeekdayMask'])
+
+def _expand(dates: pd.Series, templates: List[Dict]) -> pd.DataFrame:
+    """Cross dates with template windows, keeping each window's weekdays only"""
+    frame = pd.DataFrame({'ScheduleDate': dates}).merge(_template_frame(templates), how='cross')
+    on_weekday = frame['WeekdayMask'] // (2 ** frame['ScheduleDate'].dt.dayofweek) % 2 == 1
+    return frame[on_weekday]
+
+def build_schedule_frame(temple_id: int, start_date: date, days: int, templates: List[Dict],
+                         festivals: List[Dict] = None) -> pd.DataFrame:
+    """
+    Compute schedule rows for days days from start_date.
+
+    Each festival dict has FestivalID, StartDate and EndDate, plus optional
+    CapacityFactor (scales capacity on festival days), DarshanTypeIDs (limits
+    the override to those types) and ExtraWindows (more templates that only
+    run during the festival).
+    """
+    dates = pd.Series(pd.date_range(start_date, periods=days, freq='D'))
+    frame = _expand(dates, templates)
+    frame['FestivalID'] = None
+    frame['CurrentCapacity'] = frame['Capacity']
+
+    extra_frames = []
+    for festival in festivals or []:
+        start = pd.Timestamp(festival['StartDate'])
+        end = pd.Timestamp(festival['EndDate'])
+
+        in_festival = frame['ScheduleDate'].between(start, end)
+        if festival.get('DarshanTypeIDs'):
+            in_festival &= frame['DarshanTypeID'].isin(festival['DarshanTypeIDs'])
+
+        frame.loc[in_festival, 'FestivalID'] = festival['FestivalID']
+        factor = festival.get('CapacityFactor', 1.0)
+        if factor != 1.0:
+            frame.loc[in_festival, 'CurrentCapacity'] = (frame.loc[in_festival, 'Capacity'] * factor).round()
+
+        if festival.get('ExtraWindows'):
+            festival_dates = dates[dates.between(start, end)]
+            extra = _expand(festival_dates, festival['ExtraWindows'])
+            extra['FestivalID'] = festival['FestivalID']
+            extra['CurrentCapacity'] = extra['Capacity']
+            extra_frames.append(extra)
+
+    if extra_frames:
+        frame = pd.concat([frame] + extra_frames, ignore_index=True)
+
+    frame['TempleID'] = temple_id
+    frame['CurrentCapacity'] = frame['CurrentCapacity'].astype(int)
+    frame['RemainingSlots'] = frame['CurrentCapacity']
+    return frame.sort_values(['ScheduleDate', 'StartTime', 'DarshanTypeID'])[SCHEDULE_COLUMNS].reset_index(drop=True)
+
+def _minutes(times: pd.Series) -> pd.Series:
+    """Minutes past midnight for 'HH:MM' strings or MySQL TIME values (timedeltas)"""
+    if times.empty:
+        return pd.Series([], dtype='int64', index=times.index)
+    if isinstance(times.iloc[0], str):
+        times = pd.to_timedelta(times.str.slice(0, 5) + ':00')
+    else:
+        times = pd.to_timedelta(times)
+    return (times.dt.total_seconds() // 60).astype('int64')
+
+def drop_existing(cursor, frame: pd.DataFrame) -> pd.DataFrame:
+    """Remove rows whose (temple, type, date, start time) slot already exists"""
+    if frame.empty:
+        return frame
+
+    cursor.execute("""
+    SELECT DarshanTypeID, ScheduleDate, StartTime FROM DarshanSchedules
+    WHERE TempleID = %s AND ScheduleDate BETWEEN %s AND %s
+    """, (int(frame['TempleID'].iloc[0]), frame['ScheduleDate'].min().date(), frame['ScheduleDate'].max().date()))
+    existing = pd.DataFrame(cursor.fetchall(), columns=['DarshanTypeID', 'ScheduleDate', 'StartTime'])
+    if existing.empty:
+        return frame
+
+    existing['ScheduleDate'] = pd.to_datetime(existing['ScheduleDate'])
+    existing['StartMinutes'] = _minutes(existing['StartTime'])
+    keyed = frame.assign(StartMinutes=_minutes(frame['StartTime']))
+    merged = keyed.merge(existing[['DarshanTypeID', 'ScheduleDate', 'StartMinutes']].drop_duplicates(),
+                         on=['DarshanTypeID', 'ScheduleDate', 'StartMinutes'], how='left', indicator=True)
+    return frame[(merged['_merge'] == 'left_only').to_numpy()]
+
+def insert_schedule_rows(cursor, frame: pd.DataFrame, batch_size: int = INSERT_BATCH) -> int:
+    """
+    Insert schedule rows with multi-row INSERT statements in the current transaction.
+    Slots materialized concurrently from templates are skipped by the unique slot key.
+    """
+    if frame.empty:
+        return 0
+
+    rows = frame.assign(ScheduleDate=frame['ScheduleDate'].dt.strftime('%Y-%m-%d'))[SCHEDULE_COLUMNS]
+    # object dtype turns numpy scalars into plain Python values the connector accepts
+    rows = rows.astype(object).where(rows.notna(), None).values.tolist()
+
+    placeholder = "(" + ", ".join(["%s"] * len(SCHEDULE_COLUMNS)) + ")"
+    inserted = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        cursor.execute(
+            f"INSERT INTO DarshanSchedules ({', '.join(SCHEDULE_COLUMNS)}) VALUES "
+            + ", ".join([placeholder] * len(batch))
+            + " ON DUPLICATE KEY UPDATE ScheduleID = ScheduleID",
+            [value for row in batch for value in row]
+        )
+        inserted += cursor.rowcount
+    return inserted
+
+def save_templates(cursor, temple_id: int, templates: List[Dict]) -> int:
+    """Store resolved templates as recurring ScheduleTemplates rows for on-demand materialization"""
+    if not templates:
+        return 0
+
+    rows = [(temple_id, template['DarshanTypeID'], template['StartTime'], template['EndTime'],
+             template['Capacity'], _weekday_mask(template.get('Weekdays')),
+             template.get('ValidFrom'), template.get('ValidTo'))
+            for template in templates]
+    cursor.execute(
+        "INSERT INTO ScheduleTemplates (TempleID, DarshanTypeID, StartTime, EndTime, Capacity, "
+        "WeekdayMask, ValidFrom, ValidTo) VALUES "
+        + ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(rows)),
+        [value for row in rows for value in row]
+    )
+    return len(rows)
+
+def generate_schedules(db, temple_id: int, start_date: date = None, days: int = 90,
+                       templates: List[Dict] = None, festival_overrides: Dict[int, Dict] = None) -> int:
+    """
+    Create the temple's schedules for days days from start_date (default today),
+    skipping slots that already exist. Festivals in the range tag their days'
+    rows with FestivalID; festival_overrides maps FestivalID to CapacityFactor,
+    DarshanTypeIDs and ExtraWindows settings. Returns the number of rows created.
+    """
+    start_date = start_date or date.today()
+    end_date = start_date + timedelta(days=days - 1)
+    festival_overrides = festival_overrides or {}
+
+    darshan_type_ids = {dt['DarshanName']: dt['DarshanTypeID'] for dt in db.get_darshan_types(temple_id)}
+    templates = resolve_templates(templates or DEFAULT_TEMPLATES, darshan_type_ids)
+    if not templates:
+        print("No schedule templates match this temple's darshan types")
+        return 0
+
+    with db.unit_of_work():
+        try:
+            db.cursor.execute("""
+            SELECT FestivalID, StartDate, EndDate FROM Festivals
+            WHERE TempleID = %s AND StartDate <= %s AND EndDate >= %s
+            """, (temple_id, end_date, start_date))
+            festivals = [{**festival, **festival_overrides.get(festival['FestivalID'], {})}
+                         for festival in db.cursor.fetchall()]
+            for festival in festivals:
+                if festival.get('ExtraWindows'):
+                    festival['ExtraWindows'] = resolve_templates(festival['ExtraWindows'], darshan_type_ids)
+
+            frame = build_schedule_frame(temple_id, start_date, days, templates, festivals)
+            frame = drop_existing(db.cursor, frame)
+            created = insert_schedule_rows(db.cursor, frame)
+
+            db.conn.commit()
+            return created
+        except mysql.connector.Error as err:
+            print(f"Error generating schedules: {err}")
+            db.conn.rollback()
+            return 0
+
+def main() -> int:
+    import time
+    from booking import TempleDatabase
+
+    parser = argparse.ArgumentParser(description="Generate darshan schedules from templates")
+    parser.add_argument("--temple", type=int, required=True, help="TempleID")
+    parser.add_argument("--start", default=None, help="First date (YYYY-MM-DD, default today)")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--festival-capacity", type=float, default=1.0,
+                        help="Capacity multiplier on festival days")
+    parser.add_argument("--save-templates", action="store_true",
+                        help="Store the default templates as recurring ScheduleTemplates instead of creating rows")
+    args = parser.parse_args()
+
+    start_date = datetime.strptime(args.start, '%Y-%m-%d').date() if args.start else date.today()
+    db = TempleDatabase(per_request=True)
+
+    if args.save_templates:
+        darshan_type_ids = {dt['DarshanName']: dt['DarshanTypeID'] for dt in db.get_darshan_types(args.temple)}
+        with db.unit_of_work():
+            saved = save_templates(db.cursor, args.temple, resolve_templates(DEFAULT_TEMPLATES, darshan_type_ids))
+            db.conn.commit()
+        db.invalidate_catalogue()
+        print(f"Saved {saved} recurring schedule templates")
+        return 0
+
+    overrides = {}
+    if args.festival_capacity != 1.0:
+        with db.unit_of_work():
+            db.cursor.execute("SELECT FestivalID FROM Festivals WHERE TempleID = %s", (args.temple,))
+            overrides = {row['FestivalID']: {'CapacityFactor': args.festival_capacity}
+                         for row in db.cursor.fetchall()}
+
+    started = time.perf_counter()
+    created = generate_schedules(db, args.temple, start_date, args.days, festival_overrides=overrides)
+    print(f"Created {created} schedules for {args.days} days from {start_date} "
+          f"in {time.perf_counter() - started:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
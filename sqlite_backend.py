@@ -0,0 +1,510 @@
+#sqlite_backend.py
+#
+# Embedded SQLite backend. Connections from connect() look like MySQL
+# Connector/Python connections to the rest of the code: they take the same
+# MySQL-dialect SQL (translated here), return the same Python types, and raise
+# mysql.connector errors. Selected with TEMPLE_DB_BACKEND=sqlite.
+#
+# Locking follows InnoDB closely enough for the booking code: any write,
+# SELECT ... FOR UPDATE or SAVEPOINT opens a BEGIN IMMEDIATE transaction, which
+# holds the database's single write lock until commit or rollback. DDL commits
+# first, as it does in MySQL. Admin pages that query MySQL-only catalogues
+# (table_constraints, data_length, ...) are not supported.
+
+import os
+import re
+import sqlite3
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Tuple
+
+import mysql.connector
+
+# Where database names without a path or extension are stored
+SQLITE_DIR = os.environ.get('TEMPLE_SQLITE_DIR', '.')
+# Seconds to wait for the write lock (MySQL's innodb_lock_wait_timeout is 50)
+BUSY_TIMEOUT = float(os.environ.get('TEMPLE_SQLITE_BUSY_TIMEOUT', 30))
+
+ER_DUP_ENTRY = 1062
+ER_NO_REFERENCED_ROW = 1452
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_NO_SUCH_TABLE = 1146
+ER_PARSE_ERROR = 1064
+
+
+def database_path(database: str) -> str:
+    """File for a database name: names without a directory or extension go in SQLITE_DIR as <name>.sqlite3"""
+    if os.sep in database or os.path.splitext(database)[1]:
+        return database
+    return os.path.join(SQLITE_DIR, f"{database}.sqlite3")
+
+
+# Types: values read back come out as Connector/Python returns them
+def _parse_time(value: bytes) -> timedelta:
+    hours, minutes, *seconds = value.decode().split(':')
+    return timedelta(hours=int(hours), minutes=int(minutes), seconds=float(seconds[0]) if seconds else 0)
+
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()[:10]))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('TIME', _parse_time)
+sqlite3.register_converter('DECIMAL', lambda value: Decimal(value.decode()))
+
+def _param(value: Any) -> Any:
+    """Convert a query parameter to the text or number MySQL would have stored"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, time):
+        return value.strftime('%H:%M:%S')
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    if isinstance(value, Decimal):
+        # Exact text; DECIMAL columns keep it to 15 significant digits
+        return str(value)
+    if hasattr(value, 'item') and not isinstance(value, (bytes, str)):
+        # numpy scalars
+        return value.item()
+    return value
+
+def _params(params: Any) -> Any:
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return {key: _param(value) for key, value in params.items()}
+    return tuple(_param(value) for value in params)
+
+
+# SQL functions MySQL has and SQLite lacks
+def _as_date(value: Any) -> Optional[date]:
+    if value is None:
+        return None
+    return date.fromisoformat(str(value)[:10])
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    if value is None:
+        return None
+    return datetime.fromisoformat(str(value))
+
+_DATE_FORMAT_CODES = {
+    'Y': '%Y', 'y': '%y', 'm': '%m', 'd': '%d', 'H': '%H', 'h': '%I', 'I': '%I', 'i': '%M', 's': '%S',
+    'S': '%S', 'p': '%p', 'M': '%B', 'b': '%b', 'W': '%A', 'a': '%a', 'j': '%j', 'T': '%H:%M:%S', '%': '%%',
+}
+
+def _date_format(value: Any, fmt: str) -> Optional[str]:
+    moment = _as_datetime(value)
+    if moment is None or fmt is None:
+        return None
+
+    def code(match: re.Match) -> str:
+        spec = match.group(1)
+        if spec == 'e':
+            return str(moment.day)
+        if spec == 'c':
+            return str(moment.month)
+        if spec == 'k':
+            return str(moment.hour)
+        return moment.strftime(_DATE_FORMAT_CODES.get(spec, spec))
+
+    return re.sub(r'%(.)', code, fmt)
+
+_INTERVAL_UNITS = {'SECOND': 'seconds', 'MINUTE': 'minutes', 'HOUR': 'hours', 'DAY': 'days', 'WEEK': 'weeks'}
+
+def _date_add(value: Any, amount: Any, unit: str, sign: int = 1) -> Optional[str]:
+    if value is None or amount is None:
+        return None
+    text = str(value)
+    moment = _as_datetime(text)
+    unit = unit.upper()
+    if unit in ('MONTH', 'YEAR'):
+        months = moment.month - 1 + sign * int(amount) * (12 if unit == 'YEAR' else 1)
+        year, month = moment.year + months // 12, months % 12 + 1
+        days_in_month = (date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)).day
+        moment = moment.replace(year=year, month=month, day=min(moment.day, days_in_month))
+    else:
+        moment += sign * timedelta(**{_INTERVAL_UNITS[unit]: float(amount)})
+    if len(text) <= 10 and unit in ('DAY', 'WEEK', 'MONTH', 'YEAR'):
+        return moment.date().isoformat()
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def _concat(*values: Any) -> Optional[str]:
+    if any(value is None for value in values):
+        return None
+    return ''.join(str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+                   for value in values)
+
+def _greatest(*values: Any) -> Any:
+    return None if any(value is None for value in values) else max(values)
+
+_TIME_TEXT = re.compile(r'^(-?)(\d+):(\d{2})(?::(\d{2}(?:\.\d+)?))?$')
+
+def _time_key(value: str) -> Tuple:
+    match = _TIME_TEXT.match(value)
+    if not match:
+        return (1, value)
+    sign, hours, minutes, seconds = match.groups()
+    total = int(hours) * 3600 + int(minutes) * 60 + float(seconds or 0)
+    return (0, -total if sign else total)
+
+def _compare_times(a: str, b: str) -> int:
+    """MYSQL_TIME collation: TIME columns compare by value, so '7:00' = '07:00:00' as in MySQL"""
+    a, b = _time_key(a), _time_key(b)
+    return (a > b) - (a < b)
+
+def _least(*values: Any) -> Any:
+    return None if any(value is None for value in values) else min(values)
+
+def _register_functions(conn: sqlite3.Connection) -> None:
+    functions = [
+        ('CURDATE', 0, lambda: date.today().isoformat(), False),
+        ('NOW', 0, lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S'), False),
+        ('CURTIME', 0, lambda: datetime.now().strftime('%H:%M:%S'), False),
+        ('DATE_FORMAT', 2, _date_format, True),
+        ('DATE_ADD', 3, _date_add, True),
+        ('DATE_SUB', 3, lambda value, amount, unit: _date_add(value, amount, unit, -1), True),
+        ('DATEDIFF', 2, lambda a, b: None if a is None or b is None else (_as_date(a) - _as_date(b)).days, True),
+        ('WEEKDAY', 1, lambda value: None if value is None else _as_date(value).weekday(), True),
+        ('DAYOFWEEK', 1, lambda value: None if value is None else (_as_date(value).weekday() + 1) % 7 + 1, True),
+        ('YEAR', 1, lambda value: None if value is None else _as_date(value).year, True),
+        ('MONTH', 1, lambda value: None if value is None else _as_date(value).month, True),
+        ('DAY', 1, lambda value: None if value is None else _as_date(value).day, True),
+        ('HOUR', 1, lambda value: None if value is None else int(str(value).split(' ')[-1].split(':')[0]), True),
+        ('CONCAT', -1, _concat, True),
+        ('GREATEST', -1, _greatest, True),
+        ('LEAST', -1, _least, True),
+        ('ANY_VALUE', 1, lambda value: value, True),
+        # One writer at a time already; advisory locks always succeed
+        ('GET_LOCK', 2, lambda name, timeout: 1, False),
+        ('RELEASE_LOCK', 1, lambda name: 1, False),
+        ('DATABASE', 0, lambda: 'main', True),
+        ('VERSION', 0, lambda: f"SQLite {sqlite3.sqlite_version}", True),
+    ]
+    for name, arity, function, deterministic in functions:
+        conn.create_function(name, arity, function, deterministic=deterministic)
+    conn.create_collation('MYSQL_TIME', _compare_times)
+
+
+# Dialect translation
+_INFORMATION_SCHEMA = {
+    'tables': "(SELECT 'main' AS table_schema, name AS table_name, 'BASE TABLE' AS table_type, "
+              "NULL AS table_rows FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%')",
+    'columns': "(SELECT 'main' AS table_schema, m.name AS table_name, p.name AS column_name, "
+               "p.type AS data_type, p.type AS column_type, CASE WHEN p.\"notnull\" THEN 'NO' ELSE 'YES' END "
+               "AS is_nullable, p.dflt_value AS column_default, "
+               "CASE WHEN p.pk THEN 'PRI' ELSE '' END AS column_key, p.cid + 1 AS ordinal_position "
+               "FROM sqlite_master m JOIN pragma_table_info(m.name) p WHERE m.type = 'table')",
+    'statistics': "(SELECT 'main' AS table_schema, tbl_name AS table_name, name AS index_name "
+                  "FROM sqlite_master WHERE type = 'index')",
+}
+
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+
+_REWRITES = [
+    (re.compile(r'\bINT(?:EGER)?\s+(?:NOT\s+NULL\s+)?AUTO_INCREMENT\s+PRIMARY\s+KEY\b', re.I),
+     'INTEGER PRIMARY KEY AUTOINCREMENT'),
+    (re.compile(r'\s*\bAUTO_INCREMENT\b(\s*=\s*\d+)?', re.I), ''),
+    (re.compile(r'\s*\b(ENGINE|DEFAULT\s+CHARSET|CHARSET|COLLATE)\s*=?\s*\w+', re.I), ''),
+    (re.compile(r'\bAS\s+(UN)?SIGNED(\s+INTEGER)?\b', re.I), 'AS INTEGER'),
+    (re.compile(r'\bUNSIGNED\b', re.I), ''),
+    (re.compile(r'\bDEFAULT\s+CURRENT_TIMESTAMP\b(\s*\(\s*\))?', re.I), "DEFAULT (datetime('now', 'localtime'))"),
+    (re.compile(r'\bCURRENT_TIMESTAMP\b(\s*\(\s*\))?', re.I), 'NOW()'),
+    (re.compile(r'\bCURRENT_DATE\b(\s*\(\s*\))?', re.I), 'CURDATE()'),
+    (re.compile(r'\bLAST_INSERT_ID\s*\(\s*\)', re.I), 'last_insert_rowid()'),
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.I), 'INSERT OR IGNORE'),
+    (re.compile(r'\bINTERVAL\s+(\?|[\w.]+)\s+(SECOND|MINUTE|HOUR|DAY|WEEK|MONTH|YEAR)\b', re.I), r"\1, '\2'"),
+    (re.compile(r'\s+(FOR\s+UPDATE(\s+(SKIP\s+LOCKED|NOWAIT))?|FOR\s+SHARE|LOCK\s+IN\s+SHARE\s+MODE)\b', re.I), ''),
+    (re.compile(r'\binformation_schema\.(\w+)', re.I),
+     lambda match: _INFORMATION_SCHEMA.get(match.group(1).lower(), match.group(0))),
+]
+
+_TIME_COLUMN = re.compile(r'(?<=[\w"]\s)TIME(?=\s*(?:NOT\b|NULL\b|DEFAULT\b|CHECK\b|,|\)|$))', re.I)
+_LOCKING_READ = re.compile(r'\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b', re.I)
+_UPSERT = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.I)
+
+def _translate_upsert(sql: str) -> str:
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE c = VALUES(c) -> INSERT ... ON CONFLICT DO UPDATE SET c = excluded.c
+    (or ON CONFLICT DO NOTHING for the no-op c = c)
+    """
+    head, tail = _UPSERT.split(sql, maxsplit=1)
+    if re.fullmatch(r'\s*(\w+)\s*=\s*\1\s*', tail):
+        # The "c = c" no-op only skips duplicates; DO NOTHING also leaves them out of rowcount as MySQL does
+        conflict = 'ON CONFLICT DO NOTHING'
+    else:
+        tail = re.sub(r'\bVALUES\s*\(\s*(\w+)\s*\)', r'excluded.\1', tail, flags=re.I)
+        conflict = f'ON CONFLICT DO UPDATE SET {tail}'
+    if re.search(r'\bSELECT\b', head, re.I) and not re.search(r'\bWHERE\b', head, re.I):
+        # SQLite needs a WHERE on INSERT ... SELECT before an upsert clause
+        group = re.search(r'\bGROUP\s+BY\b', head, re.I)
+        head = head[:group.start()] + 'WHERE true ' + head[group.start():] if group else head + ' WHERE true'
+    return f"{head} {conflict}"
+
+@lru_cache(maxsize=1024)
+def translate(sql: str) -> Tuple[str, str]:
+    """
+    Translate one MySQL statement. Returns (kind, sql) where kind is 'read',
+    'locking_read', 'write', 'ddl', 'savepoint', 'begin', 'commit', 'rollback',
+    'noop' or 'show'.
+    """
+    # Work on the statement with string literals masked out
+    literals: List[str] = []
+
+    def mask(match: re.Match) -> str:
+        literals.append(match.group(0))
+        return f"\x00{len(literals) - 1}\x00"
+
+    code = _LITERAL.sub(mask, sql.strip().rstrip(';'))
+    code = code.replace('`', '"')
+    code = re.sub(r'%\((\w+)\)s', r':\1', code).replace('%s', '?')
+
+    first = code.split(None, 1)[0].upper() if code else ''
+    words = code.upper().split()
+    if first in ('SELECT', 'WITH', 'VALUES'):
+        kind = 'locking_read' if _LOCKING_READ.search(code) else 'read'
+    elif first in ('INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+        kind = 'write'
+    elif first in ('CREATE', 'ALTER', 'DROP', 'TRUNCATE', 'RENAME'):
+        kind = 'ddl'
+    elif first == 'SAVEPOINT' or (first in ('ROLLBACK', 'RELEASE') and 'SAVEPOINT' in words[:3]) \
+            or (first == 'ROLLBACK' and len(words) > 1 and words[1] == 'TO'):
+        kind = 'savepoint'
+    elif first in ('BEGIN', 'START'):
+        kind = 'begin'
+    elif first == 'COMMIT':
+        kind = 'commit'
+    elif first == 'ROLLBACK':
+        kind = 'rollback'
+    elif first == 'SET':
+        # Session variables (foreign_key_checks, unique_checks, ...) have no SQLite counterpart
+        kind = 'noop'
+    elif first == 'SHOW':
+        kind = 'show'
+    elif first == 'LOAD':
+        raise mysql.connector.errors.NotSupportedError(msg="LOAD DATA is not supported by the SQLite backend")
+    else:
+        kind = 'read'
+
+    if kind == 'ddl' and re.match(r'ALTER\s+TABLE\s+\S+\s+(MODIFY|CHANGE)\b', code, re.I):
+        # Column types aren't enforced by SQLite, so type changes are no-ops
+        kind, code = 'noop', ''
+    for pattern, replacement in _REWRITES:
+        code = pattern.sub(replacement, code)
+    if kind == 'ddl':
+        # Parameters aren't typed, so TIME columns compare their text by value instead
+        code = _TIME_COLUMN.sub('TIME COLLATE MYSQL_TIME', code)
+    if kind == 'write' and _UPSERT.search(code):
+        code = _translate_upsert(code)
+
+    return kind, re.sub(r'\x00(\d+)\x00', lambda match: literals[int(match.group(1))], code)
+
+def _show(sql: str) -> Tuple[str, Sequence]:
+    """SELECT equivalents of the SHOW statements the admin pages use"""
+    create = re.match(r"SHOW\s+CREATE\s+TABLE\s+[`\"]?(\w+)", sql, re.I)
+    if create:
+        return ("SELECT name AS \"Table\", sql AS \"Create Table\" FROM sqlite_master "
+                "WHERE type = 'table' AND name = ?", (create.group(1),))
+    if re.match(r"SHOW\s+TABLES", sql, re.I):
+        return ("SELECT name AS \"Tables_in_main\" FROM sqlite_master "
+                "WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name", ())
+    # STATUS, VARIABLES, PROCESSLIST, ...: nothing to report
+    return "SELECT NULL AS Variable_name, NULL AS Value WHERE 0", ()
+
+
+def _error(err: sqlite3.Error) -> mysql.connector.Error:
+    """The mysql.connector error the same failure raises on MySQL"""
+    message = str(err)
+    lowered = message.lower()
+    if isinstance(err, sqlite3.IntegrityError):
+        errno = ER_DUP_ENTRY if 'unique' in lowered or 'primary key' in lowered else ER_NO_REFERENCED_ROW
+        return mysql.connector.errors.IntegrityError(msg=message, errno=errno)
+    if isinstance(err, sqlite3.OperationalError):
+        if 'locked' in lowered or 'busy' in lowered:
+            return mysql.connector.errors.DatabaseError(msg=f"Lock wait timeout exceeded ({message})",
+                                                        errno=ER_LOCK_WAIT_TIMEOUT)
+        if 'no such table' in lowered:
+            return mysql.connector.errors.ProgrammingError(msg=message, errno=ER_NO_SUCH_TABLE)
+        if 'syntax error' in lowered or 'no such column' in lowered or 'no such function' in lowered:
+            return mysql.connector.errors.ProgrammingError(msg=message, errno=ER_PARSE_ERROR)
+        return mysql.connector.errors.OperationalError(msg=message)
+    if isinstance(err, sqlite3.ProgrammingError):
+        return mysql.connector.errors.ProgrammingError(msg=message)
+    if isinstance(err, sqlite3.NotSupportedError):
+        return mysql.connector.errors.NotSupportedError(msg=message)
+    if isinstance(err, sqlite3.InterfaceError):
+        return mysql.connector.errors.InterfaceError(msg=message)
+    return mysql.connector.errors.DatabaseError(msg=message)
+
+
+class SQLiteCursor:
+    """Cursor with Connector/Python's interface: %s parameters, lastrowid, dictionary rows"""
+
+    def __init__(self, connection: 'SQLiteConnection', dictionary: bool = False):
+        self._connection = connection
+        self._cursor = connection._conn.cursor()
+        self._dictionary = dictionary
+        self._rows: List[Any] = []
+        self._next = 0
+        self.lastrowid: Optional[int] = None
+        self.rowcount = -1
+        self.description = None
+
+    @property
+    def column_names(self) -> Tuple[str, ...]:
+        return tuple(column[0] for column in self.description or ())
+
+    def execute(self, operation: str, params: Any = None, multi: bool = False) -> None:
+        kind, sql = translate(operation)
+        params = _params(params)
+        self._rows, self._next = [], 0
+        self.description = None
+
+        try:
+            if kind == 'show':
+                sql, params = _show(operation)
+            elif kind == 'noop':
+                self.rowcount = 0
+                return
+            elif kind == 'begin':
+                self._connection.start_transaction()
+                return
+            elif kind == 'commit':
+                self._connection.commit()
+                return
+            elif kind == 'rollback':
+                self._connection.rollback()
+                return
+            elif kind == 'ddl':
+                # DDL commits the open transaction first, as in MySQL
+                self._connection.commit()
+            elif kind in ('write', 'locking_read', 'savepoint'):
+                self._connection._begin_write()
+
+            self._cursor.execute(sql, params)
+        except sqlite3.Error as err:
+            raise _error(err) from err
+
+        self.description = self._cursor.description
+        if kind == 'write':
+            self.rowcount = self._cursor.rowcount
+            self.lastrowid = None
+            if sql.split(None, 1)[0].upper() in ('INSERT', 'REPLACE') and self.rowcount > 0:
+                # MySQL reports the first ID of a multi-row insert
+                self.lastrowid = self._cursor.lastrowid - self.rowcount + 1
+        elif self.description is not None:
+            # Read everything now, like a buffered MySQL cursor
+            self._rows = self._cursor.fetchall()
+            self.rowcount = len(self._rows)
+        else:
+            self.rowcount = self._cursor.rowcount
+
+    def executemany(self, operation: str, seq_params: Sequence) -> None:
+        rowcount = 0
+        first_id = None
+        for params in seq_params:
+            self.execute(operation, params)
+            rowcount += max(self.rowcount, 0)
+            if first_id is None and self.lastrowid:
+                first_id = self.lastrowid
+        self.rowcount = rowcount
+        self.lastrowid = first_id
+
+    def _row(self, row: Tuple) -> Any:
+        if self._dictionary:
+            return {column[0]: value for column, value in zip(self.description, row)}
+        return row
+
+    def fetchone(self) -> Any:
+        if self._next >= len(self._rows):
+            return None
+        self._next += 1
+        return self._row(self._rows[self._next - 1])
+
+    def fetchmany(self, size: int = 1) -> List[Any]:
+        rows = self._rows[self._next:self._next + size]
+        self._next += len(rows)
+        return [self._row(row) for row in rows]
+
+    def fetchall(self) -> List[Any]:
+        rows = self._rows[self._next:]
+        self._next = len(self._rows)
+        return [self._row(row) for row in rows]
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def close(self) -> None:
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Connection with Connector/Python's interface over one sqlite3 connection"""
+
+    def __init__(self, database: str, timeout: float = BUSY_TIMEOUT):
+        self.database = database
+        try:
+            self._conn = sqlite3.connect(database_path(database), timeout=timeout, isolation_level=None,
+                                         detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            # Readers don't block the writer and vice versa
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+        except sqlite3.Error as err:
+            raise _error(err) from err
+        _register_functions(self._conn)
+
+    def cursor(self, dictionary: bool = False, **options) -> SQLiteCursor:
+        return SQLiteCursor(self, dictionary)
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._conn.in_transaction
+
+    def _begin_write(self) -> None:
+        """Take the write lock now, so rows read for update can't change before the write"""
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN IMMEDIATE")
+
+    def start_transaction(self, **options) -> None:
+        try:
+            self._begin_write()
+        except sqlite3.Error as err:
+            raise _error(err) from err
+
+    def commit(self) -> None:
+        try:
+            if self._conn.in_transaction:
+                self._conn.execute("COMMIT")
+        except sqlite3.Error as err:
+            raise _error(err) from err
+
+    def rollback(self) -> None:
+        try:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+        except sqlite3.Error as err:
+            raise _error(err) from err
+
+    def ping(self, reconnect: bool = False, attempts: int = 1, delay: int = 0) -> None:
+        try:
+            self._conn.execute("SELECT 1")
+        except sqlite3.Error as err:
+            raise _error(err) from err
+
+    def is_connected(self) -> bool:
+        try:
+            self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self) -> None:
+        self._conn.close()
+
+def connect(database: str, **options) -> SQLiteConnection:
+    """Open a database (a name or a file path); MySQL-only options such as host or user are ignored"""
+    return SQLiteConnection(database, timeout=options.get('timeout', BUSY_TIMEOUT))
@@ -0,0 +1,145 @@
+#stress_booking.py
+#
+# Concurrency stress test for TempleDatabase.book_darshan.
+# Many threads race to book one small schedule; afterwards the schedule's
+# RemainingSlots must match its bookings exactly and never go negative.
+#
+#   python stress_booking.py --threads 200 --capacity 500
+
+import argparse
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from booking import TempleDatabase, REMAINING_SLOTS_SQL
+from db_pool import DB_CONFIG, get_pool
+from rollups import retract_bookings
+from visitor_stats import recompute_visitor_stats
+
+def create_stress_schedule(db: TempleDatabase, capacity: int) -> int:
+    """Create a throwaway VIP schedule far in the future and return its ID"""
+    temple = db.get_temples()[0]
+    darshan_type = db.get_darshan_types(temple['TempleID'])[0]
+    schedule_date = (datetime.now() + timedelta(days=3650)).strftime('%Y-%m-%d')
+
+    with db.unit_of_work():
+        db.cursor.execute("""
+        INSERT INTO DarshanSchedules (TempleID, DarshanTypeID, ScheduleDate,
+        StartTime, EndTime, CurrentCapacity, RemainingSlots)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (temple['TempleID'], darshan_type['DarshanTypeID'], schedule_date,
+              '07:00', '10:00', capacity, capacity))
+        schedule_id = db.cursor.lastrowid
+        db.conn.commit()
+    return schedule_id
+
+def create_stress_visitors(db: TempleDatabase, count: int) -> List[int]:
+    """Register one visitor per worker thread so they don't contend on a visitor row"""
+    visitor_ids = []
+    for i in range(count):
+        visitor_id = db.register_visitor("Stress", f"Devotee{i}", f"9{random.randint(100000000, 999999999)}")
+        if visitor_id is None:
+            raise RuntimeError("Could not register stress-test visitor")
+        visitor_ids.append(visitor_id)
+    return visitor_ids
+
+def check_schedule(db: TempleDatabase, schedule_id: int) -> Dict:
+    """Compare a schedule's slot counter with its bookings"""
+    with db.unit_of_work():
+        db.cursor.execute(f"""
+        SELECT ds.CurrentCapacity, {REMAINING_SLOTS_SQL} as RemainingSlots,
+               (SELECT COALESCE(SUM(b.NumberOfPeople), 0) FROM DarshanBookings b
+                WHERE b.ScheduleID = ds.ScheduleID) as booked
+        FROM DarshanSchedules ds
+        WHERE ds.ScheduleID = %s
+        """, (schedule_id,))
+        return db.cursor.fetchone()
+
+def cleanup(db: TempleDatabase, schedule_id: int, visitor_ids: List[int]) -> None:
+    """Remove the rows created by the stress test"""
+    with db.unit_of_work():
+        retract_bookings(db.cursor, 'ScheduleID', schedule_id)
+        db.cursor.execute("DELETE FROM DarshanBookings WHERE ScheduleID = %s", (schedule_id,))
+        db.cursor.execute("DELETE FROM DarshanScheduleShards WHERE ScheduleID = %s", (schedule_id,))
+        db.cursor.execute("DELETE FROM DarshanSchedules WHERE ScheduleID = %s", (schedule_id,))
+        for visitor_id in visitor_ids:
+            db.cursor.execute("DELETE FROM Visitors WHERE VisitorID = %s", (visitor_id,))
+        recompute_visitor_stats(db.cursor, *visitor_ids)
+        db.conn.commit()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stress book_darshan for oversell under concurrency")
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--capacity", type=int, default=300)
+    parser.add_argument("--max-people", type=int, default=4, help="Each booking asks for 1..N people")
+    parser.add_argument("--shards", type=int, default=0, help="Split the schedule into N sharded counters")
+    parser.add_argument("--keep", action="store_true", help="Keep the test schedule and bookings")
+    args = parser.parse_args()
+
+    # Size the shared pool so every worker gets its own connection
+    get_pool(DB_CONFIG, pool_size=args.threads + 2, timeout=60)
+    db = TempleDatabase(per_request=True)
+    db.init_db()
+
+    schedule_id = create_stress_schedule(db, args.capacity)
+    if args.shards:
+        db.shard_schedule(schedule_id, args.shards)
+    visitor_ids = create_stress_visitors(db, args.threads)
+
+    results = {'booked': 0, 'people': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+    start = threading.Barrier(args.threads)
+
+    def worker(visitor_id: int) -> None:
+        start.wait()
+        while True:
+            people = random.randint(1, args.max_people)
+            booking_id, message = db.book_darshan(schedule_id, visitor_id, people)
+            with lock:
+                if booking_id:
+                    results['booked'] += 1
+                    results['people'] += people
+                elif message == "Not enough slots available":
+                    results['rejected'] += 1
+                else:
+                    results['errors'] += 1
+            # Keep going until small requests are refused too
+            if not booking_id and message == "Not enough slots available" and people == 1:
+                return
+            if not booking_id and message != "Not enough slots available":
+                return
+
+    threads = [threading.Thread(target=worker, args=(visitor_id,)) for visitor_id in visitor_ids]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    state = check_schedule(db, schedule_id)
+    oversold = max(0, state['booked'] - state['CurrentCapacity'])
+    consistent = (state['RemainingSlots'] >= 0
+                  and state['CurrentCapacity'] - state['RemainingSlots'] == state['booked']
+                  and state['booked'] == results['people'])
+
+    print(f"Threads: {args.threads}  Capacity: {args.capacity}  Shards: {args.shards}  Time: {elapsed:.2f}s")
+    print(f"Bookings: {results['booked']} ({results['people']} people)  "
+          f"Rejected: {results['rejected']}  Errors: {results['errors']}")
+    print(f"RemainingSlots: {state['RemainingSlots']}  Booked in DB: {state['booked']}  Oversold: {oversold}")
+    print(f"Pool: {db.pool.stats()}")
+
+    if not args.keep:
+        cleanup(db, schedule_id, visitor_ids)
+
+    if oversold or not consistent:
+        print("FAIL: slot counter and bookings disagree")
+        return 1
+    print("OK: no oversell")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#visitor_lookup.py
+
+import os
+import mysql.connector
+from typing import Dict, Optional
+from cache import TTLCache
+
+# Positive cache: registered visitors by mobile number. The admin utility deletes and
+# edits visitors from its own process and can't reach this cache, so instead of
+# invalidating on delete the TTL is kept short: a deleted visitor is served for at
+# most this long.
+VISITOR_CACHE_SIZE = int(os.environ.get('TEMPLE_VISITOR_CACHE_SIZE', 10000))
+VISITOR_CACHE_TTL = float(os.environ.get('TEMPLE_VISITOR_CACHE_TTL', 30))
+
+# Negative cache: numbers that are not registered. Kept shorter still so a number
+# registered by another process is picked up quickly.
+NEGATIVE_CACHE_SIZE = int(os.environ.get('TEMPLE_VISITOR_NEGATIVE_CACHE_SIZE', 10000))
+NEGATIVE_CACHE_TTL = float(os.environ.get('TEMPLE_VISITOR_NEGATIVE_CACHE_TTL', 15))
+
+
+class VisitorLookup:
+    """
+    Visitor-by-phone lookups for a TempleDatabase, backed by a bounded LRU
+    cache of known visitors and a smaller-TTL cache of unregistered numbers.
+    Database errors are never cached. The caches are per process; changes made
+    elsewhere show up when entries expire (see VISITOR_CACHE_TTL).
+    """
+
+    def __init__(self, db, maxsize: int = VISITOR_CACHE_SIZE, ttl: float = VISITOR_CACHE_TTL,
+                 negative_maxsize: int = NEGATIVE_CACHE_SIZE, negative_ttl: float = NEGATIVE_CACHE_TTL):
+        self.db = db
+        self.found = TTLCache(ttl, maxsize)
+        self.not_found = TTLCache(negative_ttl, negative_maxsize)
+
+    def get(self, phone: str) -> Optional[Dict]:
+        """Get a visitor by mobile number, or None if not registered"""
+        visitor = self.found.get(phone)
+        if visitor is not None:
+            return dict(visitor)
+        if self.not_found.get(phone):
+            return None
+
+        try:
+            with self.db.unit_of_work():
+                self.db.cursor.execute(
+                    "SELECT * FROM Visitors WHERE MobileNumber = %s", (phone,)
+                )
+                visitor = self.db.cursor.fetchone()
+        except mysql.connector.Error as err:
+            print(f"Error getting visitor: {err}")
+            return None
+
+        if visitor is None:
+            self.not_found.set(phone, True)
+            return None
+
+        self.found.set(phone, visitor)
+        return dict(visitor)
+
+    def invalidate(self, phone: str) -> None:
+        """Forget anything cached for a mobile number"""
+        self.found.invalidate(phone)
+        self.not_found.invalidate(phone)
+
+    def clear(self) -> None:
+        """Forget everything"""
+        self.found.clear()
+        self.not_found.clear()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Get metrics for both caches"""
+        return {'found': self.found.stats(), 'not_found': self.not_found.stats()}
+
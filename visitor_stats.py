@@ -0,0 +1,126 @@
+#visitor_stats.py
+
+import mysql.connector
+from typing import Tuple
+from db_pool import DB_CONFIG, get_pool
+
+# Visitors recomputed per transaction by rebuild_visitor_stats()
+REBUILD_BATCH_VISITORS = 5000
+
+ACTIVITY_KINDS = ('booking', 'donation', 'puja', 'prasadam')
+
+VISITOR_ACTIVITY_SQL = """
+INSERT INTO VisitorStats (VisitorID, BookingCount, BookingAmount, DonationCount, DonationAmount,
+                          PujaCount, PujaAmount, PrasadamCount, PrasadamAmount, ActivityCount, LastActivity)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+ON DUPLICATE KEY UPDATE BookingCount = BookingCount + VALUES(BookingCount),
+    BookingAmount = BookingAmount + VALUES(BookingAmount),
+    DonationCount = DonationCount + VALUES(DonationCount),
+    DonationAmount = DonationAmount + VALUES(DonationAmount),
+    PujaCount = PujaCount + VALUES(PujaCount), PujaAmount = PujaAmount + VALUES(PujaAmount),
+    PrasadamCount = PrasadamCount + VALUES(PrasadamCount),
+    PrasadamAmount = PrasadamAmount + VALUES(PrasadamAmount),
+    ActivityCount = ActivityCount + VALUES(ActivityCount), LastActivity = VALUES(LastActivity)
+"""
+
+# Fresh stats from the source tables for the visitors matching {inner} (a filter on
+# VisitorID) and {outer} (the same filter on v.VisitorID). Pujas record no booking
+# time, so LastActivity falls back to the visitor's LastVisit day.
+_STATS_FROM_SOURCE = """
+INSERT INTO VisitorStats (VisitorID, BookingCount, BookingAmount, DonationCount, DonationAmount,
+                          PujaCount, PujaAmount, PrasadamCount, PrasadamAmount, ActivityCount, LastActivity)
+SELECT v.VisitorID,
+       COALESCE(b.activity, 0), COALESCE(b.amount, 0), COALESCE(d.activity, 0), COALESCE(d.amount, 0),
+       COALESCE(p.activity, 0), COALESCE(p.amount, 0), COALESCE(o.activity, 0), COALESCE(o.amount, 0),
+       COALESCE(b.activity, 0) + COALESCE(d.activity, 0) + COALESCE(p.activity, 0) + COALESCE(o.activity, 0),
+       NULLIF(GREATEST(COALESCE(b.last_at, '1000-01-01'), COALESCE(d.last_at, '1000-01-01'),
+                       COALESCE(o.last_at, '1000-01-01'), COALESCE(v.LastVisit, '1000-01-01')), '1000-01-01')
+FROM Visitors v
+LEFT JOIN (SELECT VisitorID, COUNT(*) as activity, SUM(TotalAmount) as amount, MAX(BookingDateTime) as last_at
+           FROM DarshanBookings WHERE {inner} GROUP BY VisitorID) b ON b.VisitorID = v.VisitorID
+LEFT JOIN (SELECT VisitorID, COUNT(*) as activity, SUM(Amount) as amount, MAX(DonationDate) as last_at
+           FROM Donations WHERE {inner} GROUP BY VisitorID) d ON d.VisitorID = v.VisitorID
+LEFT JOIN (SELECT VisitorID, COUNT(*) as activity, SUM(TotalAmount) as amount
+           FROM VirtualPujas WHERE {inner} GROUP BY VisitorID) p ON p.VisitorID = v.VisitorID
+LEFT JOIN (SELECT VisitorID, COUNT(*) as activity, SUM(TotalAmount) as amount, MAX(OrderDate) as last_at
+           FROM PrasadamOrders WHERE {inner} GROUP BY VisitorID) o ON o.VisitorID = v.VisitorID
+WHERE {outer}
+  AND (b.activity IS NOT NULL OR d.activity IS NOT NULL OR p.activity IS NOT NULL OR o.activity IS NOT NULL)
+"""
+
+def visitor_activity(visitor_id: int, kind: str, count: int, amount: float) -> Tuple:
+    """Parameters for VISITOR_ACTIVITY_SQL adding count records worth amount of one kind"""
+    values = [0] * (2 * len(ACTIVITY_KINDS))
+    position = 2 * ACTIVITY_KINDS.index(kind)
+    values[position], values[position + 1] = count, amount
+    return (visitor_id, *values, count)
+
+def _insert_from_source(cursor, condition: str, params: Tuple) -> int:
+    """Insert fresh stats for the visitors matching condition (on a column named {column})"""
+    cursor.execute(_STATS_FROM_SOURCE.format(inner=condition.format(column='VisitorID'),
+                                             outer=condition.format(column='v.VisitorID')),
+                   params * 5)
+    return max(cursor.rowcount, 0)
+
+def recompute_visitor_stats(cursor, *visitor_ids: int) -> None:
+    """
+    Recompute the stats of the given visitors from the source tables, in the
+    caller's transaction. Run it after deleting their bookings, donations,
+    pujas or orders (or the visitors themselves).
+    """
+    visitor_ids = sorted({visitor_id for visitor_id in visitor_ids if visitor_id is not None})
+    for start in range(0, len(visitor_ids), 1000):
+        batch = tuple(visitor_ids[start:start + 1000])
+        placeholders = ", ".join(["%s"] * len(batch))
+        cursor.execute(f"DELETE FROM VisitorStats WHERE VisitorID IN ({placeholders})", batch)
+        _insert_from_source(cursor, f"{{column}} IN ({placeholders})", batch)
+
+def rebuild_visitor_stats(conn, cursor, first_id: int = 1, last_id: int = None) -> int:
+    """
+    Recompute VisitorStats for visitors first_id..last_id (default all of them),
+    committing every REBUILD_BATCH_VISITORS visitor IDs; run it off-peak.
+    Returns the number of rows written.
+    """
+    if last_id is None:
+        cursor.execute("""
+        SELECT GREATEST(COALESCE((SELECT MAX(VisitorID) FROM Visitors), 0),
+                        COALESCE((SELECT MAX(VisitorID) FROM VisitorStats), 0)) as max_id
+        """)
+        last_id = cursor.fetchone()['max_id']
+
+    written = 0
+    for start in range(first_id, last_id + 1, REBUILD_BATCH_VISITORS):
+        ids = (start, min(start + REBUILD_BATCH_VISITORS - 1, last_id))
+        cursor.execute("DELETE FROM VisitorStats WHERE VisitorID BETWEEN %s AND %s", ids)
+        written += _insert_from_source(cursor, "{column} BETWEEN %s AND %s", ids)
+        conn.commit()
+    return written
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild the VisitorStats summary from the source tables")
+    parser.add_argument("--visitor", type=int, action="append", default=None,
+                        help="Only recompute this visitor (repeatable)")
+    args = parser.parse_args()
+
+    conn = get_pool(DB_CONFIG).get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        if args.visitor:
+            recompute_visitor_stats(cursor, *args.visitor)
+            conn.commit()
+            print(f"Recomputed {len(set(args.visitor))} visitor(s)")
+        else:
+            print(f"Rebuilt stats for {rebuild_visitor_stats(conn, cursor):,} visitors")
+        return 0
+    except mysql.connector.Error as err:
+        print(f"Error rebuilding visitor stats: {err}")
+        conn.rollback()
+        return 1
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    raise SystemExit(main())